@@ -4,69 +4,201 @@ ReformatBackup - Backup Functionality
 This module handles backing up application data.
 """
 
+import io
 import os
+import re
 import json
 import logging
 import datetime
-from typing import Dict, Any, List, Optional
+import pathlib
+import contextlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import BinaryIO, Dict, Any, Iterator, List, Optional, Tuple
 import py7zr
+from py7zr.helpers import ArchiveTimestamp
+from py7zr.member import MemberType
 
 from reformatbackup.src.config import (
     get_backup_location,
     set_backup_location,
     get_compression_level,
-    get_max_backups_per_app
+    get_max_backups_per_app,
+    get_backup_format,
+    get_incremental_backups,
+    get_max_incremental_chain
 )
+from reformatbackup.src.chunkstore import (
+    MANIFEST_SUFFIX,
+    get_chunk_store,
+    read_manifest,
+    write_version,
+    collect_garbage
+)
+from reformatbackup.src.compression import STORE_FILTERS, classify_files, get_compression_filters
+from reformatbackup.src.fingerprint import tree_digest
+from reformatbackup.src.hashcache import HASH_ALGORITHM, HashingReader, get_hash_cache, new_hasher
+from reformatbackup.src.ownership import normalize_path, is_within, collapse_paths
+from reformatbackup.src.progress import ProgressTracker
+from reformatbackup.src.utils import read_json
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-def backup_app(app_id: str, compression_level: Optional[int] = None,
-               backup_dot_files: Optional[bool] = None, notes: str = "") -> Dict[str, Any]:
+# The extension of each backup format's backup file
+BACKUP_SUFFIXES = {"7z": ".7z", "chunks": MANIFEST_SUFFIX}
+
+# Threads reading files ahead of the compressor
+READER_WORKERS = 4
+
+# Files up to this size are read ahead into memory; larger ones are read by
+# the compressor as it goes
+PREFETCH_FILE_LIMIT = 16 * 1024 * 1024
+
+# Most bytes read ahead and not yet compressed, including the file being compressed
+PREFETCH_MEMORY_LIMIT = 64 * 1024 * 1024
+
+# Most files read ahead at once
+PREFETCH_FILES = 256
+
+def find_backup_file(backup_location: str, backup_id: str) -> Optional[str]:
     """
-    Back up an application's data.
+    Find the archive or manifest of a backup.
     
     Args:
-        app_id (str): The ID of the application to back up.
-        compression_level (Optional[int], optional): The compression level to use (0-9).
-            If None, uses the value from configuration. Defaults to None.
-        backup_dot_files (Optional[bool], optional): Whether to include dot files in the backup.
-            If None, uses the value from configuration. Defaults to None.
-        notes (str, optional): Notes to add to the backup metadata. Defaults to "".
+        backup_location (str): The backup location.
+        backup_id (str): The ID of the backup.
     
     Returns:
-        Dict[str, Any]: A dictionary containing information about the backup.
+        Optional[str]: The path of the backup file, or None if there is none.
+    """
+    for suffix in BACKUP_SUFFIXES.values():
+        backup_path = os.path.join(backup_location, f"{backup_id}{suffix}")
+        if os.path.exists(backup_path):
+            return backup_path
+    return None
+
+def is_app_backup(backup_id: str, app_id: str) -> bool:
     """
-    from reformatbackup.src.scan import scan_installed_apps
+    Check whether a backup ID belongs to an application.
     
-    # Get the list of installed applications
-    apps = scan_installed_apps()
+    Backup IDs are "<app_id>-<YYYYMMDD>-<HHMMSS>", so a plain prefix test
+    would also match the backups of an application whose ID starts with
+    this one (e.g. "foo-bar" for "foo").
     
-    # Find the application to back up
-    app = None
-    for a in apps:
-        if a.get("id") == app_id:
-            app = a
-            break
+    Args:
+        backup_id (str): The backup ID.
+        app_id (str): The ID of the application.
     
-    if not app:
-        return {"success": False, "error": f"Application with ID {app_id} not found"}
+    Returns:
+        bool: True if the backup is one of the application's.
+    """
+    return re.fullmatch(re.escape(app_id) + r"-\d{8}-\d{6}", backup_id) is not None
+
+def list_app_backups(backup_location: str, app_id: str) -> List[Tuple[str, str]]:
+    """
+    List the backups of an application, in either format.
     
-    # Get the backup location
-    backup_location = get_backup_location()
+    Args:
+        backup_location (str): The backup location.
+        app_id (str): The ID of the application.
     
-    # Create a timestamp for the backup
-    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    Returns:
+        List[Tuple[str, str]]: The ID and file path of each backup, newest first.
+    """
+    backups = []
+    for filename in os.listdir(backup_location):
+        suffix = next((suffix for suffix in BACKUP_SUFFIXES.values() if filename.endswith(suffix)), None)
+        if suffix and is_app_backup(filename[:-len(suffix)], app_id):
+            backups.append((filename[:-len(suffix)], os.path.join(backup_location, filename)))
     
-    # Create the backup filename
-    backup_filename = f"{app_id}-{timestamp}.7z"
-    backup_path = os.path.join(backup_location, backup_filename)
+    # Backup IDs end with their timestamp, so they sort by age
+    backups.sort(key=lambda backup: backup[0][len(app_id) + 1:], reverse=True)
+    return backups
+
+def find_incremental_base(backup_location: str, app_id: str, backup_format: str) -> Optional[Dict[str, Any]]:
+    """
+    Find the backup the next incremental backup of an application builds on.
     
-    # Create the metadata filename
-    metadata_filename = f"{app_id}-{timestamp}.json"
-    metadata_path = os.path.join(backup_location, metadata_filename)
+    That is the newest backup in the same format, unless it wasn't written
+    as part of an incremental chain or its chain is already as long as
+    allowed, in which case the next backup is a full one.
+    
+    Args:
+        backup_location (str): The backup location.
+        app_id (str): The ID of the application.
+        backup_format (str): The format of the next backup.
+    
+    Returns:
+        Optional[Dict[str, Any]]: The base backup's metadata, with its "id"
+            and "backup_path", or None for a full backup.
+    """
+    suffix = BACKUP_SUFFIXES.get(backup_format, ".7z")
+    latest = next(((backup_id, backup_path) for backup_id, backup_path in list_app_backups(backup_location, app_id)
+                   if backup_path.endswith(suffix)), None)
+    if latest is None:
+        return None
+    
+    backup_id, backup_path = latest
+    metadata = read_json(os.path.join(backup_location, f"{backup_id}.json"))
+    if metadata.get("app_id") != app_id:
+        return None
+    if metadata.get("backup_type") not in ["full", "incremental"]:
+        return None
+    if metadata.get("chain_length", 0) >= get_max_incremental_chain():
+        return None
+    if backup_format == "7z" and "files" not in metadata:
+        return None
+    
+    return dict(metadata, id=backup_id, backup_path=backup_path)
+
+def get_latest_fingerprint(backup_location: str, app_id: str) -> Optional[Dict[str, str]]:
+    """
+    Get the fingerprint of an application's latest backup.
+    
+    Args:
+        backup_location (str): The backup location.
+        app_id (str): The ID of the application.
+    
+    Returns:
+        Optional[Dict[str, str]]: The backup's "id" and "fingerprint", or
+            None if there is no backup or it has no fingerprint.
+    """
+    backups = list_app_backups(backup_location, app_id)
+    if not backups:
+        return None
+    
+    backup_id, _ = backups[0]
+    metadata = read_json(os.path.join(backup_location, f"{backup_id}.json"))
+    fingerprint = metadata.get("fingerprint")
+    if not fingerprint or metadata.get("app_id") != app_id:
+        return None
+    return {"id": backup_id, "fingerprint": fingerprint}
+
+def get_backup_file_format(backup_path: str) -> str:
+    """
+    Get the format of a backup file.
+    
+    Args:
+        backup_path (str): The path of the archive or manifest.
+    
+    Returns:
+        str: "chunks" for a manifest, otherwise "7z".
+    """
+    return "chunks" if backup_path.endswith(MANIFEST_SUFFIX) else "7z"
+
+def get_backup_paths(app: Dict[str, Any], backup_dot_files: bool) -> List[str]:
+    """
+    Determine the paths to back up for an application.
+    
+    Args:
+        app (Dict[str, Any]): The application.
+        backup_dot_files (bool): Whether to include related dot files from the
+            user's home directory.
     
-    # Determine the paths to back up
+    Returns:
+        List[str]: The existing paths, each directory listed once.
+    """
     paths_to_backup = []
     
     # Add the application path if it exists
@@ -83,11 +215,6 @@ def backup_app(app_id: str, compression_level: Optional[int] = None,
         if os.path.exists(path):
             paths_to_backup.append(path)
     
-    # Get backup_dot_files setting if not provided
-    if backup_dot_files is None:
-        from reformatbackup.src.config import get_backup_dot_files
-        backup_dot_files = get_backup_dot_files()
-    
     # Add dot files if this is a dot file backup or if backup_dot_files is enabled
     if (app.get("source") == "dot_file" and "path" in app) or backup_dot_files:
         # If this is a dot file app, add its path
@@ -117,54 +244,525 @@ def backup_app(app_id: str, compression_level: Optional[int] = None,
                 if os.path.exists(dot_file_path):
                     paths_to_backup.append(dot_file_path)
     
-    # If no paths to backup, return an error
-    if not paths_to_backup:
-        return {"success": False, "error": f"No data found to back up for {app.get('name', app_id)}"}
+    # Archive each directory once, even if it was found several ways
+    return collapse_paths(paths_to_backup)
+
+def _exclude_paths(app: Dict[str, Any], paths: List[str],
+                   excluded: List[str]) -> Tuple[List[str], Optional[str]]:
+    """
+    Leave out the paths another backup in the same batch covers.
+    
+    Args:
+        app (Dict[str, Any]): The application.
+        paths (List[str]): The paths to back up.
+        excluded (List[str]): The normalized paths covered by other backups.
     
-    # Create the backup
-    try:
-        # Use provided compression level or get from config
-        if compression_level is None:
-            from reformatbackup.src.config import get_compression_level
-            compression_level = get_compression_level()
-        
-        # Ensure compression level is within valid range
-        compression_level = max(0, min(9, compression_level))
+    Returns:
+        Tuple[List[str], Optional[str]]: The remaining paths, and an error
+            message if nothing is left to back up.
+    """
+    app_name = app.get("name", app.get("id"))
+    skipped_paths = [path for path in paths
+                     if any(is_within(normalize_path(path), other) for other in excluded)]
+    paths = [path for path in paths if path not in skipped_paths]
+    
+    if not paths:
+        if skipped_paths:
+            return paths, f"All data for {app_name} is already in another backup in this batch"
+        return paths, f"No data found to back up for {app_name}"
+    return paths, None
+
+def _scan_backup_files(paths_to_backup: List[str], excluded: List[str]) -> List[Tuple[str, str, int, int]]:
+    """
+    List the files to archive for a backup, with their size and modification time.
+    
+    Each directory is listed once with os.scandir, whose entries carry the
+    stat data (on Windows without another system call). Files come in the
+    order os.walk would give them.
+    
+    Args:
+        paths_to_backup (List[str]): The files and directories to archive.
+        excluded (List[str]): Normalized paths not to archive.
+    
+    Returns:
+        List[Tuple[str, str, int, int]]: The path of each file, its name in
+            the archive, its size in bytes and its mtime in nanoseconds (0 for
+            both if it can't be read).
+    """
+    found = []
+    for path in paths_to_backup:
+        if not os.path.isdir(path):
+            found.append((path, os.path.basename(path), *_stat_file(path)))
+            continue
         
-        with py7zr.SevenZipFile(backup_path, mode="w", filters=[{"id": py7zr.FILTER_LZMA2, "preset": compression_level}]) as archive:
-            for path in paths_to_backup:
-                if os.path.isdir(path):
-                    # Add directory contents
-                    for root, dirs, files in os.walk(path):
-                        for file in files:
-                            file_path = os.path.join(root, file)
-                            try:
-                                # Calculate the archive path (relative to the backup root)
-                                arcname = os.path.relpath(file_path, os.path.dirname(path))
-                                archive.write(file_path, arcname)
-                            except Exception as e:
-                                logger.error(f"Error adding file to archive: {e}")
+        # Archive paths are relative to the backup root
+        root = os.path.dirname(path)
+        stack = [path]
+        while stack:
+            directory = stack.pop()
+            subdirs = []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        # Don't archive anything covered by other backups
+                        if excluded and normalize_path(entry.path) in excluded:
+                            continue
+                        try:
+                            is_dir = entry.is_dir()
+                        except OSError:
+                            is_dir = False
+                        if is_dir:
+                            # Like os.walk, don't descend into linked directories
+                            if not entry.is_symlink():
+                                subdirs.append(entry.path)
+                            continue
+                        try:
+                            stat = entry.stat()
+                            size, mtime_ns = stat.st_size, stat.st_mtime_ns
+                        except OSError:
+                            size, mtime_ns = 0, 0
+                        found.append((entry.path, os.path.relpath(entry.path, root), size, mtime_ns))
+            except OSError as e:
+                logger.error(f"Error listing {directory}: {e}")
+                continue
+            # Visit subdirectories depth first, in the order they were listed
+            stack.extend(reversed(subdirs))
+    return found
+
+def _stat_file(path: str) -> Tuple[int, int]:
+    """
+    Get the size and modification time of a file.
+    
+    Args:
+        path (str): The file path.
+    
+    Returns:
+        Tuple[int, int]: The size in bytes and the mtime in nanoseconds, or
+            (0, 0) if the file can't be read.
+    """
+    try:
+        stat = os.stat(path)
+        return stat.st_size, stat.st_mtime_ns
+    except OSError:
+        return 0, 0
+
+def _read_file(path: str, size: int) -> Optional[Tuple[bytes, os.stat_result, str]]:
+    """
+    Read and hash a file ahead of the compressor.
+    
+    Args:
+        path (str): The file path.
+        size (int): The file's size when it was listed.
+    
+    Returns:
+        Optional[Tuple[bytes, os.stat_result, str]]: The file's contents, its
+            stat result and its hash, or None if it can't be read or its size
+            changed (the compressor then reads it itself).
+    """
+    try:
+        with open(path, "rb") as f:
+            stat = os.fstat(f.fileno())
+            # Read one byte more, to notice a file that grew
+            data = f.read(size + 1)
+    except OSError:
+        return None
+    if len(data) != size:
+        return None
+    hasher = new_hasher()
+    hasher.update(data)
+    return data, stat, hasher.hexdigest()
+
+def _read_ahead(files: List[Tuple[str, str]], sizes: List[int]) -> Iterator[Optional[Tuple[bytes, os.stat_result, str]]]:
+    """
+    Read the files of a backup on a thread pool, ahead of the compressor.
+    
+    Reads are queued in order while the files read but not yet compressed
+    fit in PREFETCH_MEMORY_LIMIT and PREFETCH_FILES, so slow disks and
+    network shares are read while the compressor works instead of between
+    files. A file's buffer counts against the limit until the compressor asks
+    for the next file.
+    
+    Args:
+        files (List[Tuple[str, str]]): The path of each file and its name in the archive.
+        sizes (List[int]): The size of each file.
+    
+    Yields:
+        Optional[Tuple[bytes, os.stat_result, str]]: For each file in order, the
+            result of _read_file, or None if it's a symbolic link, larger
+            than PREFETCH_FILE_LIMIT or couldn't be read ahead.
+    """
+    pending = deque()
+    buffered = 0
+    next_index = 0
+    executor = ThreadPoolExecutor(max_workers=READER_WORKERS)
+    try:
+        for _ in range(len(files)):
+            while next_index < len(files) and len(pending) < PREFETCH_FILES:
+                size = sizes[next_index]
+                # Links are left to the compressor, which archives them as links
+                if size > PREFETCH_FILE_LIMIT or os.path.islink(files[next_index][0]):
+                    pending.append((None, 0))
+                elif not pending or buffered + size <= PREFETCH_MEMORY_LIMIT:
+                    pending.append((executor.submit(_read_file, files[next_index][0], size), size))
+                    buffered += size
                 else:
-                    # Add file
+                    break
+                next_index += 1
+            
+            future, size = pending.popleft()
+            yield future.result() if future is not None else None
+            buffered -= size
+    finally:
+        for future, _ in pending:
+            if future is not None:
+                future.cancel()
+        executor.shutdown(wait=True)
+
+def _write_stream(archive: py7zr.SevenZipFile, stream: BinaryIO, stat: os.stat_result, arcname: str) -> None:
+    """
+    Add an open file to an archive.
+    
+    Args:
+        archive (py7zr.SevenZipFile): The archive being written.
+        stream (BinaryIO): The file's contents, positioned at the start.
+        stat (os.stat_result): The file's stat result.
+        arcname (str): The file's name in the archive.
+    """
+    archive.writef(stream, arcname)
+    
+    # Record the file's own timestamps rather than the time it was added
+    archive.header.files_info.files[-1].update(
+        creationtime=ArchiveTimestamp.from_datetime(stat.st_ctime),
+        lastwritetime=ArchiveTimestamp.from_datetime(stat.st_mtime),
+        lastaccesstime=ArchiveTimestamp.from_datetime(stat.st_atime),
+    )
+
+def _write_link(archive: py7zr.SevenZipFile, file_path: str, arcname: str) -> None:
+    """
+    Add a symbolic link to an archive as a link, the way archive.write does.
+    
+    archive.write can't be used once the archive holds files added with
+    writef (or any file, when appending): it looks for the link's target
+    among their source paths, which those files don't have.
+    
+    Args:
+        archive (py7zr.SevenZipFile): The archive being written.
+        file_path (str): The path of the link.
+        arcname (str): The link's name in the archive.
+    """
+    stat = os.lstat(file_path)
+    target = pathlib.Path(os.readlink(file_path)).as_posix()
+    with io.BytesIO(target.encode("utf-8")) as buffer:
+        _write_stream(archive, buffer, stat, arcname)
+    archive.header.files_info.files[-1]["attributes"] = MemberType.SYMLINK.attributes(stat)
+
+def _write_file(archive: py7zr.SevenZipFile, file_path: str, arcname: str) -> Optional[Tuple[os.stat_result, str]]:
+    """
+    Add a file that wasn't read ahead to an archive, hashing it as the
+    compressor reads it.
+    
+    Args:
+        archive (py7zr.SevenZipFile): The archive being written.
+        file_path (str): The file path.
+        arcname (str): The file's name in the archive.
+    
+    Returns:
+        Optional[Tuple[os.stat_result, str]]: The file's stat result and hash,
+            or None for a symbolic link, which is archived as a link.
+    """
+    if os.path.islink(file_path):
+        _write_link(archive, file_path, arcname)
+        return None
+    
+    # The archive keeps the file it was given, so close it once written
+    with HashingReader(file_path) as reader:
+        stat = os.fstat(reader.fileno())
+        _write_stream(archive, reader, stat, arcname)
+        return stat, reader.hexdigest()
+
+def _write_archive(files: List[Tuple[str, str]], sizes: List[int], backup_path: str,
+                   compression_level: int, reporter: Optional[ProgressTracker] = None) -> Dict[str, Any]:
+    """
+    Write the files of a backup to a 7z archive.
+    
+    Files worth compressing go into an LZMA2 block, and files that are
+    compressed already (see compression.classify_files) are then appended
+    to a second block that stores them as they are. Files are read ahead on
+    a thread pool (_read_ahead) and written in order as their contents arrive.
+    Each file is hashed from the data read for the archive.
+    
+    Args:
+        files (List[Tuple[str, str]]): The path of each file and its name in the archive.
+        sizes (List[int]): The size of each file, for reading ahead and
+            progress reporting.
+        backup_path (str): The archive to write.
+        compression_level (int): The compression level to use (0-9).
+        reporter (Optional[ProgressTracker], optional): Advanced for each
+            file. The backup stops when its is_cancelled() returns True.
+            Defaults to None.
+    
+    Returns:
+        Dict[str, Any]: "files_done", "stored_files" (the files stored
+            without compression), "cancelled" and "hashed" (the path, name,
+            stat result and hash of each file read).
+    """
+    files_done = 0
+    hashed = []
+    cancelled = False
+    
+    # Write the compressible files first, then the ones to store
+    compressible = classify_files([file_path for file_path, _ in files], sizes)
+    order = sorted(range(len(files)), key=lambda i: not compressible[i])
+    files = [files[i] for i in order]
+    sizes = [sizes[i] for i in order]
+    split = compressible.count(True)
+    
+    # Each block is written in its own pass, the second appended to the
+    # archive. A backup without files still gets an (empty) archive.
+    blocks = [(get_compression_filters(compression_level), files[:split], sizes[:split]),
+              (STORE_FILTERS, files[split:], sizes[split:])]
+    blocks = [block for block in blocks if block[1]] or blocks[:1]
+    
+    with contextlib.closing(_read_ahead(files, sizes)) as prefetched:
+        for number, (filters, block_files, block_sizes) in enumerate(blocks):
+            with py7zr.SevenZipFile(backup_path, mode="w" if number == 0 else "a", filters=filters) as archive:
+                for (file_path, arcname), size in zip(block_files, block_sizes):
+                    if reporter is not None and reporter.is_cancelled():
+                        cancelled = True
+                        break
+                    read = next(prefetched)
                     try:
-                        archive.write(path, os.path.basename(path))
+                        if read is not None:
+                            data, stat, file_hash = read
+                            # The archive keeps the buffer it was given, so close it once written
+                            with io.BytesIO(data) as buffer:
+                                _write_stream(archive, buffer, stat, arcname)
+                            hashed.append((file_path, arcname, stat, file_hash))
+                        else:
+                            outcome = _write_file(archive, file_path, arcname)
+                            if outcome is not None:
+                                hashed.append((file_path, arcname, *outcome))
+                        files_done += 1
                     except Exception as e:
                         logger.error(f"Error adding file to archive: {e}")
+                    if reporter is not None:
+                        reporter.advance(size, arcname)
+            if cancelled:
+                break
+    
+    return {"files_done": files_done, "stored_files": len(files) - split, "cancelled": cancelled, "hashed": hashed}
+
+def _collect_hashes(backup_location: str, scanned: List[Tuple[str, str, int, int]],
+                    hashed: List[Tuple[str, str, os.stat_result, str]],
+                    reporter: Optional[ProgressTracker] = None) -> Dict[str, str]:
+    """
+    Get the hash of every file of a backup.
+    
+    The files written were hashed as they were read, and those hashes are
+    added to the hash cache. The others (files an incremental backup took
+    from its base) come from the cache, and only files missing from it are
+    read, in a "hashing" phase of their own.
+    
+    Args:
+        backup_location (str): The backup location, which holds the hash cache.
+        scanned (List[Tuple[str, str, int, int]]): Every file of the backup,
+            as returned by _scan_backup_files.
+        hashed (List[Tuple[str, str, os.stat_result, str]]): The path, name,
+            stat result and hash of each file hashed while it was written.
+        reporter (Optional[ProgressTracker], optional): Tracks the progress
+            of the "hashing" phase. Defaults to None.
+    
+    Returns:
+        Dict[str, str]: The hash of each file that could be read, by its name
+            in the backup. Empty if the hash cache can't be used.
+    """
+    hashes = {arcname: file_hash for _, arcname, _, file_hash in hashed}
+    rest = [(file_path, arcname, size) for file_path, arcname, size, _ in scanned if arcname not in hashes]
+    try:
+        cache = get_hash_cache(backup_location)
+        cache.remember([(file_path, stat, file_hash) for file_path, _, stat, file_hash in hashed])
+        if not rest:
+            return hashes
+        
+        cached = cache.cached_hashes([file_path for file_path, _, _ in rest])
+        missing = [(file_path, arcname, size) for file_path, arcname, size in rest if file_path not in cached]
+        if missing:
+            if reporter is not None:
+                reporter.start_phase("hashing", len(missing), sum(size for _, _, size in missing))
+            cached.update(cache.hash_files([file_path for file_path, _, _ in missing], reporter=reporter))
+            if reporter is not None:
+                reporter.finish()
+    except Exception as e:
+        logger.error(f"Error hashing backup files: {e}")
+        return {}
+    
+    hashes.update((arcname, cached[file_path]) for file_path, arcname, _ in rest if cached.get(file_path))
+    return hashes
+
+def write_backup(app: Dict[str, Any], paths_to_backup: List[str], backup_location: str,
+                 compression_level: int, backup_dot_files: bool, notes: str = "",
+                 excluded: Optional[List[str]] = None,
+                 reporter: Optional[ProgressTracker] = None,
+                 backup_format: str = "7z", incremental: bool = False,
+                 base: Optional[Dict[str, Any]] = None,
+                 latest: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    """
+    Write the archive and metadata of one backup.
+    
+    Everything the backup needs is passed in, so this can run in a worker
+    process without access to the scan cache or configuration.
+    
+    Args:
+        app (Dict[str, Any]): The application to back up.
+        paths_to_backup (List[str]): The paths to archive.
+        backup_location (str): The directory to write the backup to.
+        compression_level (int): The compression level to use (0-9).
+        backup_dot_files (bool): Whether dot files were included, recorded in the metadata.
+        notes (str, optional): Notes to add to the backup metadata. Defaults to "".
+        excluded (Optional[List[str]], optional): Normalized paths inside
+            paths_to_backup not to archive. Defaults to None.
+        reporter (Optional[ProgressTracker], optional): Tracks the progress
+            of the "archiving" phase, and of the "hashing" phase when files
+            not written still need hashing. The backup stops when its
+            is_cancelled() returns True. Defaults to None.
+        backup_format (str, optional): "7z" to write an archive or "chunks"
+            to add the files to the chunk store and write a manifest.
+            Defaults to "7z".
+        incremental (bool, optional): Whether the backup is part of an
+            incremental chain. Its metadata then records the size and
+            modification time of every file, for the next backup to compare
+            against. Defaults to False.
+        base (Optional[Dict[str, Any]], optional): The metadata of the backup
+            to build on, as returned by find_incremental_base. Only files
+            added or changed since then are archived, and deleted files are
+            recorded. Defaults to None (a full backup).
+        latest (Optional[Dict[str, str]], optional): The application's latest
+            backup, as returned by get_latest_fingerprint. If the files'
+            fingerprint still matches, no backup is written. Defaults to None.
+    
+    Returns:
+        Dict[str, Any]: A dictionary containing information about the backup.
+            A cancelled backup is removed and returns "cancelled". A skipped
+            backup returns "unchanged" and the "latest_backup_id".
+            The metadata records the hash of every file, for restores and
+            verification to compare against (see _collect_hashes).
+    """
+    app_id = app["id"]
+    excluded = excluded or []
+    
+    # Create a timestamp for the backup
+    timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+    
+    # Create the backup filename
+    backup_filename = f"{app_id}-{timestamp}{BACKUP_SUFFIXES.get(backup_format, '.7z')}"
+    backup_path = os.path.join(backup_location, backup_filename)
+    
+    # Create the metadata filename
+    metadata_filename = f"{app_id}-{timestamp}.json"
+    metadata_path = os.path.join(backup_location, metadata_filename)
+    
+    # Create the backup
+    try:
+        # Ensure compression level is within valid range
+        compression_level = max(0, min(9, compression_level))
+        
+        scanned = _scan_backup_files(paths_to_backup, excluded)
+        files = [(file_path, arcname) for file_path, arcname, _, _ in scanned]
+        stats = [(size, mtime_ns) for _, _, size, mtime_ns in scanned]
+        
+        # Skip the backup if no file changed since the latest one
+        fingerprint = tree_digest(paths_to_backup, ((arcname, size, mtime_ns)
+                                                    for (_, arcname), (size, mtime_ns) in zip(files, stats)))
+        if latest is not None and latest.get("fingerprint") == fingerprint:
+            logger.info(f"Skipped backup of {app_id}: unchanged since {latest['id']}")
+            return {
+                "success": True,
+                "unchanged": True,
+                "app_id": app_id,
+                "app_name": app.get("name", app_id),
+                "latest_backup_id": latest["id"],
+                "message": f"unchanged, latest is {latest['id']}",
+                "paths": paths_to_backup,
+            }
+        
+        # Compare against the base backup, by name, size and modification time
+        file_stats = {arcname: list(stat) for (_, arcname), stat in zip(files, stats)}
+        deleted: List[str] = []
+        base_entries = None
+        if base is not None:
+            if backup_format == "chunks":
+                base_entries = {entry["path"]: entry for entry in read_manifest(base["backup_path"])["files"]}
+                base_files = base_entries
+            else:
+                base_files = base["files"]
+                changed = [i for i, (_, arcname) in enumerate(files) if base_files.get(arcname) != file_stats[arcname]]
+                files = [files[i] for i in changed]
+                stats = [stats[i] for i in changed]
+            deleted = sorted(set(base_files) - set(file_stats))
+        
+        sizes = [size for size, _ in stats]
+        if reporter is not None:
+            reporter.start_phase("archiving", len(files), sum(sizes))
+        
+        if backup_format == "chunks":
+            store = get_chunk_store(backup_location, compression_level)
+            written = write_version(store, files, sizes, backup_path, reporter, base_entries)
+        else:
+            written = _write_archive(files, sizes, backup_path, compression_level, reporter)
+        
+        if reporter is not None:
+            reporter.finish()
     except Exception as e:
         logger.error(f"Error creating backup: {e}")
         return {"success": False, "error": str(e)}
     
+    if written["cancelled"]:
+        logger.info(f"Backup of {app_id} cancelled after {written['files_done']} files")
+        try:
+            if os.path.exists(backup_path):
+                os.remove(backup_path)
+        except OSError as e:
+            logger.error(f"Error removing cancelled backup: {e}")
+        return {"success": False, "cancelled": True, "app_id": app_id,
+                "app_name": app.get("name", app_id), "error": "Backup cancelled"}
+    
+    # A chunked backup's size is what it added to the chunk store
+    if backup_format == "chunks":
+        size = written["stored_size"]
+    else:
+        size = os.path.getsize(backup_path) if os.path.exists(backup_path) else 0
+    
+    hashes = _collect_hashes(backup_location, scanned, written["hashed"], reporter)
+    
     # Create the metadata
     metadata = {
         "app_id": app_id,
         "app_name": app.get("name", app_id),
         "timestamp": timestamp,
         "paths": paths_to_backup,
-        "size": os.path.getsize(backup_path) if os.path.exists(backup_path) else 0,
+        "size": size,
         "compression_level": compression_level,
         "backup_dot_files": backup_dot_files,
         "notes": notes,
+        "format": backup_format,
+        "fingerprint": fingerprint,
+        "hash_algorithm": HASH_ALGORITHM,
+        "hashes": hashes,
     }
+    if backup_format == "chunks":
+        metadata.update(original_size=written["original_size"], chunks=written["chunks"],
+                        new_chunks=written["new_chunks"])
+    else:
+        metadata["stored_files"] = written["stored_files"]
+    if incremental:
+        changed_files = written["files_done"] - written.get("files_reused", 0)
+        metadata.update(backup_type="incremental" if base else "full",
+                        base=base["id"] if base else None,
+                        chain_length=base.get("chain_length", 0) + 1 if base else 0,
+                        changed_files=changed_files, deleted=deleted)
+        # A manifest already lists the files of a chunked backup
+        if backup_format == "7z":
+            metadata["files"] = file_stats
     
     # Save the metadata
     try:
@@ -173,10 +771,6 @@ def backup_app(app_id: str, compression_level: Optional[int] = None,
     except Exception as e:
         logger.error(f"Error saving metadata: {e}")
     
-    # Clean up old backups if we exceed the maximum number of backups per app
-    max_backups = get_max_backups_per_app()
-    cleanup_old_backups(app_id, max_backups)
-    
     return {
         "success": True,
         "app_id": app_id,
@@ -184,49 +778,231 @@ def backup_app(app_id: str, compression_level: Optional[int] = None,
         "backup_path": backup_path,
         "metadata_path": metadata_path,
         "timestamp": timestamp,
-        "size": os.path.getsize(backup_path) if os.path.exists(backup_path) else 0,
+        "size": size,
+        "paths": paths_to_backup,
+        "format": backup_format,
+        "backup_type": metadata.get("backup_type", "full"),
     }
+
+def backup_app(app_id: str, compression_level: Optional[int] = None,
+               backup_dot_files: Optional[bool] = None, notes: str = "",
+               exclude_paths: Optional[List[str]] = None, force: bool = False) -> Dict[str, Any]:
+    """
+    Back up an application's data.
+    
+    Args:
+        app_id (str): The ID of the application to back up.
+        compression_level (Optional[int], optional): The compression level to use (0-9).
+            If None, uses the value from configuration. Defaults to None.
+        backup_dot_files (Optional[bool], optional): Whether to include dot files in the backup.
+            If None, uses the value from configuration. Defaults to None.
+        notes (str, optional): Notes to add to the backup metadata. Defaults to "".
+        exclude_paths (Optional[List[str]], optional): Paths not to archive,
+            because another backup already covers them. Paths inside them are
+            skipped too. Defaults to None.
+        force (bool, optional): Whether to back up even if nothing changed
+            since the latest backup. Defaults to False.
+    
+    Returns:
+        Dict[str, Any]: A dictionary containing information about the backup.
+            "paths" lists the paths archived. A skipped backup returns
+            "unchanged" and the "latest_backup_id".
+    """
+    from reformatbackup.src.scan import find_app
+    
+    # Find the application to back up
+    app = find_app(app_id)
+    
+    if not app:
+        return {"success": False, "error": f"Application with ID {app_id} not found"}
+    
+    # Get backup_dot_files setting if not provided
+    if backup_dot_files is None:
+        from reformatbackup.src.config import get_backup_dot_files
+        backup_dot_files = get_backup_dot_files()
+    
+    # Use provided compression level or get from config
+    if compression_level is None:
+        compression_level = get_compression_level()
+    
+    # Leave out directories another backup in the same batch covers
+    excluded = [normalize_path(path) for path in exclude_paths or []]
+    paths_to_backup, error = _exclude_paths(app, get_backup_paths(app, backup_dot_files), excluded)
+    if error:
+        return {"success": False, "error": error}
+    
+    backup_location = get_backup_location()
+    backup_format = get_backup_format()
+    incremental = get_incremental_backups()
+    base = find_incremental_base(backup_location, app_id, backup_format) if incremental else None
+    
+    latest = None if force else get_latest_fingerprint(backup_location, app_id)
+    
+    result = write_backup(app, paths_to_backup, backup_location, compression_level,
+                          backup_dot_files, notes, excluded, backup_format=backup_format,
+                          incremental=incremental, base=base, latest=latest)
+    
+    # Clean up old backups if we exceed the maximum number of backups per app
+    if result.get("success") and not result.get("unchanged"):
+        cleanup_old_backups(app_id, get_max_backups_per_app())
+    
+    return result
+
+def plan_backups(app_ids: List[str], notes: str = "",
+                 force: bool = False) -> Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]:
+    """
+    Work out the paths of several backups without archiving any directory twice.
+    
+    Applications are planned deepest path first, so a directory inside
+    another selected application's folder goes into its own backup and is
+    left out of the enclosing one. A directory shared by several of the
+    applications goes into the first backup that includes it.
+    
+    Args:
+        app_ids (List[str]): The IDs of the applications to back up.
+        notes (str, optional): Notes to add to each backup's metadata. Defaults to "".
+        force (bool, optional): Whether to back up applications even if
+            nothing changed since their latest backup. Defaults to False.
+    
+    Returns:
+        Tuple[Dict[str, Dict[str, Any]], Dict[str, Dict[str, Any]]]: The
+            failed results of applications that can't be backed up, and the
+            keyword arguments of write_backup for the others, both by app ID.
+    """
+    from reformatbackup.src.scan import find_app
+    from reformatbackup.src.config import get_backup_dot_files
+    
+    backup_location = get_backup_location()
+    compression_level = get_compression_level()
+    backup_dot_files = get_backup_dot_files()
+    backup_format = get_backup_format()
+    incremental = get_incremental_backups()
+    
+    def depth(app_id: str) -> int:
+        app = find_app(app_id)
+        if app is None or not app.get("path"):
+            return 0
+        return normalize_path(app["path"]).count(os.sep)
+    
+    failed: Dict[str, Dict[str, Any]] = {}
+    tasks: Dict[str, Dict[str, Any]] = {}
+    planned: List[str] = []
+    for app_id in sorted(app_ids, key=depth, reverse=True):
+        if app_id in failed or app_id in tasks:
+            continue
+        
+        app = find_app(app_id)
+        if not app:
+            failed[app_id] = {"success": False, "error": f"Application with ID {app_id} not found"}
+            continue
+        
+        excluded = list(planned)
+        paths_to_backup, error = _exclude_paths(app, get_backup_paths(app, backup_dot_files), excluded)
+        if error:
+            failed[app_id] = {"success": False, "error": error}
+            continue
+        
+        planned.extend(normalize_path(path) for path in paths_to_backup)
+        tasks[app_id] = {
+            "app": app,
+            "paths_to_backup": paths_to_backup,
+            "backup_location": backup_location,
+            "compression_level": compression_level,
+            "backup_dot_files": backup_dot_files,
+            "notes": notes,
+            "excluded": excluded,
+            "backup_format": backup_format,
+            "incremental": incremental,
+            "base": find_incremental_base(backup_location, app_id, backup_format) if incremental else None,
+            "latest": None if force else get_latest_fingerprint(backup_location, app_id),
+        }
+    
+    return failed, tasks
+
+def backup_apps(app_ids: List[str], notes: str = "",
+                max_workers: Optional[int] = None, force: bool = False) -> List[Dict[str, Any]]:
+    """
+    Back up several applications in parallel without archiving any directory twice.
+    
+    The backups are planned with plan_backups and the archives then written
+    on a process pool, since LZMA compression only uses one core per
+    archive. A directory planned for a backup that then fails is not added
+    to the enclosing backup instead.
+    
+    Args:
+        app_ids (List[str]): The IDs of the applications to back up.
+        notes (str, optional): Notes to add to each backup's metadata. Defaults to "".
+        max_workers (Optional[int], optional): The most backups to write at
+            once. If None, uses the backup concurrency from configuration.
+            Defaults to None.
+        force (bool, optional): Whether to back up applications even if
+            nothing changed since their latest backup. Defaults to False.
+    
+    Returns:
+        List[Dict[str, Any]]: The result of each backup, in the order requested.
+    """
+    from reformatbackup.src.backup_executor import run_backup_tasks
+    
+    results, tasks = plan_backups(app_ids, notes, force)
+    results.update(zip(tasks, run_backup_tasks(write_backup, list(tasks.values()), max_workers)))
+    
+    # Clean up old backups if we exceed the maximum number of backups per app
+    max_backups = get_max_backups_per_app()
+    for app_id in tasks:
+        if results[app_id].get("success") and not results[app_id].get("unchanged"):
+            cleanup_old_backups(app_id, max_backups)
+    
+    return [results[app_id] for app_id in app_ids]
     
 def cleanup_old_backups(app_id: str, max_backups: int) -> None:
     """
     Clean up old backups for an application if we exceed the maximum number of backups.
     
+    Incremental archives need the backups they build on to be restored, so
+    those are kept as long as a newer backup needs them. Chunks only the
+    removed backups used are then removed from the chunk store.
+    
     Args:
         app_id (str): The ID of the application.
         max_backups (int): The maximum number of backups to keep.
     """
     backup_location = get_backup_location()
     
-    # Find all backups for this application
-    backups = []
-    for filename in os.listdir(backup_location):
-        if filename.startswith(f"{app_id}-") and filename.endswith(".7z"):
-            backup_path = os.path.join(backup_location, filename)
-            metadata_path = os.path.join(backup_location, filename.replace(".7z", ".json"))
-            timestamp = filename.split("-")[1].split(".")[0] if "-" in filename else ""
-            
-            backups.append({
-                "backup_path": backup_path,
-                "metadata_path": metadata_path,
-                "timestamp": timestamp
-            })
+    # Find all backups for this application (newest first)
+    backups = list_app_backups(backup_location, app_id)
+    if len(backups) <= max_backups:
+        return
     
-    # Sort backups by timestamp (newest first)
-    backups.sort(key=lambda x: x["timestamp"], reverse=True)
+    # Keep the chains the newest backups are restored from
+    kept = {backup_id for backup_id, _ in backups[:max_backups]}
+    pending = [backup_id for backup_id, backup_path in backups[:max_backups] if backup_path.endswith(".7z")]
+    while pending:
+        metadata = read_json(os.path.join(backup_location, f"{pending.pop()}.json"))
+        base_id = metadata.get("base") if metadata.get("backup_type") == "incremental" else None
+        if base_id and base_id not in kept:
+            kept.add(base_id)
+            pending.append(base_id)
     
     # Remove old backups if we exceed the maximum
-    if len(backups) > max_backups:
-        for backup in backups[max_backups:]:
-            try:
-                if os.path.exists(backup["backup_path"]):
-                    os.remove(backup["backup_path"])
-                    logger.info(f"Removed old backup: {backup['backup_path']}")
-                
-                if os.path.exists(backup["metadata_path"]):
-                    os.remove(backup["metadata_path"])
-                    logger.info(f"Removed old metadata: {backup['metadata_path']}")
-            except Exception as e:
-                logger.error(f"Error removing old backup: {e}")
+    removed_manifests = False
+    for backup_id, backup_path in backups:
+        if backup_id in kept:
+            continue
+        metadata_path = os.path.join(backup_location, f"{backup_id}.json")
+        try:
+            if os.path.exists(backup_path):
+                os.remove(backup_path)
+                logger.info(f"Removed old backup: {backup_path}")
+                removed_manifests |= get_backup_file_format(backup_path) == "chunks"
+            
+            if os.path.exists(metadata_path):
+                os.remove(metadata_path)
+                logger.info(f"Removed old metadata: {metadata_path}")
+        except Exception as e:
+            logger.error(f"Error removing old backup: {e}")
+    
+    if removed_manifests:
+        collect_garbage(backup_location)
 
 def backup_dot_files(app_id: str) -> Dict[str, Any]:
     """
@@ -299,10 +1075,10 @@ def get_recent_backups(limit: int = 5) -> List[Dict[str, Any]]:
     for filename in os.listdir(backup_location):
         if filename.endswith(".json"):
             metadata_path = os.path.join(backup_location, filename)
-            backup_path = os.path.join(backup_location, filename.replace(".json", ".7z"))
+            backup_path = find_backup_file(backup_location, filename[:-len(".json")])
             
             # Skip if the backup file doesn't exist
-            if not os.path.exists(backup_path):
+            if backup_path is None:
                 continue
             
             try:
@@ -313,6 +1089,10 @@ def get_recent_backups(limit: int = 5) -> List[Dict[str, Any]]:
                 backup_id = filename.replace(".json", "")
                 metadata["id"] = backup_id
                 metadata["backup_path"] = backup_path
+                # The file lists and hashes are only needed to back up, restore and verify
+                metadata.pop("files", None)
+                metadata.pop("deleted", None)
+                metadata.pop("hashes", None)
                 metadata["metadata_path"] = metadata_path
                 
                 backups.append(metadata)
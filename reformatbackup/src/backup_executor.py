@@ -0,0 +1,104 @@
+"""
+ReformatBackup - Backup Executor
+
+This module runs backups on a pool of worker processes. py7zr compresses
+each archive on a single core, so writing several archives at once is the
+only way a batch backup uses the rest of the machine.
+"""
+
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Dict, List, Any, Optional
+
+from reformatbackup.src.config import get_backup_concurrency
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Type definitions for better type hinting
+BackupResult = Dict[str, Any]
+
+def get_backup_workers(task_count: int, max_workers: Optional[int] = None) -> int:
+    """
+    Get how many worker processes to use for a batch of backups.
+    
+    Args:
+        task_count (int): The number of backups in the batch.
+        max_workers (Optional[int], optional): The most backups to write at
+            once. If None, uses the backup concurrency from configuration,
+            where 0 means one per CPU. Defaults to None.
+    
+    Returns:
+        int: The number of workers, at least 1 and at most task_count.
+    """
+    if max_workers is None:
+        max_workers = get_backup_concurrency()
+    if max_workers <= 0:
+        max_workers = os.cpu_count() or 1
+    
+    return max(1, min(max_workers, task_count))
+
+def run_backup_tasks(func: Callable[..., BackupResult], tasks: List[Dict[str, Any]],
+                     max_workers: Optional[int] = None) -> List[BackupResult]:
+    """
+    Run backups concurrently on worker processes.
+    
+    Each task is a dictionary of keyword arguments for func, which must be a
+    module-level function so it can be sent to the worker processes, and
+    return a dictionary with "success". A batch that only needs one worker
+    runs in this process.
+    
+    Args:
+        func (Callable[..., BackupResult]): The function that writes one backup.
+        tasks (List[Dict[str, Any]]): The keyword arguments of each backup.
+        max_workers (Optional[int], optional): The most backups to write at
+            once. If None, uses the backup concurrency from configuration.
+            Defaults to None.
+    
+    Returns:
+        List[BackupResult]: The result of each task, in the order given. A
+            task whose worker failed gets {"success": False, "error": ...}.
+    """
+    if not tasks:
+        return []
+    
+    workers = get_backup_workers(len(tasks), max_workers)
+    if workers == 1:
+        return [_run_task(func, task) for task in tasks]
+    
+    logger.info(f"Running {len(tasks)} backups on {workers} worker processes")
+    
+    results: List[BackupResult] = []
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(func, **task) for task in tasks]
+            for future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    logger.error(f"Error in backup worker process: {e}")
+                    results.append({"success": False, "error": f"Backup process failed: {e}"})
+    except Exception as e:
+        # The pool couldn't be started; write the remaining backups here
+        logger.error(f"Error starting backup worker processes: {e}")
+        results.extend(_run_task(func, task) for task in tasks[len(results):])
+    
+    return results
+
+def _run_task(func: Callable[..., BackupResult], task: Dict[str, Any]) -> BackupResult:
+    """
+    Run one backup in this process.
+    
+    Args:
+        func (Callable[..., BackupResult]): The function that writes one backup.
+        task (Dict[str, Any]): The keyword arguments for func.
+    
+    Returns:
+        BackupResult: The result of func, or a failure if it raised.
+    """
+    try:
+        return func(**task)
+    except Exception as e:
+        logger.error(f"Error running backup: {e}")
+        return {"success": False, "error": str(e)}
@@ -0,0 +1,610 @@
+"""
+ReformatBackup - Chunk Store
+
+This module stores backups as deduplicated chunks. Files are split into
+content-defined chunks with a gear rolling hash (as in FastCDC), so an edit
+only changes the chunks around it. The hash is computed with numpy; without
+it, files are split into fixed-size chunks, which still deduplicate
+unchanged files but not data that moved within a file. Each unique chunk is compressed and
+stored once under its SHA-256, shared by every version and application, and
+a backup version is a small manifest listing the chunks of each file.
+"""
+
+import os
+import json
+import lzma
+import time
+import hashlib
+import logging
+import tempfile
+from typing import BinaryIO, Dict, Any, Iterator, List, Optional, Set, Tuple
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from reformatbackup.src.compression import SAMPLE_SIZE, is_compressible_data
+from reformatbackup.src.hashcache import new_hasher
+from reformatbackup.src.progress import ProgressTracker
+from reformatbackup.src.utils import atomic_write_json
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# The chunk store's directory inside the backup location
+CHUNK_STORE_DIR = ".chunks"
+
+# The extension of backup versions stored as chunks
+MANIFEST_SUFFIX = ".manifest"
+MANIFEST_VERSION = 1
+
+# Chunk sizes in bytes. Files smaller than the minimum are one chunk.
+CHUNK_MIN_SIZE = 256 * 1024
+CHUNK_AVG_SIZE = 1024 * 1024
+CHUNK_MAX_SIZE = 4 * 1024 * 1024
+
+# Boundary masks over the top bits of the gear hash: stricter before the
+# average size and looser after it, which keeps chunk sizes close to it
+_HASH_BITS = 64
+_HASH_MASK = (1 << _HASH_BITS) - 1
+_MASK_SMALL = ((1 << 22) - 1) << (_HASH_BITS - 22)
+_MASK_LARGE = ((1 << 18) - 1) << (_HASH_BITS - 18)
+
+# One random-looking value per byte value. Derived rather than random, so
+# every run finds the same boundaries and chunks deduplicate across runs.
+_GEAR = [int.from_bytes(hashlib.sha256(bytes([i])).digest()[:8], "little") for i in range(256)]
+_GEAR_TABLE = numpy.array(_GEAR, dtype=numpy.uint64) if numpy is not None else None
+
+# How chunk boundaries are found, recorded in each manifest
+CHUNKING = "gear" if numpy is not None else "fixed"
+
+# Bytes hashed at a time when looking for a boundary: few enough for the
+# arrays to stay in the CPU cache, and the search stops at the first block
+# with a boundary
+GEAR_BLOCK_SIZE = 32 * 1024
+
+# The first byte of a stored chunk says how its data is encoded
+CHUNK_STORED = b"S"
+CHUNK_LZMA = b"X"
+
+# Unreferenced chunks younger than this are kept by garbage collection, as
+# a backup still being written may be about to reference them
+GC_GRACE_SECONDS = 3600
+
+# Type definitions for better type hinting
+Manifest = Dict[str, Any]
+
+def _gear_hashes(data: memoryview) -> Any:
+    """
+    Compute the gear hash after each byte of some data, starting from zero.
+    
+    The hash after byte i is the sum of gear[byte i - k] << k for k < 64
+    (older bytes are shifted out), so it is built for every position at
+    once by doubling the window: 1, 2, 4, ... 64 bytes.
+    
+    Args:
+        data (memoryview): The data.
+    
+    Returns:
+        numpy.ndarray: The hash after each byte, as uint64.
+    """
+    hashes = _GEAR_TABLE.take(numpy.frombuffer(data, dtype=numpy.uint8))
+    span = 1
+    while span < _HASH_BITS:
+        hashes[span:] += hashes[:-span] << numpy.uint64(span)
+        span *= 2
+    return hashes
+
+def _find_match(data: memoryview, start: int, stop: int, mask: int) -> Optional[int]:
+    """
+    Find the first byte after which the gear hash, started from zero at
+    CHUNK_MIN_SIZE, has none of the mask's bits set.
+    
+    Args:
+        data (memoryview): The data.
+        start (int): Where to start looking, at least CHUNK_MIN_SIZE.
+        stop (int): Where to stop looking.
+        mask (int): The boundary mask.
+    
+    Returns:
+        Optional[int]: The position of the byte, or None if there is none.
+    """
+    # A block's hashes only depend on the 63 bytes before it
+    history = _HASH_BITS - 1
+    for block in range(start, stop, GEAR_BLOCK_SIZE):
+        first = max(CHUNK_MIN_SIZE, block - history)
+        hashes = _gear_hashes(data[first:min(stop, block + GEAR_BLOCK_SIZE)])[block - first:]
+        matches = numpy.flatnonzero((hashes & numpy.uint64(mask)) == 0)
+        if matches.size:
+            return block + int(matches[0])
+    return None
+
+def _find_boundary(data: memoryview) -> int:
+    """
+    Find where the first chunk of some data ends.
+    
+    Args:
+        data (memoryview): The data, at least CHUNK_MAX_SIZE bytes unless it's
+            the end of the file.
+    
+    Returns:
+        int: The length of the first chunk.
+    """
+    size = len(data)
+    if size <= CHUNK_MIN_SIZE:
+        return size
+    
+    end = min(size, CHUNK_MAX_SIZE)
+    normal = min(end, CHUNK_AVG_SIZE)
+    if numpy is None:
+        return normal
+    
+    # The stricter mask applies up to the average size, the looser one after
+    match = _find_match(data, CHUNK_MIN_SIZE, normal, _MASK_SMALL)
+    if match is None:
+        match = _find_match(data, normal, end, _MASK_LARGE)
+    return match + 1 if match is not None else end
+
+def iter_chunks(f: BinaryIO) -> Iterator[bytes]:
+    """
+    Split a file into content-defined chunks.
+    
+    Args:
+        f (BinaryIO): The file, open for reading.
+    
+    Yields:
+        bytes: Each chunk, in order. An empty file has no chunks.
+    """
+    buffer = bytearray()
+    while True:
+        while len(buffer) < CHUNK_MAX_SIZE:
+            data = f.read(CHUNK_MAX_SIZE)
+            if not data:
+                break
+            buffer += data
+        if not buffer:
+            return
+        
+        with memoryview(buffer) as view:
+            cut = _find_boundary(view)
+        yield bytes(buffer[:cut])
+        del buffer[:cut]
+
+class ChunkStore:
+    """
+    A directory of compressed chunks named by the SHA-256 of their data.
+    
+    Chunks are written to a temporary file and moved into place, so several
+    processes can add chunks at once, and a chunk is never changed once
+    written.
+    """
+    
+    def __init__(self, root: str, compression_level: int = 9):
+        """
+        Open a chunk store.
+        
+        Args:
+            root (str): The chunk store directory. It is created as needed.
+            compression_level (int, optional): The LZMA preset (0-9) for new
+                chunks. Defaults to 9.
+        """
+        self.root = root
+        self.objects_dir = os.path.join(root, "objects")
+        self.compression_level = max(0, min(9, compression_level))
+        self._created_dirs: Set[str] = set()
+    
+    def _object_path(self, digest: str) -> str:
+        """
+        Get the path of a chunk.
+        
+        Args:
+            digest (str): The chunk's SHA-256, in hex.
+        
+        Returns:
+            str: The path of the chunk file.
+        """
+        return os.path.join(self.objects_dir, digest[:2], digest)
+    
+    def _encode(self, data: bytes) -> bytes:
+        """
+        Compress a chunk, or store it as is if a sample of it or the whole
+        chunk doesn't compress.
+        
+        Args:
+            data (bytes): The chunk data.
+        
+        Returns:
+            bytes: The encoded chunk.
+        """
+        # Don't spend LZMA2's time on data that is compressed already
+        if not is_compressible_data(data[:SAMPLE_SIZE]):
+            return CHUNK_STORED + data
+        
+        # The dictionary never needs to be larger than a chunk, and a smaller
+        # one saves hundreds of megabytes at the higher presets
+        filters = [{"id": lzma.FILTER_LZMA2, "preset": self.compression_level,
+                    "dict_size": max(4096, min(len(data), CHUNK_MAX_SIZE))}]
+        compressed = lzma.compress(data, format=lzma.FORMAT_XZ, filters=filters)
+        if len(compressed) < len(data):
+            return CHUNK_LZMA + compressed
+        return CHUNK_STORED + data
+    
+    def has_chunk(self, digest: str) -> bool:
+        """
+        Check whether a chunk is stored.
+        
+        Args:
+            digest (str): The chunk's SHA-256, in hex.
+        
+        Returns:
+            bool: True if the chunk is stored.
+        """
+        return os.path.exists(self._object_path(digest))
+    
+    def put_chunk(self, data: bytes) -> Tuple[str, int]:
+        """
+        Store a chunk unless it is already stored.
+        
+        Args:
+            data (bytes): The chunk data.
+        
+        Returns:
+            Tuple[str, int]: The chunk's SHA-256, and the bytes added to the
+                store (0 if it was already stored).
+        """
+        digest = hashlib.sha256(data).hexdigest()
+        path = self._object_path(digest)
+        
+        if os.path.exists(path):
+            # Mark the chunk as in use, so garbage collection keeps it until
+            # this backup's manifest is written
+            try:
+                os.utime(path)
+            except OSError as e:
+                logger.debug(f"Error touching chunk {digest}: {e}")
+            return digest, 0
+        
+        directory = os.path.dirname(path)
+        if directory not in self._created_dirs:
+            os.makedirs(directory, exist_ok=True)
+            self._created_dirs.add(directory)
+        
+        encoded = self._encode(data)
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{digest[:8]}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(encoded)
+            os.replace(temp_path, path)
+        except OSError:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            # Another process may have stored the same chunk at the same time
+            if os.path.exists(path):
+                return digest, 0
+            raise
+        return digest, len(encoded)
+    
+    def get_chunk(self, digest: str) -> bytes:
+        """
+        Read a chunk.
+        
+        Args:
+            digest (str): The chunk's SHA-256, in hex.
+        
+        Returns:
+            bytes: The chunk data.
+        
+        Raises:
+            OSError: If the chunk is missing.
+            ValueError: If the chunk is damaged.
+        """
+        with open(self._object_path(digest), "rb") as f:
+            encoded = f.read()
+        
+        kind, payload = encoded[:1], encoded[1:]
+        if kind == CHUNK_LZMA:
+            data = lzma.decompress(payload, format=lzma.FORMAT_XZ)
+        elif kind == CHUNK_STORED:
+            data = payload
+        else:
+            raise ValueError(f"Unknown encoding of chunk {digest}")
+        
+        if hashlib.sha256(data).hexdigest() != digest:
+            raise ValueError(f"Chunk {digest} is damaged")
+        return data
+    
+    def store_file(self, path: str, hasher: Any = None) -> Tuple[List[str], int]:
+        """
+        Store a file's chunks.
+        
+        Args:
+            path (str): The file path.
+            hasher (Any, optional): A hash object (see hashcache.new_hasher)
+                to update with the file's data as it's read. Defaults to None.
+        
+        Returns:
+            Tuple[List[str], int]: The file's chunks in order, and the bytes
+                added to the store.
+        """
+        chunks = []
+        new_bytes = 0
+        with open(path, "rb") as f:
+            for data in iter_chunks(f):
+                if hasher is not None:
+                    hasher.update(data)
+                digest, written = self.put_chunk(data)
+                chunks.append(digest)
+                new_bytes += written
+        return chunks, new_bytes
+    
+    def restore_file(self, chunks: List[str], destination: str) -> int:
+        """
+        Write a file from its chunks.
+        
+        Args:
+            chunks (List[str]): The file's chunks, in order.
+            destination (str): The file to write.
+        
+        Returns:
+            int: The bytes written.
+        """
+        written = 0
+        with open(destination, "wb") as f:
+            for digest in chunks:
+                data = self.get_chunk(digest)
+                f.write(data)
+                written += len(data)
+        return written
+    
+    def iter_chunk_files(self) -> Iterator[Tuple[str, str]]:
+        """
+        List the files in the store.
+        
+        Yields:
+            Tuple[str, str]: The name and path of each file, including
+                temporary files left by interrupted writes.
+        """
+        if not os.path.isdir(self.objects_dir):
+            return
+        for entry in os.scandir(self.objects_dir):
+            if entry.is_dir():
+                for chunk in os.scandir(entry.path):
+                    yield chunk.name, chunk.path
+    
+    def collect_garbage(self, referenced: Set[str],
+                        grace_seconds: Optional[float] = None) -> Dict[str, int]:
+        """
+        Remove the chunks no backup references.
+        
+        Args:
+            referenced (Set[str]): The chunks to keep.
+            grace_seconds (Optional[float], optional): Keep unreferenced
+                chunks written or reused this recently. If None, uses
+                GC_GRACE_SECONDS. Defaults to None.
+        
+        Returns:
+            Dict[str, int]: The "removed" chunks, the bytes "freed" and the
+                chunks "kept".
+        """
+        if grace_seconds is None:
+            grace_seconds = GC_GRACE_SECONDS
+        cutoff = time.time() - grace_seconds
+        removed = freed = kept = 0
+        
+        for name, path in self.iter_chunk_files():
+            if name in referenced:
+                kept += 1
+                continue
+            try:
+                stat = os.stat(path)
+                if stat.st_mtime > cutoff:
+                    kept += 1
+                    continue
+                os.remove(path)
+                removed += 1
+                freed += stat.st_size
+            except OSError as e:
+                logger.error(f"Error removing chunk {name}: {e}")
+        
+        return {"removed": removed, "freed": freed, "kept": kept}
+
+def get_chunk_store(backup_location: str, compression_level: int = 9) -> ChunkStore:
+    """
+    Get the chunk store of a backup location.
+    
+    Args:
+        backup_location (str): The backup location.
+        compression_level (int, optional): The LZMA preset (0-9) for new
+            chunks. Defaults to 9.
+    
+    Returns:
+        ChunkStore: The chunk store.
+    """
+    return ChunkStore(os.path.join(backup_location, CHUNK_STORE_DIR), compression_level)
+
+def read_manifest(manifest_path: str) -> Manifest:
+    """
+    Read a backup version's manifest.
+    
+    Args:
+        manifest_path (str): The path to the manifest.
+    
+    Returns:
+        Manifest: The manifest, with a "files" list of "path", "size",
+            "mtime_ns" and "chunks".
+    
+    Raises:
+        OSError: If the manifest can't be read.
+        ValueError: If it isn't a manifest this version understands.
+    """
+    with open(manifest_path, "r") as f:
+        manifest = json.load(f)
+    
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest: {manifest_path}")
+    return manifest
+
+def write_version(store: ChunkStore, files: List[Tuple[str, str]], sizes: List[int],
+                  manifest_path: str, reporter: Optional[ProgressTracker] = None,
+                  base_entries: Optional[Dict[str, Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """
+    Store a backup version as chunks and write its manifest.
+    
+    A file with the same size and modification time as in the base version
+    takes its chunks from there without being read.
+    
+    Args:
+        store (ChunkStore): The chunk store.
+        files (List[Tuple[str, str]]): The path of each file and its name in the backup.
+        sizes (List[int]): The size of each file, for progress reporting.
+        manifest_path (str): The manifest to write.
+        reporter (Optional[ProgressTracker], optional): Advanced for each
+            file. The backup stops when its is_cancelled() returns True.
+            Defaults to None.
+        base_entries (Optional[Dict[str, Dict[str, Any]]], optional): The
+            manifest entries of the base version by file name. Defaults to
+            None (every file is read).
+    
+    Returns:
+        Dict[str, Any]: "files_done", "files_reused" (taken from the base
+            version), "cancelled", "original_size", "stored_size" (the
+            bytes added to the store), "chunks", "new_chunks" and "hashed"
+            (the path, name, stat result and hash of each file read). The
+            manifest isn't written if the backup failed or was cancelled.
+    """
+    entries = []
+    reused = 0
+    new_bytes = 0
+    original_size = 0
+    known: Set[str] = set()
+    new_chunks: Set[str] = set()
+    hashed = []
+    cancelled = False
+    
+    for (file_path, arcname), size in zip(files, sizes):
+        if reporter is not None and reporter.is_cancelled():
+            cancelled = True
+            break
+        try:
+            stat = os.stat(file_path)
+            previous = base_entries.get(arcname) if base_entries else None
+            if (previous is not None and previous["size"] == stat.st_size
+                    and previous["mtime_ns"] == stat.st_mtime_ns):
+                chunks, written = previous["chunks"], 0
+                reused += 1
+            else:
+                # Hash the file while it's read for chunking
+                hasher = new_hasher()
+                chunks, written = store.store_file(file_path, hasher)
+                hashed.append((file_path, arcname, stat, hasher.hexdigest()))
+            entries.append({"path": arcname, "size": stat.st_size,
+                            "mtime_ns": stat.st_mtime_ns, "chunks": chunks})
+            new_bytes += written
+            original_size += stat.st_size
+            if written:
+                new_chunks.update(digest for digest in chunks if digest not in known)
+            known.update(chunks)
+        except Exception as e:
+            logger.error(f"Error adding file to chunk store: {e}")
+        if reporter is not None:
+            reporter.advance(size, arcname)
+    
+    result = {
+        "files_done": len(entries),
+        "files_reused": reused,
+        "cancelled": cancelled,
+        "original_size": original_size,
+        "stored_size": new_bytes,
+        "chunks": len(known),
+        "new_chunks": len(new_chunks),
+        "hashed": hashed,
+    }
+    if cancelled:
+        return result
+    
+    if not atomic_write_json(manifest_path, {"version": MANIFEST_VERSION, "chunking": CHUNKING, "files": entries}, indent=None):
+        raise OSError(f"Error writing manifest: {manifest_path}")
+    return result
+
+def extract_version(store: ChunkStore, manifest: Manifest, destination: str,
+                    reporter: Optional[ProgressTracker] = None) -> int:
+    """
+    Write the files of a backup version into a directory.
+    
+    Args:
+        store (ChunkStore): The chunk store.
+        manifest (Manifest): The version's manifest.
+        destination (str): The directory to write the files to, by their
+            names in the backup.
+        reporter (Optional[ProgressTracker], optional): Advanced for each
+            file. Extraction stops when its is_cancelled() returns True.
+            Defaults to None.
+    
+    Returns:
+        int: The number of files written.
+    
+    Raises:
+        ValueError: If the manifest names a file outside the destination,
+            or a chunk is damaged.
+        OSError: If a chunk is missing or a file can't be written.
+    """
+    root = os.path.abspath(destination)
+    extracted = 0
+    
+    for entry in manifest.get("files", []):
+        if reporter is not None and reporter.is_cancelled():
+            break
+        
+        target = os.path.abspath(os.path.join(root, entry["path"]))
+        if os.path.commonpath([root, target]) != root:
+            raise ValueError(f"Manifest entry outside the backup: {entry['path']}")
+        
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        written = store.restore_file(entry["chunks"], target)
+        if entry.get("mtime_ns") is not None:
+            os.utime(target, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+        extracted += 1
+        
+        if reporter is not None:
+            reporter.advance(written, entry["path"])
+    
+    return extracted
+
+def collect_garbage(backup_location: str, grace_seconds: Optional[float] = None) -> Dict[str, Any]:
+    """
+    Remove the chunks no backup version in a backup location references.
+    
+    Nothing is removed if any manifest can't be read, since its chunks
+    can't be told apart from unused ones.
+    
+    Args:
+        backup_location (str): The backup location.
+        grace_seconds (Optional[float], optional): Keep unreferenced chunks
+            written or reused this recently. If None, uses GC_GRACE_SECONDS.
+            Defaults to None.
+    
+    Returns:
+        Dict[str, Any]: "success", and the "removed" chunks, the bytes
+            "freed" and the chunks "kept", or an "error".
+    """
+    store = get_chunk_store(backup_location)
+    if not os.path.isdir(store.objects_dir):
+        return {"success": True, "removed": 0, "freed": 0, "kept": 0}
+    
+    referenced: Set[str] = set()
+    for filename in os.listdir(backup_location):
+        if not filename.endswith(MANIFEST_SUFFIX):
+            continue
+        try:
+            manifest = read_manifest(os.path.join(backup_location, filename))
+        except Exception as e:
+            logger.error(f"Error reading manifest {filename}, skipping garbage collection: {e}")
+            return {"success": False, "error": f"Error reading manifest {filename}: {e}"}
+        for entry in manifest.get("files", []):
+            referenced.update(entry.get("chunks", []))
+    
+    result = store.collect_garbage(referenced, grace_seconds)
+    if result["removed"]:
+        logger.info(f"Removed {result['removed']} unused chunks ({result['freed']} bytes)")
+    return {"success": True, **result}
@@ -0,0 +1,126 @@
+"""
+ReformatBackup - Compression Classifier
+
+This module decides which files are worth compressing. Files that are
+compressed already (archives, images, audio, video and packed game assets)
+shrink by almost nothing under LZMA2 but cost as much CPU time as any other
+file, so backups store them as they are. A file is judged by its extension,
+and otherwise by how well a quick deflate pass compresses a sample from its
+start.
+"""
+
+import os
+import zlib
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+import py7zr
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Extensions of formats that are compressed already
+INCOMPRESSIBLE_EXTENSIONS = frozenset({
+    # Archives and compressed streams
+    ".7z", ".zip", ".rar", ".gz", ".tgz", ".bz2", ".xz", ".lz4", ".zst", ".cab", ".jar", ".apk",
+    # Game packages
+    ".pak", ".pk3", ".pk4", ".vpk", ".upk", ".uasset", ".ubulk", ".utoc", ".ucas", ".bk2", ".bik", ".usm", ".fsb",
+    # Images
+    ".jpg", ".jpeg", ".png", ".gif", ".webp", ".heic", ".avif", ".ktx2",
+    # Audio and video
+    ".mp3", ".ogg", ".opus", ".aac", ".m4a", ".flac", ".wma", ".wem",
+    ".mp4", ".mkv", ".avi", ".mov", ".webm", ".wmv", ".m4v",
+    # Documents and installers stored as ZIP
+    ".docx", ".xlsx", ".pptx", ".epub", ".msi", ".nupkg",
+})
+
+# Bytes read from the start of a file to estimate how well it compresses
+SAMPLE_SIZE = 64 * 1024
+
+# Files smaller than this are compressed without sampling, unless their
+# extension says otherwise: LZMA2 takes little time on them anyway
+SAMPLE_MIN_SIZE = 256 * 1024
+
+# A sample that a fast deflate pass can't shrink below this share of its size
+# is treated as incompressible
+INCOMPRESSIBLE_RATIO = 0.97
+
+# Threads sampling files at once
+CLASSIFY_WORKERS = 4
+
+# The archive filters for files that are stored as they are
+STORE_FILTERS = [{"id": py7zr.FILTER_COPY}]
+
+def get_compression_filters(compression_level: int) -> List[Dict[str, Any]]:
+    """
+    Get the archive filters for files worth compressing.
+    
+    Args:
+        compression_level (int): The compression level to use (0-9).
+    
+    Returns:
+        List[Dict[str, Any]]: The py7zr filters.
+    """
+    return [{"id": py7zr.FILTER_LZMA2, "preset": compression_level}]
+
+def is_compressible_data(sample: bytes) -> bool:
+    """
+    Estimate whether data is worth compressing, from a sample of it.
+    
+    Args:
+        sample (bytes): The sample, up to SAMPLE_SIZE bytes.
+    
+    Returns:
+        bool: False if a fast deflate pass barely shrinks the sample.
+    """
+    if not sample:
+        return True
+    return len(zlib.compress(sample, 1)) < len(sample) * INCOMPRESSIBLE_RATIO
+
+def is_compressible(path: str, size: int) -> bool:
+    """
+    Estimate whether a file is worth compressing.
+    
+    Args:
+        path (str): The file path.
+        size (int): The file's size in bytes.
+    
+    Returns:
+        bool: False if the file's extension is a compressed format, or a
+            sample from its start doesn't compress.
+    """
+    if os.path.splitext(path)[1].lower() in INCOMPRESSIBLE_EXTENSIONS:
+        return False
+    if size < SAMPLE_MIN_SIZE:
+        return True
+    
+    try:
+        with open(path, "rb") as f:
+            sample = f.read(SAMPLE_SIZE)
+    except OSError:
+        # The archiver reports files it can't read
+        return True
+    return is_compressible_data(sample)
+
+def classify_files(paths: List[str], sizes: List[int], max_workers: Optional[int] = None) -> List[bool]:
+    """
+    Estimate which files are worth compressing.
+    
+    Args:
+        paths (List[str]): The file paths.
+        sizes (List[int]): The size of each file.
+        max_workers (Optional[int], optional): The most files to sample at
+            once. If None, uses CLASSIFY_WORKERS. Defaults to None.
+    
+    Returns:
+        List[bool]: Whether each file is worth compressing, in order.
+    """
+    if not paths:
+        return []
+    with ThreadPoolExecutor(max_workers=max_workers or CLASSIFY_WORKERS) as executor:
+        compressible = list(executor.map(is_compressible, paths, sizes))
+    
+    stored = compressible.count(False)
+    if stored:
+        logger.debug(f"{stored} of {len(paths)} files don't compress and will be stored")
+    return compressible
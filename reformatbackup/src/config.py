@@ -6,8 +6,13 @@ This module handles reading and writing configuration settings for the applicati
 
 import os
 import json
+import time
 import logging
-from typing import Dict, Any, Optional, List, Union
+import threading
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, Optional, List, Tuple, Union
+
+from reformatbackup.src.utils import atomic_write_json, file_lock, get_file_stamp
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -22,8 +27,36 @@ DEFAULT_CONFIG = {
     "compression_level": 9,
     "backup_dot_files": True,
     "last_scan_time": None,
+    "scan_store": "json",
+    "game_scan_skip_drive_types": ["network", "optical"],
+    "scan_interval_hours": 24,
+    "watch_filesystem": False,
+    "backup_concurrency": 0,
+    "backup_format": "7z",
+    "incremental_backups": False,
+    "max_incremental_chain": 6,
 }
 
+# How long a cached configuration is trusted before the file is stat'ed again
+CONFIG_REVALIDATE_SECONDS = 1.0
+
+# Process-wide configuration cache, invalidated by the file's mtime and size
+_config_lock = threading.RLock()
+_config_cache: Optional[Dict[str, Any]] = None
+_config_cache_path: Optional[str] = None
+_config_cache_stamp: Optional[Tuple[int, int]] = None
+_config_cache_checked = 0.0
+
+# Backup locations that have already been verified to exist
+_verified_backup_locations = set()
+
+# Serializes configuration writes between threads; the lock file does the same
+# between processes
+_config_write_lock = threading.RLock()
+
+# Pending configuration of the transaction open in the current thread, if any
+_transaction_state = threading.local()
+
 def get_config_path() -> str:
     """
     Get the path to the configuration file.
@@ -33,15 +66,44 @@ def get_config_path() -> str:
     """
     return os.path.join(os.path.expanduser("~"), ".reformatbackup")
 
-def get_config() -> Dict[str, Any]:
+def _set_config_cache(config_path: str, config: Dict[str, Any]) -> None:
     """
-    Get the configuration settings.
+    Store a configuration in the process-wide cache.
+    
+    Args:
+        config_path (str): The path the configuration was read from or written to.
+        config (Dict[str, Any]): The configuration settings.
+    """
+    global _config_cache, _config_cache_path, _config_cache_stamp, _config_cache_checked
+    
+    with _config_lock:
+        _config_cache = dict(config)
+        _config_cache_path = config_path
+        _config_cache_stamp = get_file_stamp(config_path)
+        _config_cache_checked = time.monotonic()
+
+def invalidate_config_cache() -> None:
+    """
+    Drop the cached configuration so the next read goes to disk.
+    """
+    global _config_cache, _config_cache_path, _config_cache_stamp
+    
+    with _config_lock:
+        _config_cache = None
+        _config_cache_path = None
+        _config_cache_stamp = None
+        _verified_backup_locations.clear()
+
+def _load_config_from_disk(config_path: str) -> Dict[str, Any]:
+    """
+    Read the configuration file, creating it with default values if needed.
+    
+    Args:
+        config_path (str): The path to the configuration file.
     
     Returns:
         Dict[str, Any]: The configuration settings.
     """
-    config_path = get_config_path()
-    
     # If the configuration file exists, load it
     if os.path.exists(config_path):
         try:
@@ -64,14 +126,136 @@ def get_config() -> Dict[str, Any]:
         os.makedirs(os.path.dirname(config_path), exist_ok=True)
         
         # Write the default configuration
-        with open(config_path, "w") as f:
-            json.dump(DEFAULT_CONFIG, f, indent=2)
+        atomic_write_json(config_path, DEFAULT_CONFIG)
         
         return DEFAULT_CONFIG.copy()
     except Exception as e:
         logger.error(f"Error creating default configuration: {e}")
         return DEFAULT_CONFIG.copy()
 
+def _get_cached_config() -> Dict[str, Any]:
+    """
+    Get the process-wide configuration, reading the file only when it changed.
+    
+    The file is stat'ed at most once every CONFIG_REVALIDATE_SECONDS, and it is
+    only parsed again when its mtime or size differs from the cached copy.
+    The returned dictionary is shared and must not be modified.
+    
+    Returns:
+        Dict[str, Any]: The cached configuration settings.
+    """
+    global _config_cache_checked
+    
+    config_path = get_config_path()
+    
+    with _config_lock:
+        if _config_cache is not None and _config_cache_path == config_path:
+            now = time.monotonic()
+            if now - _config_cache_checked < CONFIG_REVALIDATE_SECONDS:
+                return _config_cache
+            
+            if get_file_stamp(config_path) == _config_cache_stamp:
+                _config_cache_checked = now
+                return _config_cache
+            
+            logger.debug("Configuration file changed on disk, reloading")
+        
+        _set_config_cache(config_path, _load_config_from_disk(config_path))
+        return _config_cache
+
+def get_config() -> Dict[str, Any]:
+    """
+    Get the configuration settings.
+    
+    Returns:
+        Dict[str, Any]: A copy of the configuration settings.
+    """
+    pending = _get_pending_config()
+    if pending is not None:
+        return dict(pending)
+    
+    return dict(_get_cached_config())
+
+def _get_pending_config() -> Optional[Dict[str, Any]]:
+    """
+    Get the pending configuration of the transaction open in this thread.
+    
+    Returns:
+        Optional[Dict[str, Any]]: The pending configuration, or None if no
+            transaction is open.
+    """
+    return getattr(_transaction_state, "config", None)
+
+@contextmanager
+def _locked_config_file(config_path: str) -> Iterator[None]:
+    """
+    Hold the configuration write lock across threads and processes.
+    
+    Args:
+        config_path (str): The path to the configuration file.
+    """
+    with _config_write_lock:
+        with file_lock(f"{config_path}.lock"):
+            yield
+
+def _write_config(config_path: str, config: Dict[str, Any]) -> bool:
+    """
+    Atomically write the configuration and update the process-wide cache.
+    
+    The caller must hold the configuration write lock.
+    
+    Args:
+        config_path (str): The path to the configuration file.
+        config (Dict[str, Any]): The configuration settings to write.
+    
+    Returns:
+        bool: True if successful, False otherwise.
+    """
+    if not atomic_write_json(config_path, config):
+        logger.error("Error saving configuration")
+        return False
+    
+    # Write through to the process-wide cache
+    _set_config_cache(config_path, config)
+    return True
+
+@contextmanager
+def config_transaction() -> Iterator[Dict[str, Any]]:
+    """
+    Apply several configuration updates with a single write.
+    
+    The configuration is re-read from disk under a lock shared by threads and
+    processes, so concurrent updates are never lost. Setters called inside the
+    block (set_compression_level, update_config, ...) update the pending
+    configuration instead of writing, and everything is written once with an
+    atomic replace when the block exits. Nothing is written if the block raises.
+    Nested transactions join the outermost one.
+    
+    Example:
+        with config_transaction():
+            set_compression_level(5)
+            set_backup_dot_files(False)
+    
+    Yields:
+        Dict[str, Any]: The pending configuration, which may be modified directly.
+    """
+    pending = _get_pending_config()
+    if pending is not None:
+        yield pending
+        return
+    
+    config_path = get_config_path()
+    
+    with _locked_config_file(config_path):
+        config = _load_config_from_disk(config_path)
+        _transaction_state.config = config
+        try:
+            yield config
+        finally:
+            _transaction_state.config = None
+        
+        _write_config(config_path, config)
+
 def save_config(config: Dict[str, Any]) -> bool:
     """
     Save the configuration settings.
@@ -82,25 +266,24 @@ def save_config(config: Dict[str, Any]) -> bool:
     Returns:
         bool: True if successful, False otherwise.
     """
+    pending = _get_pending_config()
+    if pending is not None:
+        pending.clear()
+        pending.update(config)
+        return True
+    
     config_path = get_config_path()
     
-    try:
-        # Ensure the parent directory exists
-        os.makedirs(os.path.dirname(config_path), exist_ok=True)
-        
-        # Write the configuration
-        with open(config_path, "w") as f:
-            json.dump(config, f, indent=2)
-        
-        return True
-    except Exception as e:
-        logger.error(f"Error saving configuration: {e}")
-        return False
+    with _locked_config_file(config_path):
+        return _write_config(config_path, config)
 
 def update_config(key: str, value: Any) -> bool:
     """
     Update a specific configuration setting.
     
+    Inside a config_transaction() the update is deferred until the transaction
+    is committed.
+    
     Args:
         key (str): The configuration key to update.
         value (Any): The new value for the configuration key.
@@ -108,9 +291,18 @@ def update_config(key: str, value: Any) -> bool:
     Returns:
         bool: True if successful, False otherwise.
     """
-    config = get_config()
-    config[key] = value
-    return save_config(config)
+    pending = _get_pending_config()
+    if pending is not None:
+        pending[key] = value
+        return True
+    
+    config_path = get_config_path()
+    
+    # Read-modify-write under the lock so concurrent updates aren't lost
+    with _locked_config_file(config_path):
+        config = _load_config_from_disk(config_path)
+        config[key] = value
+        return _write_config(config_path, config)
 
 def get_config_value(key: str, default: Any = None) -> Any:
     """
@@ -124,8 +316,11 @@ def get_config_value(key: str, default: Any = None) -> Any:
     Returns:
         Any: The configuration value, or the default if the key doesn't exist.
     """
-    config = get_config()
-    return config.get(key, default)
+    pending = _get_pending_config()
+    if pending is not None:
+        return pending.get(key, default)
+    
+    return _get_cached_config().get(key, default)
 
 def get_backup_location() -> str:
     """
@@ -136,6 +331,13 @@ def get_backup_location() -> str:
     """
     location = get_config_value("backup_location")
     
+    # Locations verified earlier in this process only need a stat, to notice
+    # a folder deleted or a drive unplugged since
+    if location in _verified_backup_locations:
+        if os.path.isdir(location):
+            return location
+        _verified_backup_locations.discard(location)
+    
     # Create the backup location if it doesn't exist
     if not os.path.exists(location):
         try:
@@ -151,6 +353,9 @@ def get_backup_location() -> str:
                 except Exception as e:
                     logger.error(f"Error creating default backup location: {e}")
     
+    if os.path.exists(location):
+        _verified_backup_locations.add(location)
+    
     return location
 
 def set_backup_location(location: str) -> bool:
@@ -183,6 +388,85 @@ def get_scan_cache_path() -> str:
     """
     return os.path.join(os.path.expanduser("~"), "appscan.json")
 
+def get_scan_meta_path() -> str:
+    """
+    Get the path to the file holding metadata for the JSON scan cache.
+    
+    Returns:
+        str: The path to the scan metadata file.
+    """
+    return os.path.join(os.path.expanduser("~"), "appscan.meta.json")
+
+def get_scan_db_path() -> str:
+    """
+    Get the path to the SQLite scan store.
+    
+    Returns:
+        str: The path to the SQLite scan store.
+    """
+    return os.path.join(os.path.expanduser("~"), "appscan.db")
+
+def get_jobs_db_path() -> str:
+    """
+    Get the path to the SQLite store of background jobs.
+    
+    Returns:
+        str: The path to the job store.
+    """
+    return os.path.join(os.path.expanduser("~"), ".reformatbackup_jobs.db")
+
+def get_scan_store() -> str:
+    """
+    Get the backend used to store scan results.
+    
+    Returns:
+        str: "json" for appscan.json or "sqlite" for the SQLite store.
+    """
+    return get_config_value("scan_store", DEFAULT_CONFIG["scan_store"])
+
+def set_scan_store(store: str) -> bool:
+    """
+    Set the backend used to store scan results.
+    
+    Args:
+        store (str): "json" for appscan.json or "sqlite" for the SQLite store.
+    
+    Returns:
+        bool: True if successful, False otherwise.
+    """
+    if store not in ["json", "sqlite"]:
+        logger.error(f"Invalid scan store: {store}")
+        return False
+    
+    return update_config("scan_store", store)
+
+def get_game_scan_skip_drive_types() -> List[str]:
+    """
+    Get the drive types that are skipped when looking for game libraries.
+    
+    Returns:
+        List[str]: The drive types (e.g., ["network", "optical"]).
+    """
+    return get_config_value("game_scan_skip_drive_types", DEFAULT_CONFIG["game_scan_skip_drive_types"])
+
+def set_game_scan_skip_drive_types(drive_types: List[str]) -> bool:
+    """
+    Set the drive types that are skipped when looking for game libraries.
+    
+    Args:
+        drive_types (List[str]): The drive types to skip, from "fixed",
+            "removable", "network", "optical" and "unknown".
+    
+    Returns:
+        bool: True if successful, False otherwise.
+    """
+    invalid = [t for t in drive_types if t not in ["fixed", "removable", "network", "optical", "unknown"]]
+    if invalid:
+        logger.error(f"Invalid drive types: {invalid}")
+        return False
+    
+    return update_config("game_scan_skip_drive_types", list(drive_types))
+
 def get_auto_rescan() -> bool:
     """
     Get whether to automatically rescan on startup.
@@ -204,6 +488,159 @@ def set_auto_rescan(enabled: bool) -> bool:
     """
     return update_config("auto_rescan", enabled)
 
+def get_scan_interval_hours() -> float:
+    """
+    Get how often the background scan worker refreshes the scan when
+    auto-rescan is enabled.
+    
+    Returns:
+        float: The interval in hours.
+    """
+    return get_config_value("scan_interval_hours", DEFAULT_CONFIG["scan_interval_hours"])
+
+def set_scan_interval_hours(hours: float) -> bool:
+    """
+    Set how often the background scan worker refreshes the scan when
+    auto-rescan is enabled.
+    
+    Args:
+        hours (float): The interval in hours. Must be positive.
+    
+    Returns:
+        bool: True if successful, False otherwise.
+    """
+    if hours <= 0:
+        logger.error(f"Invalid scan interval: {hours}")
+        return False
+    
+    return update_config("scan_interval_hours", hours)
+
+def get_watch_filesystem() -> bool:
+    """
+    Get whether to watch the scanned directories for changes and keep the
+    scan current without scheduled rescans.
+    
+    Returns:
+        bool: True if the file system watcher is enabled, False otherwise.
+    """
+    return get_config_value("watch_filesystem", DEFAULT_CONFIG["watch_filesystem"])
+
+def set_watch_filesystem(enabled: bool) -> bool:
+    """
+    Set whether to watch the scanned directories for changes.
+    
+    Args:
+        enabled (bool): Whether to enable the file system watcher.
+    
+    Returns:
+        bool: True if successful, False otherwise.
+    """
+    return update_config("watch_filesystem", enabled)
+
+def get_backup_concurrency() -> int:
+    """
+    Get how many application backups may run at the same time.
+    
+    Returns:
+        int: The number of backup processes, or 0 to use one per CPU.
+    """
+    return get_config_value("backup_concurrency", DEFAULT_CONFIG["backup_concurrency"])
+
+def set_backup_concurrency(concurrency: int) -> bool:
+    """
+    Set how many application backups may run at the same time.
+    
+    Args:
+        concurrency (int): The number of backup processes, or 0 to use one
+            per CPU. Each process compresses independently and needs its own
+            LZMA memory.
+    
+    Returns:
+        bool: True if successful, False otherwise.
+    """
+    if concurrency < 0:
+        logger.error(f"Invalid backup concurrency: {concurrency}")
+        return False
+    
+    return update_config("backup_concurrency", concurrency)
+
+def get_backup_format() -> str:
+    """
+    Get the format of new backups.
+    
+    Returns:
+        str: "7z" for a 7z archive per backup or "chunks" for the deduplicated
+            chunk store.
+    """
+    return get_config_value("backup_format", DEFAULT_CONFIG["backup_format"])
+
+def set_backup_format(backup_format: str) -> bool:
+    """
+    Set the format of new backups. Existing backups keep their format and
+    can still be restored.
+    
+    Args:
+        backup_format (str): "7z" for a 7z archive per backup or "chunks" for
+            the deduplicated chunk store.
+    
+    Returns:
+        bool: True if successful, False otherwise.
+    """
+    if backup_format not in ["7z", "chunks"]:
+        logger.error(f"Invalid backup format: {backup_format}")
+        return False
+    
+    return update_config("backup_format", backup_format)
+
+def get_incremental_backups() -> bool:
+    """
+    Get whether backups only store the files changed since the previous backup.
+    
+    Returns:
+        bool: True if incremental backups are enabled, False otherwise.
+    """
+    return get_config_value("incremental_backups", DEFAULT_CONFIG["incremental_backups"])
+
+def set_incremental_backups(enabled: bool) -> bool:
+    """
+    Set whether backups only store the files changed since the previous backup.
+    
+    Args:
+        enabled (bool): Whether to enable incremental backups.
+    
+    Returns:
+        bool: True if successful, False otherwise.
+    """
+    return update_config("incremental_backups", enabled)
+
+def get_max_incremental_chain() -> int:
+    """
+    Get how many incremental backups may follow a full backup.
+    
+    Returns:
+        int: The number of incremental backups before the next full backup.
+    """
+    return get_config_value("max_incremental_chain", DEFAULT_CONFIG["max_incremental_chain"])
+
+def set_max_incremental_chain(length: int) -> bool:
+    """
+    Set how many incremental backups may follow a full backup. Restoring
+    an incremental backup extracts every backup back to the full one, so
+    shorter chains restore faster.
+    
+    Args:
+        length (int): The number of incremental backups before the next
+            full backup (at least 1).
+    
+    Returns:
+        bool: True if successful, False otherwise.
+    """
+    if length < 1:
+        logger.error(f"Invalid incremental chain length: {length}")
+        return False
+    
+    return update_config("max_incremental_chain", length)
+
 def get_theme() -> str:
     """
     Get the UI theme.
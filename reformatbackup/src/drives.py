@@ -0,0 +1,234 @@
+"""
+ReformatBackup - Drive Inventory
+
+This module keeps a cached inventory of the system's drives, classified as
+fixed, removable, network or optical. Drives are probed in parallel with a
+timeout each, so a disconnected network mapping or an empty card reader can't
+stall a scan.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, List, Any, Optional
+
+import psutil
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Type definitions for better type hinting
+DriveInfo = Dict[str, Any]
+
+# Drive types
+DRIVE_FIXED = "fixed"
+DRIVE_REMOVABLE = "removable"
+DRIVE_NETWORK = "network"
+DRIVE_OPTICAL = "optical"
+DRIVE_UNKNOWN = "unknown"
+
+# How long a drive may take to respond to a probe, in seconds, by type
+PROBE_TIMEOUTS = {
+    DRIVE_FIXED: 2.0,
+    DRIVE_REMOVABLE: 1.0,
+    DRIVE_NETWORK: 1.0,
+    DRIVE_OPTICAL: 0.5,
+    DRIVE_UNKNOWN: 1.0,
+}
+
+# How long the inventory is reused before the drives are probed again
+DRIVE_INVENTORY_TTL = 300.0
+
+# File systems that are mounted over the network on non-Windows systems
+NETWORK_FSTYPES = {"nfs", "nfs4", "cifs", "smbfs", "smb3", "afpfs", "9p", "fuse.sshfs", "davfs"}
+
+# File systems used by optical media
+OPTICAL_FSTYPES = {"iso9660", "udf", "cdfs"}
+
+# Process-wide drive inventory
+_inventory_lock = threading.Lock()
+_inventory: Optional[List[DriveInfo]] = None
+_inventory_time = 0.0
+
+def _classify(partition: Any) -> str:
+    """
+    Classify a partition reported by psutil.
+    
+    On Windows psutil reports the drive type in the mount options
+    ("fixed", "removable", "remote" or "cdrom"); elsewhere the file system
+    type and device name are used.
+    
+    Args:
+        partition (Any): The partition, as returned by psutil.disk_partitions.
+    
+    Returns:
+        str: The drive type.
+    """
+    opts = set(partition.opts.split(","))
+    fstype = partition.fstype.lower()
+    
+    if "remote" in opts or fstype in NETWORK_FSTYPES or partition.device.startswith("\\\\"):
+        return DRIVE_NETWORK
+    if "cdrom" in opts or fstype in OPTICAL_FSTYPES or os.path.basename(partition.device).startswith("sr"):
+        return DRIVE_OPTICAL
+    if "removable" in opts:
+        return DRIVE_REMOVABLE
+    if "fixed" in opts or os.name != "nt":
+        return DRIVE_FIXED
+    return DRIVE_UNKNOWN
+
+def _probe(mountpoint: str) -> bool:
+    """
+    Check whether a drive is accessible.
+    
+    Args:
+        mountpoint (str): The drive's mount point.
+    
+    Returns:
+        bool: True if the drive's root can be read.
+    """
+    return os.path.exists(mountpoint)
+
+def _build_inventory() -> List[DriveInfo]:
+    """
+    List the drives and probe them in parallel.
+    
+    Each probe runs on a daemon thread. A probe that doesn't answer within its
+    drive type's timeout marks the drive as unavailable and is left behind.
+    
+    Returns:
+        List[DriveInfo]: The drives, in the order psutil reports them.
+    """
+    try:
+        # Disconnected network mappings only show up with all=True on Windows
+        partitions = psutil.disk_partitions(all=os.name == "nt")
+    except Exception as e:
+        logger.error(f"Error listing drives: {e}")
+        return []
+    
+    drives = []
+    probes = []
+    
+    for partition in partitions:
+        drive_type = _classify(partition)
+        drive = {
+            "drive": os.path.splitdrive(partition.mountpoint)[0] or partition.mountpoint,
+            "mountpoint": partition.mountpoint,
+            "device": partition.device,
+            "fstype": partition.fstype,
+            "type": drive_type,
+            "available": False,
+            "timed_out": False,
+            "probe_ms": None,
+        }
+        drives.append(drive)
+        
+        result: Dict[str, Any] = {}
+        done = threading.Event()
+        
+        def probe(drive: DriveInfo = drive, result: Dict[str, Any] = result, done: threading.Event = done) -> None:
+            try:
+                result["available"] = _probe(drive["mountpoint"])
+            except Exception:
+                result["available"] = False
+            done.set()
+        
+        thread = threading.Thread(target=probe, name=f"drive-probe-{drive['drive']}", daemon=True)
+        probes.append((drive, result, done, time.monotonic()))
+        thread.start()
+    
+    for drive, result, done, started in probes:
+        timeout = PROBE_TIMEOUTS.get(drive["type"], PROBE_TIMEOUTS[DRIVE_UNKNOWN])
+        if done.wait(max(0.0, started + timeout - time.monotonic())):
+            drive["available"] = result["available"]
+            drive["probe_ms"] = round((time.monotonic() - started) * 1000, 1)
+        else:
+            drive["timed_out"] = True
+            logger.warning(f"Drive {drive['mountpoint']} ({drive['type']}) didn't respond within {timeout}s")
+    
+    return drives
+
+def get_drive_inventory(refresh: bool = False) -> List[DriveInfo]:
+    """
+    Get the drive inventory, probing the drives if the cached one has expired.
+    
+    Args:
+        refresh (bool, optional): Whether to probe the drives even if the
+            cached inventory is still fresh. Defaults to False.
+    
+    Returns:
+        List[DriveInfo]: The drives, each with "drive", "mountpoint",
+            "device", "fstype", "type", "available", "timed_out" and
+            "probe_ms" (None if the probe timed out).
+    """
+    global _inventory, _inventory_time
+    
+    with _inventory_lock:
+        if not refresh and _inventory is not None and time.monotonic() - _inventory_time < DRIVE_INVENTORY_TTL:
+            return _inventory
+        
+        start = time.monotonic()
+        _inventory = _build_inventory()
+        _inventory_time = time.monotonic()
+        
+        available = sum(1 for drive in _inventory if drive["available"])
+        logger.info(f"Found {available} of {len(_inventory)} drives available "
+                    f"in {(_inventory_time - start) * 1000:.0f}ms")
+        return _inventory
+
+def invalidate_drive_inventory() -> None:
+    """
+    Drop the cached drive inventory so the next call probes the drives again.
+    """
+    global _inventory
+    
+    with _inventory_lock:
+        _inventory = None
+
+def get_available_drives(skip_types: Optional[List[str]] = None) -> List[str]:
+    """
+    Get the mount points of the drives that responded to their probe.
+    
+    Args:
+        skip_types (Optional[List[str]], optional): Drive types to leave out
+            (e.g., ["network", "optical"]). Defaults to None.
+    
+    Returns:
+        List[str]: The mount points (e.g., ["C:\\", "D:\\"]).
+    """
+    skip_types = skip_types or []
+    return [
+        drive["mountpoint"] for drive in get_drive_inventory()
+        if drive["available"] and drive["type"] not in skip_types
+    ]
+
+def get_drive_for_path(path: str, inventory: Optional[List[DriveInfo]] = None) -> Optional[DriveInfo]:
+    """
+    Find the drive a path is on.
+    
+    Args:
+        path (str): The path.
+        inventory (Optional[List[DriveInfo]], optional): The drive inventory.
+            Defaults to the cached inventory.
+    
+    Returns:
+        Optional[DriveInfo]: The drive with the longest mount point containing
+            the path, or None if no drive contains it.
+    """
+    if inventory is None:
+        inventory = get_drive_inventory()
+    
+    path = os.path.normcase(os.path.abspath(path))
+    best = None
+    best_length = -1
+    
+    for drive in inventory:
+        mountpoint = os.path.normcase(drive["mountpoint"])
+        if not mountpoint.endswith(os.sep):
+            mountpoint += os.sep
+        if (path + os.sep).startswith(mountpoint) and len(mountpoint) > best_length:
+            best = drive
+            best_length = len(mountpoint)
+    
+    return best
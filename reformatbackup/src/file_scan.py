@@ -0,0 +1,357 @@
+"""
+ReformatBackup - File System Scanning
+
+This module finds applications by looking for executables in the folders of
+common install roots. Roots are scanned in parallel with os.scandir, and
+folders whose fingerprint hasn't changed since the last scan are not
+inspected again.
+"""
+
+import os
+import stat
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+
+from reformatbackup.src.config import get_game_scan_skip_drive_types
+from reformatbackup.src.drives import get_available_drives
+from reformatbackup.src.fingerprint import make_fingerprint, fingerprint_entry
+from reformatbackup.src.scan_cache import load_scan_index, get_scan_meta, set_scan_meta
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Type definitions for better type hinting
+AppInfo = Dict[str, Any]
+
+# Number of install roots scanned at the same time
+FS_SCAN_WORKERS = 4
+
+# Directories under an install root that are never applications
+SKIP_APP_DIRS = ["Windows", "Program Files", "Program Files (x86)", "Users", "ProgramData"]
+
+# Subdirectories searched for an executable when a folder has none at the top
+EXE_SUBDIRS = ["bin", "program", "app"]
+
+# A root modified this soon before its last scan is listed again, since an
+# entry added in the same clock tick wouldn't change its modification time
+ROOT_SETTLE_SECONDS = 2.0
+
+# Fingerprints and detection costs of the install roots, recorded by the last
+# file system scan that ran to completion
+_root_fingerprints: Optional[Dict[str, Any]] = None
+
+def clear_root_fingerprints() -> None:
+    """
+    Forget the root fingerprints recorded by the last scan.
+    """
+    global _root_fingerprints
+    _root_fingerprints = None
+
+def get_root_fingerprints() -> Dict[str, Any]:
+    """
+    Get the root fingerprints recorded by the last scan that ran to completion.
+    
+    Returns:
+        Dict[str, Any]: For each install root, its "fingerprint", the
+            fingerprints of its "folders" and the detection "cost".
+    """
+    return _root_fingerprints or {}
+
+def get_install_dirs() -> List[str]:
+    """
+    Get the install roots to scan.
+    
+    Returns:
+        List[str]: The install roots that exist.
+    """
+    # Common installation directories, skipping variables that aren't set
+    install_dirs = [
+        os.path.join(os.environ[env], *subdirs)
+        for env, subdirs in [
+            ("ProgramFiles", []),
+            ("ProgramFiles(x86)", []),
+            ("LOCALAPPDATA", ["Programs"]),
+            ("APPDATA", []),
+            ("LOCALAPPDATA", []),
+        ]
+        if os.environ.get(env)
+    ]
+    
+    # Filter out non-existent directories
+    install_dirs = [d for d in install_dirs if os.path.exists(d)]
+    
+    # Add the roots of responsive drives to scan for game installations,
+    # leaving out slow drive types
+    for drive in get_available_drives(skip_types=get_game_scan_skip_drive_types()):
+        # Steam, Epic and GOG libraries are found from their manifests
+        # by the library scanners
+        game_dirs = [
+            os.path.join(drive, "Games"),
+        ]
+        install_dirs.extend([d for d in game_dirs if os.path.exists(d)])
+    
+    return install_dirs
+
+def _is_executable(name: str) -> bool:
+    """
+    Check whether a file name looks like an application executable.
+    
+    Args:
+        name (str): The file name.
+    
+    Returns:
+        bool: True for .exe files other than uninstallers.
+    """
+    return name.endswith(".exe") and not name.startswith("unins")
+
+def _list_folder(path: str) -> Tuple[int, Optional[str], List[str]]:
+    """
+    List an application folder once, for both its fingerprint and detection.
+    
+    Args:
+        path (str): The path to the folder.
+    
+    Returns:
+        Tuple[int, Optional[str], List[str]]: The number of entries, the path
+            of the first executable at the top level (if any) and the
+            executable subdirectories present, in EXE_SUBDIRS order.
+    """
+    count = 0
+    exe_path = None
+    subdirs = []
+    
+    with os.scandir(path) as it:
+        for entry in it:
+            count += 1
+            if exe_path is None and _is_executable(entry.name):
+                exe_path = entry.path
+            elif entry.name in EXE_SUBDIRS and entry.is_dir():
+                subdirs.append(entry.name)
+    
+    subdirs.sort(key=EXE_SUBDIRS.index)
+    return count, exe_path, subdirs
+
+def _find_subdir_executable(path: str, subdirs: List[str]) -> Optional[str]:
+    """
+    Look for an executable in an application folder's subdirectories.
+    
+    Args:
+        path (str): The path to the folder.
+        subdirs (List[str]): The subdirectories to search, in order.
+    
+    Returns:
+        Optional[str]: The path of the first executable found, or None.
+    """
+    for subdir in subdirs:
+        try:
+            with os.scandir(os.path.join(path, subdir)) as it:
+                for entry in it:
+                    if _is_executable(entry.name):
+                        return entry.path
+        except OSError as e:
+            logger.debug(f"Error listing {path}\\{subdir}: {e}")
+    
+    return None
+
+def _scan_install_root(install_dir: str, previous_root: Dict[str, Any], cached_apps: Dict[str, AppInfo],
+                       cancel_event: Optional[threading.Event]) -> Tuple[List[AppInfo], Optional[Dict[str, Any]]]:
+    """
+    Find the applications in one install root.
+    
+    A root whose modification time and file ID match its record from the
+    last scan isn't listed again; the folders recorded then are checked
+    instead.
+    
+    Args:
+        install_dir (str): The install root.
+        previous_root (Dict[str, Any]): The root's record from the last scan, if any.
+        cached_apps (Dict[str, AppInfo]): File system apps from the last scan, by path.
+        cancel_event (Optional[threading.Event]): Set to stop the scan early.
+    
+    Returns:
+        Tuple[List[AppInfo], Optional[Dict[str, Any]]]: The applications found
+            and the root's new record, or None if the scan was cancelled.
+    """
+    start = time.monotonic()
+    previous_folders = previous_root.get("folders", {})
+    apps = []
+    folders = {}
+    inspected = 0
+    listed = 0
+    avoided = 0
+    errors = 0
+    
+    st = os.stat(install_dir)
+    previous_fingerprint = previous_root.get("fingerprint")
+    root_unchanged = (previous_fingerprint is not None
+                      and [st.st_mtime_ns, st.st_ino] == [previous_fingerprint[0], previous_fingerprint[2]]
+                      and st.st_mtime < previous_root.get("scanned_at", 0) - ROOT_SETTLE_SECONDS)
+    if root_unchanged:
+        entry_count = previous_fingerprint[1]
+        entries = [(app_dir, os.path.join(install_dir, app_dir), None) for app_dir in previous_folders]
+    else:
+        with os.scandir(install_dir) as it:
+            entries = [(entry.name, entry.path, entry) for entry in it]
+        entry_count = len(entries)
+    
+    for app_dir, path, entry in entries:
+        if cancel_event is not None and cancel_event.is_set():
+            return apps, None
+        
+        # Skip system directories and hidden directories
+        if app_dir.startswith('.') or app_dir in SKIP_APP_DIRS:
+            continue
+        
+        try:
+            if entry is None:
+                folder_st = os.stat(path)
+                if not stat.S_ISDIR(folder_st.st_mode):
+                    continue
+                count, exe_path, subdirs = _list_folder(path)
+                fingerprint = make_fingerprint(folder_st, count)
+            else:
+                if not entry.is_dir():
+                    continue
+                count, exe_path, subdirs = _list_folder(path)
+                fingerprint = fingerprint_entry(entry, count)
+        except OSError as e:
+            logger.debug(f"Error scanning directory {path}: {e}")
+            errors += 1
+            continue
+        folders[app_dir] = fingerprint
+        listed += count
+        
+        # Reuse the cached result for unchanged folders
+        if fingerprint == previous_folders.get(app_dir):
+            if path in cached_apps:
+                apps.append(dict(cached_apps[path]))
+            if exe_path is None:
+                avoided += len(subdirs)
+            continue
+        
+        inspected += 1
+        if exe_path is None:
+            exe_path = _find_subdir_executable(path, subdirs)
+        if exe_path is None:
+            continue
+        
+        app_id = app_dir.lower().replace(" ", "-")
+        apps.append({
+            "id": f"fs-{app_id}",
+            "name": app_dir,
+            "path": path,
+            "source": "file_system",
+            "root": install_dir,
+            "executable": exe_path,
+            "fingerprint": fingerprint,
+        })
+    
+    elapsed = time.monotonic() - start
+    cost = {
+        "folders": len(folders),
+        "inspected": inspected,
+        "reused": len(folders) - inspected,
+        "entries": (0 if root_unchanged else entry_count) + listed,
+        "root_reused": root_unchanged,
+        "listings_avoided": avoided,
+        "errors": errors,
+        "seconds": round(elapsed, 3),
+    }
+    logger.info(f"Scanned {install_dir} in {elapsed:.2f}s: {len(folders)} folders, "
+                f"{inspected} inspected, {len(apps)} applications, {errors} errors")
+    
+    record = {"fingerprint": make_fingerprint(st, entry_count), "folders": folders,
+              "scanned_at": time.time(), "cost": cost}
+    return apps, record
+
+def scan_file_system(cancel_event: Optional[threading.Event] = None) -> List[AppInfo]:
+    """
+    Scan the file system for installed applications.
+    
+    Install roots are scanned in parallel by up to FS_SCAN_WORKERS threads.
+    Each folder is listed once with os.scandir, which yields both its
+    fingerprint and any top-level executable; bin, program and app
+    subdirectories are only searched, up to the first executable, for changed
+    folders without one. A root that hasn't changed since the last completed
+    scan isn't listed again. A folder whose fingerprint matches the last
+    completed scan is not inspected again: its cached entry is reused, or it
+    is skipped if it wasn't an application.
+    
+    Args:
+        cancel_event (Optional[threading.Event], optional): Set to stop the scan early. Defaults to None.
+    
+    Returns:
+        List[AppInfo]: The applications found, in install root order.
+    """
+    global _root_fingerprints
+    
+    install_dirs = get_install_dirs()
+    
+    # Fingerprints and entries from the last completed scan
+    previous = load_scan_index()
+    previous_roots = {}
+    cached_apps = {}
+    if previous is not None:
+        previous_roots = get_scan_meta("root_fingerprints", {})
+        cached_apps = {app.get("path"): app for app in previous.with_source("file_system")}
+    
+    apps = []
+    roots = {}
+    
+    with ThreadPoolExecutor(max_workers=FS_SCAN_WORKERS, thread_name_prefix="fs-scan") as executor:
+        futures = [
+            executor.submit(_scan_install_root, install_dir, previous_roots.get(install_dir, {}),
+                            cached_apps, cancel_event)
+            for install_dir in install_dirs
+        ]
+        for install_dir, future in zip(install_dirs, futures):
+            try:
+                root_apps, record = future.result()
+            except Exception as e:
+                logger.debug(f"Error scanning directory {install_dir}: {e}")
+                continue
+            apps.extend(root_apps)
+            if record is not None:
+                roots[install_dir] = record
+    
+    # Only a complete scan can vouch for the folders it skipped next time
+    if cancel_event is not None and cancel_event.is_set():
+        logger.info("File system scan cancelled")
+    else:
+        _root_fingerprints = roots
+    
+    return apps
+
+def rescan_install_root(install_dir: str) -> List[AppInfo]:
+    """
+    Rescan a single install root, reusing the last scan for unchanged folders.
+    
+    The root's record in the stored root fingerprints is updated, so the next
+    full scan starts from this result.
+    
+    Args:
+        install_dir (str): The install root.
+    
+    Returns:
+        List[AppInfo]: The applications found under the root.
+    """
+    previous = load_scan_index()
+    previous_roots = get_scan_meta("root_fingerprints", {}) if previous is not None else {}
+    cached_apps = {app.get("path"): app for app in previous.with_source("file_system")} if previous else {}
+    
+    try:
+        apps, record = _scan_install_root(install_dir, previous_roots.get(install_dir, {}), cached_apps, None)
+    except OSError as e:
+        logger.debug(f"Error scanning directory {install_dir}: {e}")
+        apps, record = [], None
+    
+    if record is not None:
+        previous_roots[install_dir] = record
+    else:
+        previous_roots.pop(install_dir, None)
+    set_scan_meta({"root_fingerprints": previous_roots})
+    
+    return apps
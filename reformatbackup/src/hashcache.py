@@ -0,0 +1,419 @@
+"""
+ReformatBackup - File Hash Cache
+
+This module hashes files and remembers the hashes in a SQLite database in
+the backup location, keyed by path, size, modification time and file ID,
+so a file is only read again once it has changed. Files are read through
+mmap in large chunks and hashed on a thread pool, with xxHash when it's
+installed and BLAKE2 otherwise.
+"""
+
+import io
+import os
+import mmap
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+from reformatbackup.src.progress import ProgressTracker
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# The hash cache's file name in the backup location
+HASH_CACHE_FILENAME = ".hashcache.db"
+
+# The hash function used, recorded with each cached hash
+HASH_ALGORITHM = "xxh3_128" if xxhash is not None else "blake2b"
+
+# Bytes hashed per update
+HASH_READ_SIZE = 8 * 1024 * 1024
+
+# Threads hashing files at once; the hash functions release the GIL
+HASH_WORKERS = min(8, os.cpu_count() or 1)
+
+# Files modified this recently aren't cached: a change in the same clock tick
+# as the hash wouldn't change the modification time
+HASH_SETTLE_SECONDS = 2.0
+
+# Most paths looked up in one query
+LOOKUP_BATCH = 500
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS hashes (
+    path TEXT NOT NULL,
+    algorithm TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    file_id TEXT NOT NULL,
+    hash TEXT NOT NULL,
+    hashed_at REAL NOT NULL,
+    PRIMARY KEY (path, algorithm)
+);
+"""
+
+# Type definitions for better type hinting
+FileKey = Tuple[int, int, str]
+
+def new_hasher() -> Any:
+    """
+    Create a hash object for HASH_ALGORITHM.
+    
+    Returns:
+        Any: The hash object, with update and hexdigest.
+    """
+    if xxhash is not None:
+        return xxhash.xxh3_128()
+    return hashlib.blake2b(digest_size=32)
+
+class HashingReader(io.BufferedReader):
+    """
+    A file opened for reading that hashes what is read from it, so a file
+    can be hashed while it's being archived instead of in a pass of its own.
+    """
+    
+    def __init__(self, path: str):
+        """
+        Open a file for reading.
+        
+        Args:
+            path (str): The file path.
+        
+        Raises:
+            OSError: If the file can't be opened.
+        """
+        super().__init__(io.FileIO(path, "rb"), buffer_size=HASH_READ_SIZE)
+        self.hasher = new_hasher()
+    
+    def read(self, size: Optional[int] = -1) -> bytes:
+        """
+        Read from the file, adding the data to the hash.
+        
+        Args:
+            size (Optional[int], optional): The most bytes to read. Defaults
+                to -1 (the rest of the file).
+        
+        Returns:
+            bytes: The data read.
+        """
+        data = super().read(size)
+        self.hasher.update(data)
+        return data
+    
+    def hexdigest(self) -> str:
+        """
+        Get the hash of what was read so far.
+        
+        Returns:
+            str: The hash in hex.
+        """
+        return self.hasher.hexdigest()
+
+def _file_key(st: os.stat_result) -> FileKey:
+    """
+    Get what identifies a version of a file: its size, mtime and file ID.
+    
+    Args:
+        st (os.stat_result): The file's stat result.
+    
+    Returns:
+        FileKey: The size, the mtime in nanoseconds and the device and
+            inode (the file index on Windows).
+    """
+    return st.st_size, st.st_mtime_ns, f"{st.st_dev}:{st.st_ino}"
+
+def hash_file(path: str) -> Tuple[str, os.stat_result]:
+    """
+    Hash a file.
+    
+    Args:
+        path (str): The file path.
+    
+    Returns:
+        Tuple[str, os.stat_result]: The hash in hex, and the file's stat
+            result from when it was opened.
+    
+    Raises:
+        OSError: If the file can't be read.
+    """
+    hasher = new_hasher()
+    with open(path, "rb") as f:
+        st = os.fstat(f.fileno())
+        if st.st_size == 0:
+            return hasher.hexdigest(), st
+        
+        try:
+            mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Some files can't be mapped (e.g. on some network shares)
+            for data in iter(lambda: f.read(HASH_READ_SIZE), b""):
+                hasher.update(data)
+            return hasher.hexdigest(), st
+        
+        with mapped, memoryview(mapped) as view:
+            for offset in range(0, len(view), HASH_READ_SIZE):
+                hasher.update(view[offset:offset + HASH_READ_SIZE])
+    return hasher.hexdigest(), st
+
+def _hash_many(paths: List[str], max_workers: Optional[int] = None,
+               reporter: Optional[ProgressTracker] = None) -> Dict[str, Optional[Tuple[str, os.stat_result]]]:
+    """
+    Hash files on a thread pool.
+    
+    Args:
+        paths (List[str]): The file paths.
+        max_workers (Optional[int], optional): The most files to hash at
+            once. If None, uses HASH_WORKERS. Defaults to None.
+        reporter (Optional[ProgressTracker], optional): Advanced for each
+            file hashed. Defaults to None.
+    
+    Returns:
+        Dict[str, Optional[Tuple[str, os.stat_result]]]: The result of
+            hash_file for each file, or None if it can't be read.
+    """
+    def hash_one(path: str) -> Optional[Tuple[str, os.stat_result]]:
+        try:
+            return hash_file(path)
+        except OSError as e:
+            logger.error(f"Error hashing {path}: {e}")
+            return None
+    
+    if not paths:
+        return {}
+    results = {}
+    workers = max(1, min(max_workers or HASH_WORKERS, len(paths)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for path, outcome in zip(paths, executor.map(hash_one, paths)):
+            results[path] = outcome
+            if reporter is not None:
+                reporter.advance(outcome[1].st_size if outcome else 0, path)
+    return results
+
+def hash_paths(paths: List[str], max_workers: Optional[int] = None) -> Dict[str, Optional[str]]:
+    """
+    Hash files on a thread pool, without the cache.
+    
+    Args:
+        paths (List[str]): The file paths.
+        max_workers (Optional[int], optional): The most files to hash at
+            once. If None, uses HASH_WORKERS. Defaults to None.
+    
+    Returns:
+        Dict[str, Optional[str]]: The hash of each file in hex, or None if
+            it can't be read.
+    """
+    return {path: outcome[0] if outcome else None for path, outcome in _hash_many(paths, max_workers).items()}
+
+class HashCache:
+    """
+    File hashes stored in SQLite.
+    
+    A cached hash is used while the file's size, mtime and file ID are the
+    same as when it was hashed. Several processes can share the cache.
+    Connections are kept per thread.
+    """
+    
+    def __init__(self, db_path: str):
+        """
+        Open (and if needed create) a hash cache.
+        
+        Args:
+            db_path (str): The path to the SQLite database file.
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get the connection for the current thread.
+        
+        Returns:
+            sqlite3.Connection: The database connection.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def _lookup(self, keys: Dict[str, FileKey]) -> Dict[str, str]:
+        """
+        Get the cached hashes of files that haven't changed.
+        
+        Args:
+            keys (Dict[str, FileKey]): The current key of each file, by path.
+        
+        Returns:
+            Dict[str, str]: The hashes found, by path.
+        """
+        found = {}
+        paths = list(keys)
+        conn = self._connect()
+        for start in range(0, len(paths), LOOKUP_BATCH):
+            batch = paths[start:start + LOOKUP_BATCH]
+            rows = conn.execute(
+                f"SELECT path, size, mtime_ns, file_id, hash FROM hashes "
+                f"WHERE algorithm = ? AND path IN ({','.join('?' * len(batch))})",
+                [HASH_ALGORITHM, *batch],
+            )
+            for path, size, mtime_ns, file_id, file_hash in rows:
+                if keys[path] == (size, mtime_ns, file_id):
+                    found[path] = file_hash
+        return found
+    
+    def _store(self, hashed: List[Tuple[str, FileKey, str]]) -> None:
+        """
+        Cache the hashes of files.
+        
+        Args:
+            hashed (List[Tuple[str, FileKey, str]]): The path, key and hash of each file.
+        """
+        now = time.time()
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO hashes (path, algorithm, size, mtime_ns, file_id, hash, hashed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [(path, HASH_ALGORITHM, *key, file_hash, now) for path, key, file_hash in hashed],
+            )
+    
+    def remember(self, hashed: List[Tuple[str, os.stat_result, str]]) -> None:
+        """
+        Cache the hashes of files that were hashed elsewhere, such as while
+        they were archived. Files modified in the last HASH_SETTLE_SECONDS
+        aren't cached.
+        
+        Args:
+            hashed (List[Tuple[str, os.stat_result, str]]): The path of each
+                file, its stat result from before it was read, and its hash.
+        """
+        settled = time.time() - HASH_SETTLE_SECONDS
+        entries = [(path, _file_key(st), file_hash) for path, st, file_hash in hashed
+                   if st.st_mtime_ns / 1e9 < settled]
+        if not entries:
+            return
+        try:
+            self._store(entries)
+        except sqlite3.Error as e:
+            logger.error(f"Error writing hash cache: {e}")
+    
+    def cached_hashes(self, paths: List[str]) -> Dict[str, str]:
+        """
+        Get the cached hashes of files that haven't changed since they were
+        hashed, without reading any file.
+        
+        Args:
+            paths (List[str]): The file paths.
+        
+        Returns:
+            Dict[str, str]: The hashes found, by path.
+        """
+        keys: Dict[str, FileKey] = {}
+        for path in paths:
+            try:
+                keys[path] = _file_key(os.stat(path))
+            except OSError:
+                pass
+        try:
+            return self._lookup(keys)
+        except sqlite3.Error as e:
+            logger.error(f"Error reading hash cache: {e}")
+            return {}
+    
+    def hash_files(self, paths: List[str], max_workers: Optional[int] = None,
+                   reporter: Optional[ProgressTracker] = None) -> Dict[str, Optional[str]]:
+        """
+        Get the hashes of files, reading only the ones that changed since
+        they were last hashed.
+        
+        Args:
+            paths (List[str]): The file paths.
+            max_workers (Optional[int], optional): The most files to hash at
+                once. If None, uses HASH_WORKERS. Defaults to None.
+            reporter (Optional[ProgressTracker], optional): Advanced for each
+                file, cached or hashed. Defaults to None.
+        
+        Returns:
+            Dict[str, Optional[str]]: The hash of each file in hex, or None if
+                it can't be read.
+        """
+        hashes: Dict[str, Optional[str]] = {}
+        keys: Dict[str, FileKey] = {}
+        for path in paths:
+            try:
+                keys[path] = _file_key(os.stat(path))
+            except OSError:
+                hashes[path] = None
+        
+        try:
+            hashes.update(self._lookup(keys))
+        except sqlite3.Error as e:
+            logger.error(f"Error reading hash cache: {e}")
+        
+        missing = [path for path in keys if path not in hashes]
+        if reporter is not None:
+            reporter.advance(sum(keys[path][0] for path in keys if path in hashes),
+                             files=len(paths) - len(missing))
+        if not missing:
+            return hashes
+        
+        settled = time.time() - HASH_SETTLE_SECONDS
+        hashed = []
+        for path, outcome in _hash_many(missing, max_workers, reporter).items():
+            if outcome is None:
+                hashes[path] = None
+                continue
+            file_hash, st = outcome
+            hashes[path] = file_hash
+            key = _file_key(st)
+            # Only cache a hash if the file didn't change while it was read
+            if key == keys[path] and st.st_mtime_ns / 1e9 < settled:
+                hashed.append((path, key, file_hash))
+        
+        if hashed:
+            try:
+                self._store(hashed)
+            except sqlite3.Error as e:
+                logger.error(f"Error writing hash cache: {e}")
+        
+        logger.debug(f"Hashed {len(missing)} of {len(paths)} files, {len(paths) - len(missing)} from cache")
+        return hashes
+    
+    def hash(self, path: str) -> Optional[str]:
+        """
+        Get the hash of a file, reading it only if it changed since it was
+        last hashed.
+        
+        Args:
+            path (str): The file path.
+        
+        Returns:
+            Optional[str]: The hash in hex, or None if it can't be read.
+        """
+        return self.hash_files([path]).get(path)
+
+def get_hash_cache(backup_location: str) -> HashCache:
+    """
+    Get the hash cache of a backup location.
+    
+    Args:
+        backup_location (str): The backup location.
+    
+    Returns:
+        HashCache: The hash cache.
+    """
+    return HashCache(os.path.join(backup_location, HASH_CACHE_FILENAME))
@@ -0,0 +1,634 @@
+"""
+ReformatBackup - Background Jobs
+
+This module runs backups and restores as background jobs. Each job is
+recorded in a small SQLite store, so its state and progress can be polled
+or streamed by ID and survive a page reload, and the work itself runs on a
+process pool outside the HTTP request.
+"""
+
+import os
+import sys
+import json
+import time
+import uuid
+import sqlite3
+import logging
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Dict, List, Any, Optional
+
+from reformatbackup.src.config import get_jobs_db_path
+from reformatbackup.src.progress import ProgressTracker, ProgressInfo
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Type definitions for better type hinting
+JobInfo = Dict[str, Any]
+
+# Job states; the last three are final
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+JOB_CANCELLED = "cancelled"
+FINAL_STATES = [JOB_SUCCEEDED, JOB_FAILED, JOB_CANCELLED]
+
+# Most finished jobs kept in the store
+JOB_HISTORY_LIMIT = 200
+
+# How often a running job writes its progress and checks for cancellation, in seconds
+REPORT_INTERVAL = 0.5
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    kind TEXT NOT NULL,
+    batch_id TEXT,
+    app_id TEXT,
+    app_name TEXT,
+    state TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL,
+    phase TEXT,
+    files_done INTEGER NOT NULL DEFAULT 0,
+    files_total INTEGER,
+    bytes_done INTEGER NOT NULL DEFAULT 0,
+    bytes_total INTEGER,
+    current_file TEXT,
+    rate REAL,
+    eta REAL,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    result TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_created ON jobs (created_at);
+CREATE INDEX IF NOT EXISTS idx_jobs_state ON jobs (state);
+"""
+
+# Columns added after the first version of the schema, with their types
+ADDED_COLUMNS = {
+    "phase": "TEXT",
+    "files_total": "INTEGER",
+    "current_file": "TEXT",
+    "rate": "REAL",
+    "eta": "REAL",
+}
+
+# Job fields that can be changed with JobStore.update
+UPDATE_FIELDS = ["state", "started_at", "finished_at", "phase", "files_done", "files_total",
+                 "bytes_done", "bytes_total", "current_file", "rate", "eta", "error", "result"]
+
+class JobStore:
+    """
+    Background jobs stored in SQLite.
+    
+    The store is shared by the web server and the backup worker processes,
+    which write their progress to it. Connections are kept per thread.
+    """
+    
+    def __init__(self, db_path: str):
+        """
+        Open (and if needed create) a job store.
+        
+        Args:
+            db_path (str): The path to the SQLite database file.
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, column_type in ADDED_COLUMNS.items():
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {column_type}")
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get the connection for the current thread.
+        
+        Returns:
+            sqlite3.Connection: The database connection.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+    
+    def _to_job(self, row: sqlite3.Row) -> JobInfo:
+        """
+        Convert a database row to a job dictionary.
+        
+        Args:
+            row (sqlite3.Row): The row.
+        
+        Returns:
+            JobInfo: The job.
+        """
+        job = dict(row)
+        job["cancel_requested"] = bool(job["cancel_requested"])
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+    
+    def create(self, kind: str, app_id: Optional[str] = None, app_name: Optional[str] = None,
+               batch_id: Optional[str] = None, bytes_total: Optional[int] = None) -> JobInfo:
+        """
+        Record a new queued job, dropping the oldest finished jobs beyond
+        JOB_HISTORY_LIMIT.
+        
+        Args:
+            kind (str): The kind of job (e.g., "backup").
+            app_id (Optional[str], optional): The application the job is for. Defaults to None.
+            app_name (Optional[str], optional): The application's name. Defaults to None.
+            batch_id (Optional[str], optional): Groups jobs submitted together. Defaults to None.
+            bytes_total (Optional[int], optional): The expected number of bytes
+                to process, if known. Defaults to None.
+        
+        Returns:
+            JobInfo: The new job.
+        """
+        job_id = uuid.uuid4().hex
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, kind, batch_id, app_id, app_name, state, created_at, bytes_total) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, batch_id, app_id, app_name, JOB_QUEUED, time.time(), bytes_total),
+            )
+            conn.execute(
+                "DELETE FROM jobs WHERE id IN (SELECT id FROM jobs WHERE state IN (?, ?, ?) "
+                "ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+                (*FINAL_STATES, JOB_HISTORY_LIMIT),
+            )
+        return self.get(job_id)
+    
+    def get(self, job_id: str) -> Optional[JobInfo]:
+        """
+        Get a job.
+        
+        Args:
+            job_id (str): The job ID.
+        
+        Returns:
+            Optional[JobInfo]: The job, or None if it doesn't exist.
+        """
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_job(row) if row is not None else None
+    
+    def list(self, limit: int = 50, active_only: bool = False,
+             job_ids: Optional[List[str]] = None) -> List[JobInfo]:
+        """
+        List jobs, newest first.
+        
+        Args:
+            limit (int, optional): The most jobs to return. Defaults to 50.
+            active_only (bool, optional): Whether to leave out finished jobs. Defaults to False.
+            job_ids (Optional[List[str]], optional): Only return these jobs. Defaults to None.
+        
+        Returns:
+            List[JobInfo]: The jobs.
+        """
+        query = "SELECT * FROM jobs WHERE 1 = 1"
+        params: List[Any] = []
+        if active_only:
+            query += " AND state NOT IN (?, ?, ?)"
+            params.extend(FINAL_STATES)
+        if job_ids is not None:
+            query += f" AND id IN ({', '.join('?' for _ in job_ids)})"
+            params.extend(job_ids)
+        query += " ORDER BY created_at DESC, rowid DESC LIMIT ?"
+        params.append(limit)
+        
+        return [self._to_job(row) for row in self._connect().execute(query, params)]
+    
+    def update(self, job_id: str, **fields: Any) -> None:
+        """
+        Change fields of a job.
+        
+        Args:
+            job_id (str): The job ID.
+            **fields (Any): The fields to change, from UPDATE_FIELDS.
+        """
+        fields = {key: value for key, value in fields.items() if key in UPDATE_FIELDS}
+        if "result" in fields and fields["result"] is not None:
+            fields["result"] = json.dumps(fields["result"])
+        if not fields:
+            return
+        
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        with self._connect() as conn:
+            conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+    
+    def request_cancel(self, job_id: str) -> bool:
+        """
+        Ask a job to stop.
+        
+        Args:
+            job_id (str): The job ID.
+        
+        Returns:
+            bool: True if the job exists and hasn't finished.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET cancel_requested = 1 WHERE id = ? AND state NOT IN (?, ?, ?)",
+                (job_id, *FINAL_STATES),
+            )
+        return cursor.rowcount > 0
+    
+    def is_cancel_requested(self, job_id: str) -> bool:
+        """
+        Check whether a job was asked to stop.
+        
+        Args:
+            job_id (str): The job ID.
+        
+        Returns:
+            bool: True if cancellation was requested.
+        """
+        row = self._connect().execute("SELECT cancel_requested FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return bool(row and row["cancel_requested"])
+    
+    def fail_unfinished(self, error: str) -> int:
+        """
+        Mark every job that hasn't finished as failed, such as jobs left
+        over from a previous run of the server.
+        
+        Args:
+            error (str): The error to record.
+        
+        Returns:
+            int: The number of jobs marked as failed.
+        """
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET state = ?, error = ?, finished_at = ? WHERE state NOT IN (?, ?, ?)",
+                (JOB_FAILED, error, time.time(), *FINAL_STATES),
+            )
+        return cursor.rowcount
+
+class JobReporter(ProgressTracker):
+    """
+    Reports the progress of a running job to the job store.
+    
+    Progress is written, and cancellation checked, at most every
+    REPORT_INTERVAL seconds, so reporting after each file stays cheap. A
+    reporter can be sent to a worker process; it opens its own connection.
+    """
+    
+    def __init__(self, db_path: str, job_id: str, interval: float = REPORT_INTERVAL):
+        """
+        Create a reporter for a job.
+        
+        Args:
+            db_path (str): The path to the job store.
+            job_id (str): The job ID.
+            interval (float, optional): The least time between writes, in
+                seconds. Defaults to REPORT_INTERVAL.
+        """
+        super().__init__(self._write, interval)
+        self.db_path = db_path
+        self.job_id = job_id
+        self._store: Optional[JobStore] = None
+        self._last_check = 0.0
+        self._cancelled = False
+    
+    def __getstate__(self) -> Dict[str, Any]:
+        # Connections can't be sent to another process
+        return {"db_path": self.db_path, "job_id": self.job_id, "interval": self.interval}
+    
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["db_path"], state["job_id"], state["interval"])
+    
+    @property
+    def store(self) -> JobStore:
+        """
+        The job store, opened on first use.
+        """
+        if self._store is None:
+            self._store = JobStore(self.db_path)
+        return self._store
+    
+    def _write(self, progress: ProgressInfo) -> None:
+        """
+        Write a progress snapshot to the job.
+        
+        Args:
+            progress (ProgressInfo): The snapshot.
+        """
+        try:
+            self.store.update(self.job_id, **progress)
+        except sqlite3.Error as e:
+            logger.error(f"Error recording progress of job {self.job_id}: {e}")
+    
+    def is_cancelled(self) -> bool:
+        """
+        Check whether the job was asked to stop.
+        
+        Returns:
+            bool: True if cancellation was requested.
+        """
+        now = time.monotonic()
+        if not self._cancelled and now - self._last_check >= self.interval:
+            self._last_check = now
+            try:
+                self._cancelled = self.store.is_cancel_requested(self.job_id)
+            except sqlite3.Error as e:
+                logger.error(f"Error checking cancellation of job {self.job_id}: {e}")
+        return self._cancelled
+
+def _run_backup_job(db_path: str, job_id: str, task: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run a backup job in a worker process.
+    
+    Old backups of the application are cleaned up here too once a new
+    backup is written, so a slow cleanup doesn't hold up recording the
+    results of other jobs.
+    
+    Args:
+        db_path (str): The path to the job store.
+        job_id (str): The job ID.
+        task (Dict[str, Any]): The keyword arguments of write_backup.
+    
+    Returns:
+        Dict[str, Any]: The result of write_backup.
+    """
+    from reformatbackup.src.backup import cleanup_old_backups, write_backup
+    from reformatbackup.src.config import get_max_backups_per_app
+    
+    reporter = JobReporter(db_path, job_id)
+    if reporter.is_cancelled():
+        return {"success": False, "cancelled": True, "error": "Backup cancelled"}
+    
+    reporter.store.update(job_id, state=JOB_RUNNING, started_at=time.time())
+    result = write_backup(**task, reporter=reporter)
+    
+    if result.get("success") and not result.get("unchanged"):
+        app_id = task["app"]["id"]
+        try:
+            cleanup_old_backups(app_id, get_max_backups_per_app())
+        except Exception as e:
+            logger.error(f"Error cleaning up old backups of {app_id}: {e}")
+    
+    return result
+
+def _run_restore_job(db_path: str, job_id: str, options: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run a restore job in a worker process.
+    
+    Args:
+        db_path (str): The path to the job store.
+        job_id (str): The job ID.
+        options (Dict[str, Any]): The keyword arguments of restore_backup.
+    
+    Returns:
+        Dict[str, Any]: The result of restore_backup.
+    """
+    from reformatbackup.src.restore import restore_backup
+    
+    reporter = JobReporter(db_path, job_id)
+    if reporter.is_cancelled():
+        return {"success": False, "cancelled": True, "error": "Restore cancelled"}
+    
+    reporter.store.update(job_id, state=JOB_RUNNING, started_at=time.time())
+    return restore_backup(**options, reporter=reporter)
+
+class JobQueue:
+    """
+    Runs backups and restores as jobs on a process pool.
+    
+    The pool is started with the first job. Jobs left unfinished by a
+    previous run of the server are marked as failed when the queue first
+    opens the store.
+    """
+    
+    def __init__(self, db_path: Optional[str] = None):
+        """
+        Create a job queue. Nothing is opened until it's used.
+        
+        Args:
+            db_path (Optional[str], optional): The path to the job store.
+                Defaults to None (get_jobs_db_path()).
+        """
+        self._db_path = db_path
+        self._lock = threading.Lock()
+        self._store: Optional[JobStore] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._futures: Dict[str, Future] = {}
+    
+    @property
+    def store(self) -> JobStore:
+        """
+        The job store, opened on first use.
+        """
+        with self._lock:
+            if self._store is None:
+                self._store = JobStore(self._db_path or get_jobs_db_path())
+                interrupted = self._store.fail_unfinished("Interrupted because the server stopped")
+                if interrupted:
+                    logger.warning(f"Marked {interrupted} unfinished jobs from a previous run as failed")
+            return self._store
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """
+        Get the process pool, starting it if needed.
+        
+        Returns:
+            ProcessPoolExecutor: The pool.
+        """
+        from reformatbackup.src.backup_executor import get_backup_workers
+        
+        with self._lock:
+            if self._executor is None:
+                workers = get_backup_workers(sys.maxsize)
+                self._executor = ProcessPoolExecutor(max_workers=workers)
+                logger.info(f"Started backup job pool with {workers} worker processes")
+            return self._executor
+    
+    def submit_backups(self, app_ids: List[str], notes: str = "", force: bool = False) -> List[JobInfo]:
+        """
+        Queue a backup job for each application.
+        
+        The backups are planned together, as by backup_apps, so no directory
+        is archived twice. Applications that can't be backed up get a job
+        that has already failed.
+        
+        Args:
+            app_ids (List[str]): The IDs of the applications to back up.
+            notes (str, optional): Notes to add to each backup's metadata. Defaults to "".
+            force (bool, optional): Whether to back up applications even if
+                nothing changed since their latest backup. Defaults to False.
+        
+        Returns:
+            List[JobInfo]: The job of each application, in the order requested.
+        """
+        from reformatbackup.src.backup import plan_backups
+        
+        store = self.store
+        failed, tasks = plan_backups(app_ids, notes, force)
+        batch_id = uuid.uuid4().hex
+        jobs: Dict[str, JobInfo] = {}
+        
+        for app_id in dict.fromkeys(app_ids):
+            if app_id in failed:
+                job = store.create("backup", app_id, app_id, batch_id)
+                store.update(job["id"], state=JOB_FAILED, finished_at=time.time(),
+                             error=failed[app_id]["error"], result=failed[app_id])
+                jobs[app_id] = store.get(job["id"])
+                continue
+            
+            app = tasks[app_id]["app"]
+            jobs[app_id] = store.create("backup", app_id, app.get("name", app_id), batch_id,
+                                        bytes_total=app.get("size"))
+        
+        for app_id, task in tasks.items():
+            self._submit(jobs[app_id], _run_backup_job, task)
+        
+        logger.info(f"Queued {len(tasks)} backup jobs")
+        return [store.get(jobs[app_id]["id"]) for app_id in app_ids]
+    
+    def submit_restore(self, app_id: str, backup_id: str, **options: Any) -> JobInfo:
+        """
+        Queue a restore job.
+        
+        Args:
+            app_id (str): The ID of the application to restore.
+            backup_id (str): The ID of the backup to restore.
+            **options (Any): Other keyword arguments of restore_backup.
+        
+        Returns:
+            JobInfo: The job.
+        """
+        from reformatbackup.src.scan import find_app
+        
+        app = find_app(app_id)
+        job = self.store.create("restore", app_id, app.get("name", app_id) if app else app_id)
+        self._submit(job, _run_restore_job, dict(options, app_id=app_id, backup_id=backup_id))
+        logger.info(f"Queued restore of {backup_id}")
+        return self.store.get(job["id"])
+    
+    def _submit(self, job: JobInfo, func: Callable[[str, str, Dict[str, Any]], Dict[str, Any]],
+                arguments: Dict[str, Any]) -> None:
+        """
+        Run a job on the process pool.
+        
+        Args:
+            job (JobInfo): The queued job.
+            func (Callable[[str, str, Dict[str, Any]], Dict[str, Any]]): The
+                function that runs the job, given the job store path, job ID
+                and arguments.
+            arguments (Dict[str, Any]): The arguments of the job.
+        """
+        try:
+            future = self._get_executor().submit(func, self.store.db_path, job["id"], arguments)
+        except Exception as e:
+            logger.error(f"Error queueing {job['kind']} of {job['app_id']}: {e}")
+            self.store.update(job["id"], state=JOB_FAILED, finished_at=time.time(), error=str(e))
+            return
+        
+        with self._lock:
+            self._futures[job["id"]] = future
+        future.add_done_callback(lambda future: self._on_done(job, future))
+    
+    def _on_done(self, job: JobInfo, future: Future) -> None:
+        """
+        Record the result of a finished job.
+        
+        Args:
+            job (JobInfo): The job, as queued.
+            future (Future): The finished job.
+        """
+        job_id = job["id"]
+        
+        with self._lock:
+            self._futures.pop(job_id, None)
+        
+        try:
+            if future.cancelled():
+                result = {"success": False, "cancelled": True, "error": "Cancelled"}
+            else:
+                try:
+                    result = future.result()
+                except Exception as e:
+                    logger.error(f"Error in {job['kind']} job {job_id}: {e}")
+                    result = {"success": False, "error": f"Worker process failed: {e}"}
+            
+            if result.get("success"):
+                state = JOB_SUCCEEDED
+            else:
+                state = JOB_CANCELLED if result.get("cancelled") else JOB_FAILED
+            
+            self.store.update(job_id, state=state, finished_at=time.time(),
+                              error=result.get("error"), result=result)
+        except Exception as e:
+            logger.error(f"Error recording result of job {job_id}: {e}")
+    
+    def cancel(self, job_id: str) -> bool:
+        """
+        Cancel a job. A queued job is dropped. A running backup stops after
+        the file it's archiving and its partial archive is removed; a running
+        restore stops if it's still extracting, before any file is replaced.
+        
+        Args:
+            job_id (str): The job ID.
+        
+        Returns:
+            bool: True if the job was still queued or running.
+        """
+        if not self.store.request_cancel(job_id):
+            return False
+        
+        with self._lock:
+            future = self._futures.get(job_id)
+        if future is not None and future.cancel():
+            logger.info(f"Cancelled queued job {job_id}")
+        return True
+    
+    def get_job(self, job_id: str) -> Optional[JobInfo]:
+        """
+        Get a job.
+        
+        Args:
+            job_id (str): The job ID.
+        
+        Returns:
+            Optional[JobInfo]: The job, or None if it doesn't exist.
+        """
+        return self.store.get(job_id)
+    
+    def list_jobs(self, limit: int = 50, active_only: bool = False,
+                  job_ids: Optional[List[str]] = None) -> List[JobInfo]:
+        """
+        List jobs, newest first.
+        
+        Args:
+            limit (int, optional): The most jobs to return. Defaults to 50.
+            active_only (bool, optional): Whether to leave out finished jobs. Defaults to False.
+            job_ids (Optional[List[str]], optional): Only return these jobs. Defaults to None.
+        
+        Returns:
+            List[JobInfo]: The jobs.
+        """
+        return self.store.list(limit, active_only, job_ids)
+    
+    def shutdown(self, wait: bool = True) -> None:
+        """
+        Stop the process pool. Queued jobs are cancelled.
+        
+        Args:
+            wait (bool, optional): Whether to wait for running jobs. Defaults to True.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=wait, cancel_futures=True)
+
+# Process-wide job queue
+job_queue = JobQueue()
@@ -0,0 +1,344 @@
+"""
+ReformatBackup - Game Library Scanning
+
+This module finds games installed through Steam, Epic Games and GOG Galaxy by
+reading the launchers' own manifests, which give exact install directories,
+names and sizes without walking the game folders.
+"""
+
+import os
+import re
+import glob
+import json
+import logging
+import threading
+from typing import Dict, List, Any, Optional
+
+from reformatbackup.src.config import get_game_scan_skip_drive_types
+from reformatbackup.src.drives import get_drive_for_path
+from reformatbackup.src.registry import HKCU, HKLM, RegistryBackend, get_registry_backend
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Type definitions for better type hinting
+AppInfo = Dict[str, Any]
+
+# Tokens of Valve's KeyValues (VDF/ACF) text format
+VDF_TOKEN = re.compile(r'"((?:\\.|[^"\\])*)"|([{}])|//[^\n]*')
+
+# Registry keys holding installed GOG games
+GOG_REGISTRY_KEYS = [
+    (HKLM, r"SOFTWARE\WOW6432Node\GOG.com\Games"),
+    (HKLM, r"SOFTWARE\GOG.com\Games"),
+]
+
+def parse_vdf(text: str) -> Dict[str, Any]:
+    """
+    Parse Valve's KeyValues text format, used by libraryfolders.vdf and
+    appmanifest_*.acf.
+    
+    Args:
+        text (str): The file contents.
+    
+    Returns:
+        Dict[str, Any]: The parsed keys, with nested sections as dictionaries.
+    """
+    root: Dict[str, Any] = {}
+    stack = [root]
+    key = None
+    
+    for match in VDF_TOKEN.finditer(text):
+        string, brace = match.groups()
+        if string is not None:
+            value = string.replace("\\\\", "\\").replace('\\"', '"')
+            if key is None:
+                key = value
+            else:
+                stack[-1][key] = value
+                key = None
+        elif brace == "{":
+            section: Dict[str, Any] = {}
+            stack[-1][key if key is not None else ""] = section
+            stack.append(section)
+            key = None
+        elif brace == "}" and len(stack) > 1:
+            stack.pop()
+            key = None
+    
+    return root
+
+def _read_text(path: str) -> Optional[str]:
+    """
+    Read a manifest file.
+    
+    Args:
+        path (str): The path to the file.
+    
+    Returns:
+        Optional[str]: The contents, or None if the file couldn't be read.
+    """
+    try:
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            return f.read()
+    except OSError as e:
+        logger.debug(f"Error reading manifest {path}: {e}")
+        return None
+
+def _is_skipped_drive(path: str) -> bool:
+    """
+    Check whether a library is on a drive that game scans should leave alone.
+    
+    Args:
+        path (str): The library path.
+    
+    Returns:
+        bool: True if the drive didn't respond to its probe or its type is in
+            the game_scan_skip_drive_types setting.
+    """
+    drive = get_drive_for_path(path)
+    if drive is None:
+        return False
+    return not drive["available"] or drive["type"] in get_game_scan_skip_drive_types()
+
+def _find_steam_dirs() -> List[str]:
+    """
+    Find the Steam installation directory.
+    
+    Returns:
+        List[str]: Candidate Steam directories that exist.
+    """
+    candidates = []
+    
+    backend = get_registry_backend()
+    if backend is not None:
+        for hive, path in [(HKCU, r"Software\Valve"), (HKLM, r"SOFTWARE\WOW6432Node\Valve")]:
+            try:
+                for name, values in backend.read_subkeys(hive, path):
+                    if name.lower() == "steam":
+                        candidates.append(values.get("steampath") or values.get("installpath"))
+            except OSError:
+                pass
+    
+    for env in ["ProgramFiles(x86)", "ProgramFiles"]:
+        if os.environ.get(env):
+            candidates.append(os.path.join(os.environ[env], "Steam"))
+    
+    steam_dirs = []
+    for candidate in candidates:
+        if candidate and os.path.isdir(candidate):
+            candidate = os.path.normpath(candidate)
+            if candidate not in steam_dirs:
+                steam_dirs.append(candidate)
+    
+    return steam_dirs
+
+def get_steam_libraries(steam_dirs: Optional[List[str]] = None) -> List[str]:
+    """
+    Get the Steam library folders listed in libraryfolders.vdf.
+    
+    Args:
+        steam_dirs (Optional[List[str]], optional): Steam installation
+            directories. Defaults to the ones found on this system.
+    
+    Returns:
+        List[str]: The library folders, each containing a steamapps directory.
+    """
+    if steam_dirs is None:
+        steam_dirs = _find_steam_dirs()
+    
+    libraries = []
+    for steam_dir in steam_dirs:
+        libraries.append(steam_dir)
+        
+        text = _read_text(os.path.join(steam_dir, "steamapps", "libraryfolders.vdf"))
+        if text is None:
+            continue
+        
+        folders = parse_vdf(text)
+        folders = folders.get("libraryfolders") or folders.get("LibraryFolders") or {}
+        for key, value in folders.items():
+            # Newer files nest the path in a section; older ones map numbers to paths
+            if isinstance(value, dict):
+                libraries.append(value.get("path", ""))
+            elif key.isdigit():
+                libraries.append(value)
+    
+    unique = []
+    for library in libraries:
+        library = os.path.normpath(library) if library else ""
+        if library and library not in unique:
+            unique.append(library)
+    
+    return unique
+
+def scan_steam(cancel_event: Optional[threading.Event] = None,
+               steam_dirs: Optional[List[str]] = None) -> List[AppInfo]:
+    """
+    Find games installed through Steam from their appmanifest_*.acf files.
+    
+    Args:
+        cancel_event (Optional[threading.Event], optional): Set to stop the scan early. Defaults to None.
+        steam_dirs (Optional[List[str]], optional): Steam installation
+            directories. Defaults to the ones found on this system.
+    
+    Returns:
+        List[AppInfo]: The games found, with their size on disk.
+    """
+    apps = []
+    
+    for library in get_steam_libraries(steam_dirs):
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        if _is_skipped_drive(library):
+            logger.info(f"Skipping Steam library on a skipped drive: {library}")
+            continue
+        
+        steamapps = os.path.join(library, "steamapps")
+        for manifest in sorted(glob.glob(os.path.join(glob.escape(steamapps), "appmanifest_*.acf"))):
+            text = _read_text(manifest)
+            if text is None:
+                continue
+            
+            state = parse_vdf(text).get("AppState", {})
+            appid = state.get("appid")
+            installdir = state.get("installdir")
+            if not appid or not installdir:
+                continue
+            
+            path = os.path.join(steamapps, "common", installdir)
+            if not os.path.isdir(path):
+                continue
+            
+            app = {
+                "id": f"steam-{appid}",
+                "name": state.get("name") or installdir,
+                "path": path,
+                "source": "steam",
+                "root": os.path.join(steamapps, "common"),
+                "publisher": "Steam",
+            }
+            if state.get("SizeOnDisk", "").isdigit():
+                app["size"] = int(state["SizeOnDisk"])
+            apps.append(app)
+    
+    return apps
+
+def _get_epic_manifest_dir() -> Optional[str]:
+    """
+    Get the directory holding the Epic Games Launcher's .item manifests.
+    
+    Returns:
+        Optional[str]: The directory, or None if ProgramData isn't set.
+    """
+    program_data = os.environ.get("ProgramData")
+    if not program_data:
+        return None
+    return os.path.join(program_data, "Epic", "EpicGamesLauncher", "Data", "Manifests")
+
+def scan_epic(cancel_event: Optional[threading.Event] = None,
+              manifest_dir: Optional[str] = None) -> List[AppInfo]:
+    """
+    Find games installed through the Epic Games Launcher from its .item manifests.
+    
+    Args:
+        cancel_event (Optional[threading.Event], optional): Set to stop the scan early. Defaults to None.
+        manifest_dir (Optional[str], optional): The manifest directory.
+            Defaults to the launcher's directory under ProgramData.
+    
+    Returns:
+        List[AppInfo]: The games found, with their install size.
+    """
+    apps = []
+    
+    if manifest_dir is None:
+        manifest_dir = _get_epic_manifest_dir()
+    if not manifest_dir or not os.path.isdir(manifest_dir):
+        return apps
+    
+    for manifest in sorted(glob.glob(os.path.join(glob.escape(manifest_dir), "*.item"))):
+        if cancel_event is not None and cancel_event.is_set():
+            break
+        
+        text = _read_text(manifest)
+        if text is None:
+            continue
+        try:
+            item = json.loads(text)
+        except ValueError as e:
+            logger.debug(f"Error parsing Epic manifest {manifest}: {e}")
+            continue
+        
+        path = item.get("InstallLocation")
+        if not path or item.get("bIsIncompleteInstall") or _is_skipped_drive(path) or not os.path.isdir(path):
+            continue
+        
+        app = {
+            "id": f"epic-{item.get('AppName') or item.get('CatalogItemId')}",
+            "name": item.get("DisplayName") or os.path.basename(path),
+            "path": path,
+            "source": "epic",
+            "root": os.path.dirname(path),
+            "publisher": "Epic Games",
+        }
+        if item.get("LaunchExecutable"):
+            app["executable"] = os.path.join(path, item["LaunchExecutable"])
+        if item.get("AppVersionString"):
+            app["version"] = item["AppVersionString"]
+        if isinstance(item.get("InstallSize"), int):
+            app["size"] = item["InstallSize"]
+        apps.append(app)
+    
+    return apps
+
+def scan_gog(cancel_event: Optional[threading.Event] = None,
+             backend: Optional[RegistryBackend] = None) -> List[AppInfo]:
+    """
+    Find games installed through GOG Galaxy from their registry entries.
+    
+    GOG doesn't record sizes, so these games are sized like other apps.
+    
+    Args:
+        cancel_event (Optional[threading.Event], optional): Set to stop the scan early. Defaults to None.
+        backend (Optional[RegistryBackend], optional): The registry backend.
+            Defaults to the system registry.
+    
+    Returns:
+        List[AppInfo]: The games found.
+    """
+    apps = []
+    seen = set()
+    
+    if backend is None:
+        backend = get_registry_backend()
+        if backend is None:
+            return apps
+    
+    for hive, key in GOG_REGISTRY_KEYS:
+        try:
+            subkeys = backend.read_subkeys(hive, key, cancel_event)
+        except OSError:
+            continue
+        
+        for name, values in subkeys:
+            game_id = values.get("gameid") or name
+            path = values.get("path")
+            if game_id in seen or not path or _is_skipped_drive(path) or not os.path.isdir(path):
+                continue
+            seen.add(game_id)
+            
+            app = {
+                "id": f"gog-{game_id}",
+                "name": values.get("gamename") or os.path.basename(path),
+                "path": path,
+                "source": "gog",
+                "root": os.path.dirname(path),
+                "publisher": "GOG.com",
+            }
+            if values.get("exe"):
+                app["executable"] = values["exe"]
+            if values.get("ver"):
+                app["version"] = values["ver"]
+            apps.append(app)
+    
+    return apps
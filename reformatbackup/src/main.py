@@ -71,6 +71,10 @@ def create_app(config_object: object = None) -> Flask:
     else:
         app.config.from_object(config_object)
     
+    # Register template filters
+    from reformatbackup.src.utils import format_timestamp
+    app.jinja_env.filters['format_timestamp'] = format_timestamp
+    
     # Register error handlers
     register_error_handlers(app)
     
@@ -0,0 +1,204 @@
+"""
+ReformatBackup - Path Ownership
+
+This module links scan entries that point at the same folder, such as a
+registry app with an InstallLocation and the file system entry for that
+folder, and records which application owns each directory. Sizing, drive
+totals and batch backups use this to handle each directory only once.
+"""
+
+import os
+import logging
+from typing import Dict, List, Any, Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Type definitions for better type hinting
+AppInfo = Dict[str, Any]
+
+# Sources in order of preference when several apps share a path. Sources not
+# listed (e.g., from plugin scanners) come after these.
+SOURCE_PRIORITY = [
+    "steam",
+    "epic",
+    "gog",
+    "registry",
+    "msstore",
+    "file_system",
+    "apppath",
+    "app_data",
+    "dot_file",
+]
+
+# Fields set by apply_ownership
+OWNERSHIP_FIELDS = ["alias_of", "aliases", "contained_in"]
+
+def normalize_path(path: str) -> str:
+    """
+    Normalize a path for comparison.
+    
+    Args:
+        path (str): The path to normalize.
+    
+    Returns:
+        str: The absolute, case-normalized path without a trailing separator.
+    """
+    return os.path.normcase(os.path.abspath(path))
+
+def is_within(path: str, parent: str) -> bool:
+    """
+    Check whether a normalized path is a parent directory or inside it.
+    
+    Args:
+        path (str): The normalized path.
+        parent (str): The normalized parent directory.
+    
+    Returns:
+        bool: True if path equals parent or is nested under it.
+    """
+    if path == parent:
+        return True
+    prefix = parent if parent.endswith(os.sep) else parent + os.sep
+    return path.startswith(prefix)
+
+def _find_ancestor(path: str, owners: Dict[str, str]) -> Optional[str]:
+    """
+    Find the closest owned directory above a path.
+    
+    Args:
+        path (str): The normalized path.
+        owners (Dict[str, str]): Owned normalized paths and their owner IDs.
+    
+    Returns:
+        Optional[str]: The normalized path of the closest owned ancestor, or None.
+    """
+    current = path
+    while True:
+        parent = os.path.dirname(current)
+        if parent == current:
+            return None
+        if parent in owners:
+            return parent
+        current = parent
+
+def _priority(app: AppInfo) -> int:
+    """
+    Get the preference of an application's source when picking a path owner.
+    
+    Args:
+        app (AppInfo): The application.
+    
+    Returns:
+        int: Lower values are preferred.
+    """
+    source = app.get("source")
+    return SOURCE_PRIORITY.index(source) if source in SOURCE_PRIORITY else len(SOURCE_PRIORITY)
+
+def apply_ownership(apps: List[AppInfo]) -> Dict[str, int]:
+    """
+    Link applications that share or nest paths.
+    
+    Applications with the same path are grouped, and the one whose source
+    comes first in SOURCE_PRIORITY (the first reported on a tie) owns the
+    path: it gets "aliases", the IDs of the others, and each of the others
+    gets "alias_of", the owner's ID. An application whose path is inside
+    another owned path gets "contained_in", the ID of the closest owner above
+    it. Ownership fields left over from a previous scan are removed first.
+    
+    Args:
+        apps (List[AppInfo]): The applications found by the scan, updated in place.
+    
+    Returns:
+        Dict[str, int]: The number of "owners", "aliases" and "nested" apps.
+    """
+    groups: Dict[str, List[AppInfo]] = {}
+    
+    for app in apps:
+        for field in OWNERSHIP_FIELDS:
+            app.pop(field, None)
+        if app.get("path") and app.get("id"):
+            groups.setdefault(normalize_path(app["path"]), []).append(app)
+    
+    owners: Dict[str, str] = {}
+    aliases = 0
+    
+    for path, group in groups.items():
+        owner = min(group, key=_priority)
+        owners[path] = owner["id"]
+        
+        others = [app for app in group if app is not owner]
+        if others:
+            owner["aliases"] = [app["id"] for app in others]
+            for app in others:
+                app["alias_of"] = owner["id"]
+            aliases += len(others)
+    
+    nested = 0
+    for path, group in groups.items():
+        ancestor = _find_ancestor(path, owners)
+        if ancestor is not None:
+            for app in group:
+                app["contained_in"] = owners[ancestor]
+            nested += len(group)
+    
+    logger.info(f"Path ownership: {len(owners)} owned paths, {aliases} aliases, {nested} nested apps")
+    return {"owners": len(owners), "aliases": aliases, "nested": nested}
+
+def copy_alias_sizes(apps: List[AppInfo]) -> None:
+    """
+    Give each alias the size of the application that owns its path.
+    
+    Args:
+        apps (List[AppInfo]): The applications, updated in place.
+    """
+    by_id = {app["id"]: app for app in apps if app.get("id") and not app.get("alias_of")}
+    
+    for app in apps:
+        owner = by_id.get(app.get("alias_of"))
+        if owner is None:
+            continue
+        for field in ["size", "sized_at", "size_pending"]:
+            if field in owner:
+                app[field] = owner[field]
+            else:
+                app.pop(field, None)
+
+def is_counted(app: AppInfo) -> bool:
+    """
+    Check whether an application's size should count towards totals.
+    
+    Aliases and applications nested inside another application's folder are
+    already included in their owner's size.
+    
+    Args:
+        app (AppInfo): The application.
+    
+    Returns:
+        bool: True if the size is not already counted elsewhere.
+    """
+    return not app.get("alias_of") and not app.get("contained_in")
+
+def collapse_paths(paths: List[str]) -> List[str]:
+    """
+    Remove duplicate paths and paths inside other paths in the list.
+    
+    Args:
+        paths (List[str]): The paths.
+    
+    Returns:
+        List[str]: The remaining paths, in their original order.
+    """
+    normalized = [normalize_path(path) for path in paths]
+    kept = []
+    seen = set()
+    
+    for path, norm in zip(paths, normalized):
+        if norm in seen:
+            continue
+        if any(other != norm and is_within(norm, other) for other in normalized):
+            continue
+        seen.add(norm)
+        kept.append(path)
+    
+    return kept
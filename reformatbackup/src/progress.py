@@ -0,0 +1,190 @@
+"""
+ReformatBackup - Progress Tracking
+
+This module tracks the progress of long-running file operations such as
+backups and restores: files and bytes done, the current file, throughput
+and an estimated time remaining. Snapshots are emitted at a limited rate,
+so tracking can be called for every file without slowing the loop down.
+"""
+
+import time
+import logging
+from typing import Callable, Dict, Any, Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Least time between two emitted snapshots, in seconds
+PROGRESS_INTERVAL = 0.5
+
+# Weight of the latest measurement in the smoothed throughput
+RATE_SMOOTHING = 0.3
+
+# Type definitions for better type hinting
+ProgressInfo = Dict[str, Any]
+
+class ProgressTracker:
+    """
+    Tracks the progress of a file operation.
+    
+    The operation may have several phases (e.g., extracting, then copying),
+    each with its own totals. advance is cheap: it updates counters, and a
+    snapshot is only built and emitted when the interval has passed.
+    """
+    
+    def __init__(self, emit: Optional[Callable[[ProgressInfo], None]] = None,
+                 interval: float = PROGRESS_INTERVAL):
+        """
+        Create a progress tracker.
+        
+        Args:
+            emit (Optional[Callable[[ProgressInfo], None]], optional): Called
+                with each snapshot. Defaults to None (snapshots are only
+                available from snapshot()).
+            interval (float, optional): The least time between emitted
+                snapshots, in seconds. Defaults to PROGRESS_INTERVAL.
+        """
+        self.emit = emit
+        self.interval = interval
+        self.phase: Optional[str] = None
+        self.files_done = 0
+        self.bytes_done = 0
+        self.files_total: Optional[int] = None
+        self.bytes_total: Optional[int] = None
+        self.current_file: Optional[str] = None
+        self.rate: Optional[float] = None
+        self._phase_start = time.monotonic()
+        self._last_emit = 0.0
+        self._rate_time = self._phase_start
+        self._rate_bytes = 0
+    
+    def start_phase(self, phase: str, files_total: Optional[int] = None,
+                    bytes_total: Optional[int] = None) -> None:
+        """
+        Start a phase, resetting the counters.
+        
+        Args:
+            phase (str): The phase name (e.g., "archiving").
+            files_total (Optional[int], optional): The number of files in the
+                phase, if known. Defaults to None.
+            bytes_total (Optional[int], optional): The number of bytes in the
+                phase, if known. Defaults to None.
+        """
+        self.phase = phase
+        self.files_done = 0
+        self.bytes_done = 0
+        self.files_total = files_total
+        self.bytes_total = bytes_total
+        self.current_file = None
+        self.rate = None
+        self._phase_start = self._rate_time = time.monotonic()
+        self._rate_bytes = 0
+        self._emit(force=True)
+    
+    def advance(self, nbytes: int, current_file: Optional[str] = None, files: int = 1) -> None:
+        """
+        Record processed files.
+        
+        Args:
+            nbytes (int): The number of bytes processed.
+            current_file (Optional[str], optional): The file being processed. Defaults to None.
+            files (int, optional): The number of files finished. Defaults to 1.
+        """
+        self.files_done += files
+        self.bytes_done += nbytes
+        if current_file is not None:
+            self.current_file = current_file
+        
+        if time.monotonic() - self._last_emit >= self.interval:
+            self._emit()
+    
+    def finish(self) -> None:
+        """
+        Emit the final counts of the current phase.
+        """
+        self._emit(force=True)
+    
+    def is_cancelled(self) -> bool:
+        """
+        Check whether the operation should stop. Subclasses tied to a
+        cancellable job override this.
+        
+        Returns:
+            bool: False.
+        """
+        return False
+    
+    def eta(self) -> Optional[float]:
+        """
+        Estimate the time left in the current phase.
+        
+        Returns:
+            Optional[float]: The seconds remaining, or None if the total or
+                the throughput isn't known yet.
+        """
+        if self.bytes_total is None or not self.rate:
+            return None
+        return max(0.0, (self.bytes_total - self.bytes_done) / self.rate)
+    
+    def snapshot(self) -> ProgressInfo:
+        """
+        Get the current progress.
+        
+        Returns:
+            ProgressInfo: The "phase", "files_done", "files_total",
+                "bytes_done", "bytes_total", "current_file", "rate" (bytes
+                per second), "eta" (seconds) and "elapsed" (seconds in the phase).
+        """
+        eta = self.eta()
+        return {
+            "phase": self.phase,
+            "files_done": self.files_done,
+            "files_total": self.files_total,
+            "bytes_done": self.bytes_done,
+            "bytes_total": self.bytes_total,
+            "current_file": self.current_file,
+            "rate": round(self.rate, 1) if self.rate is not None else None,
+            "eta": round(eta, 1) if eta is not None else None,
+            "elapsed": round(time.monotonic() - self._phase_start, 1),
+        }
+    
+    def _update_rate(self, now: float) -> None:
+        """
+        Fold the bytes processed since the last measurement into the
+        smoothed throughput.
+        
+        Args:
+            now (float): The current monotonic time.
+        """
+        elapsed = now - self._rate_time
+        if elapsed <= 0:
+            return
+        
+        current = (self.bytes_done - self._rate_bytes) / elapsed
+        if self.rate is None:
+            self.rate = current
+        else:
+            self.rate = RATE_SMOOTHING * current + (1 - RATE_SMOOTHING) * self.rate
+        self._rate_time = now
+        self._rate_bytes = self.bytes_done
+    
+    def _emit(self, force: bool = False) -> None:
+        """
+        Emit a snapshot.
+        
+        Args:
+            force (bool, optional): Whether to emit even if the last snapshot
+                was less than the interval ago. Defaults to False.
+        """
+        now = time.monotonic()
+        if not force and now - self._last_emit < self.interval:
+            return
+        if now - self._rate_time >= self.interval or (force and self.rate is None and self.bytes_done):
+            self._update_rate(now)
+        self._last_emit = now
+        
+        if self.emit is not None:
+            try:
+                self.emit(self.snapshot())
+            except Exception as e:
+                logger.error(f"Error reporting progress: {e}")
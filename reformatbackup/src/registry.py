@@ -0,0 +1,302 @@
+"""
+ReformatBackup - Registry Reading
+
+This module reads installed applications from the Windows registry. Registry
+access goes through a small backend interface, so the scan can run against an
+in-memory fake registry on other platforms for tests and benchmarks.
+"""
+
+import os
+import abc
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Any, Optional, Tuple
+
+if os.name == "nt":
+    import winreg
+else:
+    winreg = None
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Type definitions for better type hinting
+AppInfo = Dict[str, Any]
+RegistryValues = Dict[str, Any]
+
+# Registry hives, by name
+HKLM = "HKEY_LOCAL_MACHINE"
+HKCU = "HKEY_CURRENT_USER"
+
+# Registry keys to scan, with the kind of entries they hold
+REGISTRY_ROOTS = [
+    (HKLM, r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall", "uninstall"),
+    (HKLM, r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall", "uninstall"),
+    (HKCU, r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall", "uninstall"),
+    # Microsoft Store apps
+    (HKCU, r"SOFTWARE\Classes\Local Settings\Software\Microsoft\Windows\CurrentVersion\AppModel\Repository\Packages", "msstore"),
+    # Windows App Paths
+    (HKLM, r"SOFTWARE\Microsoft\Windows\CurrentVersion\App Paths", "apppath"),
+]
+
+# Uninstall values and the application fields they map to
+UNINSTALL_FIELDS = {
+    "installlocation": "path",
+    "uninstallstring": "uninstall",
+    "publisher": "publisher",
+    "displayversion": "version",
+    "installdate": "install_date",
+}
+
+class RegistryBackend(abc.ABC):
+    """
+    Read access to a registry.
+    
+    Backends read all subkeys of a key with their values in one pass, so the
+    scan costs one open and one value enumeration per subkey.
+    """
+    
+    @abc.abstractmethod
+    def read_subkeys(self, hive: str, path: str,
+                     cancel_event: Optional[threading.Event] = None) -> List[Tuple[str, RegistryValues]]:
+        """
+        Read the values of every subkey of a key.
+        
+        Args:
+            hive (str): The registry hive (HKLM or HKCU).
+            path (str): The path of the key within the hive.
+            cancel_event (Optional[threading.Event], optional): Set to stop early. Defaults to None.
+        
+        Returns:
+            List[Tuple[str, RegistryValues]]: The name of each subkey and its
+                values, keyed by lower-case value name. The default value is
+                keyed by "".
+        
+        Raises:
+            OSError: If the key can't be opened.
+        """
+
+class WinRegBackend(RegistryBackend):
+    """
+    The Windows registry, read through winreg.
+    """
+    
+    def read_subkeys(self, hive: str, path: str,
+                     cancel_event: Optional[threading.Event] = None) -> List[Tuple[str, RegistryValues]]:
+        subkeys = []
+        
+        with winreg.OpenKey(getattr(winreg, hive), path) as key:
+            for i in range(winreg.QueryInfoKey(key)[0]):
+                if cancel_event is not None and cancel_event.is_set():
+                    break
+                try:
+                    name = winreg.EnumKey(key, i)
+                    with winreg.OpenKey(key, name) as subkey:
+                        values = {}
+                        for j in range(winreg.QueryInfoKey(subkey)[1]):
+                            value_name, data, _ = winreg.EnumValue(subkey, j)
+                            values[value_name.lower()] = data
+                    subkeys.append((name, values))
+                except OSError as e:
+                    logger.debug(f"Error reading registry key {path}\\{i}: {e}")
+        
+        return subkeys
+
+class FakeRegistry(RegistryBackend):
+    """
+    An in-memory registry for tests and benchmarks.
+    """
+    
+    def __init__(self, latency: float = 0.0):
+        """
+        Create an empty fake registry.
+        
+        Args:
+            latency (float, optional): Seconds to sleep per subkey read, to
+                simulate a slow registry. Defaults to 0.0.
+        """
+        self.latency = latency
+        self.subkey_reads = 0
+        self._keys: Dict[Tuple[str, str], Dict[str, RegistryValues]] = {}
+        self._lock = threading.Lock()
+    
+    def add_key(self, hive: str, path: str, name: str, values: RegistryValues) -> None:
+        """
+        Add a subkey with its values.
+        
+        Args:
+            hive (str): The registry hive (HKLM or HKCU).
+            path (str): The path of the parent key within the hive.
+            name (str): The name of the subkey.
+            values (RegistryValues): The subkey's values.
+        """
+        self._keys.setdefault((hive, path.lower()), {})[name] = values
+    
+    def read_subkeys(self, hive: str, path: str,
+                     cancel_event: Optional[threading.Event] = None) -> List[Tuple[str, RegistryValues]]:
+        if (hive, path.lower()) not in self._keys:
+            raise FileNotFoundError(f"Registry key not found: {hive}\\{path}")
+        
+        subkeys = []
+        for name, values in self._keys[(hive, path.lower())].items():
+            if cancel_event is not None and cancel_event.is_set():
+                break
+            if self.latency:
+                time.sleep(self.latency)
+            with self._lock:
+                self.subkey_reads += 1
+            subkeys.append((name, {k.lower(): v for k, v in values.items()}))
+        
+        return subkeys
+
+def get_registry_backend() -> Optional[RegistryBackend]:
+    """
+    Get the backend for the system registry.
+    
+    Returns:
+        Optional[RegistryBackend]: The backend, or None if there is no registry
+            on this platform.
+    """
+    return WinRegBackend() if winreg is not None else None
+
+def _map_uninstall(name: str, values: RegistryValues) -> Optional[AppInfo]:
+    """
+    Map an Uninstall subkey to an application.
+    
+    Args:
+        name (str): The name of the subkey.
+        values (RegistryValues): The subkey's values.
+    
+    Returns:
+        Optional[AppInfo]: The application, or None if it has no display name.
+    """
+    display_name = values.get("displayname")
+    if not display_name:
+        return None
+    
+    app = {"id": name, "name": display_name, "source": "registry", "root": "registry"}
+    for value_name, field in UNINSTALL_FIELDS.items():
+        if value_name in values:
+            app[field] = values[value_name]
+    
+    return app
+
+def _map_package(name: str, values: RegistryValues) -> AppInfo:
+    """
+    Map a Microsoft Store package subkey to an application.
+    
+    Args:
+        name (str): The package's full name.
+        values (RegistryValues): The subkey's values.
+    
+    Returns:
+        AppInfo: The application.
+    """
+    display_name = values.get("displayname")
+    
+    # Resource references (@{...}) can't be resolved from the registry alone;
+    # clean up the package name instead
+    if not display_name or display_name.startswith("@"):
+        display_name = name.split('_')[0].replace('.', ' ')
+    
+    app = {"id": f"msstore-{name}", "name": display_name, "source": "msstore", "root": "registry"}
+    if values.get("packagerootfolder"):
+        app["path"] = values["packagerootfolder"]
+    
+    return app
+
+def _map_app_path(name: str, values: RegistryValues) -> AppInfo:
+    """
+    Map an App Paths subkey to an application.
+    
+    Args:
+        name (str): The name of the subkey (the executable name).
+        values (RegistryValues): The subkey's values.
+    
+    Returns:
+        AppInfo: The application.
+    """
+    app = {"id": f"apppath-{name}", "name": name, "source": "apppath", "root": "registry"}
+    if "" in values:
+        app["path"] = values[""]
+    
+    return app
+
+MAPPERS = {
+    "uninstall": _map_uninstall,
+    "msstore": _map_package,
+    "apppath": _map_app_path,
+}
+
+def _read_root(backend: RegistryBackend, hive: str, path: str, kind: str,
+               cancel_event: Optional[threading.Event]) -> List[AppInfo]:
+    """
+    Read the applications under one registry key.
+    
+    Args:
+        backend (RegistryBackend): The registry backend.
+        hive (str): The registry hive.
+        path (str): The path of the key within the hive.
+        kind (str): The kind of entries the key holds.
+        cancel_event (Optional[threading.Event]): Set to stop early.
+    
+    Returns:
+        List[AppInfo]: The applications found.
+    """
+    apps = []
+    
+    try:
+        subkeys = backend.read_subkeys(hive, path, cancel_event)
+    except OSError as e:
+        logger.debug(f"Error opening registry key {path}: {e}")
+        return apps
+    
+    mapper = MAPPERS[kind]
+    for name, values in subkeys:
+        try:
+            app = mapper(name, values)
+            if app is not None:
+                apps.append(app)
+        except Exception as e:
+            logger.debug(f"Error processing registry key {name}: {e}")
+    
+    return apps
+
+def scan_registry(backend: Optional[RegistryBackend] = None,
+                  cancel_event: Optional[threading.Event] = None) -> List[AppInfo]:
+    """
+    Scan the registry for installed applications.
+    
+    The registry roots are read in parallel, one thread each, and merged in
+    the order of REGISTRY_ROOTS.
+    
+    Args:
+        backend (Optional[RegistryBackend], optional): The registry backend.
+            Defaults to the system registry.
+        cancel_event (Optional[threading.Event], optional): Set to stop the scan early. Defaults to None.
+    
+    Returns:
+        List[AppInfo]: The applications found, without duplicates.
+    """
+    if backend is None:
+        backend = get_registry_backend()
+        if backend is None:
+            logger.debug("No registry on this platform, skipping registry scan")
+            return []
+    
+    with ThreadPoolExecutor(max_workers=len(REGISTRY_ROOTS), thread_name_prefix="registry") as executor:
+        results = executor.map(lambda root: _read_root(backend, *root, cancel_event), REGISTRY_ROOTS)
+        apps = [app for root_apps in results for app in root_apps]
+    
+    # Remove duplicates based on name and path
+    unique_apps = {}
+    for app in apps:
+        # Create a unique key based on name and path if available
+        key = f"{app['name']}_{app.get('path', '')}"
+        # Keep the entry with the most information
+        if key not in unique_apps or len(app) > len(unique_apps[key]):
+            unique_apps[key] = app
+    
+    return list(unique_apps.values())
@@ -11,6 +11,12 @@ import datetime
 import shutil
 from typing import Dict, Any, List, Optional
 import py7zr
+from py7zr.callbacks import ExtractCallback
+
+from reformatbackup.src.chunkstore import get_chunk_store, read_manifest, extract_version
+from reformatbackup.src.hashcache import HASH_ALGORITHM, get_hash_cache, hash_paths
+from reformatbackup.src.progress import ProgressTracker
+from reformatbackup.src.utils import read_json
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -25,19 +31,21 @@ def get_backup_versions(app_id: str) -> List[Dict[str, Any]]:
     Returns:
         List[Dict[str, Any]]: A list of dictionaries containing information about backup versions.
     """
-    from reformatbackup.src.backup import get_backup_location
+    from reformatbackup.src.backup import get_backup_location, is_app_backup, BACKUP_SUFFIXES
     
     # Get the backup location
     backup_location = get_backup_location()
     
-    # Find all backup files for the application
+    # Find all backup files for the application, in either format
     versions = []
     
     if os.path.exists(backup_location):
         for filename in os.listdir(backup_location):
-            if filename.startswith(f"{app_id}-") and filename.endswith(".7z"):
+            backup_format = next((backup_format for backup_format, suffix in BACKUP_SUFFIXES.items()
+                                  if filename.endswith(suffix)), None)
+            if backup_format and is_app_backup(filename[:-len(BACKUP_SUFFIXES[backup_format])], app_id):
                 # Extract the timestamp from the filename
-                timestamp = filename[len(app_id) + 1:-3]
+                timestamp = filename[len(app_id) + 1:-len(BACKUP_SUFFIXES[backup_format])]
                 
                 # Create the backup ID
                 backup_id = f"{app_id}-{timestamp}"
@@ -57,8 +65,11 @@ def get_backup_versions(app_id: str) -> List[Dict[str, Any]]:
                 # Get the backup file path
                 backup_path = os.path.join(backup_location, filename)
                 
-                # Get the backup size
-                size = os.path.getsize(backup_path) if os.path.exists(backup_path) else 0
+                # Get the backup size; a chunked backup's is what it added to the chunk store
+                if backup_format == "chunks":
+                    size = metadata.get("size", 0)
+                else:
+                    size = os.path.getsize(backup_path) if os.path.exists(backup_path) else 0
                 
                 # Add the version to the list
                 versions.append({
@@ -68,6 +79,8 @@ def get_backup_versions(app_id: str) -> List[Dict[str, Any]]:
                     "metadata_path": metadata_path,
                     "size": size,
                     "notes": metadata.get("notes", ""),
+                    "format": backup_format,
+                    "backup_type": metadata.get("backup_type", "full"),
                 })
     
     # Sort versions by timestamp (newest first)
@@ -85,16 +98,17 @@ def get_backup_details(backup_id: str) -> Dict[str, Any]:
     Returns:
         Dict[str, Any]: A dictionary containing detailed information about the backup.
     """
-    from reformatbackup.src.backup import get_backup_location
+    from reformatbackup.src.backup import get_backup_location, find_backup_file, get_backup_file_format
     
     # Get the backup location
     backup_location = get_backup_location()
     
     # Get the backup file path
-    backup_path = os.path.join(backup_location, f"{backup_id}.7z")
+    backup_path = find_backup_file(backup_location, backup_id)
     
-    if not os.path.exists(backup_path):
-        return {"success": False, "error": f"Backup file not found: {backup_path}"}
+    if backup_path is None:
+        return {"success": False, "error": f"Backup file not found: {os.path.join(backup_location, backup_id)}"}
+    backup_format = get_backup_file_format(backup_path)
     
     # Get the metadata file path
     metadata_path = os.path.join(backup_location, f"{backup_id}.json")
@@ -109,8 +123,11 @@ def get_backup_details(backup_id: str) -> Dict[str, Any]:
             logger.error(f"Error loading metadata: {e}")
             return {"success": False, "error": f"Error loading metadata: {e}"}
     
-    # Get the backup size
-    size = os.path.getsize(backup_path) if os.path.exists(backup_path) else 0
+    # Get the backup size; a chunked backup's is what it added to the chunk store
+    if backup_format == "chunks":
+        size = metadata.get("size", 0)
+    else:
+        size = os.path.getsize(backup_path) if os.path.exists(backup_path) else 0
     
     # Format the timestamp
     timestamp = metadata.get("timestamp", "")
@@ -135,10 +152,206 @@ def get_backup_details(backup_id: str) -> Dict[str, Any]:
         "paths": metadata.get("paths", []),
         "compression_level": metadata.get("compression_level", 9),
         "backup_dot_files": metadata.get("backup_dot_files", False),
+        "format": backup_format,
+        "backup_type": metadata.get("backup_type", "full"),
+        "base": metadata.get("base"),
     }
 
+class _ExtractProgress(ExtractCallback):
+    """
+    Forwards py7zr extraction events to a progress tracker.
+    """
+    
+    def __init__(self, reporter: ProgressTracker):
+        self.reporter = reporter
+    
+    def report_start_preparation(self) -> None:
+        pass
+    
+    def report_start(self, processing_file_path: str, processing_bytes: str) -> None:
+        pass
+    
+    def report_update(self, decompressed_bytes: str) -> None:
+        pass
+    
+    def report_end(self, processing_file_path: str, wrote_bytes: str) -> None:
+        self.reporter.advance(int(wrote_bytes), processing_file_path)
+    
+    def report_warning(self, message: str) -> None:
+        logger.warning(f"Warning while extracting backup: {message}")
+    
+    def report_postprocess(self) -> None:
+        pass
+
+def _list_files(paths: List[str]) -> List[str]:
+    """
+    List the files under several directories.
+    
+    Args:
+        paths (List[str]): The directories; missing ones are skipped.
+    
+    Returns:
+        List[str]: The file paths.
+    """
+    return [os.path.join(root, file)
+            for path in paths if os.path.exists(path)
+            for root, _, files in os.walk(path)
+            for file in files]
+
+def _get_backup_chain(backup_location: str, backup_path: str, metadata: Dict[str, Any]) -> List[str]:
+    """
+    Get the archives an incremental backup is restored from.
+    
+    Args:
+        backup_location (str): The backup location.
+        backup_path (str): The archive of the backup.
+        metadata (Dict[str, Any]): The backup's metadata.
+    
+    Returns:
+        List[str]: The archive paths, from the full backup to this one. Just
+            this backup's archive if it isn't incremental.
+    
+    Raises:
+        FileNotFoundError: If a backup in the chain is missing.
+    """
+    chain = [backup_path]
+    seen = set()
+    while metadata.get("backup_type") == "incremental":
+        base_id = metadata.get("base")
+        base_path = os.path.join(backup_location, f"{base_id}.7z")
+        if not base_id or base_id in seen or not os.path.exists(base_path):
+            raise FileNotFoundError(f"Backup {os.path.basename(chain[0])} needs backup {base_id}, which is missing")
+        seen.add(base_id)
+        chain.insert(0, base_path)
+        metadata = read_json(os.path.join(backup_location, f"{base_id}.json"))
+    return chain
+
+def _extract_archives(archive_paths: List[str], destination: str,
+                      reporter: Optional[ProgressTracker] = None) -> None:
+    """
+    Extract archives into a directory, each overwriting the files of the ones before.
+    
+    Args:
+        archive_paths (List[str]): The archives, in order.
+        destination (str): The directory to extract to.
+        reporter (Optional[ProgressTracker], optional): Tracks the progress
+            of the "extracting" phase. Defaults to None.
+    """
+    callback = None
+    if reporter is not None:
+        entries = []
+        for archive_path in archive_paths:
+            with py7zr.SevenZipFile(archive_path, mode="r") as archive:
+                entries.extend(entry for entry in archive.list() if not entry.is_directory)
+        reporter.start_phase("extracting", len(entries), sum(entry.uncompressed for entry in entries))
+        callback = _ExtractProgress(reporter)
+    
+    for archive_path in archive_paths:
+        with py7zr.SevenZipFile(archive_path, mode="r") as archive:
+            archive.extractall(destination, callback=callback)
+    
+    if reporter is not None:
+        reporter.finish()
+
+def _remove_deleted_files(directory: str, files: Dict[str, Any]) -> None:
+    """
+    Remove the extracted files that aren't part of the restored backup.
+    
+    Args:
+        directory (str): The directory the chain was extracted to.
+        files (Dict[str, Any]): The files of the restored backup, by their
+            names in the archive.
+    """
+    names = {name.replace("\\", "/") for name in files}
+    for file_path in _list_files([directory]):
+        if os.path.relpath(file_path, directory).replace(os.sep, "/") not in names:
+            os.remove(file_path)
+
+def _extract_backup(backup_location: str, backup_path: str, metadata: Dict[str, Any],
+                    destination: str, reporter: Optional[ProgressTracker] = None) -> None:
+    """
+    Extract a backup, in either format, into a directory.
+    
+    Args:
+        backup_location (str): The backup location.
+        backup_path (str): The archive or chunk manifest of the backup.
+        metadata (Dict[str, Any]): The backup's metadata.
+        destination (str): The directory to extract to.
+        reporter (Optional[ProgressTracker], optional): Tracks the progress
+            of the "extracting" phase. Defaults to None.
+    
+    Raises:
+        Exception: If the backup can't be extracted.
+    """
+    from reformatbackup.src.backup import get_backup_file_format
+    
+    if get_backup_file_format(backup_path) == "chunks":
+        manifest = read_manifest(backup_path)
+        if reporter is not None:
+            entries = manifest.get("files", [])
+            reporter.start_phase("extracting", len(entries), sum(entry["size"] for entry in entries))
+        extract_version(get_chunk_store(backup_location), manifest, destination, reporter)
+        if reporter is not None:
+            reporter.finish()
+    else:
+        # An incremental backup is rebuilt by applying its chain, from
+        # the full backup on, and dropping the files deleted since
+        chain = _get_backup_chain(backup_location, backup_path, metadata)
+        _extract_archives(chain, destination, reporter)
+        if len(chain) > 1:
+            _remove_deleted_files(destination, metadata.get("files", {}))
+
+def _get_backup_hashes(metadata: Dict[str, Any]) -> Dict[str, str]:
+    """
+    Get the file hashes recorded with a backup, if they can be compared.
+    
+    Args:
+        metadata (Dict[str, Any]): The backup's metadata.
+    
+    Returns:
+        Dict[str, str]: The hash of each file by its name in the backup.
+            Empty if none were recorded, or they were made with a hash
+            function that isn't available.
+    """
+    if metadata.get("hash_algorithm") != HASH_ALGORITHM:
+        return {}
+    return metadata.get("hashes") or {}
+
+def _find_unchanged_files(backup_location: str, paths: List[str], hashes: Dict[str, str]) -> set:
+    """
+    Find the files on disk that are the same as in a backup.
+    
+    Args:
+        backup_location (str): The backup location, holding the hash cache.
+        paths (List[str]): The directories being restored to.
+        hashes (Dict[str, str]): The hash of each file by its name in the backup.
+    
+    Returns:
+        set: The paths of the files that don't need restoring.
+    """
+    # A file is backed up as <directory name>/<path in the directory>
+    expected = {}
+    for path in paths:
+        prefix = os.path.basename(path) + os.sep
+        for name, file_hash in hashes.items():
+            name = name.replace("\\", os.sep).replace("/", os.sep)
+            if name.startswith(prefix):
+                dst = os.path.join(path, name[len(prefix):])
+                if os.path.isfile(dst):
+                    expected[dst] = file_hash
+    if not expected:
+        return set()
+    
+    try:
+        current = get_hash_cache(backup_location).hash_files(list(expected))
+    except Exception as e:
+        logger.error(f"Error hashing files to restore: {e}")
+        return set()
+    return {dst for dst, file_hash in expected.items() if current.get(dst) == file_hash}
+
 def restore_backup(app_id: str, backup_id: str, backup_first: bool = False,
-                  restore_dot_files: bool = False, conflict_resolution: str = "overwrite-all") -> Dict[str, Any]:
+                  restore_dot_files: bool = False, conflict_resolution: str = "overwrite-all",
+                  reporter: Optional[ProgressTracker] = None) -> Dict[str, Any]:
     """
     Restore an application's data from a backup.
     
@@ -149,21 +362,27 @@ def restore_backup(app_id: str, backup_id: str, backup_first: bool = False,
         restore_dot_files (bool, optional): Whether to restore dot files. Defaults to False.
         conflict_resolution (str, optional): How to handle file conflicts.
             Options: "overwrite-all", "keep-newer", "ask". Defaults to "overwrite-all".
+        reporter (Optional[ProgressTracker], optional): Tracks the progress
+            of the "extracting" and "restoring" phases. The restore stops
+            when its is_cancelled() returns True during extraction; once
+            files are being replaced it runs to the end. Defaults to None.
     
     Returns:
-        Dict[str, Any]: A dictionary containing information about the restore operation.
+        Dict[str, Any]: A dictionary containing information about the restore
+            operation. Files already the same as in the backup, going by the
+            backup's file hashes, are left alone and counted in "unchanged_files".
     """
-    from reformatbackup.src.scan import scan_installed_apps
-    from reformatbackup.src.backup import backup_app, get_backup_location
+    from reformatbackup.src.scan import find_app
+    from reformatbackup.src.backup import backup_app, get_backup_location, find_backup_file
     
     # Get the backup location
     backup_location = get_backup_location()
     
-    # Get the backup file path
-    backup_path = os.path.join(backup_location, f"{backup_id}.7z")
+    # Get the backup file path, an archive or a chunk manifest
+    backup_path = find_backup_file(backup_location, backup_id)
     
-    if not os.path.exists(backup_path):
-        return {"success": False, "error": f"Backup file not found: {backup_path}"}
+    if backup_path is None:
+        return {"success": False, "error": f"Backup file not found: {os.path.join(backup_location, backup_id)}"}
     
     # Get the metadata file path
     metadata_path = os.path.join(backup_location, f"{backup_id}.json")
@@ -177,15 +396,8 @@ def restore_backup(app_id: str, backup_id: str, backup_first: bool = False,
         except Exception as e:
             logger.error(f"Error loading metadata: {e}")
     
-    # Get the list of installed applications
-    apps = scan_installed_apps()
-    
     # Find the application to restore
-    app = None
-    for a in apps:
-        if a.get("id") == app_id:
-            app = a
-            break
+    app = find_app(app_id)
     
     if not app:
         return {"success": False, "error": f"Application with ID {app_id} not found"}
@@ -257,15 +469,28 @@ def restore_backup(app_id: str, backup_id: str, backup_first: bool = False,
     
     # Extract the backup to the temporary directory
     try:
-        with py7zr.SevenZipFile(backup_path, mode="r") as archive:
-            archive.extractall(temp_dir)
+        _extract_backup(backup_location, backup_path, metadata, temp_dir, reporter)
     except Exception as e:
         logger.error(f"Error extracting backup: {e}")
         return {"success": False, "error": f"Error extracting backup: {e}"}
     
+    # Stop here if cancelled, before any file is replaced
+    if reporter is not None and reporter.is_cancelled():
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        return {"success": False, "cancelled": True, "app_id": app_id,
+                "app_name": app.get("name", app_id), "error": "Restore cancelled"}
+    
+    if reporter is not None:
+        files = _list_files([os.path.join(temp_dir, os.path.basename(path)) for path in paths_to_restore])
+        reporter.start_phase("restoring", len(files), sum(os.path.getsize(file) for file in files))
+    
+    # Files already the same as in the backup don't need copying
+    unchanged = _find_unchanged_files(backup_location, paths_to_restore, _get_backup_hashes(metadata))
+    
     # Restore the files to their original locations
     restored_files = 0
     skipped_files = 0
+    unchanged_files = 0
     error_files = 0
     
     for path in paths_to_restore:
@@ -291,6 +516,12 @@ def restore_backup(app_id: str, backup_id: str, backup_first: bool = False,
                     for file in files:
                         src = os.path.join(root, file)
                         dst = os.path.join(path, os.path.relpath(src, temp_path))
+                        if reporter is not None:
+                            reporter.advance(os.path.getsize(src), dst)
+                        
+                        if dst in unchanged:
+                            unchanged_files += 1
+                            continue
                         
                         # Handle file conflicts based on the selected strategy
                         if os.path.exists(dst):
@@ -324,6 +555,9 @@ def restore_backup(app_id: str, backup_id: str, backup_first: bool = False,
             logger.error(f"Error restoring files: {e}")
             error_files += 1
     
+    if reporter is not None:
+        reporter.finish()
+    
     # Clean up the temporary directory
     try:
         shutil.rmtree(temp_dir)
@@ -340,10 +574,75 @@ def restore_backup(app_id: str, backup_id: str, backup_first: bool = False,
         "timestamp": metadata.get("timestamp", ""),
         "restored_files": restored_files,
         "skipped_files": skipped_files,
+        "unchanged_files": unchanged_files,
         "error_files": error_files,
         "restore_dot_files": restore_dot_files,
         "conflict_resolution": conflict_resolution
     }
+
+def verify_backup(backup_id: str) -> Dict[str, Any]:
+    """
+    Check that a backup extracts to the files it was made from, by comparing
+    their hashes with the ones recorded when it was made.
+    
+    Args:
+        backup_id (str): The ID of the backup to verify.
+    
+    Returns:
+        Dict[str, Any]: A dictionary containing "verified" (whether every
+            file matched), "checked_files", and the names of the
+            "mismatched_files" and "missing_files".
+    """
+    from reformatbackup.src.backup import get_backup_location, find_backup_file
+    
+    backup_location = get_backup_location()
+    backup_path = find_backup_file(backup_location, backup_id)
+    
+    if backup_path is None:
+        return {"success": False, "error": f"Backup file not found: {os.path.join(backup_location, backup_id)}"}
+    
+    try:
+        metadata = read_json(os.path.join(backup_location, f"{backup_id}.json"))
+    except Exception as e:
+        logger.error(f"Error loading metadata: {e}")
+        return {"success": False, "error": f"Error loading metadata: {e}"}
+    
+    if "hash_algorithm" not in metadata:
+        return {"success": False, "error": "Backup has no file hashes to verify against"}
+    if metadata["hash_algorithm"] != HASH_ALGORITHM:
+        return {"success": False, "error": f"Backup was hashed with {metadata['hash_algorithm']}, which isn't available"}
+    hashes = _get_backup_hashes(metadata)
+    
+    temp_dir = os.path.join(os.environ["TEMP"], f"reformatbackup_verify_{backup_id}_{datetime.datetime.now().strftime('%Y%m%d%H%M%S')}")
+    try:
+        os.makedirs(temp_dir)
+        _extract_backup(backup_location, backup_path, metadata, temp_dir)
+        
+        extracted = {os.path.relpath(file, temp_dir): file for file in _list_files([temp_dir])}
+        names = {name: name.replace("\\", os.sep).replace("/", os.sep) for name in hashes}
+        current = hash_paths([extracted[path] for path in names.values() if path in extracted])
+    except Exception as e:
+        logger.error(f"Error verifying backup: {e}")
+        return {"success": False, "error": f"Error verifying backup: {e}"}
+    finally:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+    
+    missing_files = sorted(name for name, path in names.items() if path not in extracted)
+    mismatched_files = sorted(name for name, path in names.items()
+                              if path in extracted and current.get(extracted[path]) != hashes[name])
+    
+    if missing_files or mismatched_files:
+        logger.warning(f"Backup {backup_id} failed verification: {len(mismatched_files)} mismatched, {len(missing_files)} missing")
+    
+    return {
+        "success": True,
+        "backup_id": backup_id,
+        "verified": not missing_files and not mismatched_files,
+        "checked_files": len(hashes),
+        "mismatched_files": mismatched_files,
+        "missing_files": missing_files,
+    }
+
 def restore_dot_files(backup_id: str, conflict_resolution: str = "overwrite-all") -> Dict[str, Any]:
     """
     Restore dot files from a backup.
@@ -5,10 +5,13 @@ This module defines the Flask routes for the ReformatBackup application.
 """
 
 import os
+import json
+import time
 import logging
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, Iterator, List, Optional
 
-from flask import Flask, render_template, request, jsonify, redirect, url_for, flash, current_app, session
+from flask import (Flask, Response, render_template, request, jsonify, redirect, url_for, flash,
+                   current_app, session, stream_with_context)
 
 from reformatbackup.src.config import (
     get_check_updates,
@@ -17,12 +20,20 @@ from reformatbackup.src.config import (
     get_compression_level,
     set_compression_level,
     get_backup_dot_files,
-    set_backup_dot_files
+    set_backup_dot_files,
+    config_transaction
 )
+from reformatbackup.src.ownership import is_counted
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
+# How often job event streams check for changes, in seconds
+SSE_POLL_SECONDS = 0.5
+
+# Longest silence on a job event stream before a keepalive comment, in seconds
+SSE_KEEPALIVE_SECONDS = 15.0
+
 # Type definitions for better type hinting
 AppInfo = Dict[str, Any]
 BackupInfo = Dict[str, Any]
@@ -31,6 +42,9 @@ def calculate_drive_sizes(apps: List[AppInfo]) -> Dict[str, int]:
     """
     Calculate the total size of applications per drive.
     
+    Aliases and applications nested inside another application's folder are
+    left out, since their bytes are already counted by the owning application.
+    
     Args:
         apps (List[AppInfo]): The list of applications.
         
@@ -39,6 +53,8 @@ def calculate_drive_sizes(apps: List[AppInfo]) -> Dict[str, int]:
     """
     drive_sizes = {}
     for app in apps:
+        if not is_counted(app):
+            continue
         drive = app.get('drive', 'Unknown')
         size = app.get('size', 0)
         if drive in drive_sizes:
@@ -68,11 +84,22 @@ def setup_routes(app: Flask, rescan: bool = False) -> None:
     
     Args:
         app (Flask): The Flask application instance.
-        rescan (bool, optional): Whether to force a rescan of installed applications. Defaults to False.
+        rescan (bool, optional): Whether to rescan installed applications once
+            the background scan worker starts. Defaults to False.
     """
-    from reformatbackup.src.scan import scan_installed_apps
-    from reformatbackup.src.backup import backup_app, add_notes, get_recent_backups
-    from reformatbackup.src.restore import restore_backup, get_backup_versions, get_backup_details
+    from reformatbackup.src.scan import find_app, resume_pending_sizes
+    from reformatbackup.src.scan_cache import query_apps, load_scan_index, get_scan_meta
+    from reformatbackup.src.scan_worker import scan_worker, get_scan_snapshot
+    from reformatbackup.src.watcher import file_watcher
+    from reformatbackup.src.size_worker import background_sizer
+    from reformatbackup.src.backup import add_notes, get_recent_backups
+    from reformatbackup.src.jobs import job_queue, FINAL_STATES
+    from reformatbackup.src.restore import get_backup_versions, get_backup_details, verify_backup
+    
+    # The worker thread starts with the first request, so only the process
+    # that serves requests scans
+    if rescan:
+        scan_worker.request_scan()
     
     @app.route('/')
     def index() -> str:
@@ -83,24 +110,38 @@ def setup_routes(app: Flask, rescan: bool = False) -> None:
             str: The rendered HTML template.
         """
         try:
-            # Check if rescan is requested
-            force_rescan = request.args.get('rescan', 'false').lower() == 'true'
-            # Get the list of installed applications
-            apps = scan_installed_apps(force_rescan=force_rescan or rescan)
+            # Scans run on the background worker; the page shows the last
+            # completed scan and polls for a newer one
+            scan_worker.start()
+            if request.args.get('rescan', 'false').lower() == 'true':
+                scan_worker.request_scan()
+            elif load_scan_index() is None and not scan_worker.is_scanning():
+                # First run: queue the initial scan now so the page shows it
+                scan_worker.request_scan()
+            scan_status = scan_worker.get_status()
+            
+            # Get the list of installed applications; sizes that aren't known
+            # yet are calculated in the background and polled by the page
+            scan_index = get_scan_snapshot()
+            sizes_pending = background_sizer.is_running()
+            if not scan_status['scanning']:
+                sizes_pending = resume_pending_sizes(scan_index)
+            apps = scan_index.apps
             
             # Get the backup location
             backup_location = get_backup_location()
             
             # Calculate drive sizes
             drive_sizes = calculate_drive_sizes(apps)
+            total_size = sum(drive_sizes.values())
             
             # Get recent backups (if any)
             recent_backups = get_recent_backups(limit=5)
             
             # Group apps by source for statistics
             app_sources = {}
-            for app in apps:
-                source = app.get('source', 'unknown')
+            for app_info in apps:
+                source = app_info.get('source', 'unknown')
                 if source in app_sources:
                     app_sources[source] += 1
                 else:
@@ -113,8 +154,11 @@ def setup_routes(app: Flask, rescan: bool = False) -> None:
                                   apps=apps,
                                   backup_location=backup_location,
                                   drive_sizes=drive_sizes,
+                                  total_size=total_size,
                                   recent_backups=recent_backups,
                                   app_sources=app_sources,
+                                  sizes_pending=sizes_pending,
+                                  scan_status=scan_status,
                                   update_available=app.config.get('UPDATE_AVAILABLE', False))
         except Exception as e:
             logger.error(f"Error rendering index page: {e}")
@@ -122,6 +166,112 @@ def setup_routes(app: Flask, rescan: bool = False) -> None:
                                   error_code=500,
                                   error_message=f"Error loading application data: {str(e)}"), 500
     
+    @app.route('/scan/status')
+    def scan_status() -> Any:
+        """
+        Get the state of the background scan worker and file system watcher.
+        
+        Returns:
+            Any: JSON response with the worker status and, under "watcher",
+                the watcher status.
+        """
+        try:
+            scan_worker.start()
+            status = scan_worker.get_status()
+            status['watcher'] = file_watcher.get_status()
+            return jsonify(status)
+        except Exception as e:
+            logger.error(f"Error getting scan status: {e}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/debug/scan-stats')
+    def scan_stats() -> Any:
+        """
+        Get the timing statistics of the last scan and background size calculation.
+        
+        Returns:
+            Any: JSON response with the "scan" statistics (phases, roots,
+                drives and errors) and the "background_sizing" statistics,
+                each None if not recorded yet.
+        """
+        try:
+            return jsonify({
+                'scan': get_scan_meta('scan_stats'),
+                'background_sizing': get_scan_meta('background_sizing'),
+            })
+        except Exception as e:
+            logger.error(f"Error getting scan statistics: {e}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/scan', methods=['POST'])
+    def start_scan() -> Any:
+        """
+        Ask the background scan worker for a full rescan.
+        
+        Returns:
+            Any: JSON response with the worker status.
+        """
+        try:
+            scan_worker.start()
+            scan_worker.request_scan()
+            return jsonify(scan_worker.get_status())
+        except Exception as e:
+            logger.error(f"Error requesting scan: {e}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/scan/sizes')
+    def scan_sizes() -> Any:
+        """
+        Get the progress of the background size calculation.
+        
+        Query parameters: since, the sequence number of the last update the
+        client has seen.
+        
+        Returns:
+            Any: JSON response with the sizes computed since then and the
+                current drive totals.
+        """
+        try:
+            since = request.args.get('since', 0, type=int)
+            status = background_sizer.get_status(since)
+            
+            # Overlay every size computed so far, including ones not yet
+            # written to the cache, to get current totals
+            computed = background_sizer.get_status()['sizes']
+            scan_index = load_scan_index()
+            apps = [dict(a, size=computed[a['id']]) if a.get('id') in computed else a
+                    for a in (scan_index.apps if scan_index else [])]
+            
+            status['drive_sizes'] = calculate_drive_sizes(apps)
+            status['total_size'] = sum(status['drive_sizes'].values())
+            return jsonify(status)
+        except Exception as e:
+            logger.error(f"Error getting size progress: {e}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/apps')
+    def list_apps() -> Any:
+        """
+        Query the scanned applications with optional filters.
+        
+        Query parameters: source, drive, q (name contains), sort (name, size or drive),
+        limit and offset.
+        
+        Returns:
+            Any: JSON response with the matching applications.
+        """
+        try:
+            apps = query_apps(source=request.args.get('source'),
+                              drive=request.args.get('drive'),
+                              name=request.args.get('q'),
+                              sort_by=request.args.get('sort', 'name'),
+                              limit=request.args.get('limit', type=int),
+                              offset=request.args.get('offset', 0, type=int))
+            return jsonify({'apps': apps, 'count': len(apps)})
+        except Exception as e:
+            logger.error(f"Error querying applications: {e}")
+            return jsonify({'error': str(e)}), 500
+    
     @app.route('/backup', methods=['GET', 'POST'])
     def backup() -> Any:
         """
@@ -143,28 +293,21 @@ def setup_routes(app: Flask, rescan: bool = False) -> None:
             compression_level = int(request.form.get('compression_level', get_compression_level()))
             backup_dot_files = request.form.get('backup_dot_files', '') == 'on'
             notes = request.form.get('notes', '')
+            force = request.form.get('force', '') == 'on'
             
-            # Update configuration if needed
-            if compression_level != get_compression_level():
-                set_compression_level(compression_level)
-            
-            if backup_dot_files != get_backup_dot_files():
-                set_backup_dot_files(backup_dot_files)
-            
-            # Perform backups
-            results = []
-            for app_id in app_ids:
-                # Pass options to backup_app
-                result = backup_app(app_id)
-                
-                # Add notes if provided and backup was successful
-                if notes and result.get('success', False):
-                    backup_id = f"{app_id}-{result.get('timestamp', '')}"
-                    add_notes(backup_id, notes)
+            # Update configuration if needed, with a single write
+            with config_transaction():
+                if compression_level != get_compression_level():
+                    set_compression_level(compression_level)
                 
-                results.append(result)
+                if backup_dot_files != get_backup_dot_files():
+                    set_backup_dot_files(backup_dot_files)
+            
+            # Queue the backups, archiving directories shared between the
+            # selected apps only once, and return without waiting for them
+            jobs = job_queue.submit_backups(app_ids, notes=notes, force=force)
             
-            return jsonify({'results': results})
+            return jsonify({'jobs': jobs})
         else:
             # GET request - display backup page
             # Check if we have app_ids in the query string or session
@@ -178,8 +321,7 @@ def setup_routes(app: Flask, rescan: bool = False) -> None:
             session['selected_app_ids'] = app_ids
             
             # Get app details for the selected apps
-            apps = scan_installed_apps()
-            selected_apps = [app for app in apps if app.get('id') in app_ids]
+            selected_apps = get_scan_snapshot().get_many(app_ids)
             
             # Get previous backups
             previous_backups = get_recent_backups(limit=10)
@@ -191,6 +333,102 @@ def setup_routes(app: Flask, rescan: bool = False) -> None:
                                   selected_apps=selected_apps,
                                   previous_backups=previous_backups)
     
+    @app.route('/jobs')
+    def list_jobs() -> Any:
+        """
+        List background jobs, newest first.
+        
+        Query parameters "active" (only unfinished jobs), "ids" (only these
+        jobs, repeatable) and "limit" narrow the list.
+        
+        Returns:
+            Any: JSON response with the "jobs".
+        """
+        try:
+            job_ids = request.args.getlist('ids') or None
+            jobs = job_queue.list_jobs(limit=request.args.get('limit', 50, type=int),
+                                         active_only=request.args.get('active') == 'true',
+                                         job_ids=job_ids)
+            return jsonify({'jobs': jobs})
+        except Exception as e:
+            logger.error(f"Error listing jobs: {e}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/jobs/events')
+    def job_events() -> Any:
+        """
+        Stream the progress of background jobs as Server-Sent Events.
+        
+        A "jobs" event with the jobs given by the "ids" query parameter
+        (repeatable) is sent whenever one of them changes, and a "done"
+        event once all of them have finished, after which the stream ends.
+        
+        Returns:
+            Any: A text/event-stream response.
+        """
+        job_ids = request.args.getlist('ids')
+        if not job_ids:
+            return jsonify({'error': 'No job IDs given'}), 400
+        
+        def generate() -> Iterator[str]:
+            last = None
+            last_sent = time.monotonic()
+            while True:
+                jobs = job_queue.list_jobs(limit=len(job_ids), job_ids=job_ids)
+                if jobs != last:
+                    yield f"event: jobs\ndata: {json.dumps(jobs)}\n\n"
+                    last = jobs
+                    last_sent = time.monotonic()
+                elif time.monotonic() - last_sent >= SSE_KEEPALIVE_SECONDS:
+                    yield ": keepalive\n\n"
+                    last_sent = time.monotonic()
+                
+                if all(job['state'] in FINAL_STATES for job in jobs):
+                    yield "event: done\ndata: {}\n\n"
+                    return
+                time.sleep(SSE_POLL_SECONDS)
+        
+        return Response(stream_with_context(generate()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+    
+    @app.route('/jobs/<job_id>')
+    def job_status(job_id: str) -> Any:
+        """
+        Get the state and progress of a background job.
+        
+        Args:
+            job_id (str): The job ID.
+        
+        Returns:
+            Any: JSON response with the job.
+        """
+        try:
+            job = job_queue.get_job(job_id)
+            if job is None:
+                return jsonify({'error': f'Job {job_id} not found'}), 404
+            return jsonify(job)
+        except Exception as e:
+            logger.error(f"Error getting job {job_id}: {e}")
+            return jsonify({'error': str(e)}), 500
+    
+    @app.route('/jobs/<job_id>/cancel', methods=['POST'])
+    def cancel_job(job_id: str) -> Any:
+        """
+        Cancel a queued or running background job.
+        
+        Args:
+            job_id (str): The job ID.
+        
+        Returns:
+            Any: JSON response with "success", False if the job doesn't
+                exist or has already finished.
+        """
+        try:
+            return jsonify({'success': job_queue.cancel(job_id)})
+        except Exception as e:
+            logger.error(f"Error cancelling job {job_id}: {e}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+    
     @app.route('/backup/notes', methods=['POST'])
     def update_backup_notes() -> Any:
         """
@@ -227,15 +465,8 @@ def setup_routes(app: Flask, rescan: bool = False) -> None:
             str: The rendered HTML template.
         """
         try:
-            # Get the list of installed applications
-            apps = scan_installed_apps()
-            
             # Find the application
-            app = None
-            for a in apps:
-                if a.get('id') == app_id:
-                    app = a
-                    break
+            app = find_app(app_id)
             
             if not app:
                 flash(f"Application with ID {app_id} not found", "danger")
@@ -277,6 +508,23 @@ def setup_routes(app: Flask, rescan: bool = False) -> None:
             logger.error(f"Error getting backup details: {e}")
             return jsonify({"success": False, "error": str(e)}), 500
     
+    @app.route('/restore/verify/<backup_id>', methods=['POST'])
+    def verify_backup_action(backup_id: str) -> Any:
+        """
+        Check a backup against the file hashes recorded when it was made.
+        
+        Args:
+            backup_id (str): The ID of the backup to verify.
+        
+        Returns:
+            Any: JSON response with the verification result.
+        """
+        try:
+            return jsonify(verify_backup(backup_id))
+        except Exception as e:
+            logger.error(f"Error verifying backup: {e}")
+            return jsonify({"success": False, "error": str(e)}), 500
+    
     @app.route('/restore/<app_id>/<backup_id>', methods=['POST'])
     def restore_action(app_id: str, backup_id: str) -> Any:
         """
@@ -296,8 +544,8 @@ def setup_routes(app: Flask, rescan: bool = False) -> None:
                 restore_dot_files = request.form.get('restore_dot_files', 'false') == 'true'
                 conflict_resolution = request.form.get('conflict_resolution', 'overwrite-all')
                 
-                # Perform the restore
-                result = restore_backup(
+                # Queue the restore and return without waiting for it
+                job = job_queue.submit_restore(
                     app_id,
                     backup_id,
                     backup_first=backup_first,
@@ -305,7 +553,7 @@ def setup_routes(app: Flask, rescan: bool = False) -> None:
                     conflict_resolution=conflict_resolution
                 )
                 
-                return jsonify({'result': result})
+                return jsonify({'job': job})
             except Exception as e:
                 logger.error(f"Error during restore: {e}")
                 return jsonify({'result': {'success': False, 'error': str(e)}}), 500
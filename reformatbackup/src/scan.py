@@ -5,19 +5,35 @@ This module handles scanning for installed applications on Windows 11.
 """
 
 import os
-import json
+import time
 import logging
 import datetime
+import threading
 from typing import Dict, List, Any, Optional
-import winreg
-import psutil
 
 from reformatbackup.src.config import (
-    get_scan_cache_path,
     get_auto_rescan,
+    get_scan_interval_hours,
     set_last_scan_time,
     get_last_scan_time
 )
+from reformatbackup.src.scan_cache import ScanIndex, load_scan_index, save_scan_cache, set_scan_meta
+from reformatbackup.src.fingerprint import reuse_sizes
+from reformatbackup.src.ownership import apply_ownership, copy_alias_sizes, normalize_path, is_within
+from reformatbackup.src.registry import scan_registry
+from reformatbackup.src.file_scan import (
+    scan_file_system,
+    rescan_install_root,
+    get_install_dirs,
+    clear_root_fingerprints,
+    get_root_fingerprints
+)
+from reformatbackup.src.drives import get_drive_inventory
+from reformatbackup.src.libraries import scan_steam, scan_epic, scan_gog
+from reformatbackup.src.scanners import register_scanner, run_scanners
+from reformatbackup.src.scan_stats import ScanStats
+from reformatbackup.src.sizing import SizeEngine
+from reformatbackup.src.size_worker import background_sizer
 
 # Set up logging
 logger = logging.getLogger(__name__)
@@ -31,308 +47,314 @@ def scan_installed_apps(force_rescan: bool = False) -> List[Dict[str, Any]]:
     
     Returns:
         List[Dict[str, Any]]: A list of dictionaries containing information about installed applications.
+            The list is shared with the scan cache and must not be modified.
     """
-    cache_path = get_scan_cache_path()
-    auto_rescan = get_auto_rescan()
-    last_scan_time = get_last_scan_time()
+    return get_scan_index(force_rescan=force_rescan).apps
+
+def find_app(app_id: str) -> Optional[Dict[str, Any]]:
+    """
+    Find an installed application by ID in the last completed scan.
     
-    # If auto_rescan is enabled and we haven't scanned in the last 24 hours, force a rescan
-    if auto_rescan and last_scan_time:
-        try:
-            last_scan_datetime = datetime.datetime.strptime(last_scan_time, "%Y%m%d-%H%M%S")
-            time_since_last_scan = datetime.datetime.now() - last_scan_datetime
-            if time_since_last_scan.days >= 1:
-                logger.info("Auto-rescan triggered: Last scan was more than 24 hours ago")
-                force_rescan = True
-        except Exception as e:
-            logger.error(f"Error parsing last scan time: {e}")
-    
-    # Check if cache exists and we're not forcing a rescan
-    if os.path.exists(cache_path) and not force_rescan:
-        try:
-            with open(cache_path, "r") as f:
-                return json.load(f)
-        except Exception as e:
-            logger.error(f"Error loading cache: {e}")
-    
-    # Scan for installed applications
-    apps = []
+    This never starts a scan, so it is safe to call while handling a request.
     
-    # Scan registry for installed applications
-    try:
-        apps.extend(_scan_registry())
-    except Exception as e:
-        logger.error(f"Error scanning registry: {e}")
+    Args:
+        app_id (str): The ID of the application.
     
-    # Scan file system for installed applications
-    try:
-        apps.extend(_scan_file_system())
-    except Exception as e:
-        logger.error(f"Error scanning file system: {e}")
+    Returns:
+        Optional[Dict[str, Any]]: The application, or None if it wasn't found
+            or no scan has completed yet.
+    """
+    index = load_scan_index()
+    return index.get(app_id) if index is not None else None
+
+def is_scan_stale() -> bool:
+    """
+    Check whether auto-rescan is enabled and the last scan is older than the
+    configured scan interval.
+    
+    Returns:
+        bool: True if a rescan is due.
+    """
+    last_scan_time = get_last_scan_time()
+    if not get_auto_rescan() or not last_scan_time:
+        return False
     
-    # Scan for dot files in user home directory
     try:
-        apps.extend(_scan_dot_files())
+        last_scan_datetime = datetime.datetime.strptime(last_scan_time, "%Y%m%d-%H%M%S")
     except Exception as e:
-        logger.error(f"Error scanning dot files: {e}")
+        logger.error(f"Error parsing last scan time: {e}")
+        return False
+    
+    time_since_last_scan = datetime.datetime.now() - last_scan_datetime
+    return time_since_last_scan >= datetime.timedelta(hours=get_scan_interval_hours())
+
+def get_scan_index(force_rescan: bool = False, defer_sizes: bool = False) -> ScanIndex:
+    """
+    Get the indexed scan result, scanning only if the cache is missing or stale.
+    
+    The cache file is parsed once per process and again only when it changes
+    on disk, so repeated lookups are served from memory.
+    
+    Args:
+        force_rescan (bool, optional): Whether to force a rescan of installed applications. Defaults to False.
+        defer_sizes (bool, optional): Whether to return right after enumerating
+            applications and calculate their sizes in the background. Apps whose
+            size is still being calculated have "size_pending" set. Defaults to False.
+    
+    Returns:
+        ScanIndex: The indexed scan result.
+    """
+    # If auto_rescan is enabled and the last scan is older than the scan
+    # interval, force a rescan
+    if not force_rescan and is_scan_stale():
+        logger.info("Auto-rescan triggered: Last scan is older than the scan interval")
+        force_rescan = True
+    
+    # Use the cached scan if it exists and we're not forcing a rescan
+    if not force_rescan:
+        index = load_scan_index()
+        if index is not None:
+            return index
+    
+    stats = ScanStats()
+    
+    # Run all registered scanners concurrently. Scanners that don't finish
+    # keep their applications from the previous scan.
+    previous = load_scan_index()
+    clear_root_fingerprints()
+    apps = run_scanners(stats=stats, previous=previous)
+    
+    # Reuse the sizes of application folders that haven't changed
+    with stats.phase("reuse_sizes") as counters:
+        reused = reuse_sizes(apps, previous)
+        counters["reused"] = reused
+    logger.info(f"Reused {reused} cached sizes")
+    
+    # Link apps that share or nest paths, so each folder is sized once
+    with stats.phase("ownership") as counters:
+        ownership = apply_ownership(apps)
+        counters.update(ownership)
     
     # Calculate sizes and add drive information
-    for app in apps:
-        if "path" in app and os.path.exists(app["path"]):
-            app["size"] = _calculate_size(app["path"])
-            app["drive"] = os.path.splitdrive(app["path"])[0]
+    with stats.phase("sizing") as counters:
+        if defer_sizes:
+            _mark_sizes_pending(apps)
+            counters["deferred"] = sum(1 for app in apps if app.get("size_pending"))
+        else:
+            counters.update(_calculate_sizes(apps))
+    
+    root_fingerprints = get_root_fingerprints()
+    drives = get_drive_inventory()
+    stats.roots = {root: record.get("cost", {}) for root, record in root_fingerprints.items()}
+    stats.drives = [{key: drive.get(key) for key in ["mountpoint", "type", "probe_ms", "timed_out"]}
+                    for drive in drives]
     
     # Save to cache and update last scan time
-    try:
-        with open(cache_path, "w") as f:
-            json.dump(apps, f)
-        
-        # Update last scan time
+    with stats.phase("cache_write") as counters:
+        index = save_scan_cache(apps, meta={
+            "root_fingerprints": root_fingerprints,
+            "drives": drives,
+            "ownership": ownership,
+        })
+        counters["apps"] = len(apps)
+    
+    stats.finish()
+    stats.log_summary()
+    set_scan_meta({"scan_stats": stats.to_dict()})
+    
+    # Without a cached result the next start has to scan again
+    if index.write_failed:
+        logger.warning("Scan completed but couldn't be cached")
+    else:
         timestamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
         set_last_scan_time(timestamp)
         logger.info(f"Scan completed and cached at {timestamp}")
-    except Exception as e:
-        logger.error(f"Error saving cache: {e}")
     
-    return apps
+    if defer_sizes:
+        resume_pending_sizes(index)
+    
+    return index
 
-def _scan_registry() -> List[Dict[str, Any]]:
+def refresh_roots(roots: List[str], changed_paths: List[str]) -> Optional[ScanIndex]:
     """
-    Scan the Windows registry for installed applications.
+    Update the scan result after changes on disk, without a full rescan.
+    
+    The entries under each root in roots are enumerated again, reusing the
+    cached results of unchanged folders. Apps containing one of the changed
+    paths lose their size. Sizes that are missing afterwards are calculated in
+    the background.
+    
+    Args:
+        roots (List[str]): The install roots, AppData directories or home
+            directory whose entries may have changed.
+        changed_paths (List[str]): The paths reported as changed.
     
     Returns:
-        List[Dict[str, Any]]: A list of dictionaries containing information about installed applications.
+        Optional[ScanIndex]: The updated scan index, or None if there is no
+            scan result to update.
     """
-    apps = []
+    index = load_scan_index()
+    if index is None:
+        return None
     
-    # Registry paths to check
-    registry_paths = [
-        (winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"),
-        (winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\WOW6432Node\Microsoft\Windows\CurrentVersion\Uninstall"),
-        (winreg.HKEY_CURRENT_USER, r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"),
-        # Add Microsoft Store apps
-        (winreg.HKEY_CURRENT_USER, r"SOFTWARE\Classes\Local Settings\Software\Microsoft\Windows\CurrentVersion\AppModel\Repository\Packages"),
-        # Add Windows Apps
-        (winreg.HKEY_LOCAL_MACHINE, r"SOFTWARE\Microsoft\Windows\CurrentVersion\App Paths"),
-    ]
-    
-    for hkey, path in registry_paths:
-        try:
-            key = winreg.OpenKey(hkey, path)
-            for i in range(winreg.QueryInfoKey(key)[0]):
-                try:
-                    subkey_name = winreg.EnumKey(key, i)
-                    subkey = winreg.OpenKey(key, subkey_name)
-                    
-                    try:
-                        # For standard applications
-                        if "Uninstall" in path:
-                            name = winreg.QueryValueEx(subkey, "DisplayName")[0]
-                            
-                            # Skip entries without a name
-                            if not name:
-                                continue
-                            
-                            app = {"id": subkey_name, "name": name, "source": "registry"}
-                            
-                            # Get install location
-                            try:
-                                app["path"] = winreg.QueryValueEx(subkey, "InstallLocation")[0]
-                            except Exception:
-                                pass
-                            
-                            # Get uninstall string
-                            try:
-                                app["uninstall"] = winreg.QueryValueEx(subkey, "UninstallString")[0]
-                            except Exception:
-                                pass
-                            
-                            # Get publisher
-                            try:
-                                app["publisher"] = winreg.QueryValueEx(subkey, "Publisher")[0]
-                            except Exception:
-                                pass
-                            
-                            # Get version
-                            try:
-                                app["version"] = winreg.QueryValueEx(subkey, "DisplayVersion")[0]
-                            except Exception:
-                                pass
-                            
-                            # Get install date
-                            try:
-                                app["install_date"] = winreg.QueryValueEx(subkey, "InstallDate")[0]
-                            except Exception:
-                                pass
-                            
-                        # For Microsoft Store apps
-                        elif "Packages" in path:
-                            # Use the package name as the display name if DisplayName is not available
-                            app = {"id": f"msstore-{subkey_name}", "name": subkey_name, "source": "msstore"}
-                            
-                            try:
-                                # Try to get a more user-friendly name
-                                display_name_key = winreg.OpenKey(subkey, "DisplayName")
-                                app["name"] = winreg.QueryValueEx(display_name_key, "")[0]
-                                winreg.CloseKey(display_name_key)
-                            except Exception:
-                                # If we can't get a display name, clean up the package name
-                                app["name"] = subkey_name.split('_')[0].replace('.', ' ')
-                            
-                            # Get package path
-                            try:
-                                path_key = winreg.OpenKey(subkey, "Path")
-                                app["path"] = winreg.QueryValueEx(path_key, "")[0]
-                                winreg.CloseKey(path_key)
-                            except Exception:
-                                pass
-                        
-                        # For Windows App Paths
-                        elif "App Paths" in path:
-                            app = {"id": f"apppath-{subkey_name}", "name": subkey_name, "source": "apppath"}
-                            
-                            # Get executable path
-                            try:
-                                app["path"] = winreg.QueryValueEx(subkey, "")[0]
-                            except Exception:
-                                pass
-                        
-                        apps.append(app)
-                    except Exception as e:
-                        logger.debug(f"Error processing registry key {subkey_name}: {e}")
-                    
-                    winreg.CloseKey(subkey)
-                except Exception as e:
-                    logger.debug(f"Error enumerating registry key {i}: {e}")
-            
-            winreg.CloseKey(key)
-        except Exception as e:
-            logger.debug(f"Error opening registry key {path}: {e}")
+    roots = list(dict.fromkeys(roots))
+    apps = [dict(app) for app in index.apps if app.get("root") not in roots]
+    
+    if roots:
+        install_dirs = get_install_dirs()
+        dot_file_apps = _scan_dot_files()
+        for root in roots:
+            if root in install_dirs:
+                apps.extend(rescan_install_root(root))
+            apps.extend(app for app in dot_file_apps if app.get("root") == root)
+    
+    reuse_sizes(apps, index)
+    
+    # Sizes of apps with changes anywhere inside them are stale
+    changed = [normalize_path(path) for path in changed_paths]
+    for app in apps:
+        if app.get("path") and "sized_at" in app:
+            app_path = normalize_path(app["path"])
+            if any(is_within(path, app_path) for path in changed):
+                app.pop("size", None)
+                app.pop("sized_at", None)
+    
+    apply_ownership(apps)
+    _mark_sizes_pending(apps)
+    index = save_scan_cache(apps)
+    
+    pending = [app for app in index.apps if app.get("size_pending")]
+    if pending:
+        background_sizer.start(pending, _known_sizes(index.apps))
+    
+    logger.info(f"Refreshed {len(roots)} roots and {len(changed_paths)} changed paths, "
+                f"{len(pending)} sizes to recalculate")
+    return index
+
+def resume_pending_sizes(index: ScanIndex) -> bool:
+    """
+    Start calculating sizes in the background for apps whose size is pending.
+    
+    This also picks up sizes left pending by a previous run of the application.
+    
+    Args:
+        index (ScanIndex): The scan index.
+    
+    Returns:
+        bool: True if sizes are being calculated in the background.
+    """
+    if background_sizer.is_running():
+        return True
     
-    # Remove duplicates based on name and path
-    unique_apps = {}
+    pending = [app for app in index.apps if app.get("size_pending")]
+    if not pending:
+        return False
+    
+    background_sizer.start(pending, _known_sizes(index.apps))
+    return True
+
+def _mark_sizes_pending(apps: List[Dict[str, Any]]) -> None:
+    """
+    Add drive information and mark sizes as pending, without touching the disk.
+    
+    Args:
+        apps (List[Dict[str, Any]]): The applications to update in place.
+    """
     for app in apps:
-        # Create a unique key based on name and path if available
-        key = f"{app['name']}_{app.get('path', '')}"
-        # Keep the entry with the most information
-        if key not in unique_apps or len(app) > len(unique_apps[key]):
-            unique_apps[key] = app
+        if app.get("path"):
+            app["drive"] = os.path.splitdrive(app["path"])[0]
+            if "size" not in app:
+                app["size"] = 0
+                app["size_pending"] = True
     
-    return list(unique_apps.values())
+    copy_alias_sizes(apps)
 
-def _scan_file_system() -> List[Dict[str, Any]]:
+def _known_sizes(apps: List[Dict[str, Any]]) -> Dict[str, int]:
     """
-    Scan the file system for installed applications.
+    Get the sizes of applications that don't need calculating: those read
+    from a store's manifest (Steam, Epic) or reused from the scan cache.
+    
+    Args:
+        apps (List[Dict[str, Any]]): The applications.
     
     Returns:
-        List[Dict[str, Any]]: A list of dictionaries containing information about installed applications.
+        Dict[str, int]: The size of each application's path, by path.
     """
-    apps = []
+    return {app["path"]: app["size"] for app in apps
+            if app.get("path") and isinstance(app.get("size"), int)
+            and not app.get("size_pending") and not app.get("alias_of")}
+
+def _calculate_sizes(apps: List[Dict[str, Any]]) -> Dict[str, int]:
+    """
+    Calculate the size and drive of each application whose size isn't known.
     
-    # Common installation directories
-    install_dirs = [
-        os.path.join(os.environ["ProgramFiles"]),
-        os.path.join(os.environ["ProgramFiles(x86)"]),
-        os.path.join(os.environ["LOCALAPPDATA"], "Programs"),
-        os.path.join(os.environ["APPDATA"]),
-        os.path.join(os.environ["LOCALAPPDATA"]),
-        # Add Steam games directory if it exists
-        os.path.join(os.environ["ProgramFiles(x86)"], "Steam", "steamapps", "common"),
-        os.path.join(os.environ["ProgramFiles"], "Steam", "steamapps", "common"),
-        # Add Epic Games directory if it exists
-        os.path.join(os.environ["ProgramFiles"], "Epic Games"),
-        # Add GOG Games directory if it exists
-        os.path.join(os.environ["ProgramFiles"], "GOG Galaxy", "Games"),
-    ]
-    
-    # Filter out non-existent directories
-    install_dirs = [d for d in install_dirs if os.path.exists(d)]
-    
-    # Add all drive roots to scan for game installations
-    for drive in _get_available_drives():
-        game_dirs = [
-            os.path.join(drive, "Games"),
-            os.path.join(drive, "SteamLibrary", "steamapps", "common"),
-            os.path.join(drive, "Epic Games"),
-            os.path.join(drive, "GOG Games"),
-        ]
-        install_dirs.extend([d for d in game_dirs if os.path.exists(d)])
-    
-    for install_dir in install_dirs:
-        try:
-            for app_dir in os.listdir(install_dir):
-                app_path = os.path.join(install_dir, app_dir)
-                if os.path.isdir(app_path):
-                    # Skip system directories and hidden directories
-                    if app_dir.startswith('.') or app_dir in ["Windows", "Program Files", "Program Files (x86)", "Users", "ProgramData"]:
-                        continue
-                    
-                    # Check if this is likely an application by looking for executables
-                    is_app = False
-                    exe_path = None
-                    
-                    # Look for .exe files directly in the directory
-                    for file in os.listdir(app_path):
-                        if file.endswith(".exe") and not file.startswith("unins"):
-                            is_app = True
-                            exe_path = os.path.join(app_path, file)
-                            break
-                    
-                    # If no .exe found, look in bin or similar subdirectories
-                    if not is_app:
-                        for subdir in ["bin", "program", "app"]:
-                            subdir_path = os.path.join(app_path, subdir)
-                            if os.path.exists(subdir_path) and os.path.isdir(subdir_path):
-                                for file in os.listdir(subdir_path):
-                                    if file.endswith(".exe") and not file.startswith("unins"):
-                                        is_app = True
-                                        exe_path = os.path.join(subdir_path, file)
-                                        break
-                    
-                    if is_app:
-                        app_id = app_dir.lower().replace(" ", "-")
-                        app_info = {
-                            "id": f"fs-{app_id}",
-                            "name": app_dir,
-                            "path": app_path,
-                            "source": "file_system",
-                        }
-                        
-                        if exe_path:
-                            app_info["executable"] = exe_path
-                        
-                        apps.append(app_info)
-        except Exception as e:
-            logger.debug(f"Error scanning directory {install_dir}: {e}")
+    All paths are sized by one SizeEngine, so directories nested between
+    applications are only walked once, and the sizes already known (see
+    _known_sizes) are reused by the folders that contain them. Aliases aren't
+    sized; they take the size of the application that owns their path.
     
-    return apps
+    Args:
+        apps (List[Dict[str, Any]]): The applications to update in place.
+    
+    Returns:
+        Dict[str, int]: The number of applications "sized", the
+            "entries_visited" and the "memo_hits" (subtrees reused).
+    """
+    all_apps = apps
+    apps = [app for app in apps if "path" in app and os.path.exists(app["path"])]
+    for app in apps:
+        app["drive"] = os.path.splitdrive(app["path"])[0]
+    
+    known = _known_sizes(apps)
+    apps = [app for app in apps
+            if ("size" not in app or app.get("size_pending")) and not app.get("alias_of")]
+    
+    engine = SizeEngine()
+    sizes = engine.size_many([app["path"] for app in apps], known=known)
+    logger.info(f"Sized {len(apps)} applications, visiting {engine.entries_visited} entries "
+                f"({engine.memo_hits} subtrees reused)")
+    
+    sized_at = time.time()
+    for app in apps:
+        app["size"] = sizes[app["path"]]
+        app["sized_at"] = sized_at
+        app.pop("size_pending", None)
+    
+    copy_alias_sizes(all_apps)
+    
+    return {"sized": len(apps), "entries_visited": engine.entries_visited, "memo_hits": engine.memo_hits}
 
-def _get_available_drives() -> List[str]:
+def _scan_registry(cancel_event: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
     """
-    Get a list of available drive letters on Windows.
+    Scan the Windows registry for installed applications.
+    
+    Args:
+        cancel_event (Optional[threading.Event], optional): Set to stop the scan early. Defaults to None.
     
     Returns:
-        List[str]: A list of drive letters with trailing backslash (e.g., ["C:\\", "D:\\"])
+        List[Dict[str, Any]]: A list of dictionaries containing information about installed applications.
+    """
+    return scan_registry(cancel_event=cancel_event)
+
+def _scan_file_system(cancel_event: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
     """
-    drives = []
+    Scan the file system for installed applications.
     
-    try:
-        # Get all logical drives
-        for drive in range(ord('A'), ord('Z') + 1):
-            drive_letter = chr(drive) + ":\\"
-            if os.path.exists(drive_letter):
-                drives.append(drive_letter)
-    except Exception as e:
-        logger.error(f"Error getting available drives: {e}")
-        # Fallback to common drives
-        drives = ["C:\\"]
+    Args:
+        cancel_event (Optional[threading.Event], optional): Set to stop the scan early. Defaults to None.
     
-    return drives
+    Returns:
+        List[Dict[str, Any]]: A list of dictionaries containing information about installed applications.
+    """
+    return scan_file_system(cancel_event=cancel_event)
 
-def _scan_dot_files() -> List[Dict[str, Any]]:
+def _scan_dot_files(cancel_event: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
     """
     Scan for dot files and application-specific directories in the user's home directory.
     
+    Args:
+        cancel_event (Optional[threading.Event], optional): Set to stop the scan early. Defaults to None.
+    
     Returns:
         List[Dict[str, Any]]: A list of dictionaries containing information about dot files and app data.
     """
@@ -390,16 +412,17 @@ def _scan_dot_files() -> List[Dict[str, Any]]:
                 "name": app_name,
                 "path": item_path,
                 "source": "dot_file",
+                "root": home_dir,
                 "type": "configuration" if os.path.isdir(item_path) else "file"
             })
     
-    # Scan AppData directories for application data
-    appdata_dirs = [
-        os.path.join(os.environ["APPDATA"]),
-        os.path.join(os.environ["LOCALAPPDATA"]),
-    ]
+    # Scan AppData directories for application data, where they're set
+    appdata_dirs = [os.environ.get(env) for env in ["APPDATA", "LOCALAPPDATA"]]
+    appdata_dirs = [os.path.join(appdata_dir) for appdata_dir in appdata_dirs if appdata_dir]
     
     for appdata_dir in appdata_dirs:
+        if cancel_event is not None and cancel_event.is_set():
+            break
         if os.path.exists(appdata_dir):
             try:
                 for app_dir in os.listdir(appdata_dir):
@@ -414,6 +437,7 @@ def _scan_dot_files() -> List[Dict[str, Any]]:
                             "name": f"App Data: {app_dir}",
                             "path": app_path,
                             "source": "app_data",
+                            "root": appdata_dir,
                             "type": "user_data"
                         })
             except Exception as e:
@@ -431,37 +455,12 @@ def _calculate_size(path: str) -> int:
     Returns:
         int: The size in bytes.
     """
-    if not os.path.exists(path):
-        return 0
-    
-    if os.path.isfile(path):
-        try:
-            return os.path.getsize(path)
-        except Exception as e:
-            logger.debug(f"Error getting size of file {path}: {e}")
-            return 0
-    
-    total_size = 0
-    try:
-        # Use psutil for faster disk usage calculation if available
-        if hasattr(psutil, 'disk_usage'):
-            try:
-                return psutil.disk_usage(path).used
-            except:
-                # Fall back to manual calculation
-                pass
-        
-        # Manual calculation
-        for dirpath, dirnames, filenames in os.walk(path):
-            for filename in filenames:
-                file_path = os.path.join(dirpath, filename)
-                try:
-                    # Skip symbolic links to avoid infinite loops
-                    if not os.path.islink(file_path):
-                        total_size += os.path.getsize(file_path)
-                except Exception as e:
-                    logger.debug(f"Error getting size of file {file_path}: {e}")
-    except Exception as e:
-        logger.debug(f"Error walking directory {path}: {e}")
-    
-    return total_size
\ No newline at end of file
+    return SizeEngine().size_of(path)
+
+# Register the built-in scanners
+register_scanner("registry", _scan_registry, timeout=60.0, sources=["registry", "msstore", "apppath"])
+register_scanner("file_system", _scan_file_system, timeout=180.0)
+register_scanner("dot_files", _scan_dot_files, timeout=60.0, sources=["dot_file", "app_data"])
+register_scanner("steam", scan_steam, timeout=30.0)
+register_scanner("epic", scan_epic, timeout=30.0)
+register_scanner("gog", scan_gog, timeout=30.0)
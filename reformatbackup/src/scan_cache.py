@@ -0,0 +1,460 @@
+"""
+ReformatBackup - Scan Cache
+
+This module holds the scan result as an indexed in-memory model, loaded once
+per process and invalidated when the backing store changes. Scan results are
+stored in appscan.json by default, or in the SQLite scan store when the
+"scan_store" setting is "sqlite".
+"""
+
+import os
+import json
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+from reformatbackup.src.config import (
+    get_scan_cache_path,
+    get_scan_meta_path,
+    get_scan_db_path,
+    get_scan_store
+)
+from reformatbackup.src.scan_store import SqliteScanStore
+from reformatbackup.src.utils import atomic_write_json, get_file_stamp
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Type definitions for better type hinting
+AppInfo = Dict[str, Any]
+
+class ScanIndex:
+    """
+    An indexed view of a scan result.
+    
+    Applications are keyed by ID, with secondary indexes on source and drive.
+    The application dictionaries are shared with the cache and must be treated
+    as read-only.
+    """
+    
+    def __init__(self, apps: List[AppInfo]):
+        """
+        Build the indexes for a list of applications.
+        
+        Args:
+            apps (List[AppInfo]): The applications, in scan order.
+        """
+        self.apps = apps
+        self.by_id: Dict[str, AppInfo] = {}
+        self.by_source: Dict[str, List[AppInfo]] = {}
+        self.by_drive: Dict[str, List[AppInfo]] = {}
+        # Set by save_scan_cache when the index couldn't be written
+        self.write_failed = False
+        
+        for app in apps:
+            app_id = app.get("id")
+            # Keep the first entry if an ID was reported twice
+            if app_id is not None and app_id not in self.by_id:
+                self.by_id[app_id] = app
+            
+            self.by_source.setdefault(app.get("source", "unknown"), []).append(app)
+            self.by_drive.setdefault(app.get("drive", "Unknown"), []).append(app)
+    
+    @classmethod
+    def replacing_root(cls, index: Optional["ScanIndex"], root: str,
+                       apps: List[AppInfo]) -> "ScanIndex":
+        """
+        Build a new index with the applications under one install root replaced.
+        
+        Args:
+            index (Optional[ScanIndex]): The current index, if any.
+            root (str): The install root that was rescanned.
+            apps (List[AppInfo]): The applications now found under the root.
+        
+        Returns:
+            ScanIndex: The new index.
+        """
+        kept = [app for app in index.apps if app.get("root") != root] if index else []
+        return cls(kept + apps)
+    
+    @classmethod
+    def updating_apps(cls, index: Optional["ScanIndex"], apps: List[AppInfo]) -> "ScanIndex":
+        """
+        Build a new index with individual applications replaced in place.
+        
+        Args:
+            index (Optional[ScanIndex]): The current index, if any.
+            apps (List[AppInfo]): The updated applications.
+        
+        Returns:
+            ScanIndex: The new index.
+        """
+        updated = {app["id"]: app for app in apps}
+        current = index.apps if index else []
+        return cls([updated.get(app.get("id"), app) for app in current])
+    
+    def __len__(self) -> int:
+        return len(self.apps)
+    
+    def __contains__(self, app_id: str) -> bool:
+        return app_id in self.by_id
+    
+    def get(self, app_id: str) -> Optional[AppInfo]:
+        """
+        Get an application by ID.
+        
+        Args:
+            app_id (str): The ID of the application.
+        
+        Returns:
+            Optional[AppInfo]: The application, or None if it isn't in the scan.
+        """
+        return self.by_id.get(app_id)
+    
+    def get_many(self, app_ids: List[str]) -> List[AppInfo]:
+        """
+        Get several applications by ID, skipping unknown IDs.
+        
+        Args:
+            app_ids (List[str]): The IDs of the applications.
+        
+        Returns:
+            List[AppInfo]: The applications found, in the order requested.
+        """
+        return [self.by_id[app_id] for app_id in app_ids if app_id in self.by_id]
+    
+    def with_source(self, source: str) -> List[AppInfo]:
+        """
+        Get the applications found by a scanner.
+        
+        Args:
+            source (str): The source name (e.g., "registry", "file_system").
+        
+        Returns:
+            List[AppInfo]: The applications from that source.
+        """
+        return self.by_source.get(source, [])
+    
+    def on_drive(self, drive: str) -> List[AppInfo]:
+        """
+        Get the applications installed on a drive.
+        
+        Args:
+            drive (str): The drive (e.g., "C:").
+        
+        Returns:
+            List[AppInfo]: The applications on that drive.
+        """
+        return self.by_drive.get(drive, [])
+
+# Process-wide scan index, invalidated when its backing store changes. The
+# stamp is the file's mtime and size for JSON, and the store's generation
+# counter for SQLite.
+_index_lock = threading.RLock()
+_index: Optional[ScanIndex] = None
+_index_key: Optional[Tuple[str, str]] = None
+_index_stamp: Optional[Any] = None
+
+# Open SQLite scan store, if that backend is in use
+_store: Optional[SqliteScanStore] = None
+
+def get_sqlite_store() -> SqliteScanStore:
+    """
+    Get the SQLite scan store, importing the JSON cache the first time it's opened.
+    
+    Returns:
+        SqliteScanStore: The scan store.
+    """
+    global _store
+    
+    db_path = get_scan_db_path()
+    
+    with _index_lock:
+        if _store is None or _store.db_path != db_path:
+            _store = SqliteScanStore(db_path)
+            _store.import_json(get_scan_cache_path())
+        return _store
+
+def _get_backend() -> Tuple[str, str]:
+    """
+    Get the active scan store backend.
+    
+    Returns:
+        Tuple[str, str]: The backend name ("json" or "sqlite") and its path.
+    """
+    if get_scan_store() == "sqlite":
+        return ("sqlite", get_scan_db_path())
+    return ("json", get_scan_cache_path())
+
+def _get_stamp(key: Tuple[str, str]) -> Optional[Any]:
+    """
+    Get the current stamp of a backend.
+    
+    Args:
+        key (Tuple[str, str]): The backend name and path.
+    
+    Returns:
+        Optional[Any]: The stamp, or None if the backend holds no scan yet.
+    """
+    backend, path = key
+    if backend == "sqlite":
+        generation = get_sqlite_store().get_generation()
+        return generation or None
+    return get_file_stamp(path)
+
+def _set_index(key: Tuple[str, str], index: ScanIndex) -> None:
+    """
+    Store a scan index in the process-wide cache.
+    
+    Args:
+        key (Tuple[str, str]): The backend name and path backing the index.
+        index (ScanIndex): The scan index.
+    """
+    global _index, _index_key, _index_stamp
+    
+    with _index_lock:
+        _index = index
+        _index_key = key
+        _index_stamp = _get_stamp(key)
+
+def invalidate_scan_index() -> None:
+    """
+    Drop the in-memory scan index so the next load reads the backing store.
+    """
+    global _index, _index_key, _index_stamp, _store
+    
+    with _index_lock:
+        _index = None
+        _index_key = None
+        _index_stamp = None
+        if _store is not None:
+            _store.close()
+            _store = None
+
+def load_scan_index() -> Optional[ScanIndex]:
+    """
+    Load the scan index, reading the backing store only if it changed.
+    
+    Returns:
+        Optional[ScanIndex]: The scan index, or None if there is no usable cache.
+    """
+    key = _get_backend()
+    stamp = _get_stamp(key)
+    if stamp is None:
+        return None
+    
+    with _index_lock:
+        if _index is not None and _index_key == key and _index_stamp == stamp:
+            return _index
+    
+    try:
+        if key[0] == "sqlite":
+            apps = get_sqlite_store().load_all()
+        else:
+            with open(key[1], "r") as f:
+                apps = json.load(f)
+    except Exception as e:
+        logger.error(f"Error loading cache: {e}")
+        return None
+    
+    index = ScanIndex(apps)
+    _set_index(key, index)
+    logger.debug(f"Loaded scan cache with {len(index)} applications")
+    return index
+
+def get_scan_meta(key: str, default: Any = None) -> Any:
+    """
+    Get a metadata value stored with the scan result.
+    
+    Args:
+        key (str): The metadata key.
+        default (Any, optional): The value to return if the key doesn't exist. Defaults to None.
+    
+    Returns:
+        Any: The metadata value.
+    """
+    try:
+        if _get_backend()[0] == "sqlite":
+            return get_sqlite_store().get_meta(key, default)
+        
+        meta_path = get_scan_meta_path()
+        if not os.path.exists(meta_path):
+            return default
+        with open(meta_path, "r") as f:
+            return json.load(f).get(key, default)
+    except Exception as e:
+        logger.error(f"Error reading scan metadata: {e}")
+        return default
+
+def set_scan_meta(values: Dict[str, Any]) -> bool:
+    """
+    Store metadata values with the scan result.
+    
+    Args:
+        values (Dict[str, Any]): The metadata keys and values, which must be
+            JSON serializable.
+    
+    Returns:
+        bool: True if the metadata was stored.
+    """
+    try:
+        if _get_backend()[0] == "sqlite":
+            store = get_sqlite_store()
+            for key, value in values.items():
+                store.set_meta(key, value)
+            return True
+        
+        meta_path = get_scan_meta_path()
+        meta = {}
+        if os.path.exists(meta_path):
+            with open(meta_path, "r") as f:
+                meta = json.load(f)
+        meta.update(values)
+        return atomic_write_json(meta_path, meta)
+    except Exception as e:
+        logger.error(f"Error writing scan metadata: {e}")
+        return False
+
+def save_scan_cache(apps: List[AppInfo], meta: Optional[Dict[str, Any]] = None) -> ScanIndex:
+    """
+    Write a full scan result and make it the current index.
+    
+    Args:
+        apps (List[AppInfo]): The applications found by the scan.
+        meta (Optional[Dict[str, Any]], optional): Metadata to store with the
+            scan result. It is only written if the scan result was. Defaults to None.
+    
+    Returns:
+        ScanIndex: The index of the new scan result. It is only cached for
+            later loads if the scan could be written, and has write_failed
+            set otherwise.
+    """
+    key = _get_backend()
+    index = ScanIndex(apps)
+    
+    try:
+        if key[0] == "sqlite":
+            get_sqlite_store().replace_all([app for app in apps if app.get("id")])
+            written = True
+        else:
+            written = atomic_write_json(key[1], apps, indent=None)
+    except Exception as e:
+        logger.error(f"Error saving cache: {e}")
+        written = False
+    
+    if written:
+        _set_index(key, index)
+        if meta:
+            set_scan_meta(meta)
+    else:
+        logger.error("Error saving cache")
+        index.write_failed = True
+    
+    return index
+
+def update_scan_root(root: str, apps: List[AppInfo]) -> ScanIndex:
+    """
+    Replace the applications found under one install root.
+    
+    The SQLite store upserts just the affected rows; the JSON cache has to be
+    rewritten in full.
+    
+    Args:
+        root (str): The install root that was rescanned.
+        apps (List[AppInfo]): The applications now found under the root.
+    
+    Returns:
+        ScanIndex: The updated scan index.
+    """
+    key = _get_backend()
+    
+    with _index_lock:
+        index = ScanIndex.replacing_root(load_scan_index(), root, apps)
+        
+        try:
+            if key[0] == "sqlite":
+                get_sqlite_store().upsert_root(root, [app for app in apps if app.get("id")])
+                _set_index(key, index)
+                return index
+        except Exception as e:
+            logger.error(f"Error updating scan store: {e}")
+            return index
+        
+        return save_scan_cache(index.apps)
+
+def update_scan_apps(apps: List[AppInfo]) -> ScanIndex:
+    """
+    Update individual applications in the scan result.
+    
+    Args:
+        apps (List[AppInfo]): The updated applications.
+    
+    Returns:
+        ScanIndex: The updated scan index.
+    """
+    key = _get_backend()
+    
+    with _index_lock:
+        index = ScanIndex.updating_apps(load_scan_index(), apps)
+        
+        try:
+            if key[0] == "sqlite":
+                get_sqlite_store().update_apps([app for app in apps if app.get("id")])
+                _set_index(key, index)
+                return index
+        except Exception as e:
+            logger.error(f"Error updating scan store: {e}")
+            return index
+        
+        return save_scan_cache(index.apps)
+
+def query_apps(source: Optional[str] = None, drive: Optional[str] = None,
+               name: Optional[str] = None, sort_by: str = "name",
+               limit: Optional[int] = None, offset: int = 0) -> List[AppInfo]:
+    """
+    Query the scan result with optional filters.
+    
+    With the SQLite store the filtering, sorting and paging run as indexed SQL
+    queries; otherwise they run over the in-memory index.
+    
+    Args:
+        source (Optional[str], optional): Only return apps from this source. Defaults to None.
+        drive (Optional[str], optional): Only return apps on this drive. Defaults to None.
+        name (Optional[str], optional): Only return apps whose name contains this text
+            (case-insensitive). Defaults to None.
+        sort_by (str, optional): "name", "size" or "drive". Defaults to "name".
+        limit (Optional[int], optional): The maximum number of apps to return. Defaults to None.
+        offset (int, optional): The number of apps to skip. Defaults to 0.
+    
+    Returns:
+        List[AppInfo]: The matching applications.
+    """
+    if _get_backend()[0] == "sqlite":
+        return get_sqlite_store().query(source, drive, name, sort_by, limit, offset)
+    
+    index = load_scan_index()
+    if index is None:
+        return []
+    
+    if source:
+        apps = index.with_source(source)
+    elif drive:
+        apps = index.on_drive(drive)
+    else:
+        apps = index.apps
+    
+    if drive:
+        apps = [app for app in apps if app.get("drive") == drive]
+    if name:
+        name = name.lower()
+        apps = [app for app in apps if name in app.get("name", "").lower()]
+    
+    if sort_by == "size":
+        apps = sorted(apps, key=lambda app: app.get("size") or 0, reverse=True)
+    elif sort_by == "drive":
+        apps = sorted(apps, key=lambda app: (app.get("drive") or "", app.get("name", "").lower()))
+    else:
+        apps = sorted(apps, key=lambda app: app.get("name", "").lower())
+    
+    end = offset + limit if limit is not None else None
+    return apps[offset:end]
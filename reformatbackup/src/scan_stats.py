@@ -0,0 +1,147 @@
+"""
+ReformatBackup - Scan Statistics
+
+This module records where the time of a scan goes: how long each phase and
+scanner took, what each install root cost, and which errors came up. The
+statistics are stored with the scan and summarized in the log.
+"""
+
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Any, Iterator, Optional
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Most errors kept per scan; later ones are only counted
+MAX_SCAN_ERRORS = 100
+
+class ScanStats:
+    """
+    Statistics of one scan.
+    
+    Phases are recorded in the order they finish, each with its duration in
+    seconds and any counters the phase reports. Scanners run concurrently, so
+    their durations overlap.
+    """
+    
+    def __init__(self):
+        self.started_at = time.time()
+        self._start = time.monotonic()
+        self._lock = threading.Lock()
+        self.phases: Dict[str, Dict[str, Any]] = {}
+        self.roots: Dict[str, Dict[str, Any]] = {}
+        self.drives: List[Dict[str, Any]] = []
+        self.errors: List[Dict[str, str]] = []
+        self.error_count = 0
+        self.incomplete: List[str] = []
+        self.total_seconds: Optional[float] = None
+    
+    def add_phase(self, name: str, seconds: float, **counters: Any) -> None:
+        """
+        Record a finished phase.
+        
+        Args:
+            name (str): The phase name (e.g., "registry", "sizing").
+            seconds (float): How long the phase took.
+            **counters (Any): Counters reported by the phase.
+        """
+        with self._lock:
+            self.phases[name] = dict(counters, seconds=round(seconds, 3))
+    
+    @contextmanager
+    def phase(self, name: str) -> Iterator[Dict[str, Any]]:
+        """
+        Time a phase.
+        
+        Args:
+            name (str): The phase name.
+        
+        Yields:
+            Dict[str, Any]: A dictionary the phase can add counters to.
+        """
+        counters: Dict[str, Any] = {}
+        start = time.monotonic()
+        try:
+            yield counters
+        finally:
+            self.add_phase(name, time.monotonic() - start, **counters)
+    
+    def add_error(self, phase: str, message: str) -> None:
+        """
+        Record an error.
+        
+        Args:
+            phase (str): The phase the error happened in.
+            message (str): The error message.
+        """
+        with self._lock:
+            self.error_count += 1
+            if len(self.errors) < MAX_SCAN_ERRORS:
+                self.errors.append({"phase": phase, "error": message})
+    
+    def add_incomplete(self, scanner: str) -> None:
+        """
+        Record that a scanner didn't finish, so its applications are partly
+        or wholly carried over from the previous scan.
+        
+        Args:
+            scanner (str): The scanner name.
+        """
+        with self._lock:
+            self.incomplete.append(scanner)
+    
+    def finish(self) -> None:
+        """
+        Record the total duration of the scan.
+        """
+        self.total_seconds = round(time.monotonic() - self._start, 3)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        Get the statistics in a JSON serializable form.
+        
+        Returns:
+            Dict[str, Any]: The statistics, with "started_at", "total_seconds",
+                "phases", "roots", "drives", "errors", "error_count" and
+                "incomplete" (the scanners that didn't finish).
+        """
+        with self._lock:
+            return {
+                "started_at": self.started_at,
+                "total_seconds": self.total_seconds,
+                "phases": dict(self.phases),
+                "roots": dict(self.roots),
+                "drives": list(self.drives),
+                "errors": list(self.errors),
+                "error_count": self.error_count,
+                "incomplete": list(self.incomplete),
+            }
+    
+    def log_summary(self, slowest: int = 3) -> None:
+        """
+        Log the duration of each phase and the slowest roots and drives.
+        
+        Args:
+            slowest (int, optional): How many of the slowest roots to log. Defaults to 3.
+        """
+        phases = ", ".join(f"{name} {phase['seconds']:.2f}s" for name, phase in self.phases.items())
+        logger.info(f"Scan took {self.total_seconds or 0:.2f}s: {phases}")
+        
+        roots = sorted(self.roots.items(), key=lambda item: item[1].get("seconds", 0), reverse=True)
+        for root, cost in roots[:slowest]:
+            logger.info(f"Root {root}: {cost.get('seconds', 0):.2f}s, {cost.get('entries', 0)} entries, "
+                        f"{cost.get('inspected', 0)} of {cost.get('folders', 0)} folders inspected, "
+                        f"{cost.get('errors', 0)} errors")
+        
+        for drive in self.drives:
+            if drive.get("timed_out"):
+                logger.info(f"Drive {drive.get('mountpoint')} timed out")
+        
+        if self.error_count:
+            logger.info(f"Scan had {self.error_count} errors")
+        if self.incomplete:
+            logger.info(f"Scanners that didn't finish, partly kept from the previous scan: "
+                        f"{', '.join(self.incomplete)}")
@@ -0,0 +1,356 @@
+"""
+ReformatBackup - SQLite Scan Store
+
+This module provides an optional SQLite-backed store for scan results, with
+indexed queries and partial updates per install root.
+"""
+
+import os
+import json
+import sqlite3
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Iterable
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Type definitions for better type hinting
+AppInfo = Dict[str, Any]
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS apps (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '',
+    source TEXT NOT NULL DEFAULT 'unknown',
+    path TEXT,
+    drive TEXT,
+    size INTEGER,
+    root TEXT,
+    position INTEGER NOT NULL DEFAULT 0,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_apps_source ON apps (source);
+CREATE INDEX IF NOT EXISTS idx_apps_drive ON apps (drive);
+CREATE INDEX IF NOT EXISTS idx_apps_name ON apps (name COLLATE NOCASE);
+CREATE INDEX IF NOT EXISTS idx_apps_root ON apps (root);
+
+CREATE TABLE IF NOT EXISTS app_paths (
+    app_id TEXT NOT NULL REFERENCES apps (id) ON DELETE CASCADE,
+    path TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    PRIMARY KEY (app_id, path)
+);
+CREATE INDEX IF NOT EXISTS idx_app_paths_path ON app_paths (path);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+"""
+
+# App fields stored as data paths, with their kind
+PATH_FIELDS = {
+    "path": "install",
+    "executable": "executable",
+}
+
+class SqliteScanStore:
+    """
+    A scan result stored in SQLite.
+    
+    Every write bumps a generation counter, so readers can cheaply tell whether
+    the store changed since they last loaded it. Connections are kept per thread.
+    """
+    
+    def __init__(self, db_path: str):
+        """
+        Open (and if needed create) a scan store.
+        
+        Args:
+            db_path (str): The path to the SQLite database file.
+        """
+        self.db_path = db_path
+        self._local = threading.local()
+        
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+    
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Get the connection for the current thread.
+        
+        Returns:
+            sqlite3.Connection: The database connection.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA foreign_keys=ON")
+            self._local.conn = conn
+        return conn
+    
+    def close(self) -> None:
+        """
+        Close the connection for the current thread.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+    
+    def _bump_generation(self, conn: sqlite3.Connection) -> None:
+        conn.execute(
+            "INSERT INTO meta (key, value) VALUES ('generation', '1') "
+            "ON CONFLICT (key) DO UPDATE SET value = CAST(value AS INTEGER) + 1"
+        )
+    
+    def _upsert(self, conn: sqlite3.Connection, apps: Iterable[AppInfo], start: int = 0,
+                keep_positions: bool = False) -> None:
+        """
+        Insert or update applications and their data paths.
+        
+        Args:
+            conn (sqlite3.Connection): The database connection.
+            apps (Iterable[AppInfo]): The applications to write.
+            start (int, optional): The position of the first new application. Defaults to 0.
+            keep_positions (bool, optional): Whether applications already in the store
+                keep their position. Defaults to False.
+        """
+        position_update = "" if keep_positions else ", position = excluded.position"
+        
+        for position, app in enumerate(apps, start):
+            conn.execute(
+                "INSERT INTO apps (id, name, source, path, drive, size, root, position, data) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET name = excluded.name, source = excluded.source, "
+                "path = excluded.path, drive = excluded.drive, size = excluded.size, "
+                f"root = excluded.root, data = excluded.data{position_update}",
+                (
+                    app["id"],
+                    app.get("name", ""),
+                    app.get("source", "unknown"),
+                    app.get("path"),
+                    app.get("drive"),
+                    app.get("size"),
+                    app.get("root"),
+                    position,
+                    json.dumps(app),
+                ),
+            )
+            conn.execute("DELETE FROM app_paths WHERE app_id = ?", (app["id"],))
+            conn.executemany(
+                "INSERT OR IGNORE INTO app_paths (app_id, path, kind) VALUES (?, ?, ?)",
+                [(app["id"], app[field], kind) for field, kind in PATH_FIELDS.items() if app.get(field)],
+            )
+    
+    def get_generation(self) -> int:
+        """
+        Get the store's generation counter.
+        
+        Returns:
+            int: A number that changes whenever the store is written.
+        """
+        row = self._connect().execute("SELECT value FROM meta WHERE key = 'generation'").fetchone()
+        return int(row["value"]) if row else 0
+    
+    def count(self) -> int:
+        """
+        Count the applications in the store.
+        
+        Returns:
+            int: The number of applications.
+        """
+        return self._connect().execute("SELECT COUNT(*) FROM apps").fetchone()[0]
+    
+    def replace_all(self, apps: List[AppInfo]) -> None:
+        """
+        Replace the whole scan result.
+        
+        Args:
+            apps (List[AppInfo]): The applications found by the scan.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute("DELETE FROM app_paths")
+            conn.execute("DELETE FROM apps")
+            self._upsert(conn, apps)
+            self._bump_generation(conn)
+    
+    def upsert_root(self, root: str, apps: List[AppInfo]) -> None:
+        """
+        Replace the applications found under one install root.
+        
+        Applications previously found under the root but missing from `apps`
+        are removed; everything else in the store is left untouched.
+        
+        Args:
+            root (str): The install root that was rescanned.
+            apps (List[AppInfo]): The applications now found under the root.
+        """
+        conn = self._connect()
+        with conn:
+            ids = {app["id"] for app in apps}
+            stale = [
+                (row["id"],) for row in conn.execute("SELECT id FROM apps WHERE root = ?", (root,))
+                if row["id"] not in ids
+            ]
+            conn.executemany("DELETE FROM app_paths WHERE app_id = ?", stale)
+            conn.executemany("DELETE FROM apps WHERE id = ?", stale)
+            
+            # New apps go after the existing ones, which keep their position
+            start = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM apps").fetchone()[0]
+            self._upsert(conn, apps, start, keep_positions=True)
+            self._bump_generation(conn)
+    
+    def update_apps(self, apps: List[AppInfo]) -> None:
+        """
+        Update individual applications in place, keeping their positions.
+        
+        Args:
+            apps (List[AppInfo]): The updated applications.
+        """
+        conn = self._connect()
+        with conn:
+            start = conn.execute("SELECT COALESCE(MAX(position), -1) + 1 FROM apps").fetchone()[0]
+            self._upsert(conn, apps, start, keep_positions=True)
+            self._bump_generation(conn)
+    
+    def load_all(self) -> List[AppInfo]:
+        """
+        Load every application in scan order.
+        
+        Returns:
+            List[AppInfo]: The applications.
+        """
+        rows = self._connect().execute("SELECT data FROM apps ORDER BY position").fetchall()
+        return [json.loads(row["data"]) for row in rows]
+    
+    def get(self, app_id: str) -> Optional[AppInfo]:
+        """
+        Get an application by ID.
+        
+        Args:
+            app_id (str): The ID of the application.
+        
+        Returns:
+            Optional[AppInfo]: The application, or None if it isn't in the store.
+        """
+        row = self._connect().execute("SELECT data FROM apps WHERE id = ?", (app_id,)).fetchone()
+        return json.loads(row["data"]) if row else None
+    
+    def query(self, source: Optional[str] = None, drive: Optional[str] = None,
+              name: Optional[str] = None, sort_by: str = "name",
+              limit: Optional[int] = None, offset: int = 0) -> List[AppInfo]:
+        """
+        Query applications with optional filters.
+        
+        Args:
+            source (Optional[str], optional): Only return apps from this source. Defaults to None.
+            drive (Optional[str], optional): Only return apps on this drive. Defaults to None.
+            name (Optional[str], optional): Only return apps whose name contains this text
+                (case-insensitive). Defaults to None.
+            sort_by (str, optional): "name", "size" or "drive". Defaults to "name".
+            limit (Optional[int], optional): The maximum number of apps to return. Defaults to None.
+            offset (int, optional): The number of apps to skip. Defaults to 0.
+        
+        Returns:
+            List[AppInfo]: The matching applications.
+        """
+        clauses = []
+        params: List[Any] = []
+        
+        if source:
+            clauses.append("source = ?")
+            params.append(source)
+        if drive:
+            clauses.append("drive = ?")
+            params.append(drive)
+        if name:
+            clauses.append("name LIKE ? ESCAPE '\\' COLLATE NOCASE")
+            escaped = name.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            params.append(f"%{escaped}%")
+        
+        order = {
+            "size": "size DESC",
+            "drive": "drive, name COLLATE NOCASE",
+        }.get(sort_by, "name COLLATE NOCASE")
+        
+        sql = "SELECT data FROM apps"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += f" ORDER BY {order}"
+        if limit is not None:
+            sql += " LIMIT ? OFFSET ?"
+            params.extend([limit, offset])
+        
+        rows = self._connect().execute(sql, params).fetchall()
+        return [json.loads(row["data"]) for row in rows]
+    
+    def get_meta(self, key: str, default: Any = None) -> Any:
+        """
+        Get a metadata value stored with the scan.
+        
+        Args:
+            key (str): The metadata key.
+            default (Any, optional): The value to return if the key doesn't exist. Defaults to None.
+        
+        Returns:
+            Any: The decoded metadata value.
+        """
+        row = self._connect().execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        if row is None or row["value"] is None:
+            return default
+        try:
+            return json.loads(row["value"])
+        except ValueError:
+            return default
+    
+    def set_meta(self, key: str, value: Any) -> None:
+        """
+        Store a metadata value with the scan.
+        
+        Args:
+            key (str): The metadata key.
+            value (Any): The value, which must be JSON serializable.
+        """
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)", (key, json.dumps(value))
+            )
+    
+    def import_json(self, json_path: str) -> int:
+        """
+        Import an existing appscan.json cache, once.
+        
+        Args:
+            json_path (str): The path to the JSON scan cache.
+        
+        Returns:
+            int: The number of applications imported, or 0 if there was nothing
+                to import or the import already happened.
+        """
+        if self.get_meta("json_imported") or not os.path.exists(json_path):
+            return 0
+        
+        try:
+            with open(json_path, "r") as f:
+                apps = json.load(f)
+        except Exception as e:
+            logger.error(f"Error reading scan cache for import: {e}")
+            return 0
+        
+        # Drop entries without an ID, which can't be keyed
+        apps = [app for app in apps if app.get("id")]
+        
+        if self.count() == 0:
+            self.replace_all(apps)
+        self.set_meta("json_imported", json_path)
+        
+        logger.info(f"Imported {len(apps)} applications from {json_path}")
+        return len(apps)
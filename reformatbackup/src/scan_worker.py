@@ -0,0 +1,209 @@
+"""
+ReformatBackup - Background Scan Worker
+
+This module runs application scans on a background thread inside the web
+server, on a schedule and on demand. Requests are served from the last
+completed scan and never wait for scan I/O.
+"""
+
+import time
+import logging
+import threading
+from typing import Dict, Any, Optional
+
+from reformatbackup.src.config import get_last_scan_time, get_watch_filesystem
+from reformatbackup.src.scan_cache import ScanIndex, load_scan_index
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# How often the worker checks whether a scheduled rescan is due, in seconds
+SCAN_CHECK_INTERVAL = 60.0
+
+class ScanWorker:
+    """
+    Runs application scans on a daemon thread.
+    
+    The thread scans when a scan is requested, when there is no scan result
+    yet, and when auto-rescan is enabled, the last scan is older than the
+    scan interval and the file system watcher isn't running. Only one scan
+    runs at a time; requests made during a scan queue one more scan after it.
+    """
+    
+    def __init__(self, check_interval: float = SCAN_CHECK_INTERVAL):
+        """
+        Create a scan worker. The thread isn't started until start is called.
+        
+        Args:
+            check_interval (float, optional): How often to check whether a
+                scheduled rescan is due, in seconds. Defaults to SCAN_CHECK_INTERVAL.
+        """
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._requested = False
+        self._scanning = False
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._duration: Optional[float] = None
+        self._error: Optional[str] = None
+    
+    def start(self) -> None:
+        """
+        Start the worker thread if it isn't running.
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            
+            self._stopping = False
+            self._thread = threading.Thread(target=self._loop, name="scan-worker", daemon=True)
+            self._thread.start()
+        
+        logger.info("Background scan worker started")
+        
+        if get_watch_filesystem():
+            from reformatbackup.src.watcher import file_watcher
+            file_watcher.start()
+    
+    def stop(self, timeout: Optional[float] = None) -> None:
+        """
+        Stop the worker thread after the scan in progress, if any.
+        
+        Args:
+            timeout (Optional[float], optional): How long to wait for the
+                thread to finish, in seconds. Defaults to None (don't wait).
+        """
+        with self._lock:
+            self._stopping = True
+            thread = self._thread
+        
+        self._wake.set()
+        if thread is not None and timeout is not None:
+            thread.join(timeout)
+    
+    def request_scan(self) -> None:
+        """
+        Ask for a full rescan. It runs as soon as the worker is free.
+        """
+        with self._lock:
+            self._requested = True
+        
+        self._wake.set()
+    
+    def is_scanning(self) -> bool:
+        """
+        Check whether a scan is in progress.
+        
+        Returns:
+            bool: True if the worker is scanning.
+        """
+        with self._lock:
+            return self._scanning
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get the state of the worker.
+        
+        Returns:
+            Dict[str, Any]: The status, with "scanning", "queued" (a rescan
+                was requested and hasn't started), "started_at" and
+                "finished_at" (of the latest scan, as Unix times), "duration"
+                (of the last completed scan, in seconds), "error" (of the
+                last scan, if it failed) and "last_scan_time".
+        """
+        with self._lock:
+            return {
+                "scanning": self._scanning,
+                "queued": self._requested,
+                "started_at": self._started_at,
+                "finished_at": self._finished_at,
+                "duration": self._duration,
+                "error": self._error,
+                "last_scan_time": get_last_scan_time(),
+            }
+    
+    def _is_due(self) -> bool:
+        """
+        Check whether a scan should run now.
+        
+        Returns:
+            bool: True if a scan was requested, there is no scan result yet,
+                or a scheduled rescan is due. Scheduled rescans are skipped
+                while the file system watcher keeps the scan current.
+        """
+        from reformatbackup.src.scan import is_scan_stale
+        from reformatbackup.src.watcher import file_watcher
+        
+        with self._lock:
+            if self._requested:
+                return True
+        
+        if load_scan_index() is None:
+            return True
+        return is_scan_stale() and not file_watcher.is_running()
+    
+    def _loop(self) -> None:
+        """
+        Check for due scans until stopped.
+        """
+        while True:
+            with self._lock:
+                if self._stopping:
+                    return
+            
+            try:
+                if self._is_due():
+                    self._run_scan()
+            except Exception as e:
+                logger.error(f"Error in background scan worker: {e}")
+            
+            self._wake.wait(self.check_interval)
+            self._wake.clear()
+    
+    def _run_scan(self) -> None:
+        """
+        Run a full scan and start calculating sizes in the background.
+        """
+        from reformatbackup.src.scan import get_scan_index, resume_pending_sizes
+        
+        with self._lock:
+            self._requested = False
+            self._scanning = True
+            self._started_at = time.time()
+            self._error = None
+        
+        start = time.monotonic()
+        error = None
+        try:
+            index = get_scan_index(force_rescan=True, defer_sizes=True)
+            resume_pending_sizes(index)
+        except Exception as e:
+            logger.error(f"Error running background scan: {e}")
+            error = str(e)
+        
+        with self._lock:
+            self._scanning = False
+            self._finished_at = time.time()
+            self._error = error
+            if error is None:
+                self._duration = round(time.monotonic() - start, 1)
+        
+        if error is None:
+            logger.info(f"Background scan finished in {self._duration}s")
+
+def get_scan_snapshot() -> ScanIndex:
+    """
+    Get the last completed scan without scanning.
+    
+    Returns:
+        ScanIndex: The last scan result, or an empty index if no scan has
+            completed yet.
+    """
+    index = load_scan_index()
+    return index if index is not None else ScanIndex([])
+
+# Process-wide scan worker
+scan_worker = ScanWorker()
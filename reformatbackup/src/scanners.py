@@ -0,0 +1,235 @@
+"""
+ReformatBackup - Scanner Orchestration
+
+This module keeps the registry of application scanners and runs them
+concurrently, each with its own time budget.
+"""
+
+import time
+import queue
+import logging
+import threading
+from typing import Callable, Dict, List, Any, Optional
+
+from reformatbackup.src.scan_stats import ScanStats
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Type definitions for better type hinting
+AppInfo = Dict[str, Any]
+ScannerFunc = Callable[[threading.Event], List[AppInfo]]
+
+# Default time budget for a scanner, in seconds
+DEFAULT_SCANNER_TIMEOUT = 120.0
+
+# How long a cancelled scanner gets to hand back its partial results
+CANCEL_GRACE_SECONDS = 2.0
+
+class Scanner:
+    """
+    A registered application scanner.
+    
+    The scanner function receives a cancellation event. Long-running scanners
+    should check it between units of work and return what they have found so
+    far once it is set.
+    """
+    
+    def __init__(self, name: str, func: ScannerFunc, timeout: float = DEFAULT_SCANNER_TIMEOUT,
+                 sources: Optional[List[str]] = None):
+        """
+        Describe a scanner.
+        
+        Args:
+            name (str): A unique name for the scanner (e.g., "registry").
+            func (ScannerFunc): The function that performs the scan.
+            timeout (float, optional): The scanner's time budget in seconds.
+                Defaults to DEFAULT_SCANNER_TIMEOUT.
+            sources (Optional[List[str]], optional): The "source" values of
+                the applications it finds. Defaults to [name].
+        """
+        self.name = name
+        self.func = func
+        self.timeout = timeout
+        self.sources = sources or [name]
+
+# Registered scanners, in the order their results are merged
+_scanners: List[Scanner] = []
+
+def register_scanner(name: str, func: ScannerFunc, timeout: float = DEFAULT_SCANNER_TIMEOUT,
+                     sources: Optional[List[str]] = None) -> None:
+    """
+    Register an application scanner, replacing any scanner with the same name.
+    
+    Args:
+        name (str): A unique name for the scanner (e.g., "registry").
+        func (ScannerFunc): The function that performs the scan.
+        timeout (float, optional): The scanner's time budget in seconds.
+            Defaults to DEFAULT_SCANNER_TIMEOUT.
+        sources (Optional[List[str]], optional): The "source" values of the
+            applications it finds. Defaults to [name].
+    """
+    for i, scanner in enumerate(_scanners):
+        if scanner.name == name:
+            _scanners[i] = Scanner(name, func, timeout, sources)
+            return
+    
+    _scanners.append(Scanner(name, func, timeout, sources))
+
+def get_scanners() -> List[Scanner]:
+    """
+    Get the registered scanners.
+    
+    Returns:
+        List[Scanner]: The scanners, in registration order.
+    """
+    return list(_scanners)
+
+def _carry_over(scanner: Scanner, previous: Optional[Any], found: List[AppInfo]) -> List[AppInfo]:
+    """
+    Get the applications a scanner that didn't finish found in the previous
+    scan and hasn't found again.
+    
+    Args:
+        scanner (Scanner): The scanner.
+        previous (Optional[ScanIndex]): The previous scan result, if any.
+        found (List[AppInfo]): What the scanner returned this time.
+    
+    Returns:
+        List[AppInfo]: Copies of the previous scan's applications.
+    """
+    if previous is None:
+        return []
+    found_ids = {app.get("id") for app in found}
+    return [dict(app) for source in scanner.sources for app in previous.with_source(source)
+            if app.get("id") not in found_ids]
+
+def run_scanners(scanners: Optional[List[Scanner]] = None,
+                 on_result: Optional[Callable[[str, List[AppInfo]], None]] = None,
+                 stats: Optional[ScanStats] = None,
+                 previous: Optional[Any] = None) -> List[AppInfo]:
+    """
+    Run scanners concurrently and merge their results.
+    
+    Each scanner runs on its own daemon thread, so a scanner stuck on a slow or
+    disconnected drive can't stall the scan: once its time budget is spent it
+    is asked to cancel, and whatever it returns within CANCEL_GRACE_SECONDS is
+    kept as a partial result. A scanner that doesn't return by then is
+    abandoned. The applications a cancelled, abandoned or failed scanner
+    found in the previous scan and didn't find this time are kept, so a slow
+    drive doesn't drop them from the list. The total wall time is roughly
+    that of the slowest scanner, capped by the largest time budget.
+    
+    Args:
+        scanners (Optional[List[Scanner]], optional): The scanners to run.
+            Defaults to all registered scanners.
+        on_result (Optional[Callable[[str, List[AppInfo]], None]], optional):
+            Called with the scanner name and its applications as each scanner
+            finishes. Defaults to None.
+        stats (Optional[ScanStats], optional): Records each scanner as a phase,
+            with its number of applications, the number "kept" from the
+            previous scan and whether it "completed", was "cancelled",
+            "abandoned" or "failed". Scanners that didn't complete are also
+            recorded as incomplete. Defaults to None.
+        previous (Optional[ScanIndex], optional): The previous scan result,
+            to keep applications from for scanners that don't finish.
+            Defaults to None.
+    
+    Returns:
+        List[AppInfo]: The applications found, in scanner registration order.
+    """
+    if scanners is None:
+        scanners = get_scanners()
+    by_name = {scanner.name: scanner for scanner in scanners}
+    
+    results: "queue.Queue" = queue.Queue()
+    cancel_events: Dict[str, threading.Event] = {}
+    deadlines: Dict[str, float] = {}
+    started: Dict[str, float] = {}
+    
+    def run(scanner: Scanner, cancel_event: threading.Event) -> None:
+        try:
+            results.put((scanner.name, scanner.func(cancel_event), None))
+        except Exception as e:
+            results.put((scanner.name, [], e))
+    
+    for scanner in scanners:
+        cancel_event = threading.Event()
+        cancel_events[scanner.name] = cancel_event
+        started[scanner.name] = time.monotonic()
+        deadlines[scanner.name] = started[scanner.name] + scanner.timeout
+        
+        thread = threading.Thread(target=run, args=(scanner, cancel_event),
+                                  name=f"scanner-{scanner.name}", daemon=True)
+        thread.start()
+    
+    merged: Dict[str, List[AppInfo]] = {}
+    pending = set(deadlines)
+    
+    while pending:
+        now = time.monotonic()
+        
+        # Cancel scanners that used up their time budget, and give up on
+        # cancelled scanners that didn't return in time
+        for name in [n for n in pending if deadlines[n] <= now]:
+            if cancel_events[name].is_set():
+                logger.error(f"Scanner {name} didn't stop after cancellation, abandoning it")
+                pending.discard(name)
+                merged[name] = _carry_over(by_name[name], previous, [])
+                if stats is not None:
+                    stats.add_phase(name, now - started[name], apps=0, kept=len(merged[name]), status="abandoned")
+                    stats.add_error(name, "Didn't stop after cancellation")
+                    stats.add_incomplete(name)
+            else:
+                logger.warning(f"Scanner {name} timed out after {now - started[name]:.1f}s, cancelling")
+                cancel_events[name].set()
+                deadlines[name] = now + CANCEL_GRACE_SECONDS
+        
+        if not pending:
+            break
+        
+        try:
+            name, apps, error = results.get(timeout=min(deadlines[n] for n in pending) - now)
+        except queue.Empty:
+            continue
+        
+        if name not in pending:
+            # Finished after it was abandoned
+            continue
+        pending.discard(name)
+        
+        elapsed = time.monotonic() - started[name]
+        if error is not None:
+            logger.error(f"Error in {name} scanner: {error}")
+            merged[name] = _carry_over(by_name[name], previous, [])
+            if stats is not None:
+                stats.add_phase(name, elapsed, apps=0, kept=len(merged[name]), status="failed")
+                stats.add_error(name, str(error))
+                stats.add_incomplete(name)
+            continue
+        
+        kept: List[AppInfo] = []
+        if cancel_events[name].is_set():
+            kept = _carry_over(by_name[name], previous, apps)
+            logger.warning(f"Scanner {name} returned {len(apps)} applications before cancelling, "
+                           f"keeping {len(kept)} more from the previous scan")
+        else:
+            logger.info(f"Scanner {name} found {len(apps)} applications in {elapsed:.1f}s")
+        merged[name] = apps + kept
+        if stats is not None:
+            stats.add_phase(name, elapsed, apps=len(apps), kept=len(kept),
+                            status="cancelled" if cancel_events[name].is_set() else "completed")
+            if cancel_events[name].is_set():
+                stats.add_incomplete(name)
+        
+        if on_result is not None:
+            try:
+                on_result(name, apps)
+            except Exception as e:
+                logger.error(f"Error handling {name} scanner results: {e}")
+    
+    apps = []
+    for scanner in scanners:
+        apps.extend(merged.get(scanner.name, []))
+    
+    return apps
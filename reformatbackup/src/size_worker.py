@@ -0,0 +1,192 @@
+"""
+ReformatBackup - Background Size Calculation
+
+This module calculates application sizes on a background thread after a fast
+enumeration, writing them into the scan cache as they finish so the UI can
+fill them in progressively.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Tuple
+
+from reformatbackup.src.scan_cache import update_scan_apps, set_scan_meta
+from reformatbackup.src.sizing import SizeEngine
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Type definitions for better type hinting
+AppInfo = Dict[str, Any]
+
+# Number of paths sized between progress updates
+SIZE_BATCH = 16
+
+# How often computed sizes are written to the scan cache, in seconds
+FLUSH_INTERVAL = 2.0
+
+class BackgroundSizer:
+    """
+    Calculates application sizes on a background thread.
+    
+    Each computed size gets a sequence number, so pollers can ask for just the
+    sizes computed since their last poll.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._cancel_event: Optional[threading.Event] = None
+        self._total = 0
+        self._done = 0
+        self._seq = 0
+        self._updates: List[Tuple[int, str, int]] = []
+    
+    def is_running(self) -> bool:
+        """
+        Check whether sizes are being calculated.
+        
+        Returns:
+            bool: True if the background thread is running.
+        """
+        with self._lock:
+            return self._thread is not None and self._thread.is_alive()
+    
+    def start(self, apps: List[AppInfo], known: Optional[Dict[str, int]] = None) -> None:
+        """
+        Start calculating the sizes of applications, cancelling any run in progress.
+        
+        Args:
+            apps (List[AppInfo]): The applications to size. They are not
+                modified; updated copies are written to the scan cache.
+            known (Optional[Dict[str, int]], optional): Sizes that don't need
+                calculating, by path, for the folders containing them to
+                reuse (see SizeEngine.size_many). Defaults to None.
+        """
+        apps = [app for app in apps if app.get("path") and app.get("id")]
+        
+        with self._lock:
+            if self._cancel_event is not None:
+                self._cancel_event.set()
+            
+            cancel_event = threading.Event()
+            self._cancel_event = cancel_event
+            self._total = len(apps)
+            self._done = 0
+            self._updates = []
+            
+            self._thread = threading.Thread(target=self._run, args=(apps, known or {}, cancel_event),
+                                            name="background-sizer", daemon=True)
+            self._thread.start()
+        
+        logger.info(f"Calculating sizes of {len(apps)} applications in the background")
+    
+    def cancel(self) -> None:
+        """
+        Stop the run in progress, if any.
+        """
+        with self._lock:
+            if self._cancel_event is not None:
+                self._cancel_event.set()
+    
+    def _run(self, apps: List[AppInfo], known: Dict[str, int], cancel_event: threading.Event) -> None:
+        """
+        Calculate sizes in batches and write them to the scan cache.
+        
+        Args:
+            apps (List[AppInfo]): The applications to size.
+            known (Dict[str, int]): Sizes that don't need calculating, by path.
+            cancel_event (threading.Event): Set to stop early.
+        """
+        start = time.monotonic()
+        engine = SizeEngine()
+        pending: List[AppInfo] = []
+        last_flush = time.monotonic()
+        
+        # Aliases take the size of the app that owns their path instead of
+        # being sized themselves
+        owner_ids = {app["id"] for app in apps if not app.get("alias_of")}
+        aliases: Dict[str, List[AppInfo]] = {}
+        for app in apps:
+            if app.get("alias_of") in owner_ids:
+                aliases.setdefault(app["alias_of"], []).append(app)
+        apps = [app for app in apps if app.get("alias_of") not in owner_ids]
+        
+        # Size the deepest paths first so their parents reuse the results
+        apps = sorted(apps, key=lambda app: os.path.abspath(app["path"]).count(os.sep), reverse=True)
+        
+        try:
+            for i in range(0, len(apps), SIZE_BATCH):
+                if cancel_event.is_set():
+                    logger.info("Background size calculation cancelled")
+                    return
+                
+                batch = apps[i:i + SIZE_BATCH]
+                sizes = engine.size_many([app["path"] for app in batch], known=known)
+                
+                sized = []
+                for app in batch:
+                    for target in [app] + aliases.get(app["id"], []):
+                        updated = dict(target)
+                        updated["size"] = sizes[app["path"]]
+                        updated["sized_at"] = time.time()
+                        updated.pop("size_pending", None)
+                        sized.append(updated)
+                pending.extend(sized)
+                
+                with self._lock:
+                    if cancel_event.is_set():
+                        return
+                    for app in sized:
+                        self._seq += 1
+                        self._updates.append((self._seq, app["id"], app["size"]))
+                    self._done += len(sized)
+                
+                if time.monotonic() - last_flush >= FLUSH_INTERVAL:
+                    update_scan_apps(pending)
+                    pending = []
+                    last_flush = time.monotonic()
+            
+            if pending and not cancel_event.is_set():
+                update_scan_apps(pending)
+            
+            elapsed = time.monotonic() - start
+            logger.info(f"Calculated sizes of {len(apps)} paths in {elapsed:.1f}s, "
+                        f"visiting {engine.entries_visited} entries")
+            set_scan_meta({"background_sizing": {
+                "finished_at": time.time(),
+                "seconds": round(elapsed, 3),
+                "sized": len(apps),
+                "entries_visited": engine.entries_visited,
+                "memo_hits": engine.memo_hits,
+            }})
+        except Exception as e:
+            logger.error(f"Error calculating sizes in the background: {e}")
+    
+    def get_status(self, since: int = 0) -> Dict[str, Any]:
+        """
+        Get the progress of the background size calculation.
+        
+        Args:
+            since (int, optional): Only include sizes with a sequence number
+                greater than this. Defaults to 0.
+        
+        Returns:
+            Dict[str, Any]: The status, with "running", "total", "done", "seq"
+                (the latest sequence number) and "sizes" (app ID to size).
+        """
+        with self._lock:
+            running = self._thread is not None and self._thread.is_alive()
+            sizes = {app_id: size for seq, app_id, size in self._updates if seq > since}
+            return {
+                "running": running,
+                "total": self._total,
+                "done": self._done,
+                "seq": self._seq,
+                "sizes": sizes,
+            }
+
+# Process-wide background sizer
+background_sizer = BackgroundSizer()
@@ -0,0 +1,239 @@
+"""
+ReformatBackup - Size Calculation
+
+This module calculates the on-disk size of application directories, walking
+subtrees in parallel with os.scandir and memoizing the sizes of requested
+paths so nested paths are never walked twice.
+"""
+
+import os
+import stat
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Default number of threads used to walk subtrees
+DEFAULT_SIZE_WORKERS = 8
+
+def _normalize(path: str) -> str:
+    """
+    Normalize a path for use as a memo key.
+    
+    Args:
+        path (str): The path to normalize.
+    
+    Returns:
+        str: The absolute, case-normalized path.
+    """
+    return os.path.normcase(os.path.abspath(path))
+
+def _is_link(entry: os.DirEntry) -> bool:
+    """
+    Check whether a directory entry is a symbolic link or a junction.
+    
+    Junctions are reparse points that DirEntry.is_symlink() doesn't report
+    before Python 3.12; on Windows the attributes come from the directory
+    listing, so this costs no extra system call.
+    
+    Args:
+        entry (os.DirEntry): The directory entry.
+    
+    Returns:
+        bool: True if the entry should not be followed.
+    """
+    if entry.is_symlink():
+        return True
+    if os.name == "nt":
+        attributes = entry.stat(follow_symlinks=False).st_file_attributes
+        return bool(attributes & stat.FILE_ATTRIBUTE_REPARSE_POINT)
+    return False
+
+class SizeEngine:
+    """
+    Calculates directory sizes with memoization of requested subtrees.
+    
+    Use one engine per scan: sizes are memoized for the lifetime of the engine,
+    so a parent directory sized after its children reuses their totals, and a
+    child sized after its parent is a lookup.
+    """
+    
+    def __init__(self, max_workers: int = DEFAULT_SIZE_WORKERS):
+        """
+        Create a size engine.
+        
+        Args:
+            max_workers (int, optional): The number of threads used to walk
+                subtrees. Defaults to DEFAULT_SIZE_WORKERS.
+        """
+        self.max_workers = max_workers
+        self.entries_visited = 0
+        self.memo_hits = 0
+        self._memo: Dict[str, int] = {}
+    
+    def _walk(self, path: str) -> Tuple[int, int, int]:
+        """
+        Walk a directory tree and add up file sizes.
+        
+        Symbolic links and junctions are not followed. Subdirectories already in
+        the memo are not walked again.
+        
+        Args:
+            path (str): The absolute path of the directory.
+        
+        Returns:
+            Tuple[int, int, int]: The total size in bytes, the number of entries
+                visited and the number of memo hits.
+        """
+        total = 0
+        entries = 0
+        hits = 0
+        memo = self._memo
+        stack = [path]
+        
+        while stack:
+            current = stack.pop()
+            try:
+                with os.scandir(current) as it:
+                    for entry in it:
+                        entries += 1
+                        try:
+                            if entry.is_dir(follow_symlinks=False):
+                                if _is_link(entry):
+                                    continue
+                                cached = memo.get(os.path.normcase(entry.path)) if memo else None
+                                if cached is not None:
+                                    total += cached
+                                    hits += 1
+                                else:
+                                    stack.append(entry.path)
+                            elif entry.is_file(follow_symlinks=False):
+                                total += entry.stat(follow_symlinks=False).st_size
+                        except OSError as e:
+                            logger.debug(f"Error getting size of {entry.path}: {e}")
+            except OSError as e:
+                logger.debug(f"Error walking directory {current}: {e}")
+        
+        return total, entries, hits
+    
+    def _split(self, path: str) -> Tuple[int, List[str]]:
+        """
+        List the top level of a directory, splitting it into work units.
+        
+        Args:
+            path (str): The absolute path of the directory.
+        
+        Returns:
+            Tuple[int, List[str]]: The size of the files and memoized
+                subdirectories at the top level, and the subdirectories that
+                still need to be walked.
+        """
+        total = 0
+        subdirs = []
+        
+        try:
+            with os.scandir(path) as it:
+                for entry in it:
+                    self.entries_visited += 1
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            if _is_link(entry):
+                                continue
+                            cached = self._memo.get(os.path.normcase(entry.path))
+                            if cached is not None:
+                                total += cached
+                                self.memo_hits += 1
+                            else:
+                                subdirs.append(entry.path)
+                        elif entry.is_file(follow_symlinks=False):
+                            total += entry.stat(follow_symlinks=False).st_size
+                    except OSError as e:
+                        logger.debug(f"Error getting size of {entry.path}: {e}")
+        except OSError as e:
+            logger.debug(f"Error walking directory {path}: {e}")
+        
+        return total, subdirs
+    
+    def size_many(self, paths: List[str], known: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+        """
+        Calculate the sizes of several files or directories.
+        
+        Paths are processed deepest first, so nested paths are only walked once.
+        The subtrees of all paths at the same depth are walked in parallel.
+        
+        Args:
+            paths (List[str]): The paths to size.
+            known (Optional[Dict[str, int]], optional): Sizes known without
+                walking (e.g. from a store's install manifest), by path. They
+                are memoized first, so these paths aren't walked and a parent
+                directory adds up their sizes. Defaults to None.
+        
+        Returns:
+            Dict[str, int]: The size in bytes of each path, keyed by the path as
+                given. Missing paths have a size of 0.
+        """
+        for path, size in (known or {}).items():
+            self._memo.setdefault(_normalize(path), size)
+        
+        keys = {path: _normalize(path) for path in paths}
+        
+        # Group the paths still to be sized by depth, deepest first
+        levels: Dict[int, Dict[str, str]] = {}
+        for key in set(keys.values()):
+            if key not in self._memo:
+                levels.setdefault(key.count(os.sep), {})[key] = key
+        
+        with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="size") as executor:
+            for depth in sorted(levels, reverse=True):
+                totals: Dict[str, int] = {}
+                units: List[Tuple[str, str]] = []
+                
+                for key in levels[depth]:
+                    try:
+                        st = os.stat(key, follow_symlinks=False)
+                    except OSError:
+                        self._memo[key] = 0
+                        continue
+                    
+                    if not stat.S_ISDIR(st.st_mode):
+                        self._memo[key] = st.st_size
+                        continue
+                    
+                    totals[key], subdirs = self._split(key)
+                    units.extend((key, subdir) for subdir in subdirs)
+                
+                results = executor.map(lambda unit: self._walk(unit[1]), units)
+                for (key, _), (size, entries, hits) in zip(units, results):
+                    totals[key] += size
+                    self.entries_visited += entries
+                    self.memo_hits += hits
+                
+                self._memo.update(totals)
+        
+        return {path: self._memo.get(key, 0) for path, key in keys.items()}
+    
+    def size_of(self, path: str) -> int:
+        """
+        Calculate the size of a file or directory.
+        
+        Args:
+            path (str): The path to size.
+        
+        Returns:
+            int: The size in bytes, or 0 if the path doesn't exist.
+        """
+        return self.size_many([path])[path]
+    
+    def get_cached(self, path: str) -> Optional[int]:
+        """
+        Get the memoized size of a path, if it has been calculated.
+        
+        Args:
+            path (str): The path.
+        
+        Returns:
+            Optional[int]: The size in bytes, or None if it isn't memoized.
+        """
+        return self._memo.get(_normalize(path))
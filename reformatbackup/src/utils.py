@@ -9,9 +9,19 @@ import json
 import logging
 import datetime
 import shutil
-from typing import Dict, Any, List, Optional
+import time
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Any, Iterator, List, Optional, Tuple
 import py7zr
 
+from reformatbackup.src.compression import STORE_FILTERS, classify_files, get_compression_filters
+
+if os.name == "nt":
+    import msvcrt
+else:
+    import fcntl
+
 # Set up logging
 logger = logging.getLogger(__name__)
 
@@ -19,6 +29,9 @@ def compress_to_7z(source: str, destination: str, compression_level: int = 9) ->
     """
     Compress a file or directory to a 7z archive.
     
+    Files that are compressed already are stored as they are, in a second
+    block of the archive.
+    
     Args:
         source (str): The path to the file or directory to compress.
         destination (str): The path to the 7z archive to create.
@@ -28,24 +41,41 @@ def compress_to_7z(source: str, destination: str, compression_level: int = 9) ->
         bool: True if successful, False otherwise.
     """
     try:
-        with py7zr.SevenZipFile(destination, mode="w", filters=[{"id": py7zr.FILTER_LZMA2, "preset": compression_level}]) as archive:
-            if os.path.isdir(source):
-                # Add directory contents
-                for root, dirs, files in os.walk(source):
-                    for file in files:
-                        file_path = os.path.join(root, file)
-                        try:
-                            # Calculate the archive path (relative to the source)
-                            arcname = os.path.relpath(file_path, os.path.dirname(source))
-                            archive.write(file_path, arcname)
-                        except Exception as e:
-                            logger.error(f"Error adding file to archive: {e}")
-            else:
-                # Add file
-                try:
-                    archive.write(source, os.path.basename(source))
-                except Exception as e:
-                    logger.error(f"Error adding file to archive: {e}")
+        # List the files, with their names in the archive
+        if os.path.isdir(source):
+            files = [(os.path.join(root, file), os.path.relpath(os.path.join(root, file), os.path.dirname(source)))
+                     for root, dirs, names in os.walk(source) for file in names]
+        else:
+            files = [(source, os.path.basename(source))]
+        
+        # Skip files that can't be read, such as broken links or files
+        # deleted since they were listed
+        readable = []
+        sizes = []
+        for file_path, arcname in files:
+            try:
+                sizes.append(os.path.getsize(file_path))
+                readable.append((file_path, arcname))
+            except OSError as e:
+                logger.error(f"Error adding file to archive: {e}")
+        files = readable
+        
+        # Compress the files worth compressing, then append the rest stored as
+        # they are. Links always go in the first block: py7zr can't add a link
+        # when appending to an archive.
+        compressible = classify_files([file_path for file_path, _ in files], sizes)
+        compressible = [keep or os.path.islink(file_path) for (file_path, _), keep in zip(files, compressible)]
+        blocks = [(get_compression_filters(compression_level), [file for file, keep in zip(files, compressible) if keep]),
+                  (STORE_FILTERS, [file for file, keep in zip(files, compressible) if not keep])]
+        blocks = [block for block in blocks if block[1]] or blocks[:1]
+        
+        for number, (filters, block_files) in enumerate(blocks):
+            with py7zr.SevenZipFile(destination, mode="w" if number == 0 else "a", filters=filters) as archive:
+                for file_path, arcname in block_files:
+                    try:
+                        archive.write(file_path, arcname)
+                    except Exception as e:
+                        logger.error(f"Error adding file to archive: {e}")
         return True
     except Exception as e:
         logger.error(f"Error creating archive: {e}")
@@ -116,6 +146,125 @@ def write_json(file_path: str, data: Dict[str, Any]) -> bool:
         logger.error(f"Error writing JSON file: {e}")
         return False
 
+def atomic_write_json(file_path: str, data: Any, indent: Optional[int] = 2) -> bool:
+    """
+    Write data to a JSON file atomically.
+    
+    The data is written to a temporary file in the same directory, flushed to
+    disk and then moved over the target with os.replace, so readers never see
+    a partially written file.
+    
+    Args:
+        file_path (str): The path to the JSON file to write.
+        data (Any): The data to write.
+        indent (Optional[int], optional): The JSON indentation. Defaults to 2.
+    
+    Returns:
+        bool: True if successful, False otherwise.
+    """
+    directory = os.path.dirname(file_path) or "."
+    temp_path = None
+    
+    try:
+        os.makedirs(directory, exist_ok=True)
+        
+        fd, temp_path = tempfile.mkstemp(
+            dir=directory, prefix=f".{os.path.basename(file_path)}.", suffix=".tmp"
+        )
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f, indent=indent)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        # On Windows the target can be briefly held open by a reader
+        for attempt in range(5):
+            try:
+                os.replace(temp_path, file_path)
+                return True
+            except PermissionError:
+                if attempt == 4:
+                    raise
+                time.sleep(0.05 * (attempt + 1))
+    except Exception as e:
+        logger.error(f"Error writing JSON file atomically: {e}")
+        if temp_path and os.path.exists(temp_path):
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+        return False
+
+def get_file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    """
+    Get the modification stamp of a file.
+    
+    Args:
+        path (str): The path to the file.
+    
+    Returns:
+        Optional[Tuple[int, int]]: The file's mtime in nanoseconds and its size,
+            or None if the file doesn't exist.
+    """
+    try:
+        stat = os.stat(path)
+        return (stat.st_mtime_ns, stat.st_size)
+    except OSError:
+        return None
+
+@contextmanager
+def file_lock(lock_path: str, timeout: float = 10.0) -> Iterator[bool]:
+    """
+    Hold an exclusive lock on a lock file, shared across processes.
+    
+    Args:
+        lock_path (str): The path to the lock file. It is created if needed.
+        timeout (float, optional): How long to wait for the lock in seconds.
+            Defaults to 10.0.
+    
+    Yields:
+        bool: True if the lock was acquired, False if it timed out or the lock
+            file couldn't be opened (the caller runs unlocked in that case).
+    """
+    fd = None
+    acquired = False
+    
+    try:
+        os.makedirs(os.path.dirname(lock_path) or ".", exist_ok=True)
+        fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+        
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                if os.name == "nt":
+                    os.lseek(fd, 0, os.SEEK_SET)
+                    msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                else:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                acquired = True
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    logger.warning(f"Timed out waiting for lock: {lock_path}")
+                    break
+                time.sleep(0.02)
+    except Exception as e:
+        logger.error(f"Error opening lock file: {e}")
+    
+    try:
+        yield acquired
+    finally:
+        if fd is not None:
+            try:
+                if acquired:
+                    if os.name == "nt":
+                        os.lseek(fd, 0, os.SEEK_SET)
+                        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+                    else:
+                        fcntl.flock(fd, fcntl.LOCK_UN)
+            except OSError as e:
+                logger.debug(f"Error releasing lock {lock_path}: {e}")
+            os.close(fd)
+
 def handle_hidden_files(path: str) -> List[str]:
     """
     Find hidden files and directories in a path.
@@ -0,0 +1,427 @@
+"""
+ReformatBackup - File System Watch Backends
+
+This module reports changes under a set of directories through the native
+change notification API of the platform: ReadDirectoryChangesW on Windows and
+inotify on Linux, with a polling fallback everywhere else.
+"""
+
+import os
+import abc
+import select
+import struct
+import logging
+import threading
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Type definitions for better type hinting
+ChangeCallback = Callable[[str], None]
+
+# How often the polling backend checks the directories, in seconds
+POLL_INTERVAL = 10.0
+
+# inotify watches one directory per watch, so it only watches this deep below
+# each root, and no more than this many directories in total
+INOTIFY_MAX_DEPTH = 3
+INOTIFY_MAX_WATCHES = 8192
+
+# inotify event flags
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE = 0x00000200
+IN_DELETE_SELF = 0x00000400
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0x00000800
+IN_CLOEXEC = 0x00080000
+INOTIFY_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF
+INOTIFY_EVENT = struct.Struct("iIII")
+
+# ReadDirectoryChangesW constants
+FILE_LIST_DIRECTORY = 0x0001
+FILE_SHARE_ALL = 0x00000001 | 0x00000002 | 0x00000004
+OPEN_EXISTING = 3
+FILE_FLAG_BACKUP_SEMANTICS = 0x02000000
+FILE_NOTIFY_CHANGE = 0x00000001 | 0x00000002 | 0x00000008 | 0x00000010
+NOTIFY_BUFFER_SIZE = 64 * 1024
+
+class WatchBackend(abc.ABC):
+    """
+    Reports changed paths under a set of root directories.
+    
+    The callback gets the full path of each changed file or directory. It is
+    called from the backend's threads and must not block.
+    """
+    
+    name = "none"
+    
+    def __init__(self, roots: List[str], callback: ChangeCallback):
+        """
+        Create a backend for a set of roots. Nothing is watched until start is called.
+        
+        Args:
+            roots (List[str]): The directories to watch.
+            callback (ChangeCallback): Called with each changed path.
+        """
+        self.roots = roots
+        self.callback = callback
+        self._stop_event = threading.Event()
+        self._threads: List[threading.Thread] = []
+    
+    @abc.abstractmethod
+    def start(self) -> None:
+        """
+        Start watching.
+        
+        Raises:
+            OSError: If the platform API can't be used.
+        """
+    
+    def stop(self) -> None:
+        """
+        Stop watching and release the backend's resources.
+        """
+        self._stop_event.set()
+        for thread in self._threads:
+            thread.join(2.0)
+        self._threads = []
+    
+    def _start_thread(self, target: Callable, *args) -> None:
+        """
+        Run a function on a daemon thread owned by the backend.
+        
+        Args:
+            target (Callable): The function to run.
+        """
+        thread = threading.Thread(target=target, args=args, name=f"watch-{self.name}", daemon=True)
+        self._threads.append(thread)
+        thread.start()
+
+class PollingBackend(WatchBackend):
+    """
+    Detects changes by comparing the entries of each root between polls.
+    
+    An entry is reported when it appears, disappears or its modification time
+    or size changes. For directories this catches entries added to or removed
+    from them, but not changes deeper in the tree.
+    """
+    
+    name = "polling"
+    
+    def __init__(self, roots: List[str], callback: ChangeCallback, interval: float = POLL_INTERVAL):
+        """
+        Create a polling backend.
+        
+        Args:
+            roots (List[str]): The directories to watch.
+            callback (ChangeCallback): Called with each changed path.
+            interval (float, optional): Seconds between polls. Defaults to POLL_INTERVAL.
+        """
+        super().__init__(roots, callback)
+        self.interval = interval
+    
+    def _snapshot(self, root: str) -> Dict[str, Tuple[int, int]]:
+        """
+        Record the modification time and size of each entry of a root.
+        
+        Args:
+            root (str): The root directory.
+        
+        Returns:
+            Dict[str, Tuple[int, int]]: The entries' paths and stamps.
+        """
+        entries = {}
+        try:
+            with os.scandir(root) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat(follow_symlinks=False)
+                        entries[entry.path] = (st.st_mtime_ns, st.st_size)
+                    except OSError:
+                        continue
+        except OSError:
+            pass
+        return entries
+    
+    def start(self) -> None:
+        self._start_thread(self._run)
+    
+    def _run(self) -> None:
+        """
+        Poll the roots until stopped.
+        """
+        snapshots = {root: self._snapshot(root) for root in self.roots}
+        
+        while not self._stop_event.wait(self.interval):
+            for root in self.roots:
+                current = self._snapshot(root)
+                previous = snapshots[root]
+                for path in set(current) | set(previous):
+                    if current.get(path) != previous.get(path):
+                        self.callback(path)
+                snapshots[root] = current
+
+class InotifyBackend(WatchBackend):
+    """
+    Watches directories with Linux inotify.
+    
+    inotify needs a watch per directory, so directories are watched
+    breadth-first down to INOTIFY_MAX_DEPTH below each root, up to
+    INOTIFY_MAX_WATCHES in total. New directories are watched as they appear.
+    """
+    
+    name = "inotify"
+    
+    def __init__(self, roots: List[str], callback: ChangeCallback,
+                 max_depth: int = INOTIFY_MAX_DEPTH, max_watches: int = INOTIFY_MAX_WATCHES):
+        """
+        Create an inotify backend.
+        
+        Args:
+            roots (List[str]): The directories to watch.
+            callback (ChangeCallback): Called with each changed path.
+            max_depth (int, optional): How deep to watch below each root. Defaults to INOTIFY_MAX_DEPTH.
+            max_watches (int, optional): The most directories to watch. Defaults to INOTIFY_MAX_WATCHES.
+        """
+        super().__init__(roots, callback)
+        self.max_depth = max_depth
+        self.max_watches = max_watches
+        self._libc = None
+        self._fd: Optional[int] = None
+        self._watches: Dict[int, Tuple[str, int]] = {}
+    
+    def start(self) -> None:
+        import ctypes
+        import ctypes.util
+        
+        self._libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self._fd = fd
+        
+        # Watch breadth-first so the roots and app folders come first
+        queue = deque((root, 0) for root in self.roots)
+        while queue and len(self._watches) < self.max_watches:
+            path, depth = queue.popleft()
+            if not self._add_watch(path, depth):
+                continue
+            if depth < self.max_depth:
+                queue.extend((child, depth + 1) for child in self._subdirs(path))
+        
+        if len(self._watches) >= self.max_watches:
+            logger.warning(f"Watching the first {self.max_watches} directories only")
+        
+        self._start_thread(self._run)
+    
+    def stop(self) -> None:
+        super().stop()
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+        self._watches = {}
+    
+    def _subdirs(self, path: str) -> List[str]:
+        """
+        List the subdirectories of a directory, without following links.
+        
+        Args:
+            path (str): The directory.
+        
+        Returns:
+            List[str]: The subdirectories' paths.
+        """
+        try:
+            with os.scandir(path) as it:
+                return [entry.path for entry in it if entry.is_dir(follow_symlinks=False)]
+        except OSError:
+            return []
+    
+    def _add_watch(self, path: str, depth: int) -> bool:
+        """
+        Start watching a directory.
+        
+        Args:
+            path (str): The directory.
+            depth (int): How far below its root the directory is.
+        
+        Returns:
+            bool: True if the directory is being watched.
+        """
+        wd = self._libc.inotify_add_watch(self._fd, os.fsencode(path), INOTIFY_MASK)
+        if wd < 0:
+            logger.debug(f"Can't watch {path}")
+            return False
+        self._watches[wd] = (path, depth)
+        return True
+    
+    def _run(self) -> None:
+        """
+        Read events until stopped.
+        """
+        while not self._stop_event.is_set():
+            try:
+                ready, _, _ = select.select([self._fd], [], [], 0.5)
+                if not ready:
+                    continue
+                data = os.read(self._fd, NOTIFY_BUFFER_SIZE)
+            except (OSError, ValueError, TypeError):
+                # Stopped while waiting
+                return
+            
+            offset = 0
+            while offset + INOTIFY_EVENT.size <= len(data):
+                wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+                name = data[offset + INOTIFY_EVENT.size:offset + INOTIFY_EVENT.size + length].rstrip(b"\0")
+                offset += INOTIFY_EVENT.size + length
+                
+                if mask & IN_Q_OVERFLOW:
+                    # Events were lost; report every root as changed
+                    for root in self.roots:
+                        self.callback(root)
+                    continue
+                
+                watched = self._watches.get(wd)
+                if watched is None:
+                    continue
+                directory, depth = watched
+                path = os.path.join(directory, os.fsdecode(name)) if name else directory
+                
+                if (mask & IN_ISDIR and mask & (IN_CREATE | IN_MOVED_TO) and depth < self.max_depth
+                        and len(self._watches) < self.max_watches):
+                    self._add_watch(path, depth + 1)
+                if mask & IN_DELETE_SELF:
+                    self._watches.pop(wd, None)
+                
+                self.callback(path)
+
+class WindowsBackend(WatchBackend):
+    """
+    Watches directory trees with ReadDirectoryChangesW, one thread per root.
+    
+    Each root is watched with its whole subtree, so changes anywhere inside an
+    application folder are reported.
+    """
+    
+    name = "readdirectorychanges"
+    
+    def __init__(self, roots: List[str], callback: ChangeCallback):
+        super().__init__(roots, callback)
+        self._kernel32 = None
+        self._handles: List[int] = []
+        self._handles_lock = threading.Lock()
+    
+    def start(self) -> None:
+        import ctypes
+        from ctypes import wintypes
+        
+        kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)
+        kernel32.CreateFileW.restype = wintypes.HANDLE
+        kernel32.CreateFileW.argtypes = [wintypes.LPCWSTR, wintypes.DWORD, wintypes.DWORD, wintypes.LPVOID,
+                                         wintypes.DWORD, wintypes.DWORD, wintypes.HANDLE]
+        kernel32.ReadDirectoryChangesW.restype = wintypes.BOOL
+        kernel32.ReadDirectoryChangesW.argtypes = [wintypes.HANDLE, wintypes.LPVOID, wintypes.DWORD, wintypes.BOOL,
+                                                   wintypes.DWORD, ctypes.POINTER(wintypes.DWORD),
+                                                   wintypes.LPVOID, wintypes.LPVOID]
+        kernel32.CancelIoEx.argtypes = [wintypes.HANDLE, wintypes.LPVOID]
+        kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+        self._kernel32 = kernel32
+        
+        invalid_handle = ctypes.c_void_p(-1).value
+        for root in self.roots:
+            handle = kernel32.CreateFileW(root, FILE_LIST_DIRECTORY, FILE_SHARE_ALL, None,
+                                          OPEN_EXISTING, FILE_FLAG_BACKUP_SEMANTICS, None)
+            if handle is None or handle == invalid_handle:
+                logger.debug(f"Can't watch {root}: error {ctypes.get_last_error()}")
+                continue
+            with self._handles_lock:
+                self._handles.append(handle)
+            self._start_thread(self._run, root, handle)
+    
+    def stop(self) -> None:
+        self._stop_event.set()
+        with self._handles_lock:
+            handles, self._handles = self._handles, []
+        for handle in handles:
+            # Wake the blocked ReadDirectoryChangesW call
+            self._kernel32.CancelIoEx(handle, None)
+        super().stop()
+        for handle in handles:
+            self._kernel32.CloseHandle(handle)
+    
+    def _run(self, root: str, handle: int) -> None:
+        """
+        Read change notifications for one root until stopped.
+        
+        Args:
+            root (str): The root directory.
+            handle (int): The open directory handle.
+        """
+        import ctypes
+        from ctypes import wintypes
+        
+        buffer = ctypes.create_string_buffer(NOTIFY_BUFFER_SIZE)
+        returned = wintypes.DWORD()
+        
+        while not self._stop_event.is_set():
+            ok = self._kernel32.ReadDirectoryChangesW(handle, buffer, NOTIFY_BUFFER_SIZE, True,
+                                                      FILE_NOTIFY_CHANGE, ctypes.byref(returned), None, None)
+            if not ok:
+                if not self._stop_event.is_set():
+                    logger.debug(f"Stopped watching {root}: error {ctypes.get_last_error()}")
+                return
+            
+            if returned.value == 0:
+                # The buffer overflowed and events were lost
+                self.callback(root)
+                continue
+            
+            data = buffer.raw[:returned.value]
+            offset = 0
+            while True:
+                next_offset, _, length = struct.unpack_from("III", data, offset)
+                name = data[offset + 12:offset + 12 + length].decode("utf-16-le", errors="replace")
+                self.callback(os.path.join(root, name))
+                if next_offset == 0:
+                    break
+                offset += next_offset
+
+def create_backend(roots: List[str], callback: ChangeCallback, kind: str = "auto") -> WatchBackend:
+    """
+    Create and start the best watch backend for this platform.
+    
+    Args:
+        roots (List[str]): The directories to watch.
+        callback (ChangeCallback): Called with each changed path.
+        kind (str, optional): "auto" to use the native API, falling back to
+            polling if it can't be used, or "polling". Defaults to "auto".
+    
+    Returns:
+        WatchBackend: The started backend.
+    """
+    if kind != "polling":
+        native = None
+        if os.name == "nt":
+            native = WindowsBackend
+        elif hasattr(os, "uname") and os.uname().sysname == "Linux":
+            native = InotifyBackend
+        
+        if native is not None:
+            backend = native(roots, callback)
+            try:
+                backend.start()
+                return backend
+            except (OSError, AttributeError) as e:
+                logger.warning(f"Can't use {native.name} to watch for changes, polling instead: {e}")
+                backend.stop()
+    
+    backend = PollingBackend(roots, callback)
+    backend.start()
+    return backend
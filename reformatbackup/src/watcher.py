@@ -0,0 +1,273 @@
+"""
+ReformatBackup - File System Watcher
+
+This module keeps the cached scan current by watching the directories the
+scanners enumerate. Change events are coalesced, and only the roots and
+applications they touch are rescanned or resized.
+"""
+
+import os
+import time
+import logging
+import threading
+from typing import Dict, List, Any, Optional, Set, Tuple
+
+from reformatbackup.src.file_scan import get_install_dirs
+from reformatbackup.src.ownership import normalize_path, is_within
+from reformatbackup.src.watch_backends import WatchBackend, create_backend
+
+# Set up logging
+logger = logging.getLogger(__name__)
+
+# Changes are applied once no new event has arrived for this long, in seconds
+WATCH_DEBOUNCE_SECONDS = 2.0
+
+# Changes are applied at the latest this long after the first event of a
+# burst, even if events keep arriving
+WATCH_MAX_DELAY_SECONDS = 30.0
+
+# Files this application writes to the home directory, which must not
+# trigger refreshes of their own: the settings and job database
+# (.reformatbackup*), the scan cache (appscan.json, appscan.meta.json and
+# appscan.db with its -wal and -shm files), the temporary files they are
+# written through (.appscan.json.*.tmp) and the log
+OWN_FILE_PREFIXES = (".reformatbackup", "appscan.json", "appscan.meta.json", "appscan.db", ".appscan",
+                     "reformatbackup.log")
+
+def get_watch_roots() -> List[str]:
+    """
+    Get the directories the scanners enumerate: the install roots, the
+    AppData directories and the home directory.
+    
+    Returns:
+        List[str]: The directories that exist, spelled the way the scanners
+            record them as app roots.
+    """
+    roots = get_install_dirs()
+    for env in ["APPDATA", "LOCALAPPDATA"]:
+        if os.environ.get(env):
+            roots.append(os.environ[env])
+    roots.append(os.path.expanduser("~"))
+    
+    return [root for root in dict.fromkeys(roots) if os.path.isdir(root)]
+
+class FileWatcher:
+    """
+    Watches the scanned directories and refreshes the affected scan entries.
+    
+    Events are collected until none has arrived for the debounce period, or
+    the maximum delay has passed since the first one, and then applied in one
+    refresh. Nothing is applied while a full scan is running.
+    """
+    
+    def __init__(self, debounce: float = WATCH_DEBOUNCE_SECONDS,
+                 max_delay: float = WATCH_MAX_DELAY_SECONDS, backend_kind: str = "auto"):
+        """
+        Create a watcher. Nothing is watched until start is called.
+        
+        Args:
+            debounce (float, optional): Quiet period before changes are applied,
+                in seconds. Defaults to WATCH_DEBOUNCE_SECONDS.
+            max_delay (float, optional): The longest changes wait to be
+                applied, in seconds. Defaults to WATCH_MAX_DELAY_SECONDS.
+            backend_kind (str, optional): "auto" or "polling". Defaults to "auto".
+        """
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.backend_kind = backend_kind
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._backend: Optional[WatchBackend] = None
+        self._roots: List[str] = []
+        self._stopping = False
+        self._pending: Set[str] = set()
+        self._first_event = 0.0
+        self._last_event = 0.0
+        self._events = 0
+        self._refreshes = 0
+    
+    def start(self) -> bool:
+        """
+        Start watching, if not already watching.
+        
+        Returns:
+            bool: True if the watcher is running.
+        """
+        with self._cond:
+            if self._thread is not None and self._thread.is_alive():
+                return True
+            
+            try:
+                self._roots = get_watch_roots()
+                self._backend = create_backend(self._roots, self.notify, self.backend_kind)
+            except Exception as e:
+                logger.error(f"Error starting file system watcher: {e}")
+                return False
+            
+            self._stopping = False
+            self._thread = threading.Thread(target=self._loop, name="file-watcher", daemon=True)
+            self._thread.start()
+        
+        logger.info(f"Watching {len(self._roots)} directories for changes with {self._backend.name}")
+        return True
+    
+    def stop(self) -> None:
+        """
+        Stop watching. Pending changes are dropped.
+        """
+        with self._cond:
+            self._stopping = True
+            self._pending = set()
+            backend, self._backend = self._backend, None
+            self._cond.notify_all()
+        
+        if backend is not None:
+            backend.stop()
+    
+    def is_running(self) -> bool:
+        """
+        Check whether the watcher is running.
+        
+        Returns:
+            bool: True if changes are being watched.
+        """
+        with self._cond:
+            return self._thread is not None and self._thread.is_alive() and not self._stopping
+    
+    def get_status(self) -> Dict[str, Any]:
+        """
+        Get the state of the watcher.
+        
+        Returns:
+            Dict[str, Any]: The status, with "running", "backend", "roots",
+                "events" (received), "pending" (not yet applied) and
+                "refreshes" (applied).
+        """
+        running = self.is_running()
+        with self._cond:
+            return {
+                "running": running,
+                "backend": self._backend.name if self._backend is not None else None,
+                "roots": list(self._roots),
+                "events": self._events,
+                "pending": len(self._pending),
+                "refreshes": self._refreshes,
+            }
+    
+    def notify(self, path: str) -> None:
+        """
+        Record a changed path. Called by the watch backend.
+        
+        Args:
+            path (str): The path that changed.
+        """
+        now = time.monotonic()
+        with self._cond:
+            if not self._pending:
+                self._first_event = now
+            self._last_event = now
+            self._pending.add(path)
+            self._events += 1
+            self._cond.notify_all()
+    
+    def _classify(self, paths: Set[str]) -> Tuple[List[str], List[str]]:
+        """
+        Work out which roots to rescan for a set of changed paths.
+        
+        A root is rescanned when an entry in it, or directly inside one of its
+        folders, changed, since that can add, remove or change an app. In the
+        home directory only dot entries are scanned, so other changes there
+        are ignored.
+        
+        Args:
+            paths (Set[str]): The changed paths.
+        
+        Returns:
+            Tuple[List[str], List[str]]: The roots to rescan and the changed
+                paths that are relevant to the scan.
+        """
+        home = normalize_path(os.path.expanduser("~"))
+        roots = {normalize_path(root): root for root in self._roots}
+        dirty_roots = []
+        changed = []
+        
+        for path in sorted(paths):
+            norm = normalize_path(path)
+            if os.path.basename(norm).startswith(OWN_FILE_PREFIXES):
+                continue
+            
+            # The closest watched root containing the path
+            containing = [root for root in roots if is_within(norm, root)]
+            if not containing:
+                continue
+            root = max(containing, key=len)
+            
+            relative = os.path.relpath(norm, root) if norm != root else ""
+            parts = relative.split(os.sep) if relative else []
+            if root == home and (not parts or not parts[0].startswith(".")):
+                continue
+            
+            changed.append(path)
+            if len(parts) <= 2 and roots[root] not in dirty_roots:
+                dirty_roots.append(roots[root])
+        
+        return dirty_roots, changed
+    
+    def flush(self) -> Optional[Any]:
+        """
+        Apply the pending changes now.
+        
+        Returns:
+            Optional[ScanIndex]: The updated scan index, or None if there was
+                nothing to apply.
+        """
+        from reformatbackup.src.scan import refresh_roots
+        
+        with self._cond:
+            paths, self._pending = self._pending, set()
+        
+        roots, changed = self._classify(paths)
+        if not roots and not changed:
+            return None
+        
+        start = time.monotonic()
+        try:
+            index = refresh_roots(roots, changed)
+        except Exception as e:
+            logger.error(f"Error applying file system changes: {e}")
+            return None
+        
+        with self._cond:
+            self._refreshes += 1
+        logger.info(f"Applied {len(paths)} file system events ({len(roots)} roots) "
+                    f"in {time.monotonic() - start:.2f}s")
+        return index
+    
+    def _loop(self) -> None:
+        """
+        Apply coalesced changes until stopped.
+        """
+        from reformatbackup.src.scan_worker import scan_worker
+        
+        while True:
+            with self._cond:
+                while not self._stopping:
+                    if not self._pending:
+                        self._cond.wait()
+                        continue
+                    due = min(self._last_event + self.debounce, self._first_event + self.max_delay)
+                    if time.monotonic() >= due:
+                        break
+                    self._cond.wait(due - time.monotonic())
+                if self._stopping:
+                    return
+            
+            # A full scan will pick up the changes itself; hold them until it's done
+            if scan_worker.is_scanning():
+                time.sleep(self.debounce)
+                continue
+            
+            self.flush()
+
+# Process-wide file system watcher
+file_watcher = FileWatcher()
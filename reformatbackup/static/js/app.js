@@ -201,6 +201,18 @@ document.addEventListener('DOMContentLoaded', function() {
         });
     }
     
+    // Fill in application sizes as they are calculated in the background
+    const appList = document.querySelector('.app-list');
+    if (appList && appList.dataset.sizesPending) {
+        pollAppSizes(0);
+    }
+    
+    // Reload the list when a background scan finishes
+    const scanStatus = document.getElementById('scan-status');
+    if (scanStatus && scanStatus.dataset.scanning) {
+        pollScanStatus(scanStatus.dataset.finishedAt);
+    }
+    
     // Search functionality
     const searchInput = document.getElementById('app-search');
     if (searchInput) {
@@ -243,6 +255,162 @@ function updateSelectedCount() {
     }
 }
 
+/**
+ * Poll for application sizes calculated in the background and update the page.
+ * 
+ * @param {number} since - The sequence number of the last size update received.
+ */
+function pollAppSizes(since) {
+    fetch(`/scan/sizes?since=${since}`)
+        .then(response => response.json())
+        .then(data => {
+            if (data.error) {
+                return;
+            }
+            
+            Object.entries(data.sizes).forEach(([appId, size]) => {
+                document.querySelectorAll(`.app-size[data-app-id="${CSS.escape(appId)}"]`).forEach(element => {
+                    element.dataset.size = size;
+                    element.textContent = formatFileSize(size);
+                });
+            });
+            
+            document.querySelectorAll('[data-total-size]').forEach(element => {
+                element.textContent = formatFileSize(data.total_size);
+            });
+            Object.entries(data.drive_sizes).forEach(([drive, size]) => {
+                document.querySelectorAll(`[data-drive-size="${CSS.escape(drive)}"]`).forEach(element => {
+                    element.textContent = formatFileSize(size);
+                });
+            });
+            
+            if (data.running) {
+                setTimeout(() => pollAppSizes(data.seq), 1000);
+            }
+        })
+        .catch(error => {
+            console.error('Error polling application sizes:', error);
+        });
+}
+
+/**
+ * Poll the background scan worker and reload the page when a scan finishes.
+ * 
+ * @param {string} finishedAt - When the last scan the page knows about finished.
+ */
+function pollScanStatus(finishedAt) {
+    fetch('/scan/status')
+        .then(response => response.json())
+        .then(data => {
+            if (!data.scanning && !data.queued) {
+                if (data.error) {
+                    document.getElementById('scan-status').classList.add('d-none');
+                    showAlert(`Scan failed: ${data.error}`, 'danger');
+                } else if (String(data.finished_at || '') !== String(finishedAt || '')) {
+                    // Drop ?rescan=true so the reload doesn't start another scan
+                    window.location.href = window.location.pathname;
+                } else {
+                    document.getElementById('scan-status').classList.add('d-none');
+                }
+                return;
+            }
+            
+            setTimeout(() => pollScanStatus(finishedAt), 2000);
+        })
+        .catch(error => {
+            console.error('Error polling scan status:', error);
+        });
+}
+
+/**
+ * Format a size in bytes the same way as the filesizeformat template filter.
+ * 
+ * @param {number} bytes - The size in bytes.
+ * @returns {string} The formatted size.
+ */
+function formatFileSize(bytes) {
+    const units = ['kB', 'MB', 'GB', 'TB', 'PB', 'EB', 'ZB', 'YB'];
+    
+    if (bytes === 1) {
+        return '1 Byte';
+    }
+    if (bytes < 1000) {
+        return `${bytes} Bytes`;
+    }
+    
+    let unit = 0;
+    let value = bytes / 1000;
+    while (value >= 1000 && unit < units.length - 1) {
+        value /= 1000;
+        unit++;
+    }
+    
+    return `${value.toFixed(1)} ${units[unit]}`;
+}
+
+/**
+ * Follow background jobs through the server's event stream.
+ * 
+ * @param {string[]} jobIds - The IDs of the jobs to follow.
+ * @param {function(Object[])} onUpdate - Called with the jobs whenever one of them changes.
+ * @param {function()} onDone - Called once all of the jobs have finished.
+ * @returns {EventSource} The event stream.
+ */
+function streamJobs(jobIds, onUpdate, onDone) {
+    const params = new URLSearchParams();
+    jobIds.forEach(jobId => params.append('ids', jobId));
+    
+    const source = new EventSource('/jobs/events?' + params.toString());
+    source.addEventListener('jobs', event => onUpdate(JSON.parse(event.data)));
+    source.addEventListener('done', () => {
+        source.close();
+        if (onDone) {
+            onDone();
+        }
+    });
+    return source;
+}
+
+/**
+ * Get how far a job has got, by bytes.
+ * 
+ * @param {Object} job - The job, as returned by /jobs.
+ * @returns {number} The percentage done, or 0 if the total isn't known.
+ */
+function jobPercent(job) {
+    return job.bytes_total ? Math.min(100, Math.round(job.bytes_done / job.bytes_total * 100)) : 0;
+}
+
+/**
+ * Describe the progress of a job: phase, files and bytes done, throughput
+ * and time left.
+ * 
+ * @param {Object} job - The job, as returned by /jobs.
+ * @returns {string} The description.
+ */
+function describeProgress(job) {
+    const parts = [];
+    
+    if (job.phase) {
+        parts.push(job.phase.charAt(0).toUpperCase() + job.phase.slice(1));
+    }
+    parts.push(job.files_total != null ? `${job.files_done} of ${job.files_total} files` : `${job.files_done} files`);
+    parts.push(job.bytes_total ? `${formatFileSize(job.bytes_done)} of ${formatFileSize(job.bytes_total)}` :
+        formatFileSize(job.bytes_done));
+    
+    if (job.state === 'running') {
+        if (job.rate) {
+            parts.push(`${(job.rate / 1000000).toFixed(1)} MB/s`);
+        }
+        if (job.eta != null) {
+            const seconds = Math.round(job.eta);
+            parts.push(seconds >= 60 ? `${Math.floor(seconds / 60)}m ${seconds % 60}s left` : `${seconds}s left`);
+        }
+    }
+    
+    return parts.join(', ');
+}
+
 /**
  * Show an alert message.
  * 
@@ -52,33 +52,24 @@ document.addEventListener('DOMContentLoaded', function() {
             .then(data => {
                 progressContainer.classList.add('d-none');
                 
-                if (data.results) {
-                    const successCount = data.results.filter(result => result.success).length;
-                    const failCount = data.results.length - successCount;
+                if (data.jobs) {
+                    showAlert(`Queued ${data.jobs.length} backup(s). You can leave this page; progress is kept.`, 'info');
                     
-                    if (failCount === 0) {
-                        showAlert(`Successfully backed up ${successCount} application(s).`, 'success');
-                        
-                        // If we're on the index page, uncheck all checkboxes
-                        if (checkboxes.length > 0) {
-                            checkboxes.forEach(checkbox => {
-                                checkbox.checked = false;
-                            });
-                            document.getElementById('select-all-apps')?.checked = false;
-                            updateSelectedCount();
-                        } else {
-                            // If we're on the backup page, redirect to index after a short delay
-                            setTimeout(() => {
-                                window.location.href = '/';
-                            }, 2000);
+                    // If we're on the index page, uncheck all checkboxes
+                    if (checkboxes.length > 0) {
+                        checkboxes.forEach(checkbox => {
+                            checkbox.checked = false;
+                        });
+                        const selectAll = document.getElementById('select-all-apps');
+                        if (selectAll) {
+                            selectAll.checked = false;
                         }
-                    } else if (successCount === 0) {
-                        showAlert(`Failed to back up ${failCount} application(s).`, 'danger');
-                    } else {
-                        showAlert(`Backed up ${successCount} application(s), failed to back up ${failCount} application(s).`, 'warning');
+                        updateSelectedCount();
                     }
+                    
+                    watchJobs(data.jobs.map(job => job.id));
                 } else {
-                    showAlert('An error occurred during backup.', 'danger');
+                    showAlert('An error occurred during backup: ' + (data.error || 'Unknown error'), 'danger');
                 }
             })
             .catch(error => {
@@ -87,6 +78,26 @@ document.addEventListener('DOMContentLoaded', function() {
             });
         });
     }
+    
+    // Show backups still running from before the page was loaded
+    const jobsContainer = document.getElementById('backup-jobs');
+    if (jobsContainer) {
+        fetch('/jobs?active=true')
+            .then(response => response.json())
+            .then(data => {
+                if (data.jobs && data.jobs.length > 0) {
+                    watchJobs(data.jobs.map(job => job.id));
+                }
+            })
+            .catch(error => console.error('Error loading backup jobs:', error));
+        
+        jobsContainer.addEventListener('click', function(event) {
+            const button = event.target.closest('.cancel-job');
+            if (button) {
+                cancelJob(button.dataset.jobId);
+            }
+        });
+    }
 
     // Add sorting functionality to the app list
     const sortButtons = document.querySelectorAll('.sort-apps');
@@ -236,6 +247,110 @@ document.addEventListener('DOMContentLoaded', function() {
     }
 });
 
+// IDs of the backup jobs shown on the page, and their event stream
+const watchedJobs = new Set();
+let jobStream = null;
+
+/**
+ * Show backup jobs and follow their progress until they finish.
+ * 
+ * @param {string[]} jobIds - The IDs of the jobs to show.
+ */
+function watchJobs(jobIds) {
+    jobIds.forEach(jobId => watchedJobs.add(jobId));
+    if (jobStream !== null) {
+        jobStream.close();
+    }
+    
+    let latest = [];
+    jobStream = streamJobs(Array.from(watchedJobs), jobs => {
+        latest = jobs;
+        renderJobs(jobs);
+    }, () => {
+        jobStream = null;
+        const failCount = latest.filter(job => job.state === 'failed').length;
+        if (failCount > 0) {
+            showAlert(`Failed to back up ${failCount} application(s).`, 'danger');
+        } else {
+            showAlert('All backups finished.', 'success');
+        }
+    });
+}
+
+/**
+ * Render the backup jobs with their progress.
+ * 
+ * @param {Object[]} jobs - The jobs, as returned by /jobs.
+ */
+function renderJobs(jobs) {
+    const container = document.getElementById('backup-jobs');
+    if (!container) {
+        return;
+    }
+    
+    const badges = {
+        queued: 'secondary',
+        running: 'primary',
+        succeeded: 'success',
+        failed: 'danger',
+        cancelled: 'warning'
+    };
+    
+    container.innerHTML = jobs.map(job => {
+        const active = job.state === 'queued' || job.state === 'running';
+        let detail = job.state === 'failed' ? escapeHtml(job.error || '') : describeProgress(job);
+        if (job.result && job.result.unchanged) {
+            detail = escapeHtml(`Skipped: ${job.result.message}`);
+        }
+        
+        return `
+            <div class="backup-job mb-2" data-job-id="${job.id}">
+                <div class="d-flex justify-content-between align-items-center">
+                    <span>${escapeHtml(job.app_name || job.app_id || '')}
+                        <span class="badge bg-${badges[job.state] || 'secondary'}">${job.state}</span></span>
+                    ${active ? `<button type="button" class="btn btn-sm btn-outline-danger cancel-job" data-job-id="${job.id}">Cancel</button>` : ''}
+                </div>
+                ${job.state === 'running' ? `
+                <div class="progress mt-1">
+                    <div class="progress-bar" role="progressbar" style="width: ${jobPercent(job)}%"></div>
+                </div>
+                <small class="text-muted d-block text-truncate">${escapeHtml(job.current_file || '')}</small>` : ''}
+                <small class="text-muted">${detail}</small>
+            </div>
+        `;
+    }).join('');
+}
+
+/**
+ * Cancel a backup job.
+ * 
+ * @param {string} jobId - The ID of the job to cancel.
+ */
+function cancelJob(jobId) {
+    fetch(`/jobs/${jobId}/cancel`, { method: 'POST' })
+        .then(response => response.json())
+        .then(data => {
+            if (!data.success) {
+                showAlert('The backup had already finished.', 'info');
+            }
+        })
+        .catch(error => {
+            showAlert('An error occurred while cancelling the backup: ' + error.message, 'danger');
+        });
+}
+
+/**
+ * Escape text for use in HTML.
+ * 
+ * @param {string} text - The text to escape.
+ * @returns {string} The escaped text.
+ */
+function escapeHtml(text) {
+    const div = document.createElement('div');
+    div.textContent = text;
+    return div.innerHTML;
+}
+
 /**
  * Update the selected count display.
  */
@@ -278,8 +393,8 @@ function sortAppList(sortBy) {
             return valueA.localeCompare(valueB);
         } else if (sortBy === 'size') {
             // Extract size values (remove non-numeric characters)
-            valueA = parseFloat(a.querySelector('.app-size').textContent.replace(/[^0-9.]/g, '')) || 0;
-            valueB = parseFloat(b.querySelector('.app-size').textContent.replace(/[^0-9.]/g, '')) || 0;
+            valueA = parseFloat(a.querySelector('.app-size').dataset.size) || 0;
+            valueB = parseFloat(b.querySelector('.app-size').dataset.size) || 0;
             return valueB - valueA; // Sort by size descending
         } else if (sortBy === 'drive') {
             valueA = a.querySelector('.app-drive').textContent.toLowerCase();
@@ -115,23 +115,45 @@ document.addEventListener('DOMContentLoaded', function() {
             })
             .then(response => response.json())
             .then(data => {
-                progressContainer.classList.add('d-none');
-                
-                if (data.result && data.result.success) {
-                    showAlert('Successfully restored backup.', 'success');
-                    
-                    // Disable restore button to prevent multiple restores
-                    restoreButton.disabled = true;
-                    
-                    // Update UI to show restore was successful
-                    selectedVersionInfo.innerHTML += `
-                        <div class="alert alert-success mt-2 mb-0">
-                            <i class="bi bi-check-circle"></i> Restore completed successfully
-                        </div>
-                    `;
-                } else {
+                if (!data.job) {
+                    progressContainer.classList.add('d-none');
                     showAlert(`Failed to restore backup: ${data.result ? data.result.error : 'Unknown error'}`, 'danger');
+                    return;
                 }
+                
+                // Disable restore button to prevent multiple restores
+                restoreButton.disabled = true;
+                
+                // Follow the restore until it finishes
+                const progressBar = progressContainer.querySelector('.progress-bar');
+                const progressText = document.getElementById('restore-progress-text');
+                let job = data.job;
+                
+                streamJobs([job.id], jobs => {
+                    job = jobs[0];
+                    if (job.bytes_total) {
+                        progressBar.classList.remove('progress-bar-striped', 'progress-bar-animated');
+                        progressBar.style.width = `${jobPercent(job)}%`;
+                    }
+                    progressText.textContent = describeProgress(job);
+                }, () => {
+                    progressContainer.classList.add('d-none');
+                    progressText.textContent = '';
+                    
+                    if (job.state === 'succeeded') {
+                        showAlert('Successfully restored backup.', 'success');
+                        
+                        // Update UI to show restore was successful
+                        selectedVersionInfo.innerHTML += `
+                            <div class="alert alert-success mt-2 mb-0">
+                                <i class="bi bi-check-circle"></i> Restore completed successfully
+                            </div>
+                        `;
+                    } else {
+                        restoreButton.disabled = false;
+                        showAlert(`Failed to restore backup: ${job.error || 'Unknown error'}`, 'danger');
+                    }
+                });
             })
             .catch(error => {
                 progressContainer.classList.add('d-none');
@@ -0,0 +1,50 @@
+"""
+Shared fixtures for the tests of the ReformatBackup application.
+"""
+
+import time
+import pytest
+
+from reformatbackup.src import backup
+from reformatbackup.src.config import invalidate_config_cache
+from reformatbackup.src.scan_cache import invalidate_scan_index
+
+@pytest.fixture
+def temp_home(tmp_path, monkeypatch):
+    """Point the user's home directory at a temporary directory."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("USERPROFILE", str(tmp_path))
+    invalidate_config_cache()
+    invalidate_scan_index()
+    yield tmp_path
+    invalidate_scan_index()
+    invalidate_config_cache()
+
+@pytest.fixture
+def temp_env(tmp_path, monkeypatch):
+    """Point the home, AppData, temporary and backup directories at temporary directories."""
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("USERPROFILE", str(home))
+    monkeypatch.setenv("APPDATA", str(tmp_path / "missing"))
+    monkeypatch.setenv("LOCALAPPDATA", str(tmp_path / "missing"))
+    monkeypatch.setenv("TEMP", str(tmp_path))
+    
+    backups = tmp_path / "backups"
+    backups.mkdir()
+    monkeypatch.setattr(backup, "get_backup_location", lambda: str(backups))
+    invalidate_config_cache()
+    yield tmp_path
+    invalidate_config_cache()
+
+@pytest.fixture
+def wait_for():
+    """Wait until a condition holds, failing the test after a timeout."""
+    def wait(condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline
+            time.sleep(0.02)
+        return True
+    return wait
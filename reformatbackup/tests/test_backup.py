@@ -0,0 +1,301 @@
+"""
+Tests for the backup functionality of the ReformatBackup application.
+"""
+
+import os
+import json
+import datetime
+import py7zr
+import pytest
+
+from reformatbackup.src import backup, hashcache
+from reformatbackup.src.backup import backup_app, backup_apps, cleanup_old_backups
+from reformatbackup.src.progress import ProgressTracker
+from reformatbackup.src.restore import get_backup_versions, restore_backup
+
+def _archived_names(path):
+    with py7zr.SevenZipFile(path, mode="r") as archive:
+        return sorted(name for name in archive.getnames() if "." in name)
+
+class TestBackupApps:
+    """Tests for the backup_apps function."""
+    
+    def test_directories_archived_once(self, temp_env, monkeypatch):
+        """Test that shared and nested directories go into only one backup."""
+        game = temp_env / "Game"
+        (game / "mods").mkdir(parents=True)
+        (game / "game.exe").write_text("game")
+        (game / "mods" / "mod.dat").write_text("mod")
+        
+        apps = {
+            "fs-game": {"id": "fs-game", "name": "Game", "path": str(game)},
+            "steam-1": {"id": "steam-1", "name": "Game", "path": str(game)},
+            "mods": {"id": "mods", "name": "Mods", "path": str(game / "mods")},
+        }
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        
+        results = backup_apps(["fs-game", "steam-1", "mods"], notes="batch")
+        
+        assert [result["success"] for result in results] == [True, False, True]
+        assert "already in another backup" in results[1]["error"]
+        assert _archived_names(results[0]["backup_path"]) == ["Game/game.exe"]
+        assert _archived_names(results[2]["backup_path"]) == ["mods/mod.dat"]
+    
+    def test_parallel_results_in_request_order(self, temp_env, monkeypatch):
+        """Test that backups written on worker processes keep the request order."""
+        apps = {}
+        for name in ["One", "Two", "Three"]:
+            folder = temp_env / name
+            folder.mkdir()
+            (folder / f"{name.lower()}.dat").write_text(name)
+            apps[name.lower()] = {"id": name.lower(), "name": name, "path": str(folder)}
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        
+        results = backup_apps(["two", "missing", "one", "three"], max_workers=3)
+        
+        assert [result["success"] for result in results] == [True, False, True, True]
+        assert [result.get("app_id") for result in results] == ["two", None, "one", "three"]
+        assert _archived_names(results[3]["backup_path"]) == ["Three/three.dat"]
+
+class _Clock(datetime.datetime):
+    """A clock that moves a minute on each reading, so every backup gets its own timestamp."""
+    
+    ticks = 0
+    
+    @classmethod
+    def now(cls, tz=None):
+        cls.ticks += 1
+        return super().now(tz) + datetime.timedelta(minutes=cls.ticks)
+
+class TestIncrementalBackups:
+    """Tests for incremental backups."""
+    
+    @pytest.fixture
+    def game(self, temp_env, monkeypatch):
+        """An application with incremental backups in chains of two."""
+        game = temp_env / "Game"
+        game.mkdir()
+        (game / "a.txt").write_text("a")
+        (game / "b.txt").write_text("b")
+        apps = {"game": {"id": "game", "name": "Game", "path": str(game)}}
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        monkeypatch.setattr(backup, "get_incremental_backups", lambda: True)
+        monkeypatch.setattr(backup, "get_max_incremental_chain", lambda: 2)
+        monkeypatch.setattr(backup.datetime, "datetime", _Clock)
+        return game
+    
+    def test_chain_archives_changes_and_restores(self, game):
+        """Test that only changes are archived and a restore applies the chain."""
+        full = backup_app("game", backup_dot_files=False)
+        (game / "a.txt").unlink()
+        (game / "b.txt").write_text("b, changed")
+        (game / "c.txt").write_text("c")
+        first = backup_app("game", backup_dot_files=False)
+        (game / "c.txt").write_text("c, changed")
+        second = backup_app("game", backup_dot_files=False)
+        third = backup_app("game", backup_dot_files=False, force=True)
+        
+        assert full["backup_type"] == "full"
+        assert _archived_names(first["backup_path"]) == ["Game/b.txt", "Game/c.txt"]
+        assert _archived_names(second["backup_path"]) == ["Game/c.txt"]
+        assert third["backup_type"] == "full"
+        
+        for file in game.iterdir():
+            file.unlink()
+        result = restore_backup("game", f"game-{first['timestamp']}")
+        
+        assert result["success"]
+        assert sorted(os.listdir(game)) == ["b.txt", "c.txt"]
+        assert (game / "b.txt").read_text() == "b, changed"
+        assert (game / "c.txt").read_text() == "c"
+    
+    def test_cleanup_keeps_needed_bases(self, game):
+        """Test that a backup is kept while a newer incremental backup needs it."""
+        full = backup_app("game", backup_dot_files=False)
+        (game / "b.txt").write_text("b, changed")
+        backup_app("game", backup_dot_files=False)
+        
+        cleanup_old_backups("game", 1)
+        assert len(get_backup_versions("game")) == 2
+        
+        (game / "b.txt").write_text("b, changed again")
+        backup_app("game", backup_dot_files=False)
+        newest = backup_app("game", backup_dot_files=False, force=True)
+        cleanup_old_backups("game", 1)
+        
+        versions = get_backup_versions("game")
+        assert newest["backup_type"] == "full"
+        assert [version["backup_id"] for version in versions] == [f"game-{newest['timestamp']}"]
+        assert not os.path.exists(full["backup_path"])
+
+    def test_apps_sharing_an_id_prefix_stay_apart(self, game, temp_env, monkeypatch):
+        """Test that another application's backups, whose ID starts with this one's, aren't used as a base."""
+        dlc = temp_env / "DLC"
+        dlc.mkdir()
+        (dlc / "pack.txt").write_text("pack")
+        apps = {"game": {"id": "game", "name": "Game", "path": str(game)},
+                "game-dlc": {"id": "game-dlc", "name": "DLC", "path": str(dlc)}}
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        
+        full = backup_app("game", backup_dot_files=False)
+        other = backup_app("game-dlc", backup_dot_files=False)
+        (game / "b.txt").write_text("b, changed")
+        incremental = backup_app("game", backup_dot_files=False)
+        
+        assert other["backup_type"] == "full"
+        assert backup.list_app_backups(str(temp_env / "backups"), "game")[1][0] == f"game-{full['timestamp']}"
+        assert [version["backup_id"] for version in get_backup_versions("game")] == [
+            f"game-{incremental['timestamp']}", f"game-{full['timestamp']}"]
+        
+        cleanup_old_backups("game-dlc", 0)
+        result = restore_backup("game", f"game-{incremental['timestamp']}")
+        assert result["success"]
+
+class TestUnchangedBackups:
+    """Tests for skipping backups of unchanged files."""
+    
+    def test_unchanged_backup_is_skipped(self, temp_env, monkeypatch):
+        """Test that a backup is skipped until a file changes, unless forced."""
+        game = temp_env / "Game"
+        game.mkdir()
+        (game / "save.dat").write_text("save")
+        apps = {"game": {"id": "game", "name": "Game", "path": str(game)}}
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        monkeypatch.setattr(backup.datetime, "datetime", _Clock)
+        
+        first = backup_app("game", backup_dot_files=False)
+        skipped = backup_app("game", backup_dot_files=False)
+        forced = backup_apps(["game"], force=True)[0]
+        (game / "save.dat").write_text("saved again")
+        changed = backup_app("game", backup_dot_files=False)
+        
+        latest_id = f"game-{forced['timestamp']}"
+        assert skipped["success"] and skipped["unchanged"]
+        assert skipped["message"] == f"unchanged, latest is game-{first['timestamp']}"
+        assert not forced.get("unchanged")
+        assert changed["success"] and not changed.get("unchanged")
+        assert [version["backup_id"] for version in get_backup_versions("game")][1] == latest_id
+    
+    def test_apps_sharing_an_id_prefix_are_compared_apart(self, temp_env, monkeypatch):
+        """Test that a backup is compared with its own application's latest backup, not one whose ID starts with it."""
+        apps = {}
+        for app_id, name in [("game", "Game"), ("game-dlc", "DLC")]:
+            folder = temp_env / name
+            folder.mkdir()
+            (folder / "save.dat").write_text(name)
+            apps[app_id] = {"id": app_id, "name": name, "path": str(folder)}
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        monkeypatch.setattr(backup.datetime, "datetime", _Clock)
+        
+        game = backup_app("game", backup_dot_files=False)
+        dlc = backup_app("game-dlc", backup_dot_files=False)
+        latest = backup.get_latest_fingerprint(str(temp_env / "backups"), "game")
+        skipped = backup_app("game", backup_dot_files=False)
+        
+        assert latest["id"] == f"game-{game['timestamp']}"
+        assert skipped["unchanged"] and skipped["latest_backup_id"] == f"game-{game['timestamp']}"
+        assert backup_app("game-dlc", backup_dot_files=False)["latest_backup_id"] == f"game-dlc-{dlc['timestamp']}"
+
+class TestArchivePipeline:
+    """Tests for writing archives with files read ahead."""
+    
+    def test_read_ahead_keeps_order_and_timestamps(self, temp_env, monkeypatch):
+        """Test that files read ahead and files streamed from disk are archived alike."""
+        monkeypatch.setattr(backup, "PREFETCH_FILE_LIMIT", 6)
+        monkeypatch.setattr(backup, "PREFETCH_MEMORY_LIMIT", 8)
+        game = temp_env / "Game"
+        (game / "saves").mkdir(parents=True)
+        contents = {"a.txt": "small", "b.txt": "large file", "saves/c.txt": "tiny", "saves/d.txt": "five!"}
+        for name, text in contents.items():
+            (game / name).write_text(text)
+            os.utime(game / name, (1_600_000_000, 1_600_000_000))
+        apps = {"game": {"id": "game", "name": "Game", "path": str(game)}}
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        
+        reads = []
+        read_file = backup._read_file
+        monkeypatch.setattr(backup, "_read_file", lambda path, size: reads.append(size) or read_file(path, size))
+        result = backup_app("game", backup_dot_files=False)
+        
+        scanned = [arcname for _, arcname, _, _ in backup._scan_backup_files([str(game)], [])]
+        with py7zr.SevenZipFile(result["backup_path"], mode="r") as archive:
+            assert [name for name in archive.getnames() if "." in name] == scanned
+            archive.extractall(temp_env / "out")
+        
+        assert sorted(reads) == [4, 5, 5]
+        for name, text in contents.items():
+            assert (temp_env / "out" / "Game" / name).read_text() == text
+            assert os.path.getmtime(temp_env / "out" / "Game" / name) == 1_600_000_000
+    
+    @pytest.mark.skipif(not hasattr(os, "symlink") or os.name == "nt",
+                        reason="Symbolic links need extra privileges on Windows")
+    def test_symlinks_archived_as_links(self, temp_env, monkeypatch):
+        """Test that symbolic links are archived as links, in both blocks, not read ahead as files."""
+        game = temp_env / "Game"
+        game.mkdir()
+        (game / "target.txt").write_text("target")
+        (game / "textures.pak").write_bytes(os.urandom(1024))
+        os.symlink("target.txt", game / "link.txt")
+        os.symlink("textures.pak", game / "link.pak")
+        apps = {"game": {"id": "game", "name": "Game", "path": str(game)}}
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        
+        result = backup_app("game", backup_dot_files=False)
+        
+        with py7zr.SevenZipFile(result["backup_path"], mode="r") as archive:
+            links = {entry.filename: entry.is_symlink for entry in archive.list()}
+            archive.extractall(temp_env / "out")
+        assert links["Game/link.txt"] and links["Game/link.pak"] and not links["Game/target.txt"]
+        assert os.readlink(temp_env / "out" / "Game" / "link.txt") == "target.txt"
+        assert os.readlink(temp_env / "out" / "Game" / "link.pak") == "textures.pak"
+    
+    def test_incompressible_files_are_stored(self, temp_env, monkeypatch):
+        """Test that files that don't compress go into a stored block of the archive."""
+        game = temp_env / "Game"
+        game.mkdir()
+        noise = os.urandom(300 * 1024)
+        (game / "textures.pak").write_bytes(noise)
+        (game / "settings.ini").write_text("fullscreen=1\n" * 1000)
+        apps = {"game": {"id": "game", "name": "Game", "path": str(game)}}
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        
+        result = backup_app("game", backup_dot_files=False)
+        
+        with py7zr.SevenZipFile(result["backup_path"], mode="r") as archive:
+            assert archive.getnames()[-2:] == ["Game/settings.ini", "Game/textures.pak"]
+            packed = {entry.filename: entry.compressed for entry in archive.list()}
+            archive.extractall(temp_env / "out")
+        assert packed["Game/textures.pak"] == len(noise)
+        assert (temp_env / "out" / "Game" / "textures.pak").read_bytes() == noise
+        assert (temp_env / "out" / "Game" / "settings.ini").read_text() == "fullscreen=1\n" * 1000
+    
+    def test_files_hashed_while_archived(self, temp_env, monkeypatch):
+        """Test that archived files are hashed without another read, and only files left out are hashed in a phase of their own."""
+        monkeypatch.setattr(backup, "PREFETCH_FILE_LIMIT", 6)
+        game = temp_env / "Game"
+        game.mkdir()
+        (game / "a.txt").write_text("small")
+        (game / "b.txt").write_text("large file")
+        app = {"id": "game", "name": "Game"}
+        location = str(temp_env / "backups")
+        expected = {f"Game/{name}": hashcache.hash_file(str(game / name))[0] for name in ["a.txt", "b.txt"]}
+        
+        hashed = []
+        hash_file = hashcache.hash_file
+        monkeypatch.setattr(hashcache, "hash_file", lambda path: hashed.append(path) or hash_file(path))
+        phases = []
+        reporter = ProgressTracker(emit=lambda info: phases.append(info["phase"]))
+        full = backup.write_backup(app, [str(game)], location, 1, False, reporter=reporter, incremental=True)
+        with open(full["metadata_path"]) as f:
+            assert json.load(f)["hashes"] == expected
+        assert hashed == [] and "hashing" not in phases
+        
+        # The unchanged file was modified too recently to be cached, so it's read again
+        (game / "b.txt").write_text("large file, changed")
+        monkeypatch.setattr(backup.datetime, "datetime", _Clock)
+        base = backup.find_incremental_base(location, "game", "7z")
+        changed = backup.write_backup(app, [str(game)], location, 1, False, reporter=reporter,
+                                      incremental=True, base=base)
+        with open(changed["metadata_path"]) as f:
+            assert json.load(f)["hashes"]["Game/a.txt"] == expected["Game/a.txt"]
+        assert hashed == [str(game / "a.txt")] and phases[-2:] == ["hashing", "hashing"]
@@ -0,0 +1,181 @@
+"""
+Tests for the chunk store of the ReformatBackup application.
+"""
+
+import io
+import os
+import datetime
+import random
+import pytest
+
+from reformatbackup.src import backup, chunkstore
+from reformatbackup.src.backup import backup_app, cleanup_old_backups
+from reformatbackup.src.chunkstore import ChunkStore, iter_chunks, collect_garbage
+from reformatbackup.src.restore import get_backup_versions, restore_backup
+
+@pytest.fixture
+def small_chunks(monkeypatch):
+    """Use small chunks, so tests don't need megabytes of data."""
+    monkeypatch.setattr(chunkstore, "CHUNK_MIN_SIZE", 1024)
+    monkeypatch.setattr(chunkstore, "CHUNK_AVG_SIZE", 4096)
+    monkeypatch.setattr(chunkstore, "CHUNK_MAX_SIZE", 16384)
+    monkeypatch.setattr(chunkstore, "_MASK_SMALL", ((1 << 13) - 1) << 51)
+    monkeypatch.setattr(chunkstore, "_MASK_LARGE", ((1 << 11) - 1) << 53)
+
+@pytest.fixture
+def temp_env(temp_env, monkeypatch, small_chunks):
+    """Write backups in the chunks format, with small chunks."""
+    monkeypatch.setattr(backup, "get_backup_format", lambda: "chunks")
+    return temp_env
+
+def _random_bytes(size, seed=0):
+    return random.Random(seed).randbytes(size)
+
+class _Later(datetime.datetime):
+    """A clock a minute ahead, so a second backup gets its own timestamp."""
+    
+    @classmethod
+    def now(cls, tz=None):
+        return super().now(tz) + datetime.timedelta(minutes=1)
+
+def _reference_boundary(data):
+    """Find a chunk boundary one byte at a time, as the gear hash is defined."""
+    if len(data) <= chunkstore.CHUNK_MIN_SIZE:
+        return len(data)
+    end = min(len(data), chunkstore.CHUNK_MAX_SIZE)
+    normal = min(end, chunkstore.CHUNK_AVG_SIZE)
+    h = 0
+    for position in range(chunkstore.CHUNK_MIN_SIZE, end):
+        h = ((h << 1) + chunkstore._GEAR[data[position]]) & chunkstore._HASH_MASK
+        if not h & (chunkstore._MASK_SMALL if position < normal else chunkstore._MASK_LARGE):
+            return position + 1
+    return end
+
+needs_numpy = pytest.mark.skipif(chunkstore.numpy is None, reason="content-defined chunking needs numpy")
+
+class TestChunking:
+    """Tests for content-defined chunking."""
+    
+    @needs_numpy
+    def test_boundaries_match_the_gear_hash(self, small_chunks, monkeypatch):
+        """Test that the blockwise, vectorised search finds the same boundaries as the plain hash."""
+        monkeypatch.setattr(chunkstore, "GEAR_BLOCK_SIZE", 1000)
+        for seed in range(20):
+            data = _random_bytes(20 * 1024, seed=seed)
+            assert chunkstore._find_boundary(memoryview(data)) == _reference_boundary(data)
+        assert chunkstore._find_boundary(memoryview(bytes(20 * 1024))) == _reference_boundary(bytes(20 * 1024))
+    
+    def test_fixed_size_chunks_without_numpy(self, small_chunks, monkeypatch):
+        """Test that files are split into average-sized chunks when numpy isn't installed."""
+        monkeypatch.setattr(chunkstore, "numpy", None)
+        data = _random_bytes(10 * 1024)
+        
+        assert [len(chunk) for chunk in iter_chunks(io.BytesIO(data))] == [4096, 4096, 2048]
+    
+    @needs_numpy
+    def test_insert_only_changes_nearby_chunks(self, small_chunks):
+        """Test that inserting bytes keeps the chunks away from the edit."""
+        data = _random_bytes(200 * 1024)
+        edited = data[:100 * 1024] + b"inserted" + data[100 * 1024:]
+        
+        chunks = list(iter_chunks(io.BytesIO(data)))
+        edited_chunks = list(iter_chunks(io.BytesIO(edited)))
+        
+        assert b"".join(chunks) == data
+        assert all(1024 <= len(chunk) <= 16384 for chunk in chunks[:-1])
+        assert len(set(chunks) - set(edited_chunks)) <= 2
+    
+    def test_store_deduplicates_and_verifies(self, tmp_path, small_chunks):
+        """Test that stored data round-trips, is stored once and is verified."""
+        source = tmp_path / "source.bin"
+        source.write_bytes(_random_bytes(50 * 1024) + b"\0" * 50 * 1024)
+        store = ChunkStore(str(tmp_path / "store"), compression_level=1)
+        
+        chunks, written = store.store_file(str(source))
+        again, rewritten = store.store_file(str(source))
+        store.restore_file(chunks, str(tmp_path / "copy.bin"))
+        
+        assert written > 0 and rewritten == 0 and again == chunks
+        assert (tmp_path / "copy.bin").read_bytes() == source.read_bytes()
+        
+        with open(store._object_path(chunks[0]), "r+b") as f:
+            f.seek(0, os.SEEK_END)
+            f.write(b"junk")
+        with pytest.raises(Exception):
+            store.restore_file(chunks, str(tmp_path / "copy.bin"))
+
+class TestChunkedBackups:
+    """Tests for backups stored in the chunk store."""
+    
+    def test_versions_share_chunks_and_restore(self, temp_env, monkeypatch):
+        """Test that unchanged data adds nothing and any version restores."""
+        game = temp_env / "Game"
+        game.mkdir()
+        (game / "world.dat").write_bytes(_random_bytes(64 * 1024))
+        (game / "options.ini").write_text("volume=5")
+        apps = {"game": {"id": "game", "name": "Game", "path": str(game)}}
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        
+        first = backup_app("game", compression_level=1, backup_dot_files=False)
+        (game / "options.ini").write_text("volume=7")
+        monkeypatch.setattr(backup.datetime, "datetime", _Later)
+        second = backup_app("game", compression_level=1, backup_dot_files=False)
+        
+        assert first["success"] and first["format"] == "chunks"
+        assert 0 < second["size"] < first["size"]
+        versions = get_backup_versions("game")
+        assert [version["format"] for version in versions] == ["chunks", "chunks"]
+        
+        result = restore_backup("game", f"game-{first['timestamp']}")
+        assert result["success"] and result["restored_files"] == 1 and result["unchanged_files"] == 1
+        assert (game / "options.ini").read_text() == "volume=5"
+    
+    def test_cleanup_collects_unused_chunks(self, temp_env, monkeypatch):
+        """Test that chunks are removed once no backup uses them."""
+        game = temp_env / "Game"
+        game.mkdir()
+        (game / "save.dat").write_bytes(_random_bytes(8 * 1024, seed=1))
+        apps = {"game": {"id": "game", "name": "Game", "path": str(game)}}
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        
+        backup_app("game", compression_level=1, backup_dot_files=False)
+        (game / "save.dat").write_bytes(_random_bytes(8 * 1024, seed=2))
+        monkeypatch.setattr(backup.datetime, "datetime", _Later)
+        backup_app("game", compression_level=1, backup_dot_files=False)
+        
+        monkeypatch.setattr(chunkstore, "GC_GRACE_SECONDS", -1)
+        cleanup_old_backups("game", 1)
+        
+        versions = get_backup_versions("game")
+        store = chunkstore.get_chunk_store(str(temp_env / "backups"))
+        manifest = chunkstore.read_manifest(versions[0]["backup_path"])
+        assert len(versions) == 1
+        assert {name for name, _ in store.iter_chunk_files()} == set(manifest["files"][0]["chunks"])
+        assert collect_garbage(str(temp_env / "backups"))["removed"] == 0
+    
+    def test_incremental_reuses_unchanged_files(self, temp_env, monkeypatch):
+        """Test that an incremental backup takes unchanged files from the previous manifest."""
+        game = temp_env / "Game"
+        game.mkdir()
+        (game / "world.dat").write_bytes(_random_bytes(32 * 1024))
+        (game / "options.ini").write_text("volume=5")
+        apps = {"game": {"id": "game", "name": "Game", "path": str(game)}}
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        monkeypatch.setattr(backup, "get_incremental_backups", lambda: True)
+        
+        backup_app("game", compression_level=1, backup_dot_files=False)
+        (game / "options.ini").write_text("volume=11")
+        read = []
+        store_file = ChunkStore.store_file
+        monkeypatch.setattr(ChunkStore, "store_file", lambda store, path, hasher=None: read.append(path) or store_file(store, path, hasher))
+        monkeypatch.setattr(backup.datetime, "datetime", _Later)
+        second = backup_app("game", compression_level=1, backup_dot_files=False)
+        
+        assert second["backup_type"] == "incremental"
+        assert read == [str(game / "options.ini")]
+        
+        for file in game.iterdir():
+            file.unlink()
+        result = restore_backup("game", f"game-{second['timestamp']}")
+        assert result["restored_files"] == 2
+        assert (game / "world.dat").read_bytes() == _random_bytes(32 * 1024)
@@ -0,0 +1,28 @@
+"""
+Tests for the compression classifier of the ReformatBackup application.
+"""
+
+import os
+
+from reformatbackup.src import compression
+from reformatbackup.src.compression import classify_files, is_compressible_data
+
+class TestClassifyFiles:
+    """Tests for the classify_files function."""
+    
+    def test_extension_and_sample(self, tmp_path, monkeypatch):
+        """Test that compressed formats and random data are stored, and text is compressed."""
+        monkeypatch.setattr(compression, "SAMPLE_MIN_SIZE", 1024)
+        files = {
+            "config.ini": b"volume=5\n" * 1000,
+            "small.bin": os.urandom(512),
+            "noise.bin": os.urandom(64 * 1024),
+            "cover.JPG": b"\x00" * 4096,
+        }
+        for name, data in files.items():
+            (tmp_path / name).write_bytes(data)
+        
+        paths = [str(tmp_path / name) for name in files]
+        
+        assert classify_files(paths, [len(data) for data in files.values()]) == [True, True, False, False]
+        assert is_compressible_data(b"")
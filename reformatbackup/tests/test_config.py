@@ -0,0 +1,161 @@
+"""
+Tests for the configuration management in the ReformatBackup application.
+"""
+
+import os
+import json
+import threading
+import pytest
+
+from reformatbackup.src import config
+from reformatbackup.src.config import (
+    get_config,
+    get_config_path,
+    get_compression_level,
+    set_compression_level,
+    get_backup_dot_files,
+    set_backup_dot_files,
+    update_config,
+    config_transaction,
+    invalidate_config_cache
+)
+
+class TestConfigCache:
+    """Tests for the process-wide configuration cache."""
+    
+    def test_creates_default_config(self, temp_home):
+        """Test that a missing configuration file is created with defaults."""
+        assert get_compression_level() == 9
+        assert os.path.exists(get_config_path())
+    
+    def test_reads_file_once(self, temp_home, monkeypatch):
+        """Test that repeated reads don't parse the file again."""
+        get_config()
+        
+        loads = []
+        original = config._load_config_from_disk
+        monkeypatch.setattr(config, "_load_config_from_disk",
+                            lambda path: loads.append(path) or original(path))
+        
+        for _ in range(10):
+            get_compression_level()
+        
+        assert loads == []
+    
+    def test_writes_go_through(self, temp_home):
+        """Test that writes are visible immediately and persisted to disk."""
+        assert set_compression_level(3) is True
+        assert get_compression_level() == 3
+        
+        with open(get_config_path(), "r") as f:
+            assert json.load(f)["compression_level"] == 3
+    
+    def test_reloads_when_file_changes(self, temp_home, monkeypatch):
+        """Test that an external edit is picked up once the file changes."""
+        monkeypatch.setattr(config, "CONFIG_REVALIDATE_SECONDS", 0)
+        get_config()
+        
+        with open(get_config_path(), "r") as f:
+            data = json.load(f)
+        data["compression_level"] = 1
+        # Change the size too, in case the mtime granularity is coarse
+        data["notes"] = "edited"
+        with open(get_config_path(), "w") as f:
+            json.dump(data, f)
+        
+        assert get_compression_level() == 1
+    
+    def test_get_config_returns_copy(self, temp_home):
+        """Test that modifying the returned configuration doesn't affect the cache."""
+        get_config()["compression_level"] = 0
+        assert get_compression_level() == 9
+
+class TestConfigTransaction:
+    """Tests for batched configuration updates."""
+    
+    def test_single_write(self, temp_home, monkeypatch):
+        """Test that a transaction writes the file once."""
+        get_config()
+        
+        writes = []
+        original = config.atomic_write_json
+        monkeypatch.setattr(config, "atomic_write_json",
+                            lambda path, data: writes.append(path) or original(path, data))
+        
+        with config_transaction():
+            set_compression_level(4)
+            set_backup_dot_files(False)
+            
+            # Pending values are visible inside the transaction
+            assert get_compression_level() == 4
+        
+        assert len(writes) == 1
+        assert get_compression_level() == 4
+        assert get_backup_dot_files() is False
+    
+    def test_no_write_on_error(self, temp_home):
+        """Test that nothing is written if the transaction raises."""
+        with pytest.raises(RuntimeError):
+            with config_transaction():
+                set_compression_level(2)
+                raise RuntimeError("abort")
+        
+        assert get_compression_level() == 9
+    
+    def test_concurrent_updates_are_not_lost(self, temp_home):
+        """Test that parallel read-modify-write updates don't overwrite each other."""
+        get_config()
+        
+        def worker(index):
+            update_config(f"key_{index}", index)
+        
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        with open(get_config_path(), "r") as f:
+            data = json.load(f)
+        
+        assert all(data[f"key_{i}"] == i for i in range(10))
+
+def test_scan_interval_validation(temp_home):
+    """Test that the scan interval must be positive."""
+    assert config.get_scan_interval_hours() == 24
+    assert not config.set_scan_interval_hours(0)
+    assert config.set_scan_interval_hours(6)
+    assert config.get_scan_interval_hours() == 6
+
+def test_backup_concurrency_validation(temp_home):
+    """Test that the backup concurrency can't be negative."""
+    assert config.get_backup_concurrency() == 0
+    assert not config.set_backup_concurrency(-1)
+    assert config.set_backup_concurrency(4)
+    assert config.get_backup_concurrency() == 4
+
+def test_backup_format_validation(temp_home):
+    """Test that the backup format must be a known format."""
+    assert config.get_backup_format() == "7z"
+    assert not config.set_backup_format("zip")
+    assert config.set_backup_format("chunks")
+    assert config.get_backup_format() == "chunks"
+
+def test_incremental_chain_validation(temp_home):
+    """Test that incremental chains hold at least one backup."""
+    assert not config.get_incremental_backups()
+    assert config.get_max_incremental_chain() == 6
+    assert not config.set_max_incremental_chain(0)
+    assert config.set_max_incremental_chain(3)
+    assert config.get_max_incremental_chain() == 3
+
+def test_backup_location_recreated(temp_home):
+    """Test that a backup location removed after it was verified is created again."""
+    location = temp_home / "Backups"
+    assert config.set_backup_location(str(location))
+    assert config.get_backup_location() == str(location)
+    
+    location.rmdir()
+    
+    assert config.get_backup_location() == str(location)
+    assert location.is_dir()
@@ -0,0 +1,87 @@
+"""
+Tests for the drive inventory in the ReformatBackup application.
+"""
+
+import time
+import pytest
+from collections import namedtuple
+
+from reformatbackup.src import drives
+from reformatbackup.src.drives import (
+    get_drive_inventory,
+    get_available_drives,
+    get_drive_for_path,
+    invalidate_drive_inventory
+)
+
+Partition = namedtuple("Partition", ["device", "mountpoint", "fstype", "opts"])
+
+@pytest.fixture
+def fake_drives(tmp_path, monkeypatch):
+    """Report a fixed, a network and an optical drive, backed by temporary directories."""
+    paths = {}
+    for name in ["fixed", "network", "optical"]:
+        paths[name] = tmp_path / name
+        paths[name].mkdir()
+    
+    partitions = [
+        Partition("/dev/sda1", str(paths["fixed"]), "ext4", "rw,relatime"),
+        Partition("server:/share", str(paths["network"]), "nfs4", "rw"),
+        Partition("/dev/sr0", str(paths["optical"]), "iso9660", "ro"),
+    ]
+    monkeypatch.setattr(drives.psutil, "disk_partitions", lambda all=False: partitions)
+    invalidate_drive_inventory()
+    yield paths
+    invalidate_drive_inventory()
+
+class TestDriveInventory:
+    """Tests for the drive inventory."""
+    
+    def test_classifies_drives(self, fake_drives):
+        """Test that drives are classified and probed."""
+        inventory = get_drive_inventory()
+        
+        assert [d["type"] for d in inventory] == ["fixed", "network", "optical"]
+        assert all(d["available"] for d in inventory)
+    
+    def test_windows_drive_types(self):
+        """Test classification from the drive types psutil reports on Windows."""
+        assert drives._classify(Partition("C:\\", "C:\\", "NTFS", "rw,fixed")) == "fixed"
+        assert drives._classify(Partition("E:\\", "E:\\", "FAT32", "rw,removable")) == "removable"
+        assert drives._classify(Partition("Z:\\", "Z:\\", "", "remote")) == "network"
+        assert drives._classify(Partition("D:\\", "D:\\", "", "cdrom")) == "optical"
+    
+    def test_skip_policy(self, fake_drives):
+        """Test that skipped drive types are left out."""
+        assert get_available_drives(skip_types=["network", "optical"]) == [str(fake_drives["fixed"])]
+    
+    def test_probe_timeout(self, fake_drives, monkeypatch):
+        """Test that a drive that doesn't respond is marked unavailable without blocking."""
+        def probe(mountpoint):
+            if mountpoint == str(fake_drives["network"]):
+                time.sleep(5)
+            return True
+        monkeypatch.setattr(drives, "_probe", probe)
+        
+        start = time.monotonic()
+        inventory = get_drive_inventory()
+        
+        assert time.monotonic() - start < 2
+        network = inventory[1]
+        assert network["timed_out"] and not network["available"]
+        assert inventory[0]["available"]
+    
+    def test_cached(self, fake_drives, monkeypatch):
+        """Test that the inventory is reused until it's refreshed."""
+        first = get_drive_inventory()
+        monkeypatch.setattr(drives.psutil, "disk_partitions", lambda all=False: [])
+        
+        assert get_drive_inventory() is first
+        assert get_drive_inventory(refresh=True) == []
+    
+    def test_drive_for_path(self, fake_drives):
+        """Test finding the drive a path is on."""
+        drive = get_drive_for_path(str(fake_drives["network"] / "games" / "game"))
+        
+        assert drive["type"] == "network"
+        assert get_drive_for_path("/nonexistent-root/file") is None
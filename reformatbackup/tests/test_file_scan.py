@@ -0,0 +1,102 @@
+"""
+Tests for file system scanning in the ReformatBackup application.
+"""
+
+import os
+import pytest
+
+from reformatbackup.src import file_scan
+from reformatbackup.src.config import invalidate_config_cache
+from reformatbackup.src.file_scan import scan_file_system, get_root_fingerprints
+from reformatbackup.src.scan_cache import save_scan_cache, invalidate_scan_index
+
+@pytest.fixture
+def program_files(tmp_path, monkeypatch):
+    """Point the install roots and home directory at temporary directories."""
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("USERPROFILE", str(home))
+    
+    root = tmp_path / "Program Files"
+    root.mkdir()
+    monkeypatch.setenv("ProgramFiles", str(root))
+    for env in ["ProgramFiles(x86)", "LOCALAPPDATA", "APPDATA"]:
+        monkeypatch.setenv(env, str(tmp_path / "missing"))
+    monkeypatch.setattr(file_scan, "get_available_drives", lambda skip_types=None: [])
+    
+    invalidate_config_cache()
+    invalidate_scan_index()
+    file_scan.clear_root_fingerprints()
+    yield root
+    invalidate_scan_index()
+    invalidate_config_cache()
+
+def _make_app(root, name, files):
+    folder = root / name
+    for file in files:
+        (folder / file).parent.mkdir(parents=True, exist_ok=True)
+        (folder / file).write_text("x")
+    return folder
+
+class TestScanFileSystem:
+    """Tests for the scan_file_system function."""
+    
+    def test_detects_executables(self, program_files):
+        """Test detection of top-level and subdirectory executables."""
+        _make_app(program_files, "Top App", ["top.exe", "unins000.exe"])
+        _make_app(program_files, "Bin App", ["readme.txt", "bin/tool.exe", "app/other.exe"])
+        _make_app(program_files, "Only Uninstaller", ["unins000.exe"])
+        _make_app(program_files, ".hidden", ["hidden.exe"])
+        
+        apps = {app["id"]: app for app in scan_file_system()}
+        
+        assert sorted(apps) == ["fs-bin-app", "fs-top-app"]
+        assert apps["fs-top-app"]["executable"].endswith("top.exe")
+        assert apps["fs-bin-app"]["executable"].endswith("tool.exe")
+        assert apps["fs-bin-app"]["root"] == str(program_files)
+    
+    def test_reuses_unchanged_folders(self, program_files, monkeypatch):
+        """Test that a rescan only inspects folders that changed."""
+        _make_app(program_files, "App One", ["one.exe"])
+        _make_app(program_files, "Not An App", ["data.bin"])
+        
+        apps = scan_file_system()
+        save_scan_cache(apps, meta={"root_fingerprints": get_root_fingerprints()})
+        
+        searched = []
+        original = file_scan._find_subdir_executable
+        monkeypatch.setattr(file_scan, "_find_subdir_executable",
+                            lambda path, subdirs: searched.append(path) or original(path, subdirs))
+        
+        assert [app["id"] for app in scan_file_system()] == ["fs-app-one"]
+        cost = get_root_fingerprints()[str(program_files)]["cost"]
+        assert cost["inspected"] == 0 and cost["reused"] == 2
+        assert searched == []
+        
+        # An executable added to a folder that wasn't an app is picked up
+        (program_files / "Not An App" / "new.exe").write_text("x")
+        
+        assert sorted(app["id"] for app in scan_file_system()) == ["fs-app-one", "fs-not-an-app"]
+        assert get_root_fingerprints()[str(program_files)]["cost"]["inspected"] == 1
+    
+    def test_unchanged_root_not_listed(self, program_files, monkeypatch):
+        """Test that an unchanged root reuses its folder list, and a changed one is listed again."""
+        _make_app(program_files, "App One", ["one.exe"])
+        _make_app(program_files, "Not An App", ["data.bin"])
+        os.utime(program_files, (1_600_000_000, 1_600_000_000))
+        save_scan_cache(scan_file_system(), meta={"root_fingerprints": get_root_fingerprints()})
+        
+        listed = []
+        scandir = os.scandir
+        monkeypatch.setattr(file_scan.os, "scandir", lambda path: listed.append(str(path)) or scandir(path))
+        
+        assert [app["id"] for app in scan_file_system()] == ["fs-app-one"]
+        assert get_root_fingerprints()[str(program_files)]["cost"]["root_reused"]
+        assert str(program_files) not in listed
+        
+        save_scan_cache(scan_file_system(), meta={"root_fingerprints": get_root_fingerprints()})
+        _make_app(program_files, "App Two", ["two.exe"])
+        
+        assert sorted(app["id"] for app in scan_file_system()) == ["fs-app-one", "fs-app-two"]
+        assert not get_root_fingerprints()[str(program_files)]["cost"]["root_reused"]
@@ -0,0 +1,65 @@
+"""
+Tests for the directory fingerprints in the ReformatBackup application.
+"""
+
+import os
+import time
+
+from reformatbackup.src.fingerprint import get_fingerprint, reuse_sizes
+from reformatbackup.src.scan_cache import ScanIndex
+
+class TestGetFingerprint:
+    """Tests for the get_fingerprint function."""
+    
+    def test_changes_when_entries_change(self, tmp_path):
+        """Test that adding an entry changes a directory's fingerprint."""
+        (tmp_path / "a.txt").write_text("a")
+        before = get_fingerprint(str(tmp_path))
+        
+        assert get_fingerprint(str(tmp_path)) == before
+        
+        (tmp_path / "b.txt").write_text("b")
+        
+        assert get_fingerprint(str(tmp_path)) != before
+        assert get_fingerprint(str(tmp_path))[1] == 2
+    
+    def test_files_and_missing_paths(self, tmp_path):
+        """Test fingerprints of files and missing paths."""
+        path = tmp_path / "file.txt"
+        path.write_text("12345")
+        
+        assert get_fingerprint(str(path))[1] == 5
+        assert get_fingerprint(str(tmp_path / "missing")) is None
+
+class TestReuseSizes:
+    """Tests for the reuse_sizes function."""
+    
+    def test_reuses_unchanged_folders(self, tmp_path):
+        """Test that sizes are reused only for unchanged folders."""
+        for name in ["same", "changed"]:
+            (tmp_path / name).mkdir()
+            (tmp_path / name / "file.txt").write_text("x")
+        
+        now = time.time()
+        previous = ScanIndex([
+            {"id": name, "path": str(tmp_path / name), "size": 100, "sized_at": now,
+             "fingerprint": get_fingerprint(str(tmp_path / name))}
+            for name in ["same", "changed"]
+        ])
+        (tmp_path / "changed" / "new.txt").write_text("y")
+        
+        apps = [{"id": name, "path": str(tmp_path / name)} for name in ["same", "changed"]]
+        
+        assert reuse_sizes(apps, previous) == 1
+        assert apps[0]["size"] == 100
+        assert "size" not in apps[1]
+        assert apps[1]["fingerprint"] == get_fingerprint(str(tmp_path / "changed"))
+    
+    def test_revalidates_old_sizes(self, tmp_path):
+        """Test that cached sizes are dropped once they are too old."""
+        fingerprint = get_fingerprint(str(tmp_path))
+        cached = {"id": "app", "path": str(tmp_path), "size": 100, "sized_at": 0, "fingerprint": fingerprint}
+        apps = [dict(cached)]
+        
+        assert reuse_sizes(apps, ScanIndex([cached])) == 0
+        assert "size" not in apps[0]
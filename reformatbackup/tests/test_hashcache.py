@@ -0,0 +1,48 @@
+"""
+Tests for the file hash cache of the ReformatBackup application.
+"""
+
+import os
+
+from reformatbackup.src import hashcache
+from reformatbackup.src.hashcache import HashCache, hash_file
+
+class TestHashCache:
+    """Tests for the HashCache class."""
+    
+    def test_unchanged_files_are_not_read_again(self, tmp_path, monkeypatch):
+        """Test that a cached hash is used until the file changes."""
+        monkeypatch.setattr(hashcache, "HASH_SETTLE_SECONDS", -1)
+        reads = []
+        monkeypatch.setattr(hashcache, "hash_file", lambda path: reads.append(path) or hash_file(path))
+        
+        a = tmp_path / "a.txt"
+        b = tmp_path / "b.txt"
+        a.write_text("a")
+        b.write_text("b")
+        cache = HashCache(str(tmp_path / "cache" / "hashes.db"))
+        
+        first = cache.hash_files([str(a), str(b)])
+        second = HashCache(cache.db_path).hash_files([str(a), str(b)])
+        
+        assert first == second
+        assert first[str(a)] != first[str(b)]
+        assert sorted(reads) == [str(a), str(b)]
+        
+        a.write_text("a, changed")
+        os.utime(a, ns=(1_000_000_000, 1_000_000_000))
+        
+        assert cache.hash(str(a)) != first[str(a)]
+        assert reads[-1] == str(a) and len(reads) == 3
+    
+    def test_recent_and_missing_files(self, tmp_path):
+        """Test that just-modified files aren't cached and missing files have no hash."""
+        path = tmp_path / "new.txt"
+        path.write_text("new")
+        cache = HashCache(str(tmp_path / "hashes.db"))
+        
+        hashes = cache.hash_files([str(path), str(tmp_path / "missing.txt")])
+        
+        assert hashes[str(path)] == hash_file(str(path))[0]
+        assert hashes[str(tmp_path / "missing.txt")] is None
+        assert cache._lookup({str(path): hashcache._file_key(os.stat(path))}) == {}
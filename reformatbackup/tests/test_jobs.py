@@ -0,0 +1,122 @@
+"""
+Tests for the background jobs in the ReformatBackup application.
+"""
+
+import os
+import pickle
+import pytest
+
+from reformatbackup.src import backup, jobs
+from reformatbackup.src.backup import write_backup
+from reformatbackup.src.jobs import JobStore, JobReporter, JobQueue
+
+@pytest.fixture
+def store(tmp_path):
+    """Create a job store in a temporary directory."""
+    return JobStore(str(tmp_path / "jobs.db"))
+
+class TestJobStore:
+    """Tests for the JobStore class."""
+    
+    def test_lifecycle(self, store):
+        """Test creating, updating, listing and cancelling jobs."""
+        first = store.create("backup", "app-1", "App One", bytes_total=100)
+        second = store.create("backup", "app-2", "App Two")
+        assert first["state"] == "queued" and first["bytes_total"] == 100
+        
+        store.update(first["id"], state="succeeded", result={"success": True}, bogus=1)
+        
+        assert store.get(first["id"])["result"] == {"success": True}
+        assert [job["id"] for job in store.list()] == [second["id"], first["id"]]
+        assert [job["id"] for job in store.list(active_only=True)] == [second["id"]]
+        assert [job["id"] for job in store.list(job_ids=[first["id"]])] == [first["id"]]
+        
+        assert not store.request_cancel(first["id"])
+        assert store.request_cancel(second["id"])
+        assert store.is_cancel_requested(second["id"])
+        
+        assert store.fail_unfinished("Interrupted") == 1
+        assert store.get(second["id"])["state"] == "failed"
+    
+    def test_history_is_pruned(self, store, monkeypatch):
+        """Test that only the newest finished jobs are kept."""
+        monkeypatch.setattr(jobs, "JOB_HISTORY_LIMIT", 2)
+        for i in range(4):
+            job = store.create("backup", f"app-{i}")
+            store.update(job["id"], state="succeeded")
+        active = store.create("backup", "active")
+        
+        remaining = [job["app_id"] for job in store.list()]
+        assert remaining == ["active", "app-3", "app-2"]
+        assert store.get(active["id"]) is not None
+
+class TestJobReporter:
+    """Tests for the JobReporter class."""
+    
+    def test_rate_limited_and_picklable(self, store):
+        """Test that progress writes are rate limited and survive pickling."""
+        job = store.create("backup", "app")
+        reporter = pickle.loads(pickle.dumps(JobReporter(store.db_path, job["id"], interval=60)))
+        
+        reporter.start_phase("archiving", files_total=3, bytes_total=30)
+        reporter.advance(10, "a")
+        reporter.advance(10, "b")
+        assert store.get(job["id"])["files_done"] == 0
+        
+        reporter.advance(10, "c")
+        reporter.finish()
+        job = store.get(job["id"])
+        assert job["phase"] == "archiving" and job["files_total"] == 3
+        assert job["bytes_done"] == 30 and job["current_file"] == "c"
+    
+    def test_cancelled_backup_is_removed(self, store, tmp_path):
+        """Test that a cancelled backup stops and leaves no archive behind."""
+        folder = tmp_path / "App"
+        folder.mkdir()
+        (folder / "data.txt").write_text("data")
+        job = store.create("backup", "app")
+        store.request_cancel(job["id"])
+        
+        result = write_backup({"id": "app", "name": "App"}, [str(folder)], str(tmp_path), 1, False,
+                              reporter=JobReporter(store.db_path, job["id"], interval=0))
+        
+        assert result["cancelled"] and not result["success"]
+        assert not [name for name in os.listdir(tmp_path) if name.endswith(".7z")]
+
+class TestJobQueue:
+    """Tests for the JobQueue class."""
+    
+    def test_backup_job_cleans_up_old_backups(self, store, monkeypatch):
+        """Test that the worker cleans up old backups after writing a new one."""
+        cleaned = []
+        monkeypatch.setattr(backup, "write_backup", lambda app, reporter, **task: {"success": True})
+        monkeypatch.setattr(backup, "cleanup_old_backups", lambda app_id, limit: cleaned.append(app_id))
+        
+        job = store.create("backup", "app")
+        result = jobs._run_backup_job(store.db_path, job["id"], {"app": {"id": "app"}})
+        
+        assert result["success"] and cleaned == ["app"]
+        assert store.get(job["id"])["state"] == "running"
+    
+    def test_runs_backups_in_background(self, temp_env, monkeypatch, wait_for):
+        """Test that submitted backups run as jobs and record their results."""
+        folder = temp_env / "Game"
+        folder.mkdir()
+        (folder / "save.dat").write_text("save")
+        apps = {"game": {"id": "game", "name": "Game", "path": str(folder), "size": 4}}
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        
+        queue = JobQueue(str(temp_env / "jobs.db"))
+        try:
+            submitted = queue.submit_backups(["game", "missing"])
+            
+            assert [job["app_id"] for job in submitted] == ["game", "missing"]
+            assert submitted[1]["state"] == "failed"
+            wait_for(lambda: queue.get_job(submitted[0]["id"])["state"] == "succeeded", timeout=15.0)
+            
+            job = queue.get_job(submitted[0]["id"])
+            assert job["files_done"] == 1 and job["bytes_done"] == 4
+            assert os.path.exists(job["result"]["backup_path"])
+            assert not queue.cancel(job["id"])
+        finally:
+            queue.shutdown()
@@ -0,0 +1,145 @@
+"""
+Tests for game library scanning in the ReformatBackup application.
+"""
+
+import json
+import pytest
+
+from reformatbackup.src import libraries
+from reformatbackup.src.libraries import parse_vdf, get_steam_libraries, scan_steam, scan_epic, scan_gog
+from reformatbackup.src.registry import FakeRegistry, HKLM
+
+LIBRARY_FOLDERS = """
+"libraryfolders"
+{
+    "0"
+    {
+        "path"      "%s"
+        "label"     ""
+        "apps"
+        {
+            "620"       "12000000000"
+        }
+    }
+    "1"
+    {
+        "path"      "%s"
+    }
+}
+"""
+
+APP_MANIFEST = """
+"AppState"
+{
+    "appid"         "%s"
+    "name"          "%s"
+    "StateFlags"    "4"
+    "installdir"    "%s"
+    "SizeOnDisk"    "%s"
+}
+"""
+
+@pytest.fixture(autouse=True)
+def no_drive_policy(monkeypatch):
+    """Treat every path as being on a drive that is scanned."""
+    monkeypatch.setattr(libraries, "get_drive_for_path", lambda path: None)
+
+def _vdf_path(path):
+    return str(path).replace("\\", "\\\\")
+
+@pytest.fixture
+def steam(tmp_path):
+    """Create a Steam installation with a second library holding two games."""
+    steam_dir = tmp_path / "Steam"
+    library = tmp_path / "SteamLibrary"
+    (steam_dir / "steamapps").mkdir(parents=True)
+    (library / "steamapps" / "common" / "Portal 2").mkdir(parents=True)
+    
+    (steam_dir / "steamapps" / "libraryfolders.vdf").write_text(
+        LIBRARY_FOLDERS % (_vdf_path(steam_dir), _vdf_path(library)))
+    (library / "steamapps" / "appmanifest_620.acf").write_text(
+        APP_MANIFEST % ("620", "Portal 2", "Portal 2", "12000000000"))
+    # A manifest whose game folder is gone
+    (library / "steamapps" / "appmanifest_440.acf").write_text(
+        APP_MANIFEST % ("440", "Team Fortress 2", "Team Fortress 2", "25000000000"))
+    
+    return str(steam_dir), str(library)
+
+class TestParseVdf:
+    """Tests for the parse_vdf function."""
+    
+    def test_nested_sections(self):
+        """Test nested sections, escapes and comments."""
+        text = '// comment\n"a" { "b" "C:\\\\Games" "c" { "d" "say \\"hi\\"" } }'
+        
+        assert parse_vdf(text) == {"a": {"b": "C:\\Games", "c": {"d": 'say "hi"'}}}
+
+class TestSteam:
+    """Tests for the Steam library scanner."""
+    
+    def test_libraries(self, steam):
+        """Test that every library listed in libraryfolders.vdf is found."""
+        steam_dir, library = steam
+        
+        assert get_steam_libraries([steam_dir]) == [steam_dir, library]
+    
+    def test_games_from_manifests(self, steam):
+        """Test that installed games are read from their manifests with their size."""
+        steam_dir, library = steam
+        
+        apps = scan_steam(steam_dirs=[steam_dir])
+        
+        assert len(apps) == 1
+        assert apps[0]["id"] == "steam-620"
+        assert apps[0]["name"] == "Portal 2"
+        assert apps[0]["size"] == 12000000000
+        assert apps[0]["path"].endswith("Portal 2")
+
+class TestEpic:
+    """Tests for the Epic Games scanner."""
+    
+    def test_games_from_manifests(self, tmp_path):
+        """Test that complete installs are read from .item manifests."""
+        manifests = tmp_path / "Manifests"
+        manifests.mkdir()
+        game = tmp_path / "Epic Games" / "Fortnite"
+        game.mkdir(parents=True)
+        
+        (manifests / "A.item").write_text(json.dumps({
+            "DisplayName": "Fortnite", "AppName": "Fortnite", "InstallLocation": str(game),
+            "LaunchExecutable": "FortniteLauncher.exe", "InstallSize": 30000000000,
+        }))
+        (manifests / "B.item").write_text(json.dumps({
+            "DisplayName": "Half Installed", "AppName": "Half", "InstallLocation": str(game),
+            "bIsIncompleteInstall": True,
+        }))
+        (manifests / "C.item").write_text("not json")
+        
+        apps = scan_epic(manifest_dir=str(manifests))
+        
+        assert [app["id"] for app in apps] == ["epic-Fortnite"]
+        assert apps[0]["size"] == 30000000000
+        assert apps[0]["executable"].endswith("FortniteLauncher.exe")
+
+class TestGog:
+    """Tests for the GOG scanner."""
+    
+    def test_games_from_registry(self, tmp_path):
+        """Test that GOG games are read from the registry."""
+        game = tmp_path / "GOG Games" / "Witcher 3"
+        game.mkdir(parents=True)
+        
+        registry = FakeRegistry()
+        registry.add_key(HKLM, r"SOFTWARE\WOW6432Node\GOG.com\Games", "1207664663", {
+            "gameName": "The Witcher 3", "gameID": "1207664663", "path": str(game),
+            "exe": str(game / "witcher3.exe"),
+        })
+        registry.add_key(HKLM, r"SOFTWARE\WOW6432Node\GOG.com\Games", "1", {
+            "gameName": "Uninstalled", "path": str(tmp_path / "missing"),
+        })
+        
+        apps = scan_gog(backend=registry)
+        
+        assert [app["id"] for app in apps] == ["gog-1207664663"]
+        assert apps[0]["name"] == "The Witcher 3"
+        assert "size" not in apps[0]
@@ -0,0 +1,54 @@
+"""
+Tests for path ownership in the ReformatBackup application.
+"""
+
+import os
+
+from reformatbackup.src.ownership import apply_ownership, copy_alias_sizes, collapse_paths, is_counted
+
+class TestApplyOwnership:
+    """Tests for the apply_ownership function."""
+    
+    def test_links_aliases_and_nested_apps(self, tmp_path):
+        """Test that shared paths get one owner and nested paths point at it."""
+        folder = str(tmp_path / "Editor")
+        apps = [
+            {"id": "fs-editor", "source": "file_system", "path": folder},
+            {"id": "appdata-editor", "source": "app_data", "path": folder + os.sep},
+            {"id": "{GUID}", "source": "registry", "path": folder},
+            {"id": "apppath-editor.exe", "source": "apppath", "path": os.path.join(folder, "bin", "editor.exe")},
+            {"id": "other", "source": "registry", "path": str(tmp_path / "Editor2")},
+            {"id": "no-path", "source": "registry"},
+        ]
+        
+        stats = apply_ownership(apps)
+        
+        assert stats == {"owners": 3, "aliases": 2, "nested": 1}
+        assert apps[2]["aliases"] == ["fs-editor", "appdata-editor"]
+        assert apps[0]["alias_of"] == apps[1]["alias_of"] == "{GUID}"
+        assert apps[3]["contained_in"] == "{GUID}"
+        assert "contained_in" not in apps[4] and "alias_of" not in apps[4]
+        assert [is_counted(app) for app in apps] == [False, False, True, False, True, True]
+    
+    def test_clears_stale_fields_and_copies_sizes(self, tmp_path):
+        """Test that ownership from a previous scan is replaced and aliases take the owner's size."""
+        apps = [
+            {"id": "a", "source": "registry", "path": str(tmp_path), "size": 10, "sized_at": 1.0},
+            {"id": "b", "source": "file_system", "path": str(tmp_path), "aliases": ["x"], "size": 99},
+            {"id": "c", "source": "file_system", "path": str(tmp_path / "c"), "alias_of": "x"},
+        ]
+        
+        apply_ownership(apps)
+        copy_alias_sizes(apps)
+        
+        assert "aliases" not in apps[1] and "alias_of" not in apps[2]
+        assert apps[1]["alias_of"] == "a"
+        assert apps[1]["size"] == 10 and apps[1]["sized_at"] == 1.0
+        assert apps[2]["contained_in"] == "a"
+
+def test_collapse_paths(tmp_path):
+    """Test that duplicate and nested paths are removed."""
+    a = str(tmp_path / "a")
+    paths = [os.path.join(a, "sub"), a, a + os.sep, str(tmp_path / "ab")]
+    
+    assert collapse_paths(paths) == [a, str(tmp_path / "ab")]
@@ -0,0 +1,43 @@
+"""
+Tests for progress tracking in the ReformatBackup application.
+"""
+
+import time
+
+from reformatbackup.src import progress
+from reformatbackup.src.progress import ProgressTracker
+
+class TestProgressTracker:
+    """Tests for the ProgressTracker class."""
+    
+    def test_emission_is_rate_limited(self):
+        """Test that only phase changes and the finish are emitted within one interval."""
+        snapshots = []
+        tracker = ProgressTracker(snapshots.append, interval=60)
+        
+        tracker.start_phase("archiving", files_total=1000, bytes_total=1000)
+        for i in range(1000):
+            tracker.advance(1, f"file{i}")
+        tracker.finish()
+        
+        assert len(snapshots) == 2
+        assert snapshots[-1]["files_done"] == 1000
+        assert snapshots[-1]["current_file"] == "file999"
+        assert snapshots[-1]["phase"] == "archiving"
+    
+    def test_rate_and_eta(self, monkeypatch):
+        """Test that throughput and time left follow the bytes processed."""
+        now = [100.0]
+        monkeypatch.setattr(progress.time, "monotonic", lambda: now[0])
+        tracker = ProgressTracker(interval=1)
+        
+        tracker.start_phase("restoring", files_total=4, bytes_total=4000)
+        now[0] += 2
+        tracker.advance(1000)
+        
+        snapshot = tracker.snapshot()
+        assert snapshot["rate"] == 500.0
+        assert snapshot["eta"] == 6.0
+        
+        tracker.start_phase("next")
+        assert tracker.snapshot()["rate"] is None and tracker.snapshot()["files_done"] == 0
@@ -0,0 +1,101 @@
+"""
+Tests for registry reading in the ReformatBackup application.
+"""
+
+import threading
+import pytest
+
+from reformatbackup.src.registry import FakeRegistry, RegistryBackend, REGISTRY_ROOTS, HKLM, HKCU, scan_registry
+
+UNINSTALL = r"SOFTWARE\Microsoft\Windows\CurrentVersion\Uninstall"
+PACKAGES = r"SOFTWARE\Classes\Local Settings\Software\Microsoft\Windows\CurrentVersion\AppModel\Repository\Packages"
+APP_PATHS = r"SOFTWARE\Microsoft\Windows\CurrentVersion\App Paths"
+
+class TestScanRegistry:
+    """Tests for the scan_registry function."""
+    
+    def test_maps_values(self):
+        """Test that registry values are mapped to application fields."""
+        registry = FakeRegistry()
+        registry.add_key(HKLM, UNINSTALL, "{GUID-1}", {
+            "DisplayName": "App One",
+            "InstallLocation": "C:\\Program Files\\App One",
+            "Publisher": "Vendor",
+            "DisplayVersion": "1.2",
+            "EstimatedSize": 1234,
+        })
+        registry.add_key(HKLM, UNINSTALL, "KB123", {"SystemComponent": 1})
+        registry.add_key(HKCU, PACKAGES, "Microsoft.Photos_2021.1_x64__8wekyb3d8bbwe", {
+            "DisplayName": "@{Microsoft.Photos?ms-resource://Microsoft.Photos/Resources/AppName}",
+            "PackageRootFolder": "C:\\Program Files\\WindowsApps\\Microsoft.Photos",
+        })
+        registry.add_key(HKLM, APP_PATHS, "tool.exe", {"": "C:\\Tools\\tool.exe"})
+        
+        apps = {app["id"]: app for app in scan_registry(registry)}
+        
+        assert apps["{GUID-1}"] == {
+            "id": "{GUID-1}",
+            "name": "App One",
+            "source": "registry",
+            "root": "registry",
+            "path": "C:\\Program Files\\App One",
+            "publisher": "Vendor",
+            "version": "1.2",
+        }
+        assert "KB123" not in apps
+        photos = apps["msstore-Microsoft.Photos_2021.1_x64__8wekyb3d8bbwe"]
+        assert photos["name"] == "Microsoft Photos"
+        assert photos["path"] == "C:\\Program Files\\WindowsApps\\Microsoft.Photos"
+        assert apps["apppath-tool.exe"]["path"] == "C:\\Tools\\tool.exe"
+    
+    def test_removes_duplicates(self):
+        """Test that the same app under two roots is reported once, with the most information."""
+        registry = FakeRegistry()
+        registry.add_key(HKLM, UNINSTALL, "app", {"DisplayName": "App", "InstallLocation": "C:\\App"})
+        registry.add_key(HKCU, UNINSTALL, "app-user", {"DisplayName": "App", "InstallLocation": "C:\\App",
+                                                       "Publisher": "Vendor"})
+        
+        apps = scan_registry(registry)
+        
+        assert [app["id"] for app in apps] == ["app-user"]
+    
+    def test_large_registry(self):
+        """Test a scan of 5,000 keys spread over all roots, one read per key."""
+        registry = FakeRegistry()
+        for i in range(5000):
+            hive, path, _ = REGISTRY_ROOTS[i % len(REGISTRY_ROOTS)]
+            registry.add_key(hive, path, f"key-{i}", {"DisplayName": f"App {i}", "": f"C:\\Apps\\{i}.exe",
+                                                      "InstallLocation": f"C:\\Apps\\{i}"})
+        
+        apps = scan_registry(registry)
+        
+        assert registry.subkey_reads == 5000
+        assert len(apps) == 5000
+        
+        # Results are merged in root order
+        assert apps[0]["id"] == "key-0"
+        assert apps[-1]["id"] == "apppath-key-4999"
+    
+    def test_cancelled(self):
+        """Test that a cancelled scan stops reading keys."""
+        registry = FakeRegistry()
+        for i in range(100):
+            registry.add_key(HKLM, UNINSTALL, f"key-{i}", {"DisplayName": f"App {i}"})
+        
+        cancel_event = threading.Event()
+        cancel_event.set()
+        
+        assert scan_registry(registry, cancel_event) == []
+        assert registry.subkey_reads == 0
+
+class TestRegistryBackend:
+    """Tests for the RegistryBackend interface."""
+    
+    def test_read_subkeys_is_required(self):
+        """Test that a backend must implement read_subkeys."""
+        class Incomplete(RegistryBackend):
+            pass
+        
+        with pytest.raises(TypeError):
+            Incomplete()
+        assert isinstance(FakeRegistry(), RegistryBackend)
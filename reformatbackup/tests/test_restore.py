@@ -0,0 +1,81 @@
+"""
+Tests for the restore functionality of the ReformatBackup application.
+"""
+
+import json
+
+from reformatbackup.src.backup import backup_app
+from reformatbackup.src.progress import ProgressTracker
+from reformatbackup.src.restore import restore_backup, verify_backup
+
+class TestRestoreBackup:
+    """Tests for the restore_backup function."""
+    
+    def test_restore_reports_progress(self, temp_env, monkeypatch):
+        """Test that a restore reports its extracting and restoring phases."""
+        game = temp_env / "Game"
+        game.mkdir()
+        (game / "save.dat").write_text("saved game")
+        apps = {"game": {"id": "game", "name": "Game", "path": str(game)}}
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        
+        result = backup_app("game", backup_dot_files=False)
+        (game / "save.dat").write_text("changed")
+        
+        snapshots = []
+        backup_id = f"game-{result['timestamp']}"
+        restored = restore_backup("game", backup_id, reporter=ProgressTracker(snapshots.append, interval=0))
+        
+        assert restored["success"] and restored["restored_files"] == 1
+        assert (game / "save.dat").read_text() == "saved game"
+        
+        finished = {snapshot["phase"]: snapshot for snapshot in snapshots}
+        assert finished["extracting"]["files_done"] == finished["extracting"]["files_total"] == 1
+        assert finished["restoring"]["bytes_done"] == finished["restoring"]["bytes_total"] == 10
+    
+    def test_unchanged_files_are_left_alone(self, temp_env, monkeypatch):
+        """Test that files already the same as in the backup aren't copied."""
+        game = temp_env / "Game"
+        game.mkdir()
+        (game / "kept.dat").write_text("kept")
+        (game / "save.dat").write_text("saved game")
+        apps = {"game": {"id": "game", "name": "Game", "path": str(game)}}
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        
+        result = backup_app("game", backup_dot_files=False)
+        (game / "save.dat").write_text("changed")
+        
+        restored = restore_backup("game", f"game-{result['timestamp']}")
+        
+        assert restored["restored_files"] == 1 and restored["unchanged_files"] == 1
+        assert (game / "save.dat").read_text() == "saved game"
+
+class TestVerifyBackup:
+    """Tests for the verify_backup function."""
+    
+    def test_verify_finds_damaged_files(self, temp_env, monkeypatch):
+        """Test that a backup verifies until its recorded hashes stop matching."""
+        game = temp_env / "Game"
+        game.mkdir()
+        (game / "save.dat").write_text("saved game")
+        apps = {"game": {"id": "game", "name": "Game", "path": str(game)}}
+        monkeypatch.setattr("reformatbackup.src.scan.find_app", apps.get)
+        
+        result = backup_app("game", backup_dot_files=False)
+        backup_id = f"game-{result['timestamp']}"
+        
+        verified = verify_backup(backup_id)
+        assert verified["success"] and verified["verified"]
+        assert verified["checked_files"] == 1
+        
+        with open(result["metadata_path"]) as f:
+            metadata = json.load(f)
+        metadata["hashes"]["Game/save.dat"] = "0" * 32
+        metadata["hashes"]["Game/lost.dat"] = "0" * 32
+        with open(result["metadata_path"], "w") as f:
+            json.dump(metadata, f)
+        
+        damaged = verify_backup(backup_id)
+        assert not damaged["verified"]
+        assert damaged["mismatched_files"] == ["Game/save.dat"]
+        assert damaged["missing_files"] == ["Game/lost.dat"]
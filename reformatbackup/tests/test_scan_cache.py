@@ -0,0 +1,149 @@
+"""
+Tests for the scan cache in the ReformatBackup application.
+"""
+
+import os
+import json
+import pytest
+
+from reformatbackup.src import scan_cache
+from reformatbackup.src.config import (
+    get_scan_cache_path,
+    set_scan_store,
+    invalidate_config_cache
+)
+from reformatbackup.src.scan_cache import (
+    ScanIndex,
+    load_scan_index,
+    save_scan_cache,
+    update_scan_root,
+    query_apps,
+    get_scan_meta,
+    invalidate_scan_index
+)
+
+SAMPLE_APPS = [
+    {"id": "app-1", "name": "App One", "source": "registry", "drive": "C:", "size": 10, "root": "registry"},
+    {"id": "fs-app-2", "name": "App Two", "source": "file_system", "drive": "D:", "size": 30, "root": "D:\\Games"},
+    {"id": "dotfile-ssh", "name": "SSH Configuration", "source": "dot_file", "drive": "C:", "size": 20, "root": "home"},
+]
+
+@pytest.fixture
+def cache_path(tmp_path, monkeypatch):
+    """Point the user's home directory at a temporary directory and get the scan cache path."""
+    monkeypatch.setenv("HOME", str(tmp_path))
+    monkeypatch.setenv("USERPROFILE", str(tmp_path))
+    invalidate_config_cache()
+    invalidate_scan_index()
+    yield get_scan_cache_path()
+    invalidate_scan_index()
+    invalidate_config_cache()
+
+@pytest.fixture(params=["json", "sqlite"])
+def store(request, cache_path):
+    """Run a test against each scan store backend."""
+    set_scan_store(request.param)
+    return request.param
+
+class TestScanIndex:
+    """Tests for the ScanIndex class."""
+    
+    def test_lookups(self):
+        """Test lookups by ID, source and drive."""
+        index = ScanIndex(SAMPLE_APPS)
+        
+        assert len(index) == 3
+        assert index.get("fs-app-2")["name"] == "App Two"
+        assert index.get("missing") is None
+        assert "app-1" in index
+        assert [a["id"] for a in index.with_source("dot_file")] == ["dotfile-ssh"]
+        assert [a["id"] for a in index.on_drive("C:")] == ["app-1", "dotfile-ssh"]
+    
+    def test_get_many_keeps_order(self):
+        """Test that get_many returns the requested order and skips unknown IDs."""
+        index = ScanIndex(SAMPLE_APPS)
+        
+        apps = index.get_many(["dotfile-ssh", "missing", "app-1"])
+        
+        assert [a["id"] for a in apps] == ["dotfile-ssh", "app-1"]
+
+class TestScanCache:
+    """Tests for loading and saving the scan cache."""
+    
+    def test_missing_cache(self, cache_path):
+        """Test that a missing cache file yields no index."""
+        assert load_scan_index() is None
+    
+    def test_parses_once(self, cache_path, monkeypatch):
+        """Test that the cache file is only parsed again when it changes."""
+        save_scan_cache(SAMPLE_APPS)
+        
+        loads = []
+        original = json.load
+        monkeypatch.setattr(scan_cache.json, "load",
+                            lambda f: loads.append(f) or original(f))
+        
+        first = load_scan_index()
+        for _ in range(50):
+            assert load_scan_index() is first
+        assert loads == []
+        
+        # Another process rewrites the cache
+        with open(cache_path, "w") as f:
+            json.dump(SAMPLE_APPS[:1], f)
+        
+        assert len(load_scan_index()) == 1
+        assert len(loads) == 1
+
+class TestScanStores:
+    """Tests that run against both the JSON and the SQLite scan store."""
+    
+    def test_round_trip(self, store):
+        """Test that a saved scan can be loaded back in order."""
+        save_scan_cache(SAMPLE_APPS)
+        invalidate_scan_index()
+        
+        index = load_scan_index()
+        
+        assert [a["id"] for a in index.apps] == ["app-1", "fs-app-2", "dotfile-ssh"]
+    
+    def test_update_root(self, store):
+        """Test that updating one root leaves the other apps alone."""
+        save_scan_cache(SAMPLE_APPS)
+        
+        new_app = {"id": "fs-app-3", "name": "App Three", "source": "file_system",
+                   "drive": "D:", "size": 5, "root": "D:\\Games"}
+        update_scan_root("D:\\Games", [new_app])
+        invalidate_scan_index()
+        
+        index = load_scan_index()
+        
+        assert [a["id"] for a in index.apps] == ["app-1", "dotfile-ssh", "fs-app-3"]
+    
+    def test_query(self, store):
+        """Test filtered, sorted queries."""
+        save_scan_cache(SAMPLE_APPS)
+        
+        assert [a["id"] for a in query_apps(drive="C:")] == ["app-1", "dotfile-ssh"]
+        assert [a["id"] for a in query_apps(name="two")] == ["fs-app-2"]
+        assert [a["id"] for a in query_apps(sort_by="size", limit=2)] == ["fs-app-2", "dotfile-ssh"]
+
+    def test_meta_saved_with_scan(self, store):
+        """Test that metadata is stored with the scan result."""
+        save_scan_cache(SAMPLE_APPS, meta={"root_fingerprints": {"D:\\Games": {"fingerprint": [1, 2, 3]}}})
+        invalidate_scan_index()
+        
+        assert get_scan_meta("root_fingerprints") == {"D:\\Games": {"fingerprint": [1, 2, 3]}}
+        assert get_scan_meta("missing", {}) == {}
+
+class TestSqliteImport:
+    """Tests for the one-time import of appscan.json into the SQLite store."""
+    
+    def test_imports_json_cache(self, cache_path):
+        """Test that an existing JSON cache is imported when switching to SQLite."""
+        save_scan_cache(SAMPLE_APPS)
+        
+        set_scan_store("sqlite")
+        invalidate_scan_index()
+        
+        assert len(load_scan_index()) == 3
@@ -0,0 +1,108 @@
+"""
+Tests for the scan statistics in the ReformatBackup application.
+"""
+
+import pytest
+
+from reformatbackup.src import scan_cache, scan_stats, file_scan
+from reformatbackup.src.config import get_last_scan_time, invalidate_config_cache
+from reformatbackup.src.scan import get_scan_index
+from reformatbackup.src.scan_cache import get_scan_meta, invalidate_scan_index
+from reformatbackup.src.scan_stats import ScanStats
+from reformatbackup.src.scanners import Scanner, run_scanners
+
+@pytest.fixture
+def program_files(tmp_path, monkeypatch):
+    """Point the install roots and home directory at temporary directories."""
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("USERPROFILE", str(home))
+    
+    root = tmp_path / "Program Files"
+    root.mkdir()
+    monkeypatch.setenv("ProgramFiles", str(root))
+    for env in ["ProgramFiles(x86)", "LOCALAPPDATA", "APPDATA"]:
+        monkeypatch.setenv(env, str(tmp_path / "missing"))
+    monkeypatch.setattr(file_scan, "get_available_drives", lambda skip_types=None: [])
+    
+    invalidate_config_cache()
+    invalidate_scan_index()
+    file_scan.clear_root_fingerprints()
+    yield root
+    invalidate_scan_index()
+    invalidate_config_cache()
+
+class TestScanStats:
+    """Tests for the ScanStats class."""
+    
+    def test_records_phases_and_errors(self, monkeypatch):
+        """Test that phases keep their counters and errors are capped."""
+        monkeypatch.setattr(scan_stats, "MAX_SCAN_ERRORS", 2)
+        stats = ScanStats()
+        
+        with stats.phase("sizing") as counters:
+            counters["sized"] = 3
+        stats.add_phase("registry", 1.23456, apps=7)
+        for i in range(3):
+            stats.add_error("sizing", f"error {i}")
+        stats.finish()
+        
+        result = stats.to_dict()
+        assert list(result["phases"]) == ["sizing", "registry"]
+        assert result["phases"]["sizing"]["sized"] == 3
+        assert result["phases"]["registry"] == {"apps": 7, "seconds": 1.235}
+        assert len(result["errors"]) == 2 and result["error_count"] == 3
+        assert result["total_seconds"] is not None
+    
+    def test_run_scanners_records_each_scanner(self):
+        """Test that each scanner is recorded with its status."""
+        def failing(cancel_event):
+            raise OSError("access denied")
+        
+        stats = ScanStats()
+        apps = run_scanners([
+            Scanner("good", lambda cancel_event: [{"id": "a"}, {"id": "b"}]),
+            Scanner("bad", failing),
+        ], stats=stats)
+        
+        assert [app["id"] for app in apps] == ["a", "b"]
+        assert stats.phases["good"]["apps"] == 2
+        assert stats.phases["good"]["status"] == "completed"
+        assert stats.phases["bad"]["status"] == "failed"
+        assert stats.errors == [{"phase": "bad", "error": "access denied"}]
+
+class TestScanInstrumentation:
+    """Tests for the statistics stored with a scan."""
+    
+    def test_scan_stores_stats(self, program_files):
+        """Test that a scan stores its phases and per-root costs."""
+        (program_files / "App One").mkdir()
+        (program_files / "App One" / "one.exe").write_text("x")
+        (program_files / "Data").mkdir()
+        
+        get_scan_index(force_rescan=True)
+        
+        stats = get_scan_meta("scan_stats")
+        for phase in ["file_system", "reuse_sizes", "ownership", "sizing", "cache_write"]:
+            assert phase in stats["phases"]
+        assert stats["phases"]["sizing"]["sized"] >= 1
+        
+        cost = stats["roots"][str(program_files)]
+        assert cost["folders"] == 2 and cost["entries"] == 3 and cost["errors"] == 0
+    
+    def test_failed_cache_write_keeps_scan_time(self, program_files, monkeypatch):
+        """Test that a scan that couldn't be cached doesn't count as the last scan."""
+        def failing_store():
+            raise OSError("disk full")
+        
+        monkeypatch.setattr(scan_cache, "get_sqlite_store", failing_store)
+        monkeypatch.setattr(scan_cache, "atomic_write_json", lambda *args, **kwargs: False)
+        (program_files / "App One").mkdir()
+        (program_files / "App One" / "one.exe").write_text("x")
+        
+        index = get_scan_index(force_rescan=True)
+        
+        assert index.write_failed
+        assert index.apps
+        assert get_last_scan_time() is None
@@ -0,0 +1,73 @@
+"""
+Tests for the background scan worker in the ReformatBackup application.
+"""
+
+import datetime
+import threading
+import pytest
+
+from reformatbackup.src import scan
+from reformatbackup.src.config import set_last_scan_time, set_scan_interval_hours
+from reformatbackup.src.scan_cache import save_scan_cache
+from reformatbackup.src.scan_worker import ScanWorker, get_scan_snapshot
+
+@pytest.fixture
+def fake_scan(monkeypatch):
+    """Replace the full scan with one that waits for the test to release it."""
+    release = threading.Event()
+    calls = []
+    
+    def get_scan_index(force_rescan=False, defer_sizes=False):
+        calls.append(force_rescan)
+        release.wait(5)
+        return save_scan_cache([{"id": f"app-{len(calls)}", "name": "App"}])
+    
+    monkeypatch.setattr(scan, "get_scan_index", get_scan_index)
+    monkeypatch.setattr(scan, "resume_pending_sizes", lambda index: False)
+    return release, calls
+
+class TestScanWorker:
+    """Tests for the ScanWorker class."""
+    
+    def test_serves_snapshot_while_scanning(self, temp_home, fake_scan, wait_for):
+        """Test that requests see the last scan while a requested rescan runs."""
+        release, calls = fake_scan
+        save_scan_cache([{"id": "old", "name": "Old"}])
+        set_last_scan_time(datetime.datetime.now().strftime("%Y%m%d-%H%M%S"))
+        
+        worker = ScanWorker(check_interval=60.0)
+        worker.start()
+        try:
+            # A fresh cache doesn't trigger a scan on its own
+            assert not worker.is_scanning() and calls == []
+            
+            worker.request_scan()
+            wait_for(worker.is_scanning)
+            assert [app["id"] for app in get_scan_snapshot().apps] == ["old"]
+            
+            release.set()
+            wait_for(lambda: not worker.is_scanning())
+            status = worker.get_status()
+            assert status["finished_at"] is not None and status["error"] is None
+            assert [app["id"] for app in get_scan_snapshot().apps] == ["app-1"]
+            assert calls == [True]
+        finally:
+            worker.stop(timeout=5)
+    
+    def test_scans_when_stale_or_missing(self, temp_home, fake_scan, wait_for):
+        """Test that the worker scans on its own without a cache or once the interval passes."""
+        release, calls = fake_scan
+        release.set()
+        
+        assert get_scan_snapshot().apps == []
+        worker = ScanWorker(check_interval=0.05)
+        worker.start()
+        try:
+            wait_for(lambda: len(calls) == 1 and not worker.is_scanning())
+            
+            # The fake scan doesn't record a scan time, so set one that is stale
+            set_scan_interval_hours(1)
+            set_last_scan_time((datetime.datetime.now() - datetime.timedelta(hours=2)).strftime("%Y%m%d-%H%M%S"))
+            wait_for(lambda: len(calls) >= 2)
+        finally:
+            worker.stop(timeout=5)
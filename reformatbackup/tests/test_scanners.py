@@ -0,0 +1,93 @@
+"""
+Tests for the scanner orchestration in the ReformatBackup application.
+"""
+
+import time
+import pytest
+
+from reformatbackup.src import scanners
+from reformatbackup.src.scan_cache import ScanIndex
+from reformatbackup.src.scan_stats import ScanStats
+from reformatbackup.src.scanners import Scanner, run_scanners
+
+def make_scanner(delay, apps):
+    """Create a scanner that sleeps, then returns the given apps."""
+    def scan(cancel_event):
+        deadline = time.monotonic() + delay
+        while time.monotonic() < deadline:
+            if cancel_event.is_set():
+                return apps[:1]
+            time.sleep(0.01)
+        return apps
+    return scan
+
+class TestRunScanners:
+    """Tests for the run_scanners function."""
+    
+    def test_runs_concurrently(self):
+        """Test that scanners run at the same time and merge in registration order."""
+        to_run = [
+            Scanner("slow", make_scanner(0.3, [{"id": "a"}])),
+            Scanner("fast", make_scanner(0.1, [{"id": "b"}])),
+            Scanner("medium", make_scanner(0.2, [{"id": "c"}])),
+        ]
+        arrived = []
+        
+        start = time.monotonic()
+        apps = run_scanners(to_run, on_result=lambda name, found: arrived.append(name))
+        elapsed = time.monotonic() - start
+        
+        assert [a["id"] for a in apps] == ["a", "b", "c"]
+        assert arrived == ["fast", "medium", "slow"]
+        assert elapsed < 0.55
+    
+    def test_timeout_keeps_partial_results(self):
+        """Test that a scanner over its budget is cancelled and its partial results kept."""
+        to_run = [
+            Scanner("stuck", make_scanner(10, [{"id": "a"}, {"id": "b"}]), timeout=0.1),
+            Scanner("ok", make_scanner(0, [{"id": "c"}])),
+        ]
+        
+        apps = run_scanners(to_run)
+        
+        assert [a["id"] for a in apps] == ["a", "c"]
+    
+    def test_abandons_unresponsive_scanner(self, monkeypatch):
+        """Test that a scanner ignoring cancellation doesn't stall the scan."""
+        monkeypatch.setattr(scanners, "CANCEL_GRACE_SECONDS", 0.1)
+        to_run = [
+            Scanner("hung", lambda cancel_event: time.sleep(5) or [{"id": "a"}], timeout=0.1),
+            Scanner("error", lambda cancel_event: 1 / 0),
+            Scanner("ok", make_scanner(0, [{"id": "c"}])),
+        ]
+        
+        start = time.monotonic()
+        apps = run_scanners(to_run)
+        
+        assert [a["id"] for a in apps] == ["c"]
+        assert time.monotonic() - start < 1
+    
+    def test_unfinished_scanners_keep_previous_apps(self, monkeypatch):
+        """Test that failed, abandoned and cancelled scanners keep the apps the previous scan found."""
+        monkeypatch.setattr(scanners, "CANCEL_GRACE_SECONDS", 0.1)
+        previous = ScanIndex([
+            {"id": "reg-1", "source": "registry"},
+            {"id": "store-1", "source": "msstore"},
+            {"id": "fs-1", "source": "file_system"},
+            {"id": "fs-2", "source": "file_system"},
+            {"id": "steam-1", "source": "steam"},
+            {"id": "gone", "source": "epic"},
+        ])
+        to_run = [
+            Scanner("registry", lambda cancel_event: 1 / 0, sources=["registry", "msstore"]),
+            Scanner("file_system", make_scanner(10, [{"id": "fs-2", "source": "file_system"}]), timeout=0.1),
+            Scanner("steam", lambda cancel_event: time.sleep(5) or [], timeout=0.1),
+            Scanner("epic", make_scanner(0, [])),
+        ]
+        stats = ScanStats()
+        
+        apps = run_scanners(to_run, stats=stats, previous=previous)
+        
+        assert [app["id"] for app in apps] == ["reg-1", "store-1", "fs-2", "fs-1", "steam-1"]
+        assert sorted(stats.incomplete) == ["file_system", "registry", "steam"]
+        assert stats.phases["registry"]["kept"] == 2 and stats.phases["file_system"]["kept"] == 1
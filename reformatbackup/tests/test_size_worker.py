@@ -0,0 +1,61 @@
+"""
+Tests for the background size calculation in the ReformatBackup application.
+"""
+
+import os
+
+from reformatbackup.src.scan_cache import load_scan_index, save_scan_cache
+from reformatbackup.src.size_worker import BackgroundSizer
+
+def _make_app_dir(root, name, sizes):
+    path = root / name
+    path.mkdir()
+    for i, size in enumerate(sizes):
+        (path / f"file{i}.bin").write_bytes(b"x" * size)
+    return str(path)
+
+class TestBackgroundSizer:
+    """Tests for the BackgroundSizer class."""
+    
+    def test_sizes_written_to_cache(self, temp_home):
+        """Test that sizes are reported incrementally and written to the scan cache."""
+        apps = [
+            {"id": "a", "name": "A", "path": _make_app_dir(temp_home, "a", [100, 23]), "size": 0, "size_pending": True},
+            {"id": "b", "name": "B", "path": _make_app_dir(temp_home, "b", [7]), "size": 0, "size_pending": True},
+            {"id": "c", "name": "C", "size": 5},
+        ]
+        save_scan_cache(apps)
+        
+        sizer = BackgroundSizer()
+        sizer.start(apps)
+        sizer._thread.join(timeout=10)
+        
+        status = sizer.get_status()
+        assert not status["running"]
+        assert status["total"] == 2
+        assert status["done"] == 2
+        assert status["sizes"] == {"a": 123, "b": 7}
+        
+        # Only updates after the given sequence number are returned
+        assert sizer.get_status(status["seq"])["sizes"] == {}
+        
+        index = load_scan_index()
+        assert index.get("a")["size"] == 123
+        assert "size_pending" not in index.get("a")
+        assert index.get("b")["size"] == 7
+        assert index.get("c")["size"] == 5
+        
+        # The apps passed in are left unchanged
+        assert apps[0]["size_pending"] is True
+    
+    def test_cancel_before_run(self, temp_home):
+        """Test that a cancelled run doesn't write to the scan cache."""
+        apps = [{"id": "a", "name": "A", "path": _make_app_dir(temp_home, "a", [10]), "size": 0, "size_pending": True}]
+        save_scan_cache(apps)
+        
+        sizer = BackgroundSizer()
+        sizer.start(apps)
+        sizer.cancel()
+        sizer._thread.join(timeout=10)
+        
+        assert not sizer.is_running()
@@ -0,0 +1,69 @@
+"""
+Tests for the size calculation in the ReformatBackup application.
+"""
+
+import os
+import pytest
+
+from reformatbackup.src.sizing import SizeEngine
+
+def write_file(path, size):
+    """Write a file of the given size, creating its directory."""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+
+@pytest.fixture
+def tree(tmp_path):
+    """Create a small directory tree with nested application folders."""
+    root = tmp_path / "AppData"
+    write_file(str(root / "top.txt"), 10)
+    write_file(str(root / "App1" / "config.ini"), 100)
+    write_file(str(root / "App1" / "cache" / "data.bin"), 1000)
+    write_file(str(root / "App2" / "settings.json"), 50)
+    return root
+
+class TestSizeEngine:
+    """Tests for the SizeEngine class."""
+    
+    def test_directory_size(self, tree):
+        """Test that a directory's size is the sum of its files."""
+        assert SizeEngine().size_of(str(tree)) == 1160
+    
+    def test_file_and_missing_paths(self, tree):
+        """Test sizing a file and a path that doesn't exist."""
+        engine = SizeEngine()
+        
+        assert engine.size_of(str(tree / "top.txt")) == 10
+        assert engine.size_of(str(tree / "missing")) == 0
+    
+    def test_nested_paths_walked_once(self, tree):
+        """Test that nested paths reuse the sizes of their children."""
+        engine = SizeEngine()
+        
+        sizes = engine.size_many([str(tree), str(tree / "App1"), str(tree / "App2")])
+        
+        assert sizes == {str(tree): 1160, str(tree / "App1"): 1100, str(tree / "App2"): 50}
+        assert engine.memo_hits == 2
+        # top.txt, App1 and App2 at the root, plus the three entries in App1
+        # and the one in App2
+        assert engine.entries_visited == 3 + 3 + 1
+    
+    def test_known_sizes_reused(self, tree):
+        """Test that known sizes aren't walked and count towards their parents."""
+        engine = SizeEngine()
+        
+        sizes = engine.size_many([str(tree), str(tree / "App1")], known={str(tree / "App1"): 5000})
+        
+        assert sizes == {str(tree): 5060, str(tree / "App1"): 5000}
+        assert engine.memo_hits == 1
+        # Only the root's three entries and the one in App2
+        assert engine.entries_visited == 3 + 1
+    
+    @pytest.mark.skipif(not hasattr(os, "symlink") or os.name == "nt",
+                        reason="Symbolic links need extra privileges on Windows")
+    def test_symlinks_not_followed(self, tree):
+        """Test that symbolic links to directories are not counted."""
+        os.symlink(str(tree / "App1"), str(tree / "link"), target_is_directory=True)
+        
+        assert SizeEngine().size_of(str(tree)) == 1160
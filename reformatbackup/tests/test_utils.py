@@ -13,6 +13,8 @@ from reformatbackup.src.utils import (
     format_timestamp,
     read_json,
     write_json,
+    atomic_write_json,
+    compress_to_7z,
     handle_hidden_files
 )
 
@@ -90,6 +92,45 @@ class TestJsonFunctions:
             
             # Should return an empty dictionary
             assert read_data == {}
+    
+    def test_atomic_write_json(self):
+        """Test writing a JSON file atomically leaves no temporary files."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            test_file = os.path.join(temp_dir, "test.json")
+            
+            assert atomic_write_json(test_file, {"a": 1}) is True
+            assert atomic_write_json(test_file, {"a": 2}) is True
+            
+            assert read_json(test_file) == {"a": 2}
+            assert os.listdir(temp_dir) == ["test.json"]
+
+class TestCompressTo7z:
+    """Tests for the compress_to_7z function."""
+    
+    @pytest.mark.skipif(os.name == "nt", reason="symlinks need privileges on Windows")
+    def test_unreadable_files_skipped(self):
+        """Test a broken link is skipped and the rest is still archived."""
+        import py7zr
+        
+        with tempfile.TemporaryDirectory() as temp_dir:
+            source = os.path.join(temp_dir, "source")
+            os.makedirs(source)
+            with open(os.path.join(source, "notes.txt"), "w") as f:
+                f.write("notes " * 100)
+            with open(os.path.join(source, "photo.jpg"), "wb") as f:
+                f.write(os.urandom(4096))
+            os.symlink("photo.jpg", os.path.join(source, "link.jpg"))
+            os.symlink("missing.txt", os.path.join(source, "broken.txt"))
+            
+            archive_path = os.path.join(temp_dir, "out.7z")
+            assert compress_to_7z(source, archive_path) is True
+            
+            with py7zr.SevenZipFile(archive_path, "r") as archive:
+                names = archive.getnames()
+            assert "source/notes.txt" in names
+            assert "source/photo.jpg" in names
+            assert "source/link.jpg" in names
+            assert "source/broken.txt" not in names
 
 class TestHiddenFiles:
     """Tests for the handle_hidden_files function."""
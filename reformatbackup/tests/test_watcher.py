@@ -0,0 +1,145 @@
+"""
+Tests for the file system watcher in the ReformatBackup application.
+"""
+
+import os
+import sys
+import time
+import pytest
+
+from reformatbackup.src import scan, file_scan
+from reformatbackup.src.config import invalidate_config_cache
+from reformatbackup.src.scan_cache import load_scan_index, invalidate_scan_index
+from reformatbackup.src.size_worker import background_sizer
+from reformatbackup.src.watch_backends import InotifyBackend, PollingBackend
+from reformatbackup.src.watcher import FileWatcher
+
+@pytest.fixture
+def program_files(tmp_path, monkeypatch):
+    """Point the install roots and home directory at temporary directories."""
+    home = tmp_path / "home"
+    home.mkdir()
+    monkeypatch.setenv("HOME", str(home))
+    monkeypatch.setenv("USERPROFILE", str(home))
+    
+    root = tmp_path / "Program Files"
+    root.mkdir()
+    monkeypatch.setenv("ProgramFiles", str(root))
+    for env in ["ProgramFiles(x86)", "LOCALAPPDATA", "APPDATA"]:
+        monkeypatch.setenv(env, str(tmp_path / "missing"))
+    monkeypatch.setattr(file_scan, "get_available_drives", lambda skip_types=None: [])
+    
+    invalidate_config_cache()
+    invalidate_scan_index()
+    yield root
+    background_sizer.cancel()
+    invalidate_scan_index()
+    invalidate_config_cache()
+
+class TestFileWatcher:
+    """Tests for the FileWatcher class."""
+    
+    def test_refreshes_affected_entries(self, program_files, wait_for):
+        """Test that changes add new apps and resize changed ones without a full rescan."""
+        app_dir = program_files / "Editor"
+        (app_dir / "data" / "deep").mkdir(parents=True)
+        (app_dir / "editor.exe").write_bytes(b"x" * 10)
+        (program_files / "Other").mkdir()
+        (program_files / "Other" / "other.exe").write_bytes(b"x" * 5)
+        scan.get_scan_index(force_rescan=True)
+        other_before = load_scan_index().get("fs-other")
+        
+        watcher = FileWatcher(debounce=60.0, backend_kind="polling")
+        assert watcher.start()
+        try:
+            new_dir = program_files / "New App"
+            new_dir.mkdir()
+            (new_dir / "new.exe").write_bytes(b"x" * 7)
+            deep_file = app_dir / "data" / "deep" / "save.dat"
+            deep_file.write_bytes(b"x" * 100)
+            watcher.notify(str(new_dir))
+            watcher.notify(str(deep_file))
+            watcher.notify(os.path.join(os.environ["HOME"], ".reformatbackup"))
+            
+            assert watcher.flush() is not None
+            wait_for(lambda: not background_sizer.is_running())
+            
+            index = load_scan_index()
+            assert index.get("fs-new-app")["size"] == 7
+            assert index.get("fs-editor")["size"] == 110
+            assert index.get("fs-other")["sized_at"] == other_before["sized_at"]
+            assert watcher.get_status()["refreshes"] == 1
+        finally:
+            watcher.stop()
+    
+    def test_bursts_are_coalesced(self, program_files, monkeypatch, wait_for):
+        """Test that a burst of events leads to a single refresh."""
+        (program_files / "Game").mkdir()
+        calls = []
+        monkeypatch.setattr(scan, "refresh_roots", lambda roots, changed: calls.append((roots, changed)))
+        
+        watcher = FileWatcher(debounce=0.2, backend_kind="polling")
+        assert watcher.start()
+        try:
+            for i in range(50):
+                watcher.notify(str(program_files / "Game" / f"patch{i}.pak"))
+            wait_for(lambda: calls)
+            time.sleep(0.3)
+        finally:
+            watcher.stop()
+        
+        assert len(calls) == 1
+        roots, changed = calls[0]
+        assert roots == [str(program_files)] and len(changed) == 50
+    
+    def test_own_files_are_ignored(self, program_files):
+        """Test that the files this application writes to the home directory don't trigger refreshes."""
+        home = os.path.expanduser("~")
+        watcher = FileWatcher()
+        watcher._roots = [home]
+        own = [".reformatbackup", ".reformatbackup_jobs.db-wal", "appscan.json", "appscan.meta.json",
+               "appscan.db-wal", ".appscan.json.x1y2.tmp", "reformatbackup.log"]
+        
+        roots, changed = watcher._classify({os.path.join(home, name) for name in own + [".bashrc"]})
+        
+        assert roots == [home] and changed == [os.path.join(home, ".bashrc")]
+    
+    def test_refresh_without_appdata(self, program_files, monkeypatch):
+        """Test that the home directory is still refreshed when the AppData variables are unset."""
+        scan.get_scan_index(force_rescan=True)
+        monkeypatch.delenv("APPDATA")
+        monkeypatch.delenv("LOCALAPPDATA")
+        home = os.path.expanduser("~")
+        os.mkdir(os.path.join(home, ".editor"))
+        
+        index = scan.refresh_roots([home], [os.path.join(home, ".editor")])
+        
+        assert index.get("dotfile-editor")["path"] == os.path.join(home, ".editor")
+
+class TestBackends:
+    """Tests for the watch backends."""
+    
+    def _check_backend(self, backend_class, tmp_path, wait_for, **kwargs):
+        (tmp_path / "app").mkdir()
+        seen = []
+        backend = backend_class([str(tmp_path)], seen.append, **kwargs)
+        backend.start()
+        try:
+            time.sleep(0.1)
+            (tmp_path / "app" / "new.txt").write_text("x")
+            (tmp_path / "added").mkdir()
+            wait_for(lambda: str(tmp_path / "added") in seen)
+        finally:
+            backend.stop()
+        return seen
+    
+    def test_polling(self, tmp_path, wait_for):
+        """Test that polling reports changed entries of the root."""
+        seen = self._check_backend(PollingBackend, tmp_path, wait_for, interval=0.05)
+        assert str(tmp_path / "app") in seen
+    
+    @pytest.mark.skipif(not sys.platform.startswith("linux"), reason="inotify is Linux only")
+    def test_inotify(self, tmp_path, wait_for):
+        """Test that inotify reports changes inside watched subdirectories."""
+        seen = self._check_backend(InotifyBackend, tmp_path, wait_for)
+        assert str(tmp_path / "app" / "new.txt") in seen